@@ -0,0 +1,156 @@
+"""
+NLP-first extraction cascade for question answers
+Local extractors score their own result; confident answers ("procedimiento",
+"Acme Corp") are returned immediately and Gemini is only consulted below
+ANSWER_CASCADE_MIN_CONFIDENCE. Per-tier counters show how often each tier
+answers and how long it takes, to tune the threshold.
+
+The local extractor takes microseconds, so its confidence is always known
+before Gemini is called and no (billed, rate-limited) Gemini request is
+started for a confident answer. In "hedged" mode Gemini gets a deadline
+instead of the full client timeout: the NLP answer is used if Gemini has
+not answered in time, and the late Gemini result is only logged (and
+cached) for offline comparison.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.nlp_extractor_legal import extract_information_legal, extract_with_confidence_legal
+
+logger = logging.getLogger(__name__)
+
+# Local results at or above this confidence skip Gemini
+ANSWER_CASCADE_MIN_CONFIDENCE = float(os.getenv("ANSWER_CASCADE_MIN_CONFIDENCE", "0.85"))
+
+# "cascade": wait for Gemini when the NLP result is not confident
+# "hedged": wait at most ANSWER_GEMINI_DEADLINE_MS, then answer with NLP
+ANSWER_CASCADE_MODE = os.getenv("ANSWER_CASCADE_MODE", "cascade")
+ANSWER_GEMINI_DEADLINE_MS = int(os.getenv("ANSWER_GEMINI_DEADLINE_MS", "400"))
+
+# Questions where Gemini may improve on the local extractor
+GEMINI_QUESTIONS = ("tipo_trabajo", "doc_type_proc", "doc_type_proyecto", "client")
+
+TIERS = ("nlp", "gemini", "nlp_fallback", "nlp_deadline")
+
+
+class CascadeStats:
+    """Hit count and accumulated latency of each tier"""
+
+    def __init__(self):
+        self.hits = dict.fromkeys(TIERS, 0)
+        self.seconds = dict.fromkeys(TIERS, 0.0)
+
+    def record(self, tier: str, seconds: float) -> None:
+        self.hits[tier] += 1
+        self.seconds[tier] += seconds
+
+    def snapshot(self) -> Dict:
+        """Hits, hit rate and mean latency (ms) per tier"""
+        total = sum(self.hits.values())
+        return {
+            tier: {
+                "hits": self.hits[tier],
+                "hit_rate": round(self.hits[tier] / total, 3) if total else 0.0,
+                "avg_ms": round(1000 * self.seconds[tier] / self.hits[tier], 2) if self.hits[tier] else 0.0,
+            }
+            for tier in TIERS
+        }
+
+
+cascade_stats = CascadeStats()
+
+# Gemini calls still running after their deadline (kept referenced until done)
+_late_calls = set()
+
+
+async def extract_answer_cascade(
+    question_id: str,
+    user_input: str,
+    min_confidence: Optional[float] = None,
+    mode: Optional[str] = None,
+    deadline_ms: Optional[int] = None
+) -> Tuple[Any, str]:
+    """
+    Extract an answer with the local extractor first, Gemini only if unsure
+
+    Args:
+        question_id: Question being answered
+        user_input: Raw user response
+        min_confidence: Threshold (defaults to ANSWER_CASCADE_MIN_CONFIDENCE)
+        mode: "cascade" or "hedged" (defaults to ANSWER_CASCADE_MODE)
+        deadline_ms: Gemini deadline in hedged mode (defaults to ANSWER_GEMINI_DEADLINE_MS)
+
+    Returns:
+        (extracted answer, tier that produced it: "nlp", "gemini",
+        "nlp_fallback" or "nlp_deadline")
+    """
+    from app.gemini_rest_extractor import extract_with_gemini_rest, GEMINI_AVAILABLE
+
+    if min_confidence is None:
+        min_confidence = ANSWER_CASCADE_MIN_CONFIDENCE
+    if mode is None:
+        mode = ANSWER_CASCADE_MODE
+    if deadline_ms is None:
+        deadline_ms = ANSWER_GEMINI_DEADLINE_MS
+
+    start = time.perf_counter()
+    use_gemini = GEMINI_AVAILABLE and question_id in GEMINI_QUESTIONS
+    local, confidence = extract_with_confidence_legal(question_id, user_input)
+
+    if confidence >= min_confidence or not use_gemini:
+        cascade_stats.record("nlp", time.perf_counter() - start)
+        logger.info(f"NLP ({confidence:.2f}) resolvió {question_id}: {local}")
+        return local, "nlp"
+
+    # Started only now that its answer will be awaited
+    gemini_call = asyncio.ensure_future(extract_with_gemini_rest(question_id, user_input))
+    if mode == "hedged":
+        # NLP answer ready before waiting, used if Gemini misses the deadline
+        extracted = extract_information_legal(question_id, user_input)
+        remaining = max(0.0, deadline_ms / 1000 - (time.perf_counter() - start))
+        try:
+            await asyncio.wait_for(asyncio.shield(gemini_call), remaining)
+        except asyncio.TimeoutError:
+            _log_when_done(gemini_call, question_id, extracted, start)
+            cascade_stats.record("nlp_deadline", time.perf_counter() - start)
+            logger.info(f"Gemini no respondió en {deadline_ms} ms, NLP legal extrajo {question_id}: {extracted}")
+            return extracted, "nlp_deadline"
+        except Exception:
+            pass  # Raised again (and handled) when awaiting gemini_call below
+
+    try:
+        gemini_result = await gemini_call
+    except Exception as e:
+        logger.warning(f"Gemini falló, usando NLP legal: {e}")
+        gemini_result = None
+
+    if gemini_result and gemini_result.upper() != "AMBIGUO":
+        cascade_stats.record("gemini", time.perf_counter() - start)
+        logger.info(f"Gemini resolvió {question_id} (NLP {confidence:.2f}): {gemini_result}")
+        return gemini_result, "gemini"
+
+    extracted = extract_information_legal(question_id, user_input)
+    cascade_stats.record("nlp_fallback", time.perf_counter() - start)
+    logger.info(f"Gemini sin respuesta, NLP legal extrajo {question_id}: {extracted}")
+    return extracted, "nlp_fallback"
+
+
+def _log_when_done(gemini_call: asyncio.Future, question_id: str, answered: Any, start: float) -> None:
+    """Log a Gemini result that arrived after the deadline next to the answer that was given"""
+    _late_calls.add(gemini_call)
+
+    def log(call: asyncio.Future) -> None:
+        _late_calls.discard(call)
+        if call.cancelled() or call.exception() is not None:
+            return
+        elapsed_ms = 1000 * (time.perf_counter() - start)
+        agrees = "coincide" if call.result() == answered else "difiere"
+        logger.info(
+            f"Gemini tardío ({elapsed_ms:.0f} ms) para {question_id}: {call.result()!r}, "
+            f"se respondió {answered!r} ({agrees})"
+        )
+
+    gemini_call.add_done_callback(log)
@@ -3,7 +3,6 @@ Dropbox OAuth2 authentication module - AD-5
 Handles OAuth2 flow and session management with persistence
 """
 from typing import Optional, Dict
-import httpx
 from fastapi import HTTPException
 from urllib.parse import urlencode
 import json
@@ -11,6 +10,8 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from app.http_clients import get_client
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -81,25 +82,25 @@ async def exchange_code_for_token(code: str) -> Dict:
     Raises:
         HTTPException: If token exchange fails
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.dropboxapi.com/oauth2/token",
-            data={
-                "code": code,
-                "grant_type": "authorization_code",
-                "client_id": DROPBOX_APP_KEY,
-                "client_secret": DROPBOX_APP_SECRET,
-                "redirect_uri": DROPBOX_REDIRECT_URI,
-            }
+    client = get_client("dropbox_api")
+    response = await client.post(
+        "https://api.dropboxapi.com/oauth2/token",
+        data={
+            "code": code,
+            "grant_type": "authorization_code",
+            "client_id": DROPBOX_APP_KEY,
+            "client_secret": DROPBOX_APP_SECRET,
+            "redirect_uri": DROPBOX_REDIRECT_URI,
+        }
+    )
+
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=400,
+            detail="Failed to exchange authorization code for token"
         )
 
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=400,
-                detail="Failed to exchange authorization code for token"
-            )
-
-        return response.json()
+    return response.json()
 
 
 def store_session(token_data: Dict) -> None:
@@ -0,0 +1,231 @@
+"""
+Upstream circuit breakers and adaptive timeouts
+One breaker per upstream (Gemini, Dolphin) tracks request latency (EWMA and
+p99 per operation) and consecutive failures. After CIRCUIT_FAILURE_THRESHOLD
+failures the circuit opens and requests fail immediately with
+CircuitOpenError, so callers go straight to their fallback instead of
+waiting for a timeout; after CIRCUIT_RESET_SECONDS one trial request is let
+through (half-open) and closes the circuit again if it succeeds.
+"""
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open the circuit
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+
+# Seconds an open circuit waits before letting a trial request through
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# Adaptive timeout: ADAPTIVE_TIMEOUT_MULTIPLIER x p99 latency of the operation,
+# never below ADAPTIVE_TIMEOUT_MIN_SECONDS nor above the caller's timeout, once
+# ADAPTIVE_TIMEOUT_MIN_SAMPLES requests were measured
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "2.0"))
+ADAPTIVE_TIMEOUT_MIN_SECONDS = float(os.getenv("ADAPTIVE_TIMEOUT_MIN_SECONDS", "2.0"))
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.getenv("ADAPTIVE_TIMEOUT_MIN_SAMPLES", "20"))
+
+# Latencies kept per operation for the p99, and EWMA smoothing factor
+LATENCY_WINDOW = 200
+EWMA_ALPHA = 0.2
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the upstream's circuit is open"""
+
+
+class LatencyStats:
+    """EWMA and recent-window p99 of an operation's latency (seconds)"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.ewma = seconds if self.ewma is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.ewma
+
+    def p99(self) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker and latency tracker for one upstream
+
+    Args:
+        name: Upstream name (used in logs and metrics)
+        failure_threshold: Consecutive failures that open the circuit
+        reset_seconds: Seconds before an open circuit allows a trial request
+        clock: Monotonic clock (injectable for tests)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = CIRCUIT_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.latency: Dict[str, LatencyStats] = {}
+        self.metrics = {"requests": 0, "failures": 0, "rejected": 0, "transitions": {}}
+
+    def available(self) -> bool:
+        """Whether a request would be sent now (does not reserve the half-open trial)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return self.clock() - self.opened_at >= self.reset_seconds
+        return not self._trial_in_flight
+
+    def allow(self) -> bool:
+        """Reserve permission to send a request (the single trial when half-open)"""
+        if self.state == OPEN and self.clock() - self.opened_at >= self.reset_seconds:
+            self._transition(HALF_OPEN)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.metrics["rejected"] += 1
+        return False
+
+    def timeout(self, default: float, operation: str = "default") -> float:
+        """Timeout for an operation: from its p99 latency once measured, else default"""
+        stats = self.latency.get(operation)
+        if stats is None or len(stats.samples) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return default
+        adaptive = max(ADAPTIVE_TIMEOUT_MIN_SECONDS, ADAPTIVE_TIMEOUT_MULTIPLIER * stats.p99())
+        return min(default, adaptive)
+
+    def record_success(self, seconds: float, operation: str = "default") -> None:
+        self.metrics["requests"] += 1
+        self.latency.setdefault(operation, LatencyStats()).add(seconds)
+        self.failures = 0
+        self._trial_in_flight = False
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self, error: object = None) -> None:
+        self.metrics["requests"] += 1
+        self.metrics["failures"] += 1
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            logger.warning(f"Circuit '{self.name}' opening after {self.failures} failure(s): {error}")
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        transition = f"{self.state}->{state}"
+        self.metrics["transitions"][transition] = self.metrics["transitions"].get(transition, 0) + 1
+        logger.info(f"Circuit '{self.name}': {transition}")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = self.clock()
+
+    async def request(
+        self,
+        send: Callable[[float], Awaitable[httpx.Response]],
+        default_timeout: float,
+        operation: str = "default"
+    ) -> httpx.Response:
+        """
+        Send an HTTP request through the breaker
+
+        Timeouts, connection errors and 5xx responses count as failures. A
+        429 counts as neither: the upstream is up but throttling, and the
+        rate limiter around this call backs off and retries. Any other
+        response counts as a success (the upstream is answering).
+
+        Args:
+            send: Coroutine factory taking the timeout to use
+            default_timeout: Timeout before enough latency samples exist (and upper bound)
+            operation: Latency bucket ("extract", "summary", "parse", ...)
+
+        Returns:
+            The upstream's response
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+        start = self.clock()
+        try:
+            response = await send(self.timeout(default_timeout, operation))
+        except BaseException as e:
+            # Cancellation is not the upstream's fault, but the trial slot must be released
+            if isinstance(e, Exception):
+                self.record_failure(repr(e))
+            else:
+                self._trial_in_flight = False
+            raise
+
+        if response.status_code == 429:
+            self._trial_in_flight = False
+        elif response.status_code >= 500:
+            self.record_failure(f"HTTP {response.status_code}")
+        else:
+            self.record_success(self.clock() - start, operation)
+        return response
+
+    def status(self) -> Dict:
+        """State, counters, transitions and latency per operation"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            **self.metrics,
+            "transitions": dict(self.metrics["transitions"]),
+            "latency": {
+                operation: {
+                    "ewma_ms": round(1000 * stats.ewma, 1),
+                    "p99_ms": round(1000 * stats.p99(), 1),
+                    "samples": len(stats.samples),
+                }
+                for operation, stats in self.latency.items()
+            },
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Get the shared breaker for an upstream (created on first use)
+
+    Args:
+        name: Upstream name ("gemini", "dolphin")
+
+    Returns:
+        CircuitBreaker instance
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(name)
+        _breakers[name] = breaker
+    return breaker
+
+
+def breakers_status() -> Dict:
+    """Status of every breaker created so far"""
+    return {name: breaker.status() for name, breaker in _breakers.items()}
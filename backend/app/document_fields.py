@@ -0,0 +1,373 @@
+"""
+Document field extractor
+Fast local extraction of URSALL answers from a parsed document: procedure
+number, juzgado (jurisdicción, número, demarcación), document date,
+parties and insurer. Regexes and gazetteers only, compiled once, so a
+100-page document is scanned in milliseconds without Gemini.
+
+Every field is a vote over all its matches in the text; the confidence
+reflects how specific the matching pattern is and how much the matches
+agree.
+"""
+import os
+import re
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.keyword_matcher import normalize_text
+
+# Fields below this confidence are not suggested to the user
+DOCUMENT_FIELDS_MIN_CONFIDENCE = float(os.getenv("DOCUMENT_FIELDS_MIN_CONFIDENCE", "0.5"))
+
+# Confidence of each pattern on its own (before agreement between matches)
+CONFIDENCE_WITH_CONTEXT = 0.9   # "Procedimiento 455/2025", "Juzgado de lo Social nº 3"
+CONFIDENCE_LABELLED = 0.85      # "DEMANDANTE: ...", "DEMANDADO: ..."
+CONFIDENCE_SENTENCE = 0.7       # "demanda interpuesta por X contra Y"
+CONFIDENCE_DATED = 0.75         # "En Santa Cruz, a 15 de marzo de 2025", "Fecha: ..."
+CONFIDENCE_GAZETTEER = 0.6      # Insurer names
+CONFIDENCE_BARE = 0.5           # "455/2025" or a date with no context
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+
+# Tipo de juzgado -> respuesta de "jurisdiccion"
+JURISDICCIONES = {
+    "contencioso": "contencioso",
+    "social": "social",
+    "penal": "penal",
+    "primera instancia": "civil",
+    "civil": "civil",
+    "instruccion": "instrucción",
+}
+
+# Demarcaciones conocidas (sin tildes, en minúsculas) -> respuesta de "demarcacion";
+# gana el nombre más largo que coincida ("santa cruz de la palma" antes que "santa cruz")
+DEMARCACIONES = {
+    "santa cruz de tenerife": "Santa Cruz",
+    "santa cruz de la palma": "Santa Cruz de La Palma",
+    "santa cruz": "Santa Cruz",
+    "san cristobal de la laguna": "La Laguna",
+    "la laguna": "La Laguna",
+    "san sebastian de la gomera": "La Gomera",
+    "la gomera": "La Gomera",
+    "las palmas de gran canaria": "Las Palmas",
+    "las palmas": "Las Palmas",
+    "la orotava": "La Orotava",
+    "puerto de la cruz": "Puerto de la Cruz",
+    "icod de los vinos": "Icod de los Vinos",
+    "granadilla": "Granadilla",
+    "arona": "Arona",
+    "adeje": "Adeje",
+    "los llanos de aridane": "Los Llanos de Aridane",
+    "arrecife": "Arrecife",
+    "puerto del rosario": "Puerto del Rosario",
+    "valverde": "Valverde",
+    "telde": "Telde",
+    "tenerife": "Tenerife",
+}
+
+# Aseguradoras (nombre en minúsculas, con y sin tilde -> nombre de la compañía)
+ASEGURADORAS = {
+    "mapfre": "MAPFRE",
+    "axa": "AXA",
+    "allianz": "Allianz",
+    "mutua madrileña": "Mutua Madrileña",
+    "mutua tinerfeña": "Mutua Tinerfeña",
+    "generali": "Generali",
+    "zurich": "Zurich",
+    "caser": "Caser",
+    "liberty": "Liberty Seguros",
+    "reale": "Reale",
+    "santalucía": "Santalucía",
+    "santalucia": "Santalucía",
+    "santa lucia": "Santalucía",
+    "catalana occidente": "Catalana Occidente",
+    "occident": "Occident",
+    "helvetia": "Helvetia",
+    "plus ultra": "Plus Ultra",
+    "pelayo": "Pelayo",
+    "línea directa": "Línea Directa",
+    "linea directa": "Línea Directa",
+    "fiatc": "FIATC",
+    "sanitas": "Sanitas",
+    "adeslas": "Adeslas",
+    "dkv": "DKV",
+    "asisa": "Asisa",
+}
+
+# Characters before a procedure number searched for "procedimiento", "autos"...
+NUM_CONTEXT_CHARS = 40
+# Characters around each "contra" searched for "interpuesta por X contra Y"
+PARTES_WINDOW_CHARS = 150
+# Bare dates (no "Fecha:" or signature) are only looked for in the header
+DATE_HEADER_CHARS = 3000
+
+_NUM = r'(?:n[uú]m(?:ero|\.)?|n\.?\s*[ºo°])'
+
+# The regexes are anchored on cheap literals ("/2025", ", a", "juzgado") so
+# that a 100-page text is scanned in a few milliseconds
+NUM_YEAR_RE = re.compile(r'/\s*((?:19|20)\d{2})\b')
+NUM_BEFORE_RE = re.compile(
+    r'(?:(procedimiento|autos|proc\.|rollo|recurso|ejecuci[oó]n|' + _NUM + r')[^\d\n]{0,30})?'
+    r'(?<![\d/])(\d{1,6})\s*$',
+    re.IGNORECASE
+)
+
+# Demarcación at the start of a place name, longest names first
+DEMARCACION_RE = re.compile(
+    r'(' + '|'.join(
+        r'\s+'.join(map(re.escape, name.split()))
+        for name in sorted(DEMARCACIONES, key=len, reverse=True)
+    ) + r')\b'
+)
+
+JUZGADO_RE = re.compile(
+    r'juzgado\s+(?:de\s+lo\s+|de\s+)?'
+    r'(contencioso(?:[-\s]+administrativo)?|social|penal|primera\s+instancia|civil|instrucci[oó]n)'
+    r'(?:\s+e\s+instrucci[oó]n)?'
+    r'(?:\s*(?:' + _NUM + r'\s*)?(\d{1,3})\b)?'
+    r'(?:\s+de\s+([^\n,.;()]{2,40}))?',
+    re.IGNORECASE
+)
+
+_TITLE = r'(?:(?i:d\.?ª|dña\.?|don|doña|d\.)\s+)?'
+
+PARTE_ACTORA_RE = re.compile(
+    r'^\s*(?:demandante|actora?|parte\s+actora|recurrente|ejecutante)\s*:\s*' + _TITLE + r'([^\n,;:]{3,80})',
+    re.IGNORECASE | re.MULTILINE
+)
+PARTE_DEMANDADA_RE = re.compile(
+    r'^\s*(?:demandad[oa]|parte\s+demandada|recurrid[oa]|ejecutad[oa])\s*:\s*' + _TITLE + r'([^\n,;:]{3,80})',
+    re.IGNORECASE | re.MULTILINE
+)
+CONTRA_RE = re.compile(r' (?:contra|frente a) ')
+PARTES_VERBS = ("nterpuest", "romovid", "ormulad", "resentad", "eguid")
+PARTES_CONTRA_RE = re.compile(
+    r'(?:[Ii]nterpuest|[Pp]romovid|[Ff]ormulad|[Pp]resentad|[Ss]eguid)[oa]\s+(?:por|a\s+instancia\s+de)\s+' + _TITLE +
+    r'([A-ZÁÉÍÓÚÑ][^\n,;]{2,60}?)\s+(?:contra|frente\s+a)\s+' + _TITLE +
+    r'([A-ZÁÉÍÓÚÑ][^\n,;]{2,60}?)(?=\s*[,;.\n]|\s+(?:en|sobre|por|que)\s)'
+)
+
+_DATE = (
+    r'(?:(\d{1,2})\s+(?i:de\s+)?((?i:' + '|'.join(MESES) + r'))\s+(?i:del?)\s+((?:19|20)\d{2})'  # 15 de marzo de 2025
+    r'|(\d{1,2})[/.-](\d{1,2})[/.-]((?:19|20)\d{2})'  # 15/03/2025
+    r'|((?:19|20)\d{2})-(\d{2})-(\d{2}))\b'  # 2025-03-15
+)
+# Signature line ("En Santa Cruz, a 15 de marzo de 2025") or "Fecha:" label
+DATED_RE = re.compile(r'(?:,\s+[aA]\s+|(?:[Ff]echa|FECHA)\s*:\s*)' + _DATE)
+DATE_RE = re.compile(r'(?<![\d/])' + _DATE)
+
+
+def _vote(candidates: Iterable[Tuple[str, float]]) -> Optional[Dict]:
+    """
+    Pick the value with the most support among (value, confidence) matches
+
+    The winner's confidence is its best single-match confidence, raised a
+    little by every agreeing match and scaled by its share of all matches.
+    """
+    support: Dict[str, List[float]] = defaultdict(list)
+    for value, confidence in candidates:
+        support[value].append(confidence)
+    if not support:
+        return None
+
+    value, confidences = max(support.items(), key=lambda item: (sum(item[1]), max(item[1])))
+    total = sum(sum(scores) for scores in support.values())
+    share = sum(confidences) / total
+    confidence = min(0.99, max(confidences) + 0.02 * (len(confidences) - 1)) * share
+    return {"value": value, "confidence": round(confidence, 2), "matches": len(confidences)}
+
+
+def _clean_name(name: str) -> str:
+    """Trim a captured party name ("D. Juan Pérez García. " -> "Juan Pérez García")"""
+    return re.sub(r'\s+', ' ', name).strip(" .:-")
+
+
+def _demarcacion(place: str) -> Optional[str]:
+    """Map the text after "Juzgado ... de" to a known demarcación"""
+    match = DEMARCACION_RE.match(normalize_text(place))
+    if match:
+        return DEMARCACIONES[" ".join(match.group(1).split())]
+    return None
+
+
+def _date(year: str, month: str, day: str) -> Optional[str]:
+    """YYYY-MM-DD if the parts form a valid date"""
+    try:
+        return date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        return None
+
+
+def extract_num_procedimiento(text: str) -> Optional[Dict]:
+    """Procedure number (XXX/YYYY); numbers after "procedimiento", "autos", "nº"... count most"""
+    candidates = []
+    for match in NUM_YEAR_RE.finditer(text):
+        start = match.start()
+        if "/" in text[max(0, start - 6):start]:
+            continue  # Date (15/03/2025), not a procedure number
+        before = NUM_BEFORE_RE.search(text[max(0, start - NUM_CONTEXT_CHARS):start])
+        if before:
+            confidence = CONFIDENCE_WITH_CONTEXT if before.group(1) else CONFIDENCE_BARE
+            candidates.append((f"{before.group(2)}/{match.group(1)}", confidence))
+    return _vote(candidates)
+
+
+def extract_juzgado(text: str) -> Dict[str, Dict]:
+    """jurisdiccion, juzgado_num and demarcacion from "Juzgado de lo Social nº 3 de Santa Cruz" mentions"""
+    jurisdicciones, numeros, demarcaciones = [], [], []
+    for match in JUZGADO_RE.finditer(text):
+        tipo = normalize_text(match.group(1))
+        tipo = "contencioso" if tipo.startswith("contencioso") else re.sub(r'\s+', ' ', tipo)
+        jurisdicciones.append((JURISDICCIONES[tipo], CONFIDENCE_WITH_CONTEXT))
+        if match.group(2):
+            numeros.append((str(int(match.group(2))), CONFIDENCE_WITH_CONTEXT))
+        if match.group(3):
+            demarcacion = _demarcacion(match.group(3))
+            if demarcacion:
+                demarcaciones.append((demarcacion, CONFIDENCE_WITH_CONTEXT))
+
+    fields = {}
+    for field, candidates in (("jurisdiccion", jurisdicciones), ("juzgado_num", numeros),
+                              ("demarcacion", demarcaciones)):
+        result = _vote(candidates)
+        if result:
+            fields[field] = result
+    return fields
+
+
+def extract_partes(text: str) -> Optional[Dict]:
+    """Parties as "Parte A vs Parte B", from DEMANDANTE:/DEMANDADO: labels or "por X contra Y" """
+    candidates = []
+
+    actora = PARTE_ACTORA_RE.search(text)
+    demandada = PARTE_DEMANDADA_RE.search(text)
+    if actora and demandada:
+        candidates.append((f"{_clean_name(actora.group(1))} vs {_clean_name(demandada.group(1))}", CONFIDENCE_LABELLED))
+
+    # "por X contra Y" sentences are only looked for around each "contra"
+    seen = set()
+    for anchor in CONTRA_RE.finditer(text):
+        offset = max(0, anchor.start() - PARTES_WINDOW_CHARS)
+        before = text[offset:anchor.start()]
+        if not any(verb in before for verb in PARTES_VERBS):
+            continue
+        window = text[offset:anchor.end() + PARTES_WINDOW_CHARS]
+        for match in PARTES_CONTRA_RE.finditer(window):
+            if offset + match.start() not in seen:
+                seen.add(offset + match.start())
+                candidates.append((f"{_clean_name(match.group(1))} vs {_clean_name(match.group(2))}", CONFIDENCE_SENTENCE))
+
+    return _vote(candidates)
+
+
+def _match_date(match: re.Match) -> Optional[str]:
+    """YYYY-MM-DD from a match of _DATE (textual, numeric or ISO alternative)"""
+    groups = match.groups()[-9:]
+    if groups[0]:
+        return _date(groups[2], str(MESES[groups[1].lower()]), groups[0])
+    if groups[3]:
+        return _date(groups[5], groups[4], groups[3])
+    return _date(groups[6], groups[7], groups[8])
+
+
+def extract_fecha(text: str) -> Optional[Dict]:
+    """
+    Document date (YYYY-MM-DD)
+
+    The first date on a signature line or after "Fecha:"; otherwise the
+    first date in the header of the document, with less confidence.
+    """
+    for regex, scope, confidence in ((DATED_RE, text, CONFIDENCE_DATED),
+                                     (DATE_RE, text[:DATE_HEADER_CHARS], CONFIDENCE_BARE)):
+        for match in regex.finditer(scope):
+            value = _match_date(match)
+            if value:
+                return {"value": value, "confidence": confidence, "matches": 1}
+    return None
+
+
+def extract_aseguradora(text: str) -> Optional[Dict]:
+    """Insurance company named in the document (gazetteer)"""
+    lowered = text.lower()
+    candidates = []
+    for name, company in ASEGURADORAS.items():
+        # Cheap substring test first; word boundaries only for names present
+        if name in lowered:
+            count = len(re.findall(rf'\b{re.escape(name)}\b', lowered))
+            candidates.extend([(company, CONFIDENCE_GAZETTEER)] * count)
+    return _vote(candidates)
+
+
+def extract_document_fields(text: str) -> Dict[str, Dict]:
+    """
+    Extract URSALL answers from the text of a document
+
+    Args:
+        text: Parsed document text
+
+    Returns:
+        {question_id: {"value": str, "confidence": float, "matches": int}}
+        for every field found (num_procedimiento, jurisdiccion, juzgado_num,
+        demarcacion, fecha_procedimiento, partes, compania_seguro)
+    """
+    if not text:
+        return {}
+
+    fields = extract_juzgado(text)
+    for field, extractor in (
+        ("num_procedimiento", extract_num_procedimiento),
+        ("fecha_procedimiento", extract_fecha),
+        ("partes", extract_partes),
+        ("compania_seguro", extract_aseguradora),
+    ):
+        result = extractor(text)
+        if result:
+            fields[field] = result
+    return fields
+
+
+def suggested_answers(
+    fields: Dict[str, Dict],
+    min_confidence: float = DOCUMENT_FIELDS_MIN_CONFIDENCE
+) -> Tuple[Dict[str, str], Dict[str, float]]:
+    """
+    Turn extracted fields into the preview's suggested_answers
+
+    Returns:
+        (suggested_answers, confidences), with only the fields at or above
+        min_confidence
+    """
+    answers, confidences = {}, {}
+    for field, result in fields.items():
+        if result["confidence"] >= min_confidence:
+            answers[field] = result["value"]
+            confidences[field] = result["confidence"]
+    return answers, confidences
+
+
+def merge_suggested_answers(
+    gemini_answers: Dict,
+    gemini_confidence: float,
+    local_answers: Dict[str, str],
+    local_confidences: Dict[str, float]
+) -> Tuple[Dict[str, str], Dict[str, float]]:
+    """
+    Combine Gemini's suggested_answers with the local ones
+
+    Gemini's answers (null ones skipped) carry the summary's confidence; for
+    a field suggested by both, the more confident answer wins (Gemini on a
+    tie).
+
+    Returns:
+        (suggested_answers, confidences)
+    """
+    answers, confidences = dict(local_answers), dict(local_confidences)
+    for field, value in (gemini_answers or {}).items():
+        if value and gemini_confidence >= confidences.get(field, 0.0):
+            answers[field] = value
+            confidences[field] = gemini_confidence
+    return answers, confidences
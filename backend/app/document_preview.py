@@ -3,13 +3,19 @@ Document Preview Service
 Orchestrates Dolphin parsing + Gemini summarization to create document previews
 """
 
+import asyncio
 import logging
 import os
 from typing import Dict, Optional, Tuple
 from pathlib import Path
 
-from app.dolphin_parser import get_dolphin_parser, is_dolphin_available
+from app.circuit_breaker import get_breaker
+from app.document_fields import extract_document_fields, merge_suggested_answers, suggested_answers
+from app.extraction_cache import get_extraction_cache, file_sha256
+from app.parser_backends import ParserSelector, default_backends, DOCUMENT_PARSER_POLICY
 from app.gemini_summarizer import (
+    CHARS_PER_TOKEN,
+    SUMMARY_TOKEN_BUDGET,
     summarize_document,
     quick_document_check,
     is_gemini_available
@@ -17,36 +23,48 @@ from app.gemini_summarizer import (
 
 logger = logging.getLogger(__name__)
 
+EMPTY_METADATA = {"pages": 1, "has_tables": False, "has_figures": False}
+
+# Extraction budget for previews: stop after this many characters or pages
+# (by default, as much text as the summarizer's token budget can cover)
+PREVIEW_MAX_CHARS = int(os.getenv("PREVIEW_MAX_CHARS", str(SUMMARY_TOKEN_BUDGET * CHARS_PER_TOKEN)))
+PREVIEW_MAX_PAGES = int(os.getenv("PREVIEW_MAX_PAGES", "10"))
+
+# Page budget when the text goes to the Gemini (map-reduce) summarizer, so
+# long filings are not cut at PREVIEW_MAX_PAGES; PREVIEW_MAX_CHARS still applies
+SUMMARY_MAX_PAGES = int(os.getenv("SUMMARY_MAX_PAGES", "100"))
+
+# Finish extracting truncated documents in the background (result goes to
+# the extraction cache)
+PREVIEW_FULL_EXTRACTION = os.getenv("PREVIEW_FULL_EXTRACTION", "false").lower() == "true"
+
 
 class DocumentPreviewService:
     """Service for generating document previews"""
 
-    def __init__(self):
-        """Initialize the preview service"""
-        self.dolphin_available = is_dolphin_available()
+    def __init__(self, policy: str = DOCUMENT_PARSER_POLICY):
+        """
+        Initialize the preview service
+
+        Args:
+            policy: Parser backend policy (see app.parser_backends.POLICIES)
+        """
         self.gemini_available = is_gemini_available()
 
-        logger.info(f"DocumentPreviewService initialized - Dolphin: {self.dolphin_available}, Gemini: {self.gemini_available}")
+        # Backend health is probed lazily, on the first preview or status request
+        self.parsers = ParserSelector(default_backends(), policy)
 
-        # Initialize Dolphin parser if available
-        self.dolphin_parser = None
-        if self.dolphin_available:
-            try:
-                self.dolphin_parser = get_dolphin_parser()
-                if self.dolphin_parser:
-                    logger.info("Dolphin parser loaded successfully")
-                else:
-                    logger.warning("Dolphin parser initialization returned None")
-                    self.dolphin_available = False
-            except Exception as e:
-                logger.error(f"Failed to initialize Dolphin parser: {e}")
-                self.dolphin_available = False
+        # Background full extractions, by content hash
+        self._full_extractions: Dict[str, asyncio.Task] = {}
+
+        logger.info(f"DocumentPreviewService initialized - parser policy: {self.parsers.policy}, Gemini: {self.gemini_available}")
 
     async def generate_preview(
         self,
         file_path: str,
         file_id: str,
-        target_use: str = "legal"
+        target_use: str = "legal",
+        content_hash: Optional[str] = None
     ) -> Dict:
         """
         Generate a complete document preview
@@ -55,6 +73,7 @@ class DocumentPreviewService:
             file_path: Path to uploaded document
             file_id: Unique file identifier
             target_use: "legal" for URSALL or "general" for standard workflow
+            content_hash: SHA-256 of the file, if already known (computed otherwise)
 
         Returns:
             Dict with structure:
@@ -67,11 +86,13 @@ class DocumentPreviewService:
                     "confidence": float,
                     "is_legal_document": bool,
                     "pages": int,
+                    "pages_extracted": int,  # Pages the summary is based on
                     "has_tables": bool,
                     "has_figures": bool,
                     "suggested_workflow": "ursall" or "standard",
                     "key_information": Dict,
-                    "suggested_answers": Dict
+                    "suggested_answers": Dict,
+                    "suggested_answers_confidence": Dict  # Per answer, 0.0 to 1.0
                 },
                 "raw_text": str,  # Full extracted text (optional)
                 "error": str or None
@@ -84,37 +105,31 @@ class DocumentPreviewService:
 
             logger.info(f"Starting document preview for file: {file_path}")
 
-            # Step 2: Parse document with Dolphin (if available) or fallback to PyMuPDF
-            if self.dolphin_available and self.dolphin_parser:
-                try:
-                    logger.info("Attempting to parse with Dolphin")
-                    parsed_content, parse_confidence = self.dolphin_parser.parse_document(file_path)
-
-                    # Extract metadata
-                    metadata = {
-                        "pages": parsed_content.get("pages", 1),
-                        "has_tables": parsed_content.get("has_tables", False),
-                        "has_figures": parsed_content.get("has_figures", False)
-                    }
-
-                    document_text = parsed_content.get("text", "")
-                    logger.info(f"Dolphin parsing successful: {len(document_text)} characters extracted")
-                except Exception as e:
-                    logger.warning(f"Dolphin parsing failed: {e}")
-                    logger.info("Falling back to PyMuPDF + Gemini")
-                    document_text, metadata, parse_confidence = self._extract_text_pymupdf(file_path)
-            else:
-                # Fallback: Extract text using PyMuPDF directly (without Dolphin)
-                logger.info("Dolphin not available, using PyMuPDF for text extraction")
-                document_text, metadata, parse_confidence = self._extract_text_pymupdf(file_path)
+            # Step 2: Parse the first pages with Dolphin (if available) or fallback to
+            # PyMuPDF, unless the same content was already extracted; the summarizer
+            # gets a larger page budget than the basic preview
+            if content_hash is None:
+                content_hash = await asyncio.to_thread(file_sha256, file_path)
+            summarize = self.gemini_available and get_breaker("gemini").available()
+            document_text, metadata, parse_confidence = await self._extract_text(
+                file_path, content_hash, PREVIEW_MAX_CHARS, SUMMARY_MAX_PAGES if summarize else PREVIEW_MAX_PAGES
+            )
 
             if not document_text or len(document_text.strip()) == 0:
                 return self._error_response(file_id, "No se pudo extraer texto del documento")
 
-            # Step 3: Quick check if Gemini is not available
+            # Step 3: Local field extraction (regexes, milliseconds) prefills answers
+            # even without Gemini
+            local_answers = suggested_answers(extract_document_fields(document_text))
+            logger.info(f"Local field extraction suggested: {sorted(local_answers[0])}")
+
+            # Quick check if Gemini is not available
             if not self.gemini_available:
                 logger.warning("Gemini not available - returning basic preview")
-                return self._basic_preview(file_id, document_text, metadata, parse_confidence)
+                return self._basic_preview(file_id, document_text, metadata, parse_confidence, local_answers)
+            if not get_breaker("gemini").available():
+                logger.warning("Gemini circuit open - returning basic preview")
+                return self._basic_preview(file_id, document_text, metadata, parse_confidence, local_answers)
 
             # Step 4: Summarize with Gemini
             try:
@@ -122,16 +137,22 @@ class DocumentPreviewService:
 
                 if not summary_result:
                     logger.warning("Gemini summarization returned None - using basic preview")
-                    return self._basic_preview(file_id, document_text, metadata, parse_confidence)
+                    return self._basic_preview(file_id, document_text, metadata, parse_confidence, local_answers)
 
             except Exception as e:
                 logger.error(f"Gemini summarization failed: {e}")
-                return self._basic_preview(file_id, document_text, metadata, parse_confidence)
+                return self._basic_preview(file_id, document_text, metadata, parse_confidence, local_answers)
 
             # Step 5: Determine suggested workflow
             is_legal = summary_result.get("is_legal_document", False)
             suggested_workflow = "ursall" if is_legal else "standard"
 
+            answers, answer_confidence = merge_suggested_answers(
+                summary_result.get("suggested_answers", {}),
+                summary_result.get("confidence", parse_confidence),
+                *local_answers
+            )
+
             # Build complete preview
             preview = {
                 "summary": summary_result.get("summary", "Documento procesado correctamente"),
@@ -139,11 +160,13 @@ class DocumentPreviewService:
                 "confidence": summary_result.get("confidence", parse_confidence),
                 "is_legal_document": is_legal,
                 "pages": metadata["pages"],
+                "pages_extracted": metadata.get("pages_extracted", metadata["pages"]),
                 "has_tables": metadata["has_tables"],
                 "has_figures": metadata["has_figures"],
                 "suggested_workflow": suggested_workflow,
                 "key_information": summary_result.get("key_information", {}),
-                "suggested_answers": summary_result.get("suggested_answers", {})
+                "suggested_answers": answers,
+                "suggested_answers_confidence": answer_confidence
             }
 
             logger.info(f"Preview generated successfully for {file_id}: {preview['document_type']}")
@@ -160,47 +183,101 @@ class DocumentPreviewService:
             logger.error(f"Unexpected error in generate_preview: {e}", exc_info=True)
             return self._error_response(file_id, f"Unexpected error: {str(e)}")
 
-    def _extract_text_pymupdf(self, file_path: str) -> Tuple[str, Dict, float]:
+    async def _extract_text(
+        self,
+        file_path: str,
+        content_hash: str,
+        max_chars: Optional[int] = PREVIEW_MAX_CHARS,
+        max_pages: Optional[int] = PREVIEW_MAX_PAGES
+    ) -> Tuple[str, Dict, float]:
         """
-        Extract text from PDF using PyMuPDF as fallback
+        Extract text with the best available parser, through the extraction cache
+
+        Backends are tried in policy order; a backend that fails is marked
+        unhealthy and the next one is used. Only the first pages are
+        extracted, up to max_chars/max_pages; a full extraction already in
+        the cache is used when present.
 
         Args:
-            file_path: Path to PDF file
+            file_path: Path to document
+            content_hash: SHA-256 of the document
+            max_chars: Character budget (None for no limit)
+            max_pages: Page budget (None for no limit)
 
         Returns:
             Tuple of (text, metadata, confidence)
         """
-        try:
-            import fitz  # PyMuPDF
-
-            doc = fitz.open(file_path)
-            text_parts = []
-
-            for page in doc:
-                text_parts.append(page.get_text())
+        cache = get_extraction_cache()
+        budgeted = bool(max_chars or max_pages)
+
+        for backend in await self.parsers.candidates():
+            version = backend.version()
+            partial_version = f"{version}+budget-{max_chars}-{max_pages}"
+            for cached_version in ([version, partial_version] if budgeted else [version]):
+                cached = await cache.aget(content_hash, backend.name, cached_version)
+                if cached is not None:
+                    logger.info(f"Extraction cache hit ({backend.name} {cached_version}): {len(cached['text'])} characters")
+                    return cached["text"], cached["metadata"], cached["confidence"]
 
-            full_text = "\n\n".join(text_parts)
+            try:
+                logger.info(f"Parsing with {backend.name}")
+                parsed_content, parse_confidence = await backend.parse(file_path, max_chars, max_pages)
+            except Exception as e:
+                logger.warning(f"{backend.name} parsing failed, trying next backend: {e!r}")
+                backend.mark_unhealthy(e)
+                continue
 
+            self.parsers.last_selected = backend.name
+            document_text = parsed_content.get("text", "")
+            pages = parsed_content.get("pages", 1)
             metadata = {
-                "pages": len(doc),
-                "has_tables": False,  # PyMuPDF doesn't detect tables automatically
-                "has_figures": False
+                "pages": pages,
+                "pages_extracted": parsed_content.get("pages_extracted", pages),
+                "has_tables": parsed_content.get("has_tables", False),
+                "has_figures": parsed_content.get("has_figures", False)
             }
 
-            doc.close()
-
-            return full_text, metadata, 0.7  # Lower confidence than Dolphin
+            if not document_text or not document_text.strip():
+                logger.warning(f"{backend.name} extracted no text")
+                continue
+
+            complete = metadata["pages_extracted"] >= pages
+            logger.info(f"{backend.name} parsing successful: {len(document_text)} characters extracted "
+                        f"from {metadata['pages_extracted']}/{pages} pages")
+            await cache.aput(
+                content_hash, backend.name, version if complete else partial_version, document_text,
+                metadata, parse_confidence, parsed_content.get("elements", [])
+            )
+            if not complete and PREVIEW_FULL_EXTRACTION:
+                self._start_full_extraction(file_path, content_hash)
+            return document_text, metadata, parse_confidence
+
+        logger.error(f"No parser backend could extract text from {file_path}")
+        return "", dict(EMPTY_METADATA), 0.0
+
+    def _start_full_extraction(self, file_path: str, content_hash: str) -> None:
+        """Extract the whole document in the background so it lands in the extraction cache"""
+        if content_hash in self._full_extractions:
+            return
+
+        async def run():
+            try:
+                await self._extract_text(file_path, content_hash, None, None)
+                logger.info(f"Background full extraction finished for {os.path.basename(file_path)}")
+            except Exception as e:
+                logger.warning(f"Background full extraction failed for {file_path}: {e!r}")
+            finally:
+                self._full_extractions.pop(content_hash, None)
 
-        except Exception as e:
-            logger.error(f"PyMuPDF extraction failed: {e}")
-            return "", {"pages": 1, "has_tables": False, "has_figures": False}, 0.0
+        self._full_extractions[content_hash] = asyncio.create_task(run())
 
     def _basic_preview(
         self,
         file_id: str,
         document_text: str,
         metadata: Dict,
-        confidence: float
+        confidence: float,
+        local_answers: Tuple[Dict, Dict] = ({}, {})
     ) -> Dict:
         """
         Generate basic preview when Gemini is not available
@@ -210,6 +287,7 @@ class DocumentPreviewService:
             document_text: Extracted text
             metadata: Document metadata
             confidence: Parse confidence score
+            local_answers: (suggested_answers, confidences) from the local field extractor
 
         Returns:
             Basic preview dict
@@ -220,11 +298,13 @@ class DocumentPreviewService:
             "confidence": confidence,
             "is_legal_document": False,
             "pages": metadata["pages"],
+            "pages_extracted": metadata.get("pages_extracted", metadata["pages"]),
             "has_tables": metadata["has_tables"],
             "has_figures": metadata["has_figures"],
             "suggested_workflow": "standard",
             "key_information": {},
-            "suggested_answers": {}
+            "suggested_answers": dict(local_answers[0]),
+            "suggested_answers_confidence": dict(local_answers[1])
         }
 
         return {
@@ -245,25 +325,29 @@ class DocumentPreviewService:
             "error": error_message
         }
 
-    def get_status(self) -> Dict:
+    async def get_status(self) -> Dict:
         """
         Get service status
 
         Returns:
-            Dict with service availability status
+            Dict with service availability status and parser backend health
         """
+        parsers = await self.parsers.status()
+        dolphin_available = parsers["selected"] in ("dolphin", "dolphin-api")
         return {
-            "dolphin_available": self.dolphin_available,
+            "dolphin_available": dolphin_available,
             "gemini_available": self.gemini_available,
-            "preview_available": self.dolphin_available and self.gemini_available,
-            "message": self._get_status_message()
+            "preview_available": dolphin_available and self.gemini_available,
+            "parser": parsers,
+            "extraction_cache": get_extraction_cache().stats(),
+            "message": self._get_status_message(dolphin_available)
         }
 
-    def _get_status_message(self) -> str:
+    def _get_status_message(self, dolphin_available: bool) -> str:
         """Get human-readable status message"""
-        if self.dolphin_available and self.gemini_available:
+        if dolphin_available and self.gemini_available:
             return "Document preview service fully operational"
-        elif self.dolphin_available:
+        elif dolphin_available:
             return "Document preview available with basic parsing (Gemini unavailable)"
         elif self.gemini_available:
             return "Document preview unavailable (Dolphin parser not configured)"
@@ -293,7 +377,8 @@ def get_preview_service() -> DocumentPreviewService:
 async def generate_document_preview(
     file_path: str,
     file_id: str,
-    target_use: str = "legal"
+    target_use: str = "legal",
+    content_hash: Optional[str] = None
 ) -> Dict:
     """
     Convenience function to generate document preview
@@ -302,15 +387,16 @@ async def generate_document_preview(
         file_path: Path to document
         file_id: Unique file ID
         target_use: "legal" or "general"
+        content_hash: SHA-256 of the document, if known
 
     Returns:
         Preview dictionary
     """
     service = get_preview_service()
-    return await service.generate_preview(file_path, file_id, target_use)
+    return await service.generate_preview(file_path, file_id, target_use, content_hash)
 
 
-def check_preview_availability() -> Dict:
+async def check_preview_availability() -> Dict:
     """
     Check if preview service is available
 
@@ -318,4 +404,4 @@ def check_preview_availability() -> Dict:
         Status dictionary
     """
     service = get_preview_service()
-    return service.get_status()
+    return await service.get_status()
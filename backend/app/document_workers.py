@@ -0,0 +1,355 @@
+"""
+Document worker pool
+Bounded process pool for CPU-bound PyMuPDF work (thumbnails, text
+extraction, page rasterization) behind an async facade, so request
+handlers only await results and the event loop is never blocked
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for document work
+DOCUMENT_WORKERS = int(os.getenv("DOCUMENT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Tasks allowed to wait for a free worker; beyond that new tasks are rejected
+DOCUMENT_QUEUE_MAX = int(os.getenv("DOCUMENT_QUEUE_MAX", "32"))
+
+# Default per-task timeout in seconds
+DOCUMENT_TASK_TIMEOUT = float(os.getenv("DOCUMENT_TASK_TIMEOUT", "120"))
+
+# Page classification: a page is "text" (usable text layer) when it has
+# embedded fonts, at least TEXT_LAYER_MIN_CHARS characters (scaled to an A4
+# page) and images cover at most TEXT_LAYER_MAX_IMAGE_COVERAGE of it;
+# otherwise it is "scanned"
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "200"))
+TEXT_LAYER_MAX_IMAGE_COVERAGE = float(os.getenv("TEXT_LAYER_MAX_IMAGE_COVERAGE", "0.5"))
+
+A4_AREA = 595 * 842  # points
+
+
+class DocumentPoolBusy(RuntimeError):
+    """Raised when the document pool queue is full"""
+
+
+# ============================================================================
+# WORKER FUNCTIONS (run in child processes, must be top-level)
+# ============================================================================
+
+def render_thumbnail(pdf_path: str, output_path: str, zoom: float = 2.0) -> str:
+    """
+    Render the first page of a PDF to PNG
+
+    Returns:
+        output_path
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf_path)
+    try:
+        pix = doc[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        pix.save(output_path)
+    finally:
+        doc.close()
+    return output_path
+
+
+def iter_page_text(doc) -> Iterator[str]:
+    """Yield the text layer of each page, one page at a time"""
+    for page in doc:
+        yield page.get_text()
+
+
+def take_within_budget(
+    page_texts: Iterable[str],
+    max_chars: Optional[int] = None,
+    max_pages: Optional[int] = None
+) -> List[str]:
+    """
+    Consume pages until the budget is reached (the page that crosses
+    max_chars is kept); later pages are never read
+
+    Returns:
+        Texts of the consumed pages
+    """
+    taken = []
+    chars = 0
+    for text in page_texts:
+        taken.append(text)
+        chars += len(text)
+        if (max_pages and len(taken) >= max_pages) or (max_chars and chars >= max_chars):
+            break
+    return taken
+
+
+def extract_text(
+    file_path: str,
+    max_chars: Optional[int] = None,
+    max_pages: Optional[int] = None
+) -> Tuple[str, Dict]:
+    """
+    Extract the text layer of the first pages, up to a character/page budget
+
+    Returns:
+        Tuple of (text, metadata) with metadata {"pages", "pages_extracted",
+        "has_tables", "has_figures"}; "pages" is the document's page count
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(file_path)
+    try:
+        pages = take_within_budget(iter_page_text(doc), max_chars, max_pages)
+        text = "\n\n".join(pages)
+        metadata = {
+            "pages": len(doc),
+            "pages_extracted": len(pages),
+            "has_tables": False,  # PyMuPDF doesn't detect tables automatically
+            "has_figures": False
+        }
+    finally:
+        doc.close()
+    return text, metadata
+
+
+def count_pages(pdf_path: str) -> int:
+    """Number of pages of a PDF"""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf_path)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def classify_pages(
+    pdf_path: str,
+    min_chars: int = TEXT_LAYER_MIN_CHARS,
+    max_image_coverage: float = TEXT_LAYER_MAX_IMAGE_COVERAGE,
+    max_chars: Optional[int] = None,
+    max_pages: Optional[int] = None
+) -> Dict:
+    """
+    Classify pages as born-digital ("text") or "scanned"
+
+    Pages are examined in order and examination stops once max_pages pages
+    were seen or the text pages hold max_chars characters.
+
+    Returns:
+        {"page_count": int, "pages": [...]} with one dict per examined page:
+        {"page" (1-based), "kind", "chars", "density", "fonts",
+        "image_coverage", "text"}
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf_path)
+    try:
+        pages = []
+        text_chars = 0
+        for number, page in enumerate(doc):
+            text = page.get_text()
+            chars = sum(1 for char in text if not char.isspace())
+            area = abs(page.rect) or A4_AREA
+            density = chars * A4_AREA / area
+            fonts = len(page.get_fonts())
+
+            covered = 0.0
+            for image in page.get_image_info():
+                bbox = fitz.Rect(image["bbox"]) & page.rect
+                covered += abs(bbox)
+            image_coverage = min(1.0, covered / area)
+
+            is_text = fonts > 0 and density >= min_chars and image_coverage <= max_image_coverage
+            pages.append({
+                "page": number + 1,
+                "kind": "text" if is_text else "scanned",
+                "chars": chars,
+                "density": round(density, 1),
+                "fonts": fonts,
+                "image_coverage": round(image_coverage, 3),
+                "text": text if is_text else "",
+            })
+
+            text_chars += len(text) if is_text else 0
+            if (max_pages and len(pages) >= max_pages) or (max_chars and text_chars >= max_chars):
+                break
+        page_count = len(doc)
+    finally:
+        doc.close()
+    return {"page_count": page_count, "pages": pages}
+
+
+def extract_pages(pdf_path: str, output_path: str, pages: List[int]) -> str:
+    """
+    Copy some pages of a PDF into a new PDF
+
+    Args:
+        pdf_path: Source PDF
+        output_path: Destination PDF
+        pages: 0-based page numbers, in the order they should appear
+
+    Returns:
+        output_path
+    """
+    import fitz  # PyMuPDF
+
+    source = fitz.open(pdf_path)
+    target = fitz.open()
+    try:
+        for number in pages:
+            target.insert_pdf(source, from_page=number, to_page=number)
+        target.save(output_path)
+    finally:
+        target.close()
+        source.close()
+    return output_path
+
+
+# ============================================================================
+# ASYNC FACADE
+# ============================================================================
+
+class DocumentWorkerPool:
+    """
+    Async facade over a ProcessPoolExecutor
+
+    At most `max_workers` tasks run at once and at most `max_queue` wait;
+    further submissions raise DocumentPoolBusy instead of piling up.
+
+    A task that exceeds its timeout is cancelled if it has not started yet;
+    if it is already running the caller stops waiting and the worker
+    finishes it in the background (counted in "timeouts").
+
+    A worker that dies (PyMuPDF segfault, OOM kill) breaks the executor:
+    the tasks it held fail with BrokenProcessPool and the executor is
+    replaced (counted in "respawned"), so later tasks run normally.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DOCUMENT_WORKERS,
+        max_queue: int = DOCUMENT_QUEUE_MAX,
+        default_timeout: float = DOCUMENT_TASK_TIMEOUT
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.metrics = {
+            "submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "rejected": 0, "respawned": 0
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"Starting document worker pool ({self.max_workers} processes)")
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _replace_broken(self, executor: ProcessPoolExecutor) -> None:
+        """Drop an executor broken by a dead worker (the next task starts a new one)"""
+        with self._lock:
+            if self._executor is not executor:
+                return  # Already replaced by another task
+            self._executor = None
+            self.metrics["respawned"] += 1
+        logger.error("A document worker process died; starting a new document worker pool")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn: Callable, args: tuple) -> Tuple[ProcessPoolExecutor, Future]:
+        """Submit to the executor, replacing it once if it is already broken"""
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(fn, *args)
+
+    def _task_done(self, _) -> None:
+        # Called from the executor's management thread
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def queue_depth(self) -> int:
+        """Tasks submitted but waiting for a free worker"""
+        return max(0, self._pending - self.max_workers)
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None):
+        """
+        Run fn(*args) in a worker process and await its result
+
+        Args:
+            fn: Top-level (picklable) function
+            *args: Picklable arguments
+            timeout: Seconds to wait (default: DOCUMENT_TASK_TIMEOUT)
+
+        Returns:
+            fn's return value
+
+        Raises:
+            DocumentPoolBusy: If the queue is full
+            asyncio.TimeoutError: If the task did not finish in time
+            BrokenProcessPool: If a worker process died while the task was queued or running
+            Exception: Whatever fn raised
+        """
+        # Check and reserve together: _task_done decrements from another thread
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.metrics["rejected"] += 1
+                raise DocumentPoolBusy(f"Document pool queue full ({self.queue_depth} waiting)")
+            self._pending += 1
+        self.metrics["submitted"] += 1
+        future = None
+        try:
+            executor, future = self._submit(fn, args)
+        finally:
+            if future is None:
+                self._task_done(None)  # Release the reservation
+        future.add_done_callback(self._task_done)
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.default_timeout)
+        except BrokenProcessPool:
+            self.metrics["failed"] += 1
+            self._replace_broken(executor)
+            raise
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            logger.warning(f"Document task {getattr(fn, '__name__', fn)} timed out after {timeout or self.default_timeout}s")
+            raise
+        except Exception:
+            self.metrics["failed"] += 1
+            raise
+
+        self.metrics["completed"] += 1
+        return result
+
+    def status(self) -> Dict:
+        """Pool metrics, including the current queue depth"""
+        return {
+            "workers": self.max_workers,
+            "running": min(self._pending, self.max_workers),
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            **self.metrics
+        }
+
+    def shutdown(self) -> None:
+        """Stop the worker processes (pending tasks are cancelled)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global pool instance (processes are started on first task)
+document_pool = DocumentWorkerPool()
@@ -0,0 +1,149 @@
+"""
+Dolphin dynamic batcher
+Collects (prompt, image) recognition requests from every page and every
+concurrent document handled by a Dolphin worker, and runs them through the
+model in shared batches: a batch is sent when it reaches max_batch_size or
+when the oldest request has waited max_wait seconds
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+DOLPHIN_BATCHING = os.getenv("DOLPHIN_BATCHING", "true").lower() == "true"
+DOLPHIN_BATCH_MAX_SIZE = int(os.getenv("DOLPHIN_BATCH_MAX_SIZE", "16"))
+DOLPHIN_BATCH_MAX_WAIT = float(os.getenv("DOLPHIN_BATCH_MAX_WAIT_MS", "20")) / 1000
+
+# Histogram bucket upper bounds
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+
+class Histogram:
+    """Fixed-bucket histogram (count per bucket, plus count/sum)"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def snapshot(self) -> Dict:
+        labels = [f"<={bound}" for bound in self.buckets] + ["+Inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+        }
+
+
+class DynamicBatcher:
+    """
+    Thread-safe batcher in front of a batched model call
+
+    run_batch(prompts, images, max_batch_size=n) must return one output per
+    input, in order (the signature of DOLPHIN.chat with list inputs).
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[..., List[str]],
+        max_batch_size: int = DOLPHIN_BATCH_MAX_SIZE,
+        max_wait: float = DOLPHIN_BATCH_MAX_WAIT
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.batch_fill = Histogram([0.25, 0.5, 0.75, 1.0])
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.batches = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="dolphin-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt: str, image: Any) -> Future:
+        """Queue one request; the future resolves to the model output"""
+        future: Future = Future()
+        self._queue.put((prompt, image, future, time.monotonic()))
+        return future
+
+    def map(self, prompts: Sequence[str], images: Sequence[Any]) -> List[str]:
+        """Submit several requests and wait for all outputs, in input order"""
+        futures = [self.submit(prompt, image) for prompt, image in zip(prompts, images)]
+        return [future.result() for future in futures]
+
+    def _collect(self, first) -> List:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Stop after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+
+            prompts = [item[0] for item in batch]
+            images = [item[1] for item in batch]
+            try:
+                outputs = self.run_batch(prompts, images, max_batch_size=len(batch))
+                if len(outputs) != len(batch):
+                    raise RuntimeError(f"Model returned {len(outputs)} outputs for {len(batch)} inputs")
+            except Exception as e:
+                logger.error(f"Dolphin batch of {len(batch)} failed: {e}")
+                for item in batch:
+                    item[2].set_exception(e)
+                continue
+
+            now = time.monotonic()
+            self.batches += 1
+            self.batch_size.observe(len(batch))
+            self.batch_fill.observe(len(batch) / self.max_batch_size)
+            for item, output in zip(batch, outputs):
+                self.latency.observe(now - item[3])
+                item[2].set_result(output)
+
+    def snapshot(self) -> Dict:
+        """Batch-size, batch-fill and per-request latency histograms"""
+        return {
+            "batches": self.batches,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batch_size": self.batch_size.snapshot(),
+            "batch_fill": self.batch_fill.snapshot(),
+            "latency_seconds": self.latency.snapshot(),
+        }
+
+    def close(self) -> None:
+        """Stop the batching thread after the queued requests are served"""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
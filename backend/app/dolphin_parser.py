@@ -7,6 +7,7 @@ Supports both local model and REST API modes
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple, Literal
 from pathlib import Path
 
@@ -32,6 +33,11 @@ except ImportError as e:
 
 logger = logging.getLogger(__name__)
 
+DOLPHIN_CONFIG_PATH = DOLPHIN_PATH / "config" / "Dolphin.yaml"
+
+# Pages of one PDF processed concurrently when a dynamic batcher is attached
+DOLPHIN_PAGE_CONCURRENCY = int(os.getenv("DOLPHIN_PAGE_CONCURRENCY", "8"))
+
 
 class DolphinParser:
     """Wrapper class for Dolphin document parsing"""
@@ -47,7 +53,7 @@ class DolphinParser:
             raise RuntimeError("Dolphin dependencies are not installed")
 
         if config_path is None:
-            config_path = str(DOLPHIN_PATH / "config" / "Dolphin.yaml")
+            config_path = str(DOLPHIN_CONFIG_PATH)
 
         if not os.path.exists(config_path):
             raise FileNotFoundError(f"Dolphin config not found at {config_path}")
@@ -68,6 +74,15 @@ class DolphinParser:
         self.model = DOLPHIN(self.config)
         logger.info("Dolphin model loaded successfully")
 
+        # Optional DynamicBatcher shared by concurrent documents (set by the worker)
+        self.batcher = None
+
+    def _chat(self, prompts: List[str], images: List, max_batch_size: int) -> List[str]:
+        """Run the model on (prompt, image) pairs, through the batcher if one is attached"""
+        if self.batcher is not None:
+            return self.batcher.map(prompts, images)
+        return self.model.chat(prompts, images, max_batch_size=max_batch_size)
+
     def parse_document(
         self,
         document_path: str,
@@ -136,12 +151,21 @@ class DolphinParser:
         all_elements = []
         all_confidences = []
 
-        # Process each page
-        for page_idx, pil_image in enumerate(images):
-            logger.info(f"Processing page {page_idx + 1}/{len(images)}")
-
-            elements, confidence = self._process_single_image(pil_image, max_batch_size)
+        if self.batcher is not None:
+            # Pages run concurrently so their crops share model batches
+            workers = max(1, min(len(images), DOLPHIN_PAGE_CONCURRENCY))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dolphin-page") as executor:
+                page_results = list(executor.map(
+                    lambda image: self._process_single_image(image, max_batch_size), images
+                ))
+        else:
+            page_results = []
+            for page_idx, pil_image in enumerate(images):
+                logger.info(f"Processing page {page_idx + 1}/{len(images)}")
+                page_results.append(self._process_single_image(pil_image, max_batch_size))
 
+        # Results are in page order
+        for page_idx, (elements, confidence) in enumerate(page_results):
             # Add page number to each element
             for elem in elements:
                 elem['page'] = page_idx + 1
@@ -159,7 +183,7 @@ class DolphinParser:
 
     def _process_single_image(
         self,
-        image: Image.Image,
+        image: "Image.Image",
         max_batch_size: int
     ) -> Tuple[List[Dict], float]:
         """
@@ -169,7 +193,7 @@ class DolphinParser:
             Tuple of (elements_list, confidence_score)
         """
         # Stage 1: Page-level layout and reading order parsing
-        layout_output = self.model.chat("Parse the reading order of this document.", image)
+        layout_output = self._chat(["Parse the reading order of this document."], [image], 1)[0]
 
         # Stage 2: Element-level content parsing
         padded_image, dims = prepare_image(image)
@@ -239,8 +263,8 @@ class DolphinParser:
             crops_list = [elem["crop"] for elem in text_table_elements]
             prompts_list = [elem["prompt"] for elem in text_table_elements]
 
-            # Inference in batch
-            batch_results = self.model.chat(prompts_list, crops_list, max_batch_size=max_batch_size)
+            # Inference in batch (outputs come back in input order)
+            batch_results = self._chat(prompts_list, crops_list, max_batch_size)
 
             # Add batch results to recognition_results
             for i, result in enumerate(batch_results):
@@ -284,6 +308,20 @@ def is_dolphin_available() -> bool:
     return DOLPHIN_AVAILABLE
 
 
+def is_local_dolphin_configured() -> bool:
+    """Check if the local model can be loaded (dependencies and config present), without loading it"""
+    return DOLPHIN_AVAILABLE and DOLPHIN_CONFIG_PATH.exists()
+
+
+def local_model_version() -> str:
+    """Name of the configured local model (used to key cached results)"""
+    try:
+        config = OmegaConf.load(str(DOLPHIN_CONFIG_PATH))
+        return Path(config.model.model_name_or_path).name
+    except Exception:
+        return "unknown"
+
+
 def get_dolphin_parser(mode: Literal["auto", "local", "api"] = "auto") -> Optional[DolphinParser]:
     """
     Get a Dolphin parser instance if available
@@ -388,11 +426,11 @@ async def parse_document_with_dolphin(
 
     # Try local model (if mode allows)
     if mode in ["auto", "local"]:
-        parser = get_dolphin_parser(mode="local")
-        if parser:
-            logger.info("Using Dolphin local model for parsing")
-            # Local parser is synchronous
-            return parser.parse_document(document_path, max_batch_size)
+        if is_local_dolphin_configured():
+            from .dolphin_worker import get_dolphin_worker_pool
+
+            logger.info("Using Dolphin local model for parsing (worker process)")
+            return await get_dolphin_worker_pool().parse(document_path, max_batch_size)
 
     # No backend available
     raise Exception(
@@ -9,6 +9,9 @@ from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
 
+from app.http_clients import get_client
+from app.circuit_breaker import CircuitOpenError, get_breaker
+
 # Load environment variables
 load_dotenv()
 
@@ -56,15 +59,17 @@ class DolphinRestClient:
         url = f"{self.api_url}/health"
 
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(url)
+            client = get_client("dolphin")
+            response = await get_breaker("dolphin").request(
+                lambda timeout: client.get(url, timeout=timeout), 5.0, "health"
+            )
 
-                if response.status_code != 200:
-                    raise Exception(f"Health check failed with status {response.status_code}")
+            if response.status_code != 200:
+                raise Exception(f"Health check failed with status {response.status_code}")
 
-                data = response.json()
-                logger.info(f"Dolphin API health check: {data}")
-                return data
+            data = response.json()
+            logger.info(f"Dolphin API health check: {data}")
+            return data
 
         except httpx.ConnectError:
             logger.error(f"Cannot connect to Dolphin API at {self.api_url}")
@@ -120,34 +125,40 @@ class DolphinRestClient:
                 files = {'file': (os.path.basename(document_path), f, self._get_mime_type(file_ext))}
                 data = {'max_batch_size': max_batch_size}
 
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    response = await client.post(url, files=files, data=data)
+                client = get_client("dolphin")
+                # Adaptive timeout (at most self.timeout); fails fast while the Dolphin circuit is open
+                response = await get_breaker("dolphin").request(
+                    lambda timeout: client.post(url, files=files, data=data, timeout=timeout), self.timeout, "parse"
+                )
 
-                    if response.status_code != 200:
-                        error_detail = response.text
-                        logger.error(f"Dolphin API error {response.status_code}: {error_detail}")
-                        raise Exception(f"Dolphin API returned error {response.status_code}: {error_detail}")
+                if response.status_code != 200:
+                    error_detail = response.text
+                    logger.error(f"Dolphin API error {response.status_code}: {error_detail}")
+                    raise Exception(f"Dolphin API returned error {response.status_code}: {error_detail}")
 
-                    result = response.json()
+                result = response.json()
 
-                    if not result.get("success"):
-                        raise Exception("Dolphin API parsing failed")
+                if not result.get("success"):
+                    raise Exception("Dolphin API parsing failed")
 
-                    # Process response based on file type
-                    parsed_content = self._process_api_response(result)
-                    confidence = self._calculate_confidence(result)
+                # Process response based on file type
+                parsed_content = self._process_api_response(result)
+                confidence = self._calculate_confidence(result)
 
-                    logger.info(f"Successfully parsed document: {result.get('file_type')}, "
-                               f"pages: {parsed_content['pages']}, elements: {len(parsed_content['elements'])}")
+                logger.info(f"Successfully parsed document: {result.get('file_type')}, "
+                           f"pages: {parsed_content['pages']}, elements: {len(parsed_content['elements'])}")
 
-                    return parsed_content, confidence
+                return parsed_content, confidence
 
         except httpx.TimeoutException:
-            logger.error(f"Dolphin API request timed out after {self.timeout}s")
-            raise Exception(f"Document parsing timed out after {self.timeout} seconds")
+            logger.error(f"Dolphin API request timed out")
+            raise Exception(f"Document parsing timed out (limit {self.timeout} seconds)")
         except httpx.ConnectError:
             logger.error(f"Cannot connect to Dolphin API at {self.api_url}")
             raise Exception(f"Dolphin API is not reachable at {self.api_url}")
+        except CircuitOpenError as e:
+            logger.info(f"Skipping Dolphin API request: {e}")
+            raise
         except Exception as e:
             logger.error(f"Dolphin API parsing error: {e}", exc_info=True)
             raise
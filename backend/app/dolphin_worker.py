@@ -0,0 +1,432 @@
+"""
+Dolphin inference workers
+Runs local Dolphin parsing in dedicated processes that load the model once
+and receive jobs over a pipe; the API awaits each job's result through a
+future instead of running model inference on the event loop
+"""
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.dolphin_batcher import DOLPHIN_BATCHING
+
+logger = logging.getLogger(__name__)
+
+# Inference processes (each one holds a copy of the model)
+DOLPHIN_WORKERS = int(os.getenv("DOLPHIN_WORKERS", "1"))
+
+# Max jobs waiting or running; further jobs are rejected
+DOLPHIN_QUEUE_MAX = int(os.getenv("DOLPHIN_QUEUE_MAX", "8"))
+
+# Seconds a job may take from submission to result
+DOLPHIN_JOB_DEADLINE = float(os.getenv("DOLPHIN_JOB_DEADLINE", "300"))
+
+# Jobs each worker runs concurrently when dynamic batching is enabled, so
+# that crops from different documents share model batches
+DOLPHIN_WORKER_CONCURRENCY = int(os.getenv("DOLPHIN_WORKER_CONCURRENCY", "4"))
+
+
+class DolphinQueueFull(RuntimeError):
+    """Raised when too many Dolphin jobs are pending"""
+
+
+class DolphinWorkerError(RuntimeError):
+    """Raised when a job fails in the worker or no worker could start"""
+
+
+def load_local_parser():
+    """Default parser factory: load the local Dolphin model (runs in the worker)"""
+    from app.dolphin_parser import DolphinParser
+    return DolphinParser()
+
+
+def _serve_jobs(parser, receive, send, batcher) -> None:
+    """Job loop run by each worker thread until a None job arrives"""
+    while True:
+        job = receive()
+        if job is None:
+            break
+        job_id, document_path, max_batch_size, deadline = job
+
+        # Skip jobs whose caller already gave up
+        if time.time() > deadline:
+            send((job_id, "expired", None))
+            continue
+
+        try:
+            send((job_id, "ok", parser.parse_document(document_path, max_batch_size)))
+        except Exception as e:
+            send((job_id, "error", f"{type(e).__name__}: {e}"))
+
+        if batcher is not None:
+            send((None, "metrics", {"pid": os.getpid(), **batcher.snapshot()}))
+
+
+def _worker_main(
+    parser_factory: Callable[[], Any],
+    jobs,
+    results,
+    concurrency: int = 1,
+    batching: bool = False
+) -> None:
+    """
+    Worker process: load the parser once, then serve jobs until None
+
+    With batching, the model's chat() is fronted by a DynamicBatcher and
+    `concurrency` jobs run at once so their crops are batched together;
+    otherwise jobs run one at a time (the model is not thread-safe).
+
+    `jobs` and `results` are this worker's own pipe ends. Messages sent on
+    `results` are (job_id, status, payload) with status "ready",
+    "startup_error", "ok", "error", "expired" or "metrics".
+    """
+    # Thread locks, not process-shared ones: a worker that dies holding
+    # them cannot block its replacement
+    receive_lock = threading.Lock()
+    send_lock = threading.Lock()
+
+    def receive():
+        with receive_lock:
+            return jobs.recv()
+
+    def send(message):
+        with send_lock:
+            results.send(message)
+
+    try:
+        parser = parser_factory()
+    except Exception as e:
+        send((None, "startup_error", f"{type(e).__name__}: {e}"))
+        return
+
+    batcher = None
+    if batching and hasattr(parser, "model"):
+        from app.dolphin_batcher import DynamicBatcher
+        batcher = DynamicBatcher(parser.model.chat)
+        parser.batcher = batcher
+    else:
+        concurrency = 1
+    send((None, "ready", os.getpid()))
+
+    threads = [
+        threading.Thread(target=_serve_jobs, args=(parser, receive, send, batcher), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if batcher is not None:
+        batcher.close()
+
+
+class _Worker:
+    """A worker process and the parent's ends of its job and result pipes"""
+
+    def __init__(self, process: multiprocessing.Process, jobs, results):
+        self.process = process
+        self.jobs = jobs
+        self.results = results
+        self.ready = False
+        self.exited = False
+
+
+class DolphinWorkerPool:
+    """
+    Pool of Dolphin inference processes with an async facade
+
+    Processes use the "spawn" start method (safe with torch/CUDA) and are
+    started on the first job. Each worker has its own job and result pipes
+    and jobs go to the worker with the fewest pending. A worker that dies
+    after loading the model (segfault, OOM kill) shows up as end-of-file
+    on its result pipe: the jobs sent to it fail immediately instead of
+    waiting for their deadline, and a new process takes its place.
+    """
+
+    def __init__(
+        self,
+        parser_factory: Callable[[], Any] = load_local_parser,
+        workers: int = DOLPHIN_WORKERS,
+        queue_max: int = DOLPHIN_QUEUE_MAX,
+        deadline: float = DOLPHIN_JOB_DEADLINE,
+        concurrency: int = DOLPHIN_WORKER_CONCURRENCY,
+        batching: Optional[bool] = None
+    ):
+        self.parser_factory = parser_factory
+        self.workers = workers
+        self.queue_max = queue_max
+        self.deadline = deadline
+        self.concurrency = concurrency
+        self.batching = DOLPHIN_BATCHING if batching is None else batching
+        self.metrics = {"submitted": 0, "completed": 0, "failed": 0, "expired": 0, "rejected": 0, "respawned": 0}
+        self._batching_metrics: Dict[int, Dict] = {}
+        self._startup_errors = 0
+        self._pending: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Future, _Worker]] = {}
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._workers: List[_Worker] = []
+        self._wakeup = None
+        self._stop_reader = None
+        self._reader: Optional[threading.Thread] = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        """Start the worker processes and the result reader thread"""
+        if self.started:
+            return
+        ctx = multiprocessing.get_context("spawn")
+        self._wakeup, self._stop_reader = ctx.Pipe(duplex=False)
+        self._startup_errors = 0
+        self._stopping = False
+        self._workers = [self._spawn() for _ in range(self.workers)]
+        self._reader = threading.Thread(target=self._read_results, name="dolphin-results", daemon=True)
+        self._reader.start()
+        logger.info(f"Started {self.workers} Dolphin worker process(es)")
+
+    def _spawn(self) -> _Worker:
+        ctx = multiprocessing.get_context("spawn")
+        jobs_reader, jobs = ctx.Pipe(duplex=False)
+        results, results_writer = ctx.Pipe(duplex=False)
+        process = ctx.Process(
+            target=_worker_main,
+            args=(self.parser_factory, jobs_reader, results_writer, self.concurrency, self.batching),
+            daemon=True
+        )
+        process.start()
+        # Only the worker keeps these ends, so its death closes the result pipe
+        jobs_reader.close()
+        results_writer.close()
+        return _Worker(process, jobs, results)
+
+    def _least_busy(self) -> Optional[_Worker]:
+        """Running worker with the fewest pending jobs (call with the lock held)"""
+        load = {id(worker): 0 for worker in self._workers}
+        for _, _, worker in self._pending.values():
+            load[id(worker)] += 1
+        running = [worker for worker in self._workers if not worker.exited]
+        return min(running, key=lambda worker: load[id(worker)], default=None)
+
+    def _worker_exited(self, worker: _Worker) -> None:
+        """Fail the jobs sent to a worker whose process ended and replace it"""
+        worker.process.join(5)  # End-of-file comes just before the process is reaped
+        exitcode = worker.process.exitcode
+        with self._lock:
+            worker.exited = True
+            worker.jobs.close()
+            worker.results.close()
+            lost = [job_id for job_id, (_, _, assigned) in self._pending.items() if assigned is worker]
+        if self._stopping:
+            return
+
+        if worker.ready:
+            logger.error(
+                f"Dolphin worker (pid {worker.process.pid}) died with exit code {exitcode}, "
+                f"failing {len(lost)} job(s) and starting a new worker"
+            )
+            error = DolphinWorkerError(f"Dolphin worker died (exit code {exitcode}) while parsing")
+            replacement = self._spawn()
+            with self._lock:
+                self._workers[self._workers.index(worker)] = replacement
+            self.metrics["respawned"] += 1
+        else:
+            # Died while loading the model: a clean exit was already
+            # reported as startup_error, a crash was not
+            if exitcode != 0:
+                self._startup_errors += 1
+                logger.error(f"Dolphin worker crashed while starting (exit code {exitcode})")
+            error = DolphinWorkerError(f"Dolphin worker failed to start (exit code {exitcode})")
+
+        for job_id in lost:
+            self.metrics["failed"] += 1
+            self._resolve(job_id, error=error)
+        if self._startup_errors >= self.workers:
+            self._fail_all(DolphinWorkerError("No Dolphin worker could start"))
+
+    def _resolve(self, job_id: str, result: Any = None, error: Optional[Exception] = None) -> None:
+        with self._lock:
+            entry = self._pending.pop(job_id, None)
+        if entry is None:
+            return  # Caller already timed out
+        loop, future, _ = entry
+
+        def set_outcome():
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        try:
+            loop.call_soon_threadsafe(set_outcome)
+        except RuntimeError:
+            pass  # Event loop closed
+
+    def _read_results(self) -> None:
+        """Reader thread: route worker messages to the waiting futures"""
+        while True:
+            with self._lock:
+                workers = {worker.results: worker for worker in self._workers if not worker.exited}
+            for connection in multiprocessing.connection.wait([self._wakeup, *workers]):
+                if connection is self._wakeup:
+                    return
+                worker = workers[connection]
+                try:
+                    job_id, status, payload = connection.recv()
+                except (EOFError, OSError):
+                    self._worker_exited(worker)
+                    continue
+
+                if status == "ready":
+                    worker.ready = True
+                    logger.info(f"Dolphin worker ready (pid {payload})")
+                elif status == "startup_error":
+                    self._startup_errors += 1
+                    logger.error(f"Dolphin worker failed to start: {payload}")
+                    if self._startup_errors >= self.workers:
+                        self._fail_all(DolphinWorkerError(f"No Dolphin worker could start: {payload}"))
+                elif status == "metrics":
+                    self._batching_metrics[payload.pop("pid")] = payload
+                elif status == "ok":
+                    self.metrics["completed"] += 1
+                    self._resolve(job_id, result=tuple(payload))
+                elif status == "expired":
+                    self.metrics["expired"] += 1
+                    self._resolve(job_id, error=DolphinWorkerError("Job deadline passed before it started"))
+                else:
+                    self.metrics["failed"] += 1
+                    self._resolve(job_id, error=DolphinWorkerError(payload))
+
+    def _fail_all(self, error: Exception) -> None:
+        with self._lock:
+            job_ids = list(self._pending)
+        for job_id in job_ids:
+            self._resolve(job_id, error=error)
+
+    async def parse(
+        self,
+        document_path: str,
+        max_batch_size: int = 4,
+        deadline: Optional[float] = None
+    ) -> Tuple[Dict, float]:
+        """
+        Parse a document in a worker process
+
+        Args:
+            document_path: Path to document (PDF, JPG, PNG)
+            max_batch_size: Batch size for element recognition
+            deadline: Seconds to wait for the result (default: DOLPHIN_JOB_DEADLINE)
+
+        Returns:
+            Tuple of (parsed_content, confidence) as DolphinParser.parse_document
+
+        Raises:
+            DolphinQueueFull: If DOLPHIN_QUEUE_MAX jobs are already pending
+            asyncio.TimeoutError: If the deadline passes
+            DolphinWorkerError: If parsing failed or no worker could start
+        """
+        if self._startup_errors >= self.workers and self.started:
+            raise DolphinWorkerError("No Dolphin worker is available")
+        deadline = deadline or self.deadline
+        with self._lock:
+            if len(self._pending) >= self.queue_max:
+                self.metrics["rejected"] += 1
+                raise DolphinQueueFull(f"Dolphin queue full ({len(self._pending)} jobs pending)")
+            self.start()
+            worker = self._least_busy()
+            if worker is None:
+                raise DolphinWorkerError("No Dolphin worker is available")
+            job_id = uuid.uuid4().hex
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[job_id] = (loop, future, worker)
+            self.metrics["submitted"] += 1
+            try:
+                worker.jobs.send((job_id, document_path, max_batch_size, time.time() + deadline))
+            except OSError:
+                pass  # The worker just died: the reader fails the job when it sees the exit
+
+        try:
+            return await asyncio.wait_for(future, deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dolphin job for {document_path} exceeded its {deadline}s deadline")
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(job_id, None)
+
+    def status(self) -> Dict:
+        """Worker and queue metrics"""
+        return {
+            "workers": self.workers,
+            "ready_workers": sum(worker.ready and not worker.exited for worker in self._workers),
+            "startup_errors": self._startup_errors,
+            "pending_jobs": len(self._pending),
+            "queue_max": self.queue_max,
+            "batching": self.batching,
+            # Per worker pid: batch-size, batch-fill and latency histograms
+            "batchers": dict(self._batching_metrics),
+            **self.metrics
+        }
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop the workers; pending jobs fail"""
+        if not self.started:
+            return
+        self._stopping = True
+        with self._lock:
+            for worker in self._workers:
+                # One stop message per job thread
+                for _ in range(self.concurrency):
+                    try:
+                        worker.jobs.send(None)
+                    except OSError:
+                        break  # Already exited
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._stop_reader.send(None)
+        self._reader.join(timeout)
+        self._fail_all(DolphinWorkerError("Dolphin workers shut down"))
+        for worker in self._workers:
+            worker.jobs.close()
+            worker.results.close()
+        self._wakeup.close()
+        self._stop_reader.close()
+        self._workers = []
+        logger.info("Dolphin worker processes stopped")
+
+
+# Global pool instance (processes start on the first job)
+_worker_pool: Optional[DolphinWorkerPool] = None
+
+
+def get_dolphin_worker_pool() -> DolphinWorkerPool:
+    """
+    Get or create the global Dolphin worker pool
+
+    Returns:
+        DolphinWorkerPool instance
+    """
+    global _worker_pool
+
+    if _worker_pool is None:
+        _worker_pool = DolphinWorkerPool()
+
+    return _worker_pool
+
+
+def shutdown_dolphin_workers() -> None:
+    """Stop the global pool if it was started (called from the FastAPI lifespan)"""
+    if _worker_pool is not None:
+        _worker_pool.shutdown()
@@ -0,0 +1,287 @@
+"""
+Dropbox folder provisioning
+Creates whole folder structures with create_folder_batch instead of one
+get_metadata/create_folder_v2 round trip per path segment, and remembers
+which folders already exist so repeat uploads skip the API entirely
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from app.http_clients import get_client
+from app.rate_limiter import limited_request
+
+logger = logging.getLogger(__name__)
+
+# Dropbox API endpoint (files/*)
+DROPBOX_API_URL = os.getenv("DROPBOX_API_URL", "https://api.dropboxapi.com/2")
+
+# Max paths per create_folder_batch call (Dropbox limit is 10000)
+DROPBOX_FOLDER_BATCH_SIZE = int(os.getenv("DROPBOX_FOLDER_BATCH_SIZE", "1000"))
+
+# Polling of create_folder_batch/check when Dropbox runs the batch asynchronously
+DROPBOX_BATCH_POLL_INTERVAL = float(os.getenv("DROPBOX_BATCH_POLL_INTERVAL", "0.5"))
+DROPBOX_BATCH_MAX_POLLS = int(os.getenv("DROPBOX_BATCH_MAX_POLLS", "20"))
+
+# Known-folder cache: how long a folder is trusted to exist, and max entries kept
+DROPBOX_FOLDER_CACHE_TTL = float(os.getenv("DROPBOX_FOLDER_CACHE_TTL", "3600"))
+DROPBOX_FOLDER_CACHE_MAX = int(os.getenv("DROPBOX_FOLDER_CACHE_MAX", "5000"))
+
+
+class KnownFolderCache:
+    """
+    Per-account cache of Dropbox folders known to exist
+
+    Entries expire after `ttl` seconds and the least recently used entries
+    are evicted beyond `max_entries`. Paths are stored lower-cased, as
+    Dropbox paths are case-insensitive.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DROPBOX_FOLDER_CACHE_TTL,
+        max_entries: int = DROPBOX_FOLDER_CACHE_MAX,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    @staticmethod
+    def _key(access_token: str, folder_path: str) -> Tuple[str, str]:
+        account = hashlib.sha256(access_token.encode()).hexdigest()[:16]
+        return account, normalize_folder_path(folder_path).lower()
+
+    def contains(self, access_token: str, folder_path: str) -> bool:
+        """True if the folder is known to exist and the entry has not expired"""
+        key = self._key(access_token, folder_path)
+        expires_at = self._entries.get(key)
+        if expires_at is None or expires_at <= self.clock():
+            if expires_at is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def add(self, access_token: str, folder_path: str) -> None:
+        """Record a folder and all its ancestors as existing"""
+        account, path = self._key(access_token, folder_path)
+        if not path:
+            return
+        expires_at = self.clock() + self.ttl
+        parts = path.split("/")
+        for i in range(2, len(parts) + 1):
+            key = (account, "/".join(parts[:i]))
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, access_token: str, folder_path: str) -> None:
+        """Forget a folder and everything below it"""
+        account, path = self._key(access_token, folder_path)
+        stale = [
+            key for key in self._entries
+            if key[0] == account and (key[1] == path or key[1].startswith(path + "/"))
+        ]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            logger.info(f"Known-folder cache invalidated {len(stale)} entries under {folder_path}")
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Global cache instance
+known_folders = KnownFolderCache()
+
+
+def normalize_folder_path(folder_path: str) -> str:
+    """
+    Normalize a Dropbox folder path: leading slash, no trailing or duplicate slashes
+
+    Returns "" for the root folder.
+    """
+    parts = [part for part in folder_path.strip().split("/") if part]
+    return "/" + "/".join(parts) if parts else ""
+
+
+def leaf_folders(folder_paths: Iterable[str]) -> List[str]:
+    """
+    Reduce folder paths to the minimal set that must be created
+
+    Duplicates (case-insensitive, like Dropbox) and paths that are a prefix
+    of another requested path are dropped, since Dropbox creates missing
+    parent folders when creating a folder.
+
+    Args:
+        folder_paths: Folder paths, in any order
+
+    Returns:
+        Leaf paths in first-seen order
+    """
+    unique: Dict[str, str] = {}
+    for path in folder_paths:
+        normalized = normalize_folder_path(path)
+        if normalized and normalized.lower() not in unique:
+            unique[normalized.lower()] = normalized
+
+    prefixes = set()
+    for key in unique:
+        parts = key.split("/")
+        for i in range(2, len(parts)):
+            prefixes.add("/".join(parts[:i]))
+
+    return [path for key, path in unique.items() if key not in prefixes]
+
+
+def _is_existing_folder(entry: Dict) -> bool:
+    """True if a batch failure entry means the folder already exists"""
+    failure = entry.get("failure", {})
+    path_error = failure.get("path", {})
+    return (
+        failure.get(".tag") == "path"
+        and path_error.get(".tag") == "conflict"
+        and path_error.get("conflict", {}).get(".tag") == "folder"
+    )
+
+
+async def _post(access_token: str, endpoint: str, payload: Dict, stats: Dict) -> Dict:
+    """POST to the Dropbox API, counting the call in stats (only 429s are retried)"""
+    client = get_client("dropbox_api")
+
+    async def send():
+        stats["api_calls"] += 1
+        return await client.post(
+            f"{DROPBOX_API_URL}/{endpoint}",
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            },
+            json=payload
+        )
+
+    response = await limited_request("dropbox_api", access_token, send, idempotent=False)
+    if response.status_code != 200:
+        raise Exception(f"Dropbox {endpoint} failed ({response.status_code}): {response.text}")
+    return response.json()
+
+
+async def _create_batch(access_token: str, paths: List[str], stats: Dict) -> List[Dict]:
+    """
+    Run one create_folder_batch call, polling the async job if needed
+
+    Returns:
+        One result entry per path, in the same order
+    """
+    result = await _post(
+        access_token,
+        "files/create_folder_batch",
+        {"paths": paths, "autorename": False, "force_async": False},
+        stats
+    )
+
+    job_id = result.get("async_job_id")
+    polls = 0
+    while result.get(".tag") in ("async_job_id", "in_progress"):
+        if polls >= DROPBOX_BATCH_MAX_POLLS:
+            raise Exception(f"create_folder_batch did not complete after {polls} checks")
+        await asyncio.sleep(DROPBOX_BATCH_POLL_INTERVAL)
+        result = await _post(access_token, "files/create_folder_batch/check", {"async_job_id": job_id}, stats)
+        polls += 1
+
+    if result.get(".tag") != "complete":
+        raise Exception(f"create_folder_batch failed: {result}")
+
+    return result.get("entries", [])
+
+
+async def ensure_folders(access_token: str, folder_paths: Iterable[str]) -> Dict:
+    """
+    Make sure all folder paths exist in Dropbox with as few API calls as possible
+
+    Paths are deduplicated and reduced to their leaves; leaves found in the
+    known-folder cache are skipped and the rest are created with
+    create_folder_batch. Batches larger than DROPBOX_FOLDER_BATCH_SIZE are
+    split and sent concurrently. Folders that already exist count as success.
+    Errors are logged, not raised (the upload itself can still succeed).
+
+    Args:
+        access_token: Dropbox access token
+        folder_paths: Folder paths to provision (e.g. a folder_structure list)
+
+    Returns:
+        Dict with structure:
+        {
+            "success": bool,  # True if every leaf exists afterwards
+            "leaves": List[str],  # Paths sent to Dropbox
+            "created": List[str],
+            "existing": List[str],
+            "failed": List[str],
+            "api_calls": int  # Dropbox API requests made
+        }
+    """
+    stats = {"api_calls": 0}
+    leaves = leaf_folders(folder_paths)
+    result = {"success": True, "leaves": leaves, "created": [], "existing": [], "failed": []}
+
+    # Folders already known to exist need no API call
+    pending = []
+    for path in leaves:
+        if known_folders.contains(access_token, path):
+            result["existing"].append(path)
+        else:
+            pending.append(path)
+
+    if not pending:
+        result["api_calls"] = 0
+        return result
+
+    batches = [
+        pending[i:i + DROPBOX_FOLDER_BATCH_SIZE]
+        for i in range(0, len(pending), DROPBOX_FOLDER_BATCH_SIZE)
+    ]
+    outcomes = await asyncio.gather(
+        *(_create_batch(access_token, batch, stats) for batch in batches),
+        return_exceptions=True
+    )
+
+    for batch, outcome in zip(batches, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Could not create folders {batch}: {outcome}")
+            result["failed"].extend(batch)
+            continue
+
+        for path, entry in zip(batch, outcome):
+            if entry.get(".tag") == "success":
+                result["created"].append(path)
+                known_folders.add(access_token, path)
+            elif _is_existing_folder(entry):
+                result["existing"].append(path)
+                known_folders.add(access_token, path)
+            else:
+                logger.warning(f"Could not create folder {path}: {entry}")
+                result["failed"].append(path)
+
+    result["success"] = not result["failed"]
+    result["api_calls"] = stats["api_calls"]
+
+    logger.info(
+        f"Folders provisioned: {len(result['created'])} created, {len(result['existing'])} existing, "
+        f"{len(result['failed'])} failed ({result['api_calls']} API calls)"
+    )
+    return result
@@ -2,10 +2,13 @@
 Dropbox helper functions
 Helper utilities for interacting with Dropbox API
 """
-import httpx
 import logging
 from typing import List, Dict, Optional
 
+from app.dropbox_folders import known_folders
+from app.http_clients import get_client
+from app.rate_limiter import limited_request
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,29 +37,29 @@ async def list_folders_in_path(access_token: str, path: str = "") -> List[str]:
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.dropboxapi.com/2/files/list_folder",
-                headers=headers,
-                json=payload
-            )
-
-            if response.status_code != 200:
-                logger.error(f"Dropbox API error: {response.status_code} - {response.text}")
-                return []
-
-            data = response.json()
-
-            # Extract only folder names
-            folders = []
-            for entry in data.get("entries", []):
-                if entry.get(".tag") == "folder":
-                    folder_name = entry.get("name")
-                    if folder_name:
-                        folders.append(folder_name)
-
-            logger.info(f"Found {len(folders)} folders in '{path}': {folders}")
-            return folders
+        client = get_client("dropbox_api")
+        response = await limited_request("dropbox_api", access_token, lambda: client.post(
+            "https://api.dropboxapi.com/2/files/list_folder",
+            headers=headers,
+            json=payload
+        ))
+
+        if response.status_code != 200:
+            logger.error(f"Dropbox API error: {response.status_code} - {response.text}")
+            return []
+
+        data = response.json()
+
+        # Extract only folder names
+        folders = []
+        for entry in data.get("entries", []):
+            if entry.get(".tag") == "folder":
+                folder_name = entry.get("name")
+                if folder_name:
+                    folders.append(folder_name)
+
+        logger.info(f"Found {len(folders)} folders in '{path}': {folders}")
+        return folders
 
     except Exception as e:
         logger.error(f"Error listing Dropbox folders: {e}")
@@ -74,6 +77,9 @@ async def folder_exists(access_token: str, folder_path: str) -> bool:
     Returns:
         True if folder exists, False otherwise
     """
+    if known_folders.contains(access_token, folder_path):
+        return True
+
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json"
@@ -84,19 +90,22 @@ async def folder_exists(access_token: str, folder_path: str) -> bool:
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.dropboxapi.com/2/files/get_metadata",
-                headers=headers,
-                json=payload
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                return data.get(".tag") == "folder"
-
+        client = get_client("dropbox_api")
+        response = await limited_request("dropbox_api", access_token, lambda: client.post(
+            "https://api.dropboxapi.com/2/files/get_metadata",
+            headers=headers,
+            json=payload
+        ))
+
+        if response.status_code == 200:
+            data = response.json()
+            if data.get(".tag") == "folder":
+                known_folders.add(access_token, folder_path)
+                return True
             return False
 
+        return False
+
     except Exception as e:
         logger.error(f"Error checking folder existence: {e}")
         return False
@@ -1,12 +1,39 @@
 """
 Dropbox file upload module - AD-6
 Handles file upload to Dropbox using access token
+Large files are sent in chunks through an upload session
 """
-from typing import Dict
+from typing import Dict, Optional
+import json
+import logging
+import os
 import httpx
 from fastapi import HTTPException
 from pathlib import Path
 
+from app.dropbox_folders import ensure_folders, known_folders
+from app.http_clients import get_client
+from app.rate_limiter import limited_request, retry_after
+
+logger = logging.getLogger(__name__)
+
+# Dropbox content endpoint (files/upload, upload sessions)
+DROPBOX_CONTENT_URL = os.getenv("DROPBOX_CONTENT_URL", "https://content.dropboxapi.com/2")
+
+# Files larger than this are uploaded with an upload session (default 8MB)
+DROPBOX_SESSION_THRESHOLD = int(os.getenv("DROPBOX_SESSION_THRESHOLD", str(8 * 1024 * 1024)))
+
+# Bytes sent per upload_session request (Dropbox recommends multiples of 4MB)
+DROPBOX_UPLOAD_CHUNK_SIZE = int(os.getenv("DROPBOX_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+# Per-request timeout and retry policy for upload requests
+DROPBOX_UPLOAD_TIMEOUT = float(os.getenv("DROPBOX_UPLOAD_TIMEOUT", "30"))
+DROPBOX_CHUNK_RETRIES = int(os.getenv("DROPBOX_CHUNK_RETRIES", "3"))
+DROPBOX_RETRY_BACKOFF = float(os.getenv("DROPBOX_RETRY_BACKOFF", "0.5"))
+
+# Max incorrect_offset resumes per upload session before giving up
+DROPBOX_MAX_RESUMES = int(os.getenv("DROPBOX_MAX_RESUMES", "5"))
+
 
 async def create_folder_if_not_exists(
     access_token: str,
@@ -23,88 +50,225 @@ async def create_folder_if_not_exists(
     Returns:
         bool: True if created or already exists
     """
-    import json
-    import logging
-
-    logger = logging.getLogger(__name__)
-
     if not folder_path or folder_path == "/":
         return True
 
+    result = await ensure_folders(access_token, [folder_path])
+    return result["success"]
+
+
+class DestinationNotFound(HTTPException):
+    """Dropbox rejected an upload because its destination folder does not exist"""
+
+
+def _destination_missing(response: httpx.Response) -> bool:
+    """
+    Return True if the response is a 409 path/not_found error
+
+    files/upload flattens UploadWriteFailed into the error, so the write
+    error is under "reason"; finish nests it under its path or commit tag.
+    Other not_found errors, such as lookup_failed/not_found for an expired
+    upload session, are not about the destination and must not trigger
+    folder recreation.
+    """
+    if response.status_code != 409:
+        return False
     try:
-        async with httpx.AsyncClient() as client:
-            # First, check if folder exists
-            check_response = await client.post(
-                "https://api.dropboxapi.com/2/files/get_metadata",
-                headers={
-                    "Authorization": f"Bearer {access_token}",
-                    "Content-Type": "application/json"
-                },
-                json={"path": folder_path}
+        error = response.json().get("error", {})
+    except (ValueError, AttributeError):
+        return False
+    if not isinstance(error, dict) or error.get(".tag") not in ("path", "commit"):
+        return False
+    write_error = error["reason"] if "reason" in error else error.get(error[".tag"])
+    return isinstance(write_error, dict) and write_error.get(".tag") == "not_found"
+
+
+def _correct_offset(response: httpx.Response) -> Optional[int]:
+    """
+    Return Dropbox's expected offset if the response is an incorrect_offset error
+
+    Dropbox answers 409 lookup_failed/incorrect_offset when a chunk was
+    already received (e.g. the previous response was lost), which lets the
+    upload resume from the offset the server actually has.
+    """
+    if response.status_code != 409:
+        return None
+    try:
+        error = response.json().get("error", {})
+    except ValueError:
+        return None
+    lookup = error.get("lookup_failed", error)
+    if lookup.get(".tag") == "incorrect_offset":
+        return lookup.get("correct_offset")
+    return None
+
+
+async def _post_content(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    access_token: str,
+    api_arg: Dict,
+    content: bytes,
+    idempotent: bool
+) -> httpx.Response:
+    """
+    POST one request to the Dropbox content endpoint, retrying transient failures
+
+    Requests go through the account's rate limiter (see app.rate_limiter):
+    429 responses wait for Retry-After. Timeouts, connection errors and 5xx
+    responses are retried up to DROPBOX_CHUNK_RETRIES times with jittered
+    exponential backoff, but only if idempotent: files/upload and
+    upload_session/finish commit with autorename, so repeating one whose
+    response was lost would store a second "name (1).pdf" copy. Any other
+    response (including 409 errors) is returned to the caller.
+    """
+    return await limited_request(
+        "dropbox_content",
+        access_token,
+        lambda: client.post(
+            f"{DROPBOX_CONTENT_URL}/{endpoint}",
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Dropbox-API-Arg": json.dumps(api_arg),
+                "Content-Type": "application/octet-stream"
+            },
+            content=content,
+            timeout=DROPBOX_UPLOAD_TIMEOUT
+        ),
+        idempotent=idempotent,
+        retries=DROPBOX_CHUNK_RETRIES,
+        backoff=DROPBOX_RETRY_BACKOFF
+    )
+
+
+def _raise_for_upload_error(response: httpx.Response) -> None:
+    """Raise HTTPException if a Dropbox upload request failed"""
+    if response.status_code != 200:
+        error_detail = response.text
+        logger.error(f"Dropbox upload failed: {error_detail}")
+        # Still rate limited after the retries: tell the client when to try again
+        delay = retry_after(response) if response.status_code == 429 else None
+        exception = DestinationNotFound if _destination_missing(response) else HTTPException
+        raise exception(
+            status_code=response.status_code,
+            detail=f"Dropbox upload failed: {error_detail}",
+            headers={"Retry-After": str(int(delay) + 1)} if delay is not None else None
+        )
+
+
+async def _upload_single(
+    client: httpx.AsyncClient,
+    access_token: str,
+    file_path: str,
+    commit_info: Dict
+) -> Dict:
+    """Upload a small file with a single files/upload call (never repeated)"""
+    with open(file_path, 'rb') as f:
+        file_content = f.read()
+
+    response = await _post_content(
+        client, "files/upload", access_token, commit_info, file_content, idempotent=False
+    )
+    _raise_for_upload_error(response)
+    return response.json()
+
+
+async def _upload_session(
+    client: httpx.AsyncClient,
+    access_token: str,
+    file_path: str,
+    commit_info: Dict,
+    file_size: int,
+    chunk_size: int
+) -> Dict:
+    """
+    Upload a large file in chunks with upload_session/start, append_v2 and finish
+
+    The file is read from disk one chunk at a time, so memory usage is
+    bounded by chunk_size. If Dropbox reports an incorrect offset the
+    upload resumes from the offset the server reports, at most
+    DROPBOX_MAX_RESUMES times and only forward. start and append_v2 are
+    retried after an unknown outcome (a repeated start only leaves an unused
+    session behind, an append resumes through _correct_offset); finish
+    commits the file and is sent once.
+    """
+    with open(file_path, 'rb') as f:
+        first_chunk = f.read(chunk_size)
+        response = await _post_content(
+            client, "files/upload_session/start", access_token, {"close": False}, first_chunk,
+            idempotent=True
+        )
+        _raise_for_upload_error(response)
+        session_id = response.json()["session_id"]
+        offset = len(first_chunk)
+        logger.info(f"Upload session {session_id} started ({file_size} bytes, chunks of {chunk_size})")
+
+        resumes = 0
+        while True:
+            cursor = {"session_id": session_id, "offset": offset}
+            f.seek(offset)
+
+            if file_size - offset > chunk_size:
+                chunk = f.read(chunk_size)
+                endpoint = "files/upload_session/append_v2"
+                api_arg = {"cursor": cursor, "close": False}
+            else:
+                chunk = f.read()
+                endpoint = "files/upload_session/finish"
+                api_arg = {"cursor": cursor, "commit": commit_info}
+
+            response = await _post_content(
+                client, endpoint, access_token, api_arg, chunk,
+                idempotent=endpoint == "files/upload_session/append_v2"
             )
 
-            # If folder exists, return True
-            if check_response.status_code == 200:
-                logger.info(f"Folder already exists: {folder_path}")
-                return True
-
-            # Create parent folders first
-            parts = folder_path.strip("/").split("/")
-            current_path = ""
-
-            for part in parts:
-                current_path += "/" + part
-
-                # Check if this level exists
-                check_response = await client.post(
-                    "https://api.dropboxapi.com/2/files/get_metadata",
-                    headers={
-                        "Authorization": f"Bearer {access_token}",
-                        "Content-Type": "application/json"
-                    },
-                    json={"path": current_path}
-                )
-
-                if check_response.status_code != 200:
-                    # Create this level
-                    logger.info(f"Creating folder: {current_path}")
-                    create_response = await client.post(
-                        "https://api.dropboxapi.com/2/files/create_folder_v2",
-                        headers={
-                            "Authorization": f"Bearer {access_token}",
-                            "Content-Type": "application/json"
-                        },
-                        json={"path": current_path, "autorename": False}
+            correct_offset = _correct_offset(response)
+            if correct_offset is not None:
+                resumes += 1
+                if resumes > DROPBOX_MAX_RESUMES or not offset < correct_offset <= file_size:
+                    logger.error(
+                        f"Upload session {session_id}: giving up on offset {correct_offset} "
+                        f"(sent {offset}, file {file_size} bytes, resume {resumes})"
+                    )
+                    raise HTTPException(
+                        status_code=502,
+                        detail=f"Dropbox upload session out of sync at offset {correct_offset}"
                     )
+                logger.warning(f"Upload session {session_id}: resuming at offset {correct_offset} (sent {offset})")
+                offset = correct_offset
+                continue
 
-                    if create_response.status_code != 200:
-                        error_data = create_response.json()
-                        # Ignore "already exists" errors
-                        if "path" not in error_data.get("error", {}).get(".tag", ""):
-                            logger.warning(f"Could not create folder {current_path}: {error_data}")
+            _raise_for_upload_error(response)
 
-            return True
+            if endpoint == "files/upload_session/finish":
+                return response.json()
 
-    except Exception as e:
-        # If folder creation fails, log but continue (might already exist)
-        logger.warning(f"Warning: Could not create folder {folder_path}: {str(e)}")
-        return False
+            offset += len(chunk)
 
 
 async def upload_file_to_dropbox(
     access_token: str,
     file_path: str,
     dropbox_path: str,
-    new_filename: str
+    new_filename: str,
+    ensure_folder: bool = True,
+    retry_missing_folder: bool = True
 ) -> Dict:
     """
     Upload file to Dropbox
 
+    Files up to DROPBOX_SESSION_THRESHOLD are sent with a single
+    files/upload call; larger files are streamed from disk in chunks
+    through an upload session.
+
     Args:
         access_token: Dropbox access token
         file_path: Local file path to upload
         dropbox_path: Destination path in Dropbox (e.g., "/Documentos/Facturas")
         new_filename: New filename for the uploaded file
+        ensure_folder: Create dropbox_path first (skip if already provisioned)
+        retry_missing_folder: If Dropbox reports the destination missing
+            (e.g. deleted while cached as known), create it and retry once
 
     Returns:
         dict: Upload result with metadata
@@ -112,13 +276,9 @@ async def upload_file_to_dropbox(
     Raises:
         HTTPException: If upload fails
     """
-    import json
-    import logging
-
-    logger = logging.getLogger(__name__)
-
     # Ensure folder exists
-    await create_folder_if_not_exists(access_token, dropbox_path)
+    if ensure_folder:
+        await create_folder_if_not_exists(access_token, dropbox_path)
 
     # Construct full Dropbox path
     full_dropbox_path = f"{dropbox_path}/{new_filename}"
@@ -126,61 +286,59 @@ async def upload_file_to_dropbox(
     logger.info(f"Uploading file to Dropbox: {full_dropbox_path}")
 
     try:
-        # Read file content
-        with open(file_path, 'rb') as f:
-            file_content = f.read()
+        file_size = os.path.getsize(file_path)
 
-        # Prepare Dropbox API arguments
+        # Prepare Dropbox commit info
         # Modo "add" con autorename para evitar sobrescribir archivos existentes
         # Si el archivo existe, Dropbox agregará automáticamente un sufijo (ej: "archivo (1).pdf")
-        dropbox_api_arg = json.dumps({
+        commit_info = {
             "path": full_dropbox_path,
             "mode": "add",
             "autorename": True,
             "mute": False
-        })
-
-        # Upload to Dropbox using files/upload API
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://content.dropboxapi.com/2/files/upload",
-                headers={
-                    "Authorization": f"Bearer {access_token}",
-                    "Dropbox-API-Arg": dropbox_api_arg,
-                    "Content-Type": "application/octet-stream"
-                },
-                content=file_content,
-                timeout=30.0
-            )
-
-            if response.status_code != 200:
-                error_detail = response.text
-                logger.error(f"Dropbox upload failed: {error_detail}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Dropbox upload failed: {error_detail}"
-                )
-
-            result = response.json()
-            uploaded_path = result.get('path_display')
-            uploaded_name = result.get('name')
-
-            # Verificar si el archivo fue renombrado automáticamente
-            if uploaded_name != new_filename:
-                logger.warning(f"Archivo renombrado automáticamente: {new_filename} -> {uploaded_name}")
-                logger.info(f"El archivo ya existía, se creó una nueva versión")
-
-            logger.info(f"File uploaded successfully: {uploaded_path}")
-
-            return {
-                "success": True,
-                "path": uploaded_path,
-                "name": uploaded_name,
-                "id": result.get("id"),
-                "size": result.get("size"),
-                "was_renamed": uploaded_name != new_filename
-            }
+        }
 
+        client = get_client("dropbox_content")
+        if file_size > DROPBOX_SESSION_THRESHOLD:
+            result = await _upload_session(
+                client, access_token, file_path, commit_info,
+                file_size, DROPBOX_UPLOAD_CHUNK_SIZE
+            )
+        else:
+            result = await _upload_single(client, access_token, file_path, commit_info)
+
+        uploaded_path = result.get('path_display')
+        uploaded_name = result.get('name')
+
+        # Verificar si el archivo fue renombrado automáticamente
+        if uploaded_name != new_filename:
+            logger.warning(f"Archivo renombrado automáticamente: {new_filename} -> {uploaded_name}")
+            logger.info(f"El archivo ya existía, se creó una nueva versión")
+
+        logger.info(f"File uploaded successfully: {uploaded_path}")
+
+        return {
+            "success": True,
+            "path": uploaded_path,
+            "name": uploaded_name,
+            "id": result.get("id"),
+            "size": result.get("size"),
+            "was_renamed": uploaded_name != new_filename
+        }
+
+    except DestinationNotFound:
+        # Destination vanished in Dropbox: stop trusting the cached folder
+        known_folders.invalidate(access_token, dropbox_path)
+        if retry_missing_folder:
+            logger.warning(f"Destination {dropbox_path} not found in Dropbox, creating it and retrying")
+            await ensure_folders(access_token, [dropbox_path])
+            return await upload_file_to_dropbox(
+                access_token, file_path, dropbox_path, new_filename,
+                ensure_folder=False, retry_missing_folder=False
+            )
+        raise
+    except HTTPException:
+        raise
     except FileNotFoundError:
         raise HTTPException(
             status_code=404,
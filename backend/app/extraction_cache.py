@@ -0,0 +1,207 @@
+"""
+Extraction cache
+Content-addressed on-disk cache of document text extraction results
+(Dolphin or PyMuPDF), keyed by the file's SHA-256 plus the parser backend
+and version, so re-uploads and retries of the same document skip parsing
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Where cached extractions are stored
+EXTRACTION_CACHE_DIR = Path(os.getenv(
+    "EXTRACTION_CACHE_DIR",
+    str(Path(tempfile.gettempdir()) / "dropbox_chatbot_cache" / "extraction")
+))
+
+# Max total size of the cache on disk; least recently used entries are evicted beyond it (default 256MB)
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Bump when the cached entry layout changes, to invalidate old entries
+CACHE_FORMAT_VERSION = 1
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Size-bounded LRU cache of extraction results on disk
+
+    Each entry is one gzip-compressed JSON file named after
+    sha256(content_hash:backend:version). The file mtime is refreshed on
+    every hit and used as the LRU order when evicting. The total size is
+    scanned once and then tracked on every write, so the directory is only
+    listed again when the cache goes over max_bytes.
+
+    get/put do blocking file I/O and gzip; from async code use aget/aput,
+    which run them in a worker thread.
+
+    Cached entry structure:
+    {
+        "text": str,
+        "elements": List[Dict],  # Dolphin layout elements ([] for PyMuPDF)
+        "metadata": {"pages": int, "has_tables": bool, "has_figures": bool},
+        "confidence": float
+    }
+    """
+
+    def __init__(self, root: Path = EXTRACTION_CACHE_DIR, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Size of the entries on disk, None until the first write scans the directory
+        self._total_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, content_hash: str, backend: str, version: str) -> Path:
+        key = f"{content_hash}:{backend}:{version}:{CACHE_FORMAT_VERSION}"
+        return self.root / f"{hashlib.sha256(key.encode()).hexdigest()}.json.gz"
+
+    def get(self, content_hash: str, backend: str, version: str) -> Optional[Dict]:
+        """
+        Look up an extraction result
+
+        Returns:
+            Cached entry, or None on a miss
+        """
+        path = self._path(content_hash, backend, version)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable extraction cache entry {path.name}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def put(
+        self,
+        content_hash: str,
+        backend: str,
+        version: str,
+        text: str,
+        metadata: Dict,
+        confidence: float,
+        elements: Optional[List[Dict]] = None
+    ) -> None:
+        """Store an extraction result and evict old entries if over the size limit"""
+        entry = {
+            "text": text,
+            "elements": elements or [],
+            "metadata": metadata,
+            "confidence": confidence,
+        }
+        path = self._path(content_hash, backend, version)
+        partial = path.with_name(f".{path.name}.part")
+        try:
+            with gzip.open(partial, "wt", encoding="utf-8", compresslevel=6) as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+            size = partial.stat().st_size
+            with self._lock:
+                replaced = self._size(path)
+                partial.replace(path)
+                if self._total_bytes is None:
+                    self._total_bytes = sum(size for _, size, _ in self._scan())
+                else:
+                    self._total_bytes += size - replaced
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not write extraction cache entry: {e}")
+            partial.unlink(missing_ok=True)
+
+    async def aget(self, content_hash: str, backend: str, version: str) -> Optional[Dict]:
+        """get() in a worker thread"""
+        return await asyncio.to_thread(self.get, content_hash, backend, version)
+
+    async def aput(self, *args, **kwargs) -> None:
+        """put() in a worker thread"""
+        await asyncio.to_thread(self.put, *args, **kwargs)
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _remove(self, path: Path) -> None:
+        """Delete an entry and take it off the tracked total"""
+        with self._lock:
+            size = self._size(path)
+            path.unlink(missing_ok=True)
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def _scan(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every entry on disk"""
+        files = []
+        for path in self.root.glob("*.json.gz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes (called with the lock held)"""
+        files = sorted(self._scan())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+            logger.info(f"Extraction cache evicted {path.name}")
+        self._total_bytes = total
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# Global cache instance (created on first use)
+_extraction_cache: Optional[ExtractionCache] = None
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """
+    Get or create the global extraction cache
+
+    Returns:
+        ExtractionCache instance
+    """
+    global _extraction_cache
+
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache()
+
+    return _extraction_cache
@@ -0,0 +1,252 @@
+"""
+Gemini response cache
+Async memoization of Gemini generateContent results keyed by model name,
+generation config and prompt hash, so identical prompts (the same document
+text, common answers like "procedimiento judicial") are only sent once
+
+- TTL per entry, with a shorter TTL for negative results (e.g. "AMBIGUO")
+- Single-flight: concurrent identical requests share one upstream call
+- Two levels: in-process LRU in front of a SQLite database (WAL) that
+  survives restarts and is shared by all workers on the host
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+GEMINI_CACHE_ENABLED = os.getenv("GEMINI_CACHE_ENABLED", "true").lower() == "true"
+GEMINI_CACHE_DB_PATH = os.getenv(
+    "GEMINI_CACHE_DB_PATH",
+    str(Path(os.path.expanduser("~")) / ".dropbox_chatbot_gemini_cache.db")
+)
+
+# Positive results are kept for GEMINI_CACHE_TTL, negative ones (AMBIGUO, unparseable) for less
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", str(7 * 24 * 3600)))
+GEMINI_CACHE_NEGATIVE_TTL = float(os.getenv("GEMINI_CACHE_NEGATIVE_TTL", "3600"))
+
+# Entries kept in the in-process level
+GEMINI_CACHE_MEMORY_MAX = int(os.getenv("GEMINI_CACHE_MEMORY_MAX", "1000"))
+
+# Expired rows are purged from SQLite every this many writes
+_PURGE_EVERY = 100
+
+
+def cache_key(model: str, generation_config: Dict, prompt: str) -> str:
+    """Stable key for a Gemini request (the API key is deliberately not part of it)"""
+    material = json.dumps(
+        {"model": model, "config": generation_config, "prompt": hashlib.sha256(prompt.encode()).hexdigest()},
+        sort_keys=True
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class GeminiCache:
+    """
+    Memoizes Gemini results (any JSON-serializable value)
+
+    None results (upstream errors) are never cached.
+    """
+
+    def __init__(
+        self,
+        db_path: str = GEMINI_CACHE_DB_PATH,
+        ttl: float = GEMINI_CACHE_TTL,
+        negative_ttl: float = GEMINI_CACHE_NEGATIVE_TTL,
+        memory_max: int = GEMINI_CACHE_MEMORY_MAX,
+        clock: Callable[[], float] = time.time
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory_max = memory_max
+        self.clock = clock
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "negative_hits": 0}
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}  # Callers awaiting each in-flight call
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), timeout=5.0, isolation_level=None, check_same_thread=False)
+        if db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS gemini_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " negative INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    def _lookup_memory(self, key: str) -> Optional[tuple]:
+        """(value, negative) if in the in-process level and not expired"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, negative, expires_at = entry
+            if expires_at > self.clock():
+                self._memory.move_to_end(key)
+                return value, negative
+            del self._memory[key]
+        return None
+
+    def _lookup_db(self, key: str) -> Optional[tuple]:
+        """(value, negative, expires_at) from SQLite if not expired (blocking)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, negative, expires_at FROM gemini_cache WHERE key = ? AND expires_at > ?",
+                (key, self.clock())
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), bool(row[1]), row[2]
+
+    async def _lookup(self, key: str) -> Optional[tuple]:
+        """(value, negative) if cached and not expired"""
+        cached = self._lookup_memory(key)
+        if cached is not None:
+            return cached
+        row = await asyncio.to_thread(self._lookup_db, key)
+        if row is None:
+            return None
+        value, negative, expires_at = row
+        self._remember(key, value, negative, expires_at)
+        return value, negative
+
+    def _remember(self, key: str, value: Any, negative: bool, expires_at: float) -> None:
+        self._memory[key] = (value, negative, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max:
+            self._memory.popitem(last=False)
+
+    def _write(self, key: str, value: Any, negative: bool, expires_at: float) -> None:
+        """Persist an entry to SQLite, purging expired rows now and then (blocking)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO gemini_cache (key, value, negative, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), int(negative), expires_at)
+            )
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM gemini_cache WHERE expires_at <= ?", (self.clock(),))
+
+    async def _store(self, key: str, value: Any, negative: bool) -> None:
+        expires_at = self.clock() + (self.negative_ttl if negative else self.ttl)
+        self._remember(key, value, negative, expires_at)
+        await asyncio.to_thread(self._write, key, value, negative, expires_at)
+
+    async def _call_and_store(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[Any]],
+        is_negative: Optional[Callable[[Any], bool]]
+    ) -> Any:
+        value = await call()
+        if value is not None:
+            await self._store(key, value, bool(is_negative and is_negative(value)))
+        return value
+
+    def _call_done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, so a failure nobody awaited is not logged
+
+    async def get_or_call(
+        self,
+        model: str,
+        generation_config: Dict,
+        prompt: str,
+        call: Callable[[], Awaitable[Any]],
+        is_negative: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Return the cached result for a request, or make the call once
+
+        The call runs in a task owned by the cache that every caller waiting
+        for the same key awaits, so a cancelled caller (hedged extraction,
+        client disconnect) does not cancel the others; the call itself is
+        only cancelled once no caller is waiting for it.
+
+        Args:
+            model: Gemini model name
+            generation_config: generationConfig sent with the request
+            prompt: Prompt text
+            call: Coroutine factory performing the actual request
+            is_negative: Predicate marking results cached with the negative TTL
+
+        Returns:
+            The (possibly cached) result of call()
+        """
+        key = cache_key(model, generation_config, prompt)
+
+        cached = self._lookup_memory(key) if key in self._inflight else await self._lookup(key)
+        if cached is not None:
+            value, negative = cached
+            self.stats["negative_hits" if negative else "hits"] += 1
+            logger.info(f"Gemini cache hit ({model}, {'negative' if negative else 'positive'})")
+            return value
+
+        # Checked after the lookup: another caller may have started the call meanwhile
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = asyncio.ensure_future(self._call_and_store(key, call, is_negative))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._call_done(key, done))
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()  # Every caller gave up
+
+    def clear(self) -> None:
+        """Drop all entries (both levels)"""
+        self._memory.clear()
+        with self._lock:
+            self._conn.execute("DELETE FROM gemini_cache")
+
+
+# Global cache instance (created on first use)
+_gemini_cache: Optional[GeminiCache] = None
+
+
+def get_gemini_cache() -> GeminiCache:
+    """
+    Get or create the global Gemini cache
+
+    Returns:
+        GeminiCache instance
+    """
+    global _gemini_cache
+
+    if _gemini_cache is None:
+        _gemini_cache = GeminiCache()
+
+    return _gemini_cache
+
+
+async def cached_gemini_call(
+    model: str,
+    generation_config: Dict,
+    prompt: str,
+    call: Callable[[], Awaitable[Any]],
+    is_negative: Optional[Callable[[Any], bool]] = None
+) -> Any:
+    """Memoized Gemini call through the global cache (direct call when GEMINI_CACHE_ENABLED is false)"""
+    if not GEMINI_CACHE_ENABLED:
+        return await call()
+    return await get_gemini_cache().get_or_call(model, generation_config, prompt, call, is_negative)
@@ -3,11 +3,17 @@ Gemini AI Extractor using REST API directly
 More compatible than SDK
 """
 import os
+import json
 import logging
-import httpx
-from typing import Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+from app.http_clients import get_client
+from app.circuit_breaker import CircuitOpenError, get_breaker
+from app.rate_limiter import GEMINI_MAX_QUEUE_WAIT, RateLimitExceeded, limited_request
+from app.gemini_cache import cached_gemini_call, get_gemini_cache, GEMINI_CACHE_ENABLED
+from app.questions_ursall import QUESTIONS_URSALL
+
 # Load environment variables
 load_dotenv()
 
@@ -18,6 +24,9 @@ logger = logging.getLogger(__name__)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_AVAILABLE = bool(GEMINI_API_KEY)
 
+# Model used for field extraction (free tier)
+GEMINI_MODEL = "gemini-2.5-flash-lite"
+
 if GEMINI_AVAILABLE:
     logger.info("Gemini API key configured, using REST API")
 else:
@@ -196,9 +205,6 @@ RESPUESTA:"""
     if not prompt:
         return None
 
-    # Gemini REST API endpoint (using gemini-2.5-flash-lite - free tier)
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent?key={GEMINI_API_KEY}"
-
     payload = {
         "contents": [{
             "parts": [{
@@ -211,39 +217,195 @@ RESPUESTA:"""
         }
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(url, json=payload)
+    # Identical prompts are answered from the cache; AMBIGUO is cached for a shorter time
+    return await cached_gemini_call(
+        GEMINI_MODEL,
+        payload["generationConfig"],
+        prompt,
+        lambda: _call_gemini(payload, user_input),
+        is_negative=lambda result: result == "AMBIGUO"
+    )
+
+
+async def extract_bulk_with_gemini_rest(question_ids: List[str], user_input: str) -> Optional[Dict[str, str]]:
+    """
+    Extract several URSALL answers with a single Gemini call
+
+    The answers come back as one JSON object (responseSchema) instead of one
+    round trip per question; values are still raw and must go through the
+    legal NLP extractor and the question validation.
+
+    Args:
+        question_ids: URSALL questions to answer
+        user_input: "question_id: answer" lines or a free-text description of the document
+
+    Returns:
+        {question_id: value} for the questions Gemini could answer, or None if failed
+    """
+    question_ids = [question_id for question_id in question_ids if question_id in QUESTIONS_URSALL]
+    if not GEMINI_AVAILABLE or not question_ids:
+        return None
+
+    fields = "\n".join(_describe_question(question_id) for question_id in question_ids)
+    prompt = f"""Eres un asistente experto en organizar documentación jurídica y de seguros en español.
+
+TAREA: Extrae del texto del usuario la respuesta a cada uno de estos campos.
+
+CAMPOS:
+{fields}
 
-            if response.status_code != 200:
-                logger.error(f"Gemini API error {response.status_code}: {response.text}")
-                return None
+REGLAS ESTRICTAS:
+1. Responde SOLO con un objeto JSON con exactamente esos campos
+2. Si el campo indica opciones, usa exactamente una de ellas
+3. Fechas en formato YYYY-MM-DD; números de procedimiento en formato XXX/YYYY
+4. Las partes en formato "Parte A vs Parte B"
+5. Si el texto no contiene un campo o es ambiguo, usa null para ese campo
+6. NO inventes datos que no estén en el texto
+
+ENTRADA DEL USUARIO:
+{user_input}
+
+RESPUESTA (objeto JSON):"""
+
+    payload = {
+        "contents": [{
+            "parts": [{
+                "text": prompt
+            }]
+        }],
+        "generationConfig": {
+            "temperature": 0.1,
+            "maxOutputTokens": 1024,
+            "responseMimeType": "application/json",
+            "responseSchema": {
+                "type": "OBJECT",
+                "properties": {
+                    question_id: {"type": "STRING", "nullable": True}
+                    for question_id in question_ids
+                },
+            },
+        }
+    }
 
-            data = response.json()
+    # An object with every field null (nothing could be extracted) is cached for a shorter time
+    result = await cached_gemini_call(
+        GEMINI_MODEL,
+        payload["generationConfig"],
+        prompt,
+        lambda: _call_gemini_json(payload),
+        is_negative=lambda result: not any(result.values())
+    )
+    if result is None:
+        return None
+    return {
+        question_id: str(value).strip()
+        for question_id, value in result.items()
+        if question_id in question_ids and value is not None and str(value).strip()
+    }
 
-            # Extract text from response
-            if "candidates" in data and len(data["candidates"]) > 0:
-                candidate = data["candidates"][0]
-                if "content" in candidate and "parts" in candidate["content"]:
-                    parts = candidate["content"]["parts"]
-                    if len(parts) > 0 and "text" in parts[0]:
-                        extracted = parts[0]["text"].strip()
 
-                        # Clean up
-                        extracted = extracted.replace("**", "").replace("*", "")
-                        extracted = extracted.strip('"').strip("'").strip()
+def _describe_question(question_id: str) -> str:
+    """One prompt line per question: id, text and allowed options"""
+    question = QUESTIONS_URSALL[question_id]
+    line = f"- {question_id}: {question['question_text']}"
+    validation = question.get("validation", {})
+    if validation.get("type") == "choice":
+        line += f" Opciones: {', '.join(validation['choices'])}"
+    return line
 
-                        # Check for ambiguity
-                        if extracted.upper() == "AMBIGUO":
-                            logger.warning(f"Ambiguous response detected for '{user_input}'")
-                            return "AMBIGUO"
 
-                        logger.info(f"Gemini REST extraction - Input: '{user_input}' -> Output: '{extracted}'")
-                        return extracted
+async def _call_gemini(payload: dict, user_input: str) -> Optional[str]:
+    """
+    Send an extraction request to Gemini and clean up the answer
 
-            logger.error(f"Unexpected response format: {data}")
+    Returns:
+        Extracted text, "AMBIGUO", or None if the request failed
+    """
+    extracted = await _generate_content(payload)
+    if extracted is None:
+        return None
+
+    # Clean up
+    extracted = extracted.replace("**", "").replace("*", "")
+    extracted = extracted.strip('"').strip("'").strip()
+
+    # Check for ambiguity
+    if extracted.upper() == "AMBIGUO":
+        logger.warning(f"Ambiguous response detected for '{user_input}'")
+        return "AMBIGUO"
+
+    logger.info(f"Gemini REST extraction - Input: '{user_input}' -> Output: '{extracted}'")
+    return extracted
+
+
+async def _call_gemini_json(payload: dict) -> Optional[Dict]:
+    """
+    Send a JSON-mode request to Gemini and parse the answer
+
+    Returns:
+        Parsed JSON object, or None if the request failed
+    """
+    text = await _generate_content(payload)
+    if text is None:
+        return None
+
+    try:
+        data = json.loads(text)
+    except ValueError:
+        logger.error(f"Gemini returned invalid JSON: {text}")
+        return None
+    if not isinstance(data, dict):
+        logger.error(f"Unexpected JSON response: {data}")
+        return None
+
+    logger.info(f"Gemini REST bulk extraction -> {data}")
+    return data
+
+
+async def _generate_content(payload: dict) -> Optional[str]:
+    """
+    POST a generateContent request
+
+    Returns:
+        Text of the first candidate, or None if the request failed
+    """
+    # Gemini REST API endpoint (using gemini-2.5-flash-lite - free tier)
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+
+    try:
+        client = get_client("gemini")
+        breaker = get_breaker("gemini")
+        # Rate limited per API key; adaptive timeout (at most 10 s); fails fast
+        # while the Gemini circuit is open or the quota queue is too long
+        response = await limited_request(
+            "gemini", GEMINI_API_KEY,
+            lambda: breaker.request(lambda timeout: client.post(url, json=payload, timeout=timeout), 10.0, "extract"),
+            # Timeouts and 5xx go straight to the local fallback instead of
+            # being retried (429s are still retried within the queue wait)
+            idempotent=False,
+            max_wait=GEMINI_MAX_QUEUE_WAIT
+        )
+
+        if response.status_code != 200:
+            logger.error(f"Gemini API error {response.status_code}: {response.text}")
             return None
 
+        data = response.json()
+
+        # Extract text from response
+        if "candidates" in data and len(data["candidates"]) > 0:
+            candidate = data["candidates"][0]
+            if "content" in candidate and "parts" in candidate["content"]:
+                parts = candidate["content"]["parts"]
+                if len(parts) > 0 and "text" in parts[0]:
+                    return parts[0]["text"].strip()
+
+        logger.error(f"Unexpected response format: {data}")
+        return None
+
+    except (CircuitOpenError, RateLimitExceeded) as e:
+        logger.info(f"Skipping Gemini request: {e}")
+        return None
     except Exception as e:
         logger.error(f"Gemini REST API error: {e}", exc_info=True)
         return None
@@ -289,5 +451,6 @@ def check_gemini_status() -> dict:
         "api_key_configured": bool(GEMINI_API_KEY),
         "required": True,
         "api_type": "REST",
+        "cache": dict(get_gemini_cache().stats) if GEMINI_CACHE_ENABLED else None,
         "setup_url": "https://aistudio.google.com/app/apikey" if not GEMINI_AVAILABLE else None
     }
@@ -3,12 +3,18 @@ Gemini Document Summarizer
 Uses Gemini AI to create intelligent document summaries and previews
 """
 
+import asyncio
 import os
 import logging
-import httpx
-from typing import Optional, Dict
+import re
+from typing import Optional, Dict, List
 from dotenv import load_dotenv
 
+from app.http_clients import get_client
+from app.circuit_breaker import CircuitOpenError, get_breaker
+from app.rate_limiter import GEMINI_MAX_QUEUE_WAIT, RateLimitExceeded, limited_request
+from app.gemini_cache import cached_gemini_call
+
 # Load environment variables
 load_dotenv()
 
@@ -19,6 +25,34 @@ logger = logging.getLogger(__name__)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_AVAILABLE = bool(GEMINI_API_KEY)
 
+# Model used for summaries (free tier)
+GEMINI_MODEL = "gemini-2.5-flash-lite"
+
+# Long-document mode: texts longer than this are split into chunks, the most
+# salient chunks are summarized concurrently and the results merged
+SUMMARY_LONG_DOCUMENT_CHARS = int(os.getenv("SUMMARY_LONG_DOCUMENT_CHARS", "6000"))
+SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", "3000"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "3"))
+
+# Max estimated tokens (prompt + output) spent on one long document
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "12000"))
+
+SUMMARY_MAX_OUTPUT_TOKENS = 1000
+
+# Rough token estimate for Spanish text
+CHARS_PER_TOKEN = 4
+
+# Cheap local salience scoring: (pattern, weight)
+SALIENT_PATTERNS = [
+    (re.compile(r"\b\d{1,6}/\d{4}\b"), 5),  # Número de procedimiento
+    (re.compile(r"\bN\.?I\.?G\.?\b"), 4),
+    (re.compile(r"\b(juzgado|tribunal|audiencia|sala de lo)\b", re.IGNORECASE), 4),
+    (re.compile(r"\b(demandante|demandad[oa]s?|actora?|recurrente|recurrid[oa]|ejecutante|ejecutad[oa])\b", re.IGNORECASE), 3),
+    (re.compile(r"\b(procedimiento|autos|juicio|recurso|ejecución)\b", re.IGNORECASE), 2),
+    (re.compile(r"\b(sentencia|auto|decreto|diligencia|providencia|notificación)\b", re.IGNORECASE), 1),
+    (re.compile(r"\b\d{1,2} de [a-záéíóú]+ de \d{4}\b", re.IGNORECASE), 1),
+]
+
 if GEMINI_AVAILABLE:
     logger.info("Gemini API key configured for document summarization")
 else:
@@ -57,15 +91,184 @@ async def summarize_document(
         logger.warning("Gemini not available for summarization")
         return None
 
+    if len(document_text) > SUMMARY_LONG_DOCUMENT_CHARS:
+        return await _summarize_long_document(document_text, document_metadata, target_use)
+
+    return await _summarize_text(document_text, document_metadata, target_use)
+
+
+async def _summarize_text(
+    document_text: str,
+    document_metadata: Dict,
+    target_use: str,
+    max_output_tokens: int = SUMMARY_MAX_OUTPUT_TOKENS
+) -> Optional[Dict]:
+    """Summarize one text (truncated to 3000 chars by the prompt builders)"""
     # Build prompt based on target use
     if target_use == "legal":
         prompt = _build_legal_summary_prompt(document_text, document_metadata)
     else:
         prompt = _build_general_summary_prompt(document_text, document_metadata)
 
+    generation_config = {
+        "temperature": 0.2,
+        "maxOutputTokens": max_output_tokens,
+    }
+
+    # Same document text -> same prompt -> cached summary; unparseable answers
+    # (fallback structure with confidence 0.0) are cached for a shorter time
+    return await cached_gemini_call(
+        GEMINI_MODEL,
+        generation_config,
+        prompt,
+        lambda: _request_summary(prompt, generation_config),
+        is_negative=lambda result: result.get("confidence") == 0.0
+    )
+
+
+# ============================================================================
+# LONG-DOCUMENT MODE (map-reduce)
+# ============================================================================
+
+def split_chunks(document_text: str, chunk_chars: int = SUMMARY_CHUNK_CHARS) -> List[str]:
+    """
+    Split text into chunks of at most chunk_chars, on paragraph boundaries
+    when possible
+
+    Returns:
+        Chunks in document order
+    """
+    chunks = []
+    current = ""
+    for paragraph in document_text.split("\n\n"):
+        while len(paragraph) > chunk_chars:
+            # Paragraph longer than a chunk: hard split
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars:]
+        if current and len(current) + 2 + len(paragraph) > chunk_chars:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def score_chunk(chunk: str) -> int:
+    """Salience of a chunk: weighted count of legal-identifier pattern hits"""
+    return sum(weight * len(pattern.findall(chunk)) for pattern, weight in SALIENT_PATTERNS)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def select_salient_chunks(
+    chunks: List[str],
+    token_budget: int = SUMMARY_TOKEN_BUDGET,
+    chunk_overhead: int = 0
+) -> List[int]:
+    """
+    Pick the chunks to summarize within the token budget
+
+    The first chunk (cover page, heading) is always included; the rest are
+    added by descending salience while the estimated cost (chunk tokens +
+    chunk_overhead for prompt and output) fits the budget. Chunks without
+    any salient pattern are skipped.
+
+    Returns:
+        Indexes of the selected chunks, in document order
+    """
+    if not chunks:
+        return []
+    selected = [0]
+    spent = estimate_tokens(chunks[0]) + chunk_overhead
+
+    ranked = sorted(range(1, len(chunks)), key=lambda i: score_chunk(chunks[i]), reverse=True)
+    for index in ranked:
+        if score_chunk(chunks[index]) == 0:
+            break
+        cost = estimate_tokens(chunks[index]) + chunk_overhead
+        if spent + cost > token_budget:
+            continue
+        selected.append(index)
+        spent += cost
+    return sorted(selected)
+
+
+def merge_summaries(summaries: List[Dict]) -> Dict:
+    """
+    Merge chunk summaries (in document order) into one
+
+    Summary, document type and legal flag come from the first usable
+    chunk; key_information and suggested_answers take, per field, the
+    first non-null value (lists are concatenated without duplicates).
+    """
+    usable = [s for s in summaries if s and s.get("confidence", 0.0) > 0.0]
+    if not usable:
+        return summaries[0] if summaries else None
+
+    merged = {
+        "summary": usable[0].get("summary"),
+        "document_type": usable[0].get("document_type"),
+        "is_legal_document": any(s.get("is_legal_document") for s in usable),
+        "confidence": usable[0].get("confidence"),
+        "key_information": {},
+        "suggested_answers": {},
+    }
+    for section in ("key_information", "suggested_answers"):
+        for summary in usable:
+            for field, value in (summary.get(section) or {}).items():
+                current = merged[section].get(field)
+                if isinstance(current, list) and isinstance(value, list):
+                    merged[section][field] = current + [v for v in value if v not in current]
+                elif current is None:
+                    merged[section][field] = value
+    return merged
+
+
+async def _summarize_long_document(
+    document_text: str,
+    document_metadata: Dict,
+    target_use: str
+) -> Optional[Dict]:
+    """
+    Map-reduce summary: summarize the salient chunks concurrently (at most
+    SUMMARY_CONCURRENCY at a time, within SUMMARY_TOKEN_BUDGET) and merge
+    """
+    chunks = split_chunks(document_text)
+    builder = _build_legal_summary_prompt if target_use == "legal" else _build_general_summary_prompt
+    chunk_output_tokens = SUMMARY_MAX_OUTPUT_TOKENS // 2
+    overhead = estimate_tokens(builder("", document_metadata)) + chunk_output_tokens
+    selected = select_salient_chunks(chunks, SUMMARY_TOKEN_BUDGET, overhead)
+
+    logger.info(f"Long document ({len(document_text)} chars): summarizing {len(selected)}/{len(chunks)} chunks")
+
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def summarize_chunk(index: int) -> Optional[Dict]:
+        async with semaphore:
+            return await _summarize_text(chunks[index], document_metadata, target_use, chunk_output_tokens)
+
+    summaries = await asyncio.gather(*(summarize_chunk(index) for index in selected))
+    return merge_summaries([s for s in summaries if s is not None])
+
+
+async def _request_summary(prompt: str, generation_config: Dict) -> Optional[Dict]:
+    """
+    Send a summary prompt to Gemini and parse the JSON answer
+
+    Returns:
+        Parsed summary dict, or None if the request failed
+    """
     try:
         # Use Gemini REST API
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent?key={GEMINI_API_KEY}"
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
 
         payload = {
             "contents": [{
@@ -73,38 +276,46 @@ async def summarize_document(
                     "text": prompt
                 }]
             }],
-            "generationConfig": {
-                "temperature": 0.2,
-                "maxOutputTokens": 1000,
-            }
+            "generationConfig": generation_config
         }
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, json=payload)
-
-            if response.status_code != 200:
-                logger.error(f"Gemini API error {response.status_code}: {response.text}")
-                return None
+        client = get_client("gemini")
+        breaker = get_breaker("gemini")
+        response = await limited_request(
+            "gemini", GEMINI_API_KEY,
+            lambda: breaker.request(lambda timeout: client.post(url, json=payload, timeout=timeout), 30.0, "summary"),
+            # Timeouts and 5xx go straight to the local fallback instead of
+            # being retried (429s are still retried within the queue wait)
+            idempotent=False,
+            max_wait=GEMINI_MAX_QUEUE_WAIT
+        )
+
+        if response.status_code != 200:
+            logger.error(f"Gemini API error {response.status_code}: {response.text}")
+            return None
 
-            data = response.json()
+        data = response.json()
 
-            # Extract text from response
-            if "candidates" in data and len(data["candidates"]) > 0:
-                candidate = data["candidates"][0]
-                if "content" in candidate and "parts" in candidate["content"]:
-                    parts = candidate["content"]["parts"]
-                    if len(parts) > 0 and "text" in parts[0]:
-                        result_text = parts[0]["text"].strip()
+        # Extract text from response
+        if "candidates" in data and len(data["candidates"]) > 0:
+            candidate = data["candidates"][0]
+            if "content" in candidate and "parts" in candidate["content"]:
+                parts = candidate["content"]["parts"]
+                if len(parts) > 0 and "text" in parts[0]:
+                    result_text = parts[0]["text"].strip()
 
-                        # Parse structured response
-                        parsed_result = _parse_gemini_summary_response(result_text)
+                    # Parse structured response
+                    parsed_result = _parse_gemini_summary_response(result_text)
 
-                        logger.info(f"Document summarized successfully: {parsed_result.get('document_type', 'unknown')}")
-                        return parsed_result
+                    logger.info(f"Document summarized successfully: {parsed_result.get('document_type', 'unknown')}")
+                    return parsed_result
 
-            logger.error(f"Unexpected Gemini response format: {data}")
-            return None
+        logger.error(f"Unexpected Gemini response format: {data}")
+        return None
 
+    except (CircuitOpenError, RateLimitExceeded) as e:
+        logger.info(f"Skipping document summarization: {e}")
+        return None
     except Exception as e:
         logger.error(f"Error in document summarization: {e}", exc_info=True)
         return None
@@ -321,26 +532,34 @@ NO son legales: facturas, presupuestos, informes empresariales, correos, etc."""
             }
         }
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(url, json=payload)
-
-            if response.status_code == 200:
-                data = response.json()
-                if "candidates" in data and len(data["candidates"]) > 0:
-                    result_text = data["candidates"][0]["content"]["parts"][0]["text"]
+        client = get_client("gemini")
+        breaker = get_breaker("gemini")
+        response = await limited_request(
+            "gemini", GEMINI_API_KEY,
+            lambda: breaker.request(lambda timeout: client.post(url, json=payload, timeout=timeout), 10.0, "quick_check"),
+            # Timeouts and 5xx go straight to the local fallback instead of
+            # being retried (429s are still retried within the queue wait)
+            idempotent=False,
+            max_wait=GEMINI_MAX_QUEUE_WAIT
+        )
+
+        if response.status_code == 200:
+            data = response.json()
+            if "candidates" in data and len(data["candidates"]) > 0:
+                result_text = data["candidates"][0]["content"]["parts"][0]["text"]
 
-                    # Parse JSON
-                    import json
-                    result = json.loads(result_text.strip().strip('`').strip())
+                # Parse JSON
+                import json
+                result = json.loads(result_text.strip().strip('`').strip())
 
-                    is_legal = result.get("is_legal", False)
-                    confidence = float(result.get("confidence", 0.5))
+                is_legal = result.get("is_legal", False)
+                confidence = float(result.get("confidence", 0.5))
 
-                    return {
-                        "is_legal": is_legal,
-                        "confidence": confidence,
-                        "suggested_workflow": "ursall" if is_legal else "standard"
-                    }
+                return {
+                    "is_legal": is_legal,
+                    "confidence": confidence,
+                    "suggested_workflow": "ursall" if is_legal else "standard"
+                }
 
     except Exception as e:
         logger.error(f"Quick document check failed: {e}")
@@ -0,0 +1,110 @@
+"""
+Shared HTTP clients
+Application-scoped registry of pooled httpx.AsyncClient instances, one per
+upstream (Dropbox API, Dropbox content, Gemini, Dolphin), so outbound calls
+reuse warm keep-alive connections instead of paying a new TCP+TLS handshake
+"""
+import importlib.util
+import logging
+import os
+from typing import Dict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _upstream_config(name: str, timeout: float, max_connections: int, max_keepalive: int) -> Dict:
+    """
+    Build pool settings for an upstream, overridable with environment variables
+
+    For upstream "dropbox_api" the variables are DROPBOX_API_HTTP_TIMEOUT,
+    DROPBOX_API_HTTP_MAX_CONNECTIONS, DROPBOX_API_HTTP_MAX_KEEPALIVE,
+    DROPBOX_API_HTTP_KEEPALIVE_EXPIRY and DROPBOX_API_HTTP2.
+    """
+    prefix = name.upper()
+    return {
+        "timeout": float(os.getenv(f"{prefix}_HTTP_TIMEOUT", str(timeout))),
+        "max_connections": int(os.getenv(f"{prefix}_HTTP_MAX_CONNECTIONS", str(max_connections))),
+        "max_keepalive_connections": int(os.getenv(f"{prefix}_HTTP_MAX_KEEPALIVE", str(max_keepalive))),
+        "keepalive_expiry": float(os.getenv(f"{prefix}_HTTP_KEEPALIVE_EXPIRY", "60")),
+        "http2": os.getenv(f"{prefix}_HTTP2", "true").lower() == "true",
+    }
+
+
+# Pool settings per upstream. Request-specific timeouts are still passed per call.
+UPSTREAMS: Dict[str, Dict] = {
+    "dropbox_api": _upstream_config("dropbox_api", timeout=30.0, max_connections=20, max_keepalive=10),
+    "dropbox_content": _upstream_config("dropbox_content", timeout=30.0, max_connections=10, max_keepalive=5),
+    "gemini": _upstream_config("gemini", timeout=30.0, max_connections=20, max_keepalive=10),
+    "dolphin": _upstream_config("dolphin", timeout=60.0, max_connections=5, max_keepalive=2),
+}
+
+# HTTP/2 needs the optional "h2" package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _create_client(name: str) -> httpx.AsyncClient:
+    """Create a pooled client for an upstream from its configuration"""
+    config = UPSTREAMS[name]
+
+    http2 = config["http2"]
+    if http2 and not HTTP2_AVAILABLE:
+        logger.warning(f"HTTP/2 requested for '{name}' but 'h2' is not installed, using HTTP/1.1")
+        http2 = False
+
+    logger.info(
+        f"Creating HTTP client for '{name}' (max_connections={config['max_connections']}, "
+        f"keepalive={config['max_keepalive_connections']}, http2={http2})"
+    )
+
+    return httpx.AsyncClient(
+        timeout=config["timeout"],
+        limits=httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive_connections"],
+            keepalive_expiry=config["keepalive_expiry"],
+        ),
+        http2=http2,
+    )
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """
+    Get the shared client for an upstream
+
+    Clients are normally created at application startup; if called before
+    that (scripts, tests) the client is created on first use.
+
+    Args:
+        name: Upstream name ("dropbox_api", "dropbox_content", "gemini", "dolphin")
+
+    Returns:
+        Shared httpx.AsyncClient for the upstream
+
+    Raises:
+        KeyError: If the upstream is not configured
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _create_client(name)
+        _clients[name] = client
+    return client
+
+
+async def startup_clients() -> None:
+    """Create all upstream clients (called from the FastAPI lifespan)"""
+    for name in UPSTREAMS:
+        get_client(name)
+
+
+async def shutdown_clients() -> None:
+    """Close all upstream clients and their connection pools"""
+    for name, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing HTTP client '{name}': {e}")
+    _clients.clear()
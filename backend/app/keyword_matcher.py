@@ -0,0 +1,161 @@
+"""
+Compiled keyword matching
+Keyword families are compiled into lookup tables and one regex per family,
+so a text is scored without looping over keywords in Python. Matching
+ignores case and accents and respects word boundaries: "prima" does not match "primera",
+"social" does not match "asociación".
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+# Lowercase accented vowels -> plain vowels (ñ is kept). A chain of
+# str.replace is several times faster than str.translate on short answers
+_ACCENTS = list(zip("áéíóúüàèìòù", "aeiouuaeiou"))
+
+# Characters that separate words inside a token ("contencioso-administrativo")
+_WORD_SEPARATORS = "-/"
+# Punctuation stripped from the ends of each word
+_PUNCTUATION = ".,;:()[]¿?¡!\"'«»"
+# Between the words of a multi-word keyword (regex)
+_WORD_GAP = r"[\s\-/]+"
+
+
+def _longest_first(alternatives: List[str]) -> str:
+    """Regex alternation trying longer alternatives first"""
+    return "|".join(sorted(alternatives, key=len, reverse=True))
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip accents from vowels ("Jurisdicción" -> "jurisdiccion")"""
+    text = text.lower()
+    if not text.isascii():
+        for accented, plain in _ACCENTS:
+            text = text.replace(accented, plain)
+    return text
+
+
+def split_words(normalized: str) -> List[str]:
+    """Words of a normalized text, without surrounding punctuation"""
+    for separator in _WORD_SEPARATORS:
+        normalized = normalized.replace(separator, " ")
+    return [word.strip(_PUNCTUATION) for word in normalized.split()]
+
+
+class KeywordMatcher:
+    """
+    Matcher for several keyword families
+
+    The text is normalized and split into words once; single words are
+    looked up in a dict (with their plural forms), stems in one compiled
+    prefix regex and multi-word keywords by their first word.
+
+    scores() (and best()) only count hits, which is cheaper with one
+    compiled regex per family run over the normalized text.
+
+    Args:
+        families: {family: [keyword, ...]}, in priority order (see first())
+    """
+
+    def __init__(self, families: Dict[str, Iterable[str]]):
+        self.families: List[str] = list(families)
+        self._words: Dict[str, str] = {}  # word or plural form -> keyword
+        self._stems: Dict[str, str] = {}  # stem -> keyword
+        self._phrases: Dict[str, List[tuple]] = {}  # first word -> [(words, keyword)]
+        self._keyword_family: Dict[str, str] = {}
+
+        for family, keywords in families.items():
+            for keyword in keywords:
+                self._keyword_family[keyword] = family
+                words = split_words(normalize_text(keyword.rstrip("*")))
+                if len(words) > 1:
+                    self._phrases.setdefault(words[0], []).append((words, keyword))
+                elif keyword.endswith("*"):
+                    self._stems[words[0]] = keyword
+                else:
+                    for form in (words[0], words[0] + "s", words[0] + "es"):
+                        self._words.setdefault(form, keyword)
+
+        # Longer stems first so the most specific one is reported
+        stems = sorted(self._stems, key=len, reverse=True)
+        self._stem_regex = re.compile("|".join(re.escape(stem) for stem in stems)) if stems else None
+
+        self._family_regexes = [(family, self._family_regex(keywords)) for family, keywords in families.items()]
+
+    @staticmethod
+    def _family_regex(keywords: Iterable[str]) -> "re.Pattern":
+        """
+        One regex for a family: each match is one keyword, captured without
+        its plural ending so repeated keywords compare equal
+        """
+        words, stems, phrases = [], [], []
+        for keyword in keywords:
+            parts = [re.escape(part) for part in split_words(normalize_text(keyword.rstrip("*")))]
+            if len(parts) > 1:
+                phrases.append(_WORD_GAP.join(parts))
+            elif keyword.endswith("*"):
+                stems.append(parts[0])
+            else:
+                words.append(parts[0])
+
+        alternatives = []
+        if phrases:
+            # Only the first word is consumed, so a keyword inside the phrase
+            # ("legal" in "informe legal") is still found
+            alternatives.append(rf"(?=({_longest_first(phrases)})(?:e?s)?\b)\w+")
+        if words:
+            alternatives.append(rf"({_longest_first(words)})(?:e?s)?\b")
+        if stems:
+            alternatives.append(rf"({_longest_first(stems)})\w*")
+        return re.compile(r"\b(?:" + "|".join(alternatives) + ")")
+
+    def keywords(self, text: str) -> Set[str]:
+        """Distinct keywords present in text"""
+        words = split_words(normalize_text(text))
+        found = set()
+        for index, word in enumerate(words):
+            keyword = self._words.get(word)
+            if keyword is not None:
+                found.add(keyword)
+            elif self._stem_regex is not None:
+                match = self._stem_regex.match(word)
+                if match:
+                    found.add(self._stems[match.group()])
+            for phrase, keyword in self._phrases.get(word, ()):
+                if self._phrase_at(words, index, phrase):
+                    found.add(keyword)
+        return found
+
+    @staticmethod
+    def _phrase_at(words: List[str], index: int, phrase: List[str]) -> bool:
+        """Whether phrase starts at words[index] (the last word may be plural)"""
+        end = index + len(phrase)
+        if end > len(words) or words[index:end - 1] != phrase[:-1]:
+            return False
+        last = words[end - 1]
+        return last in (phrase[-1], phrase[-1] + "s", phrase[-1] + "es")
+
+    def scores(self, text: str) -> Dict[str, int]:
+        """Number of distinct keywords of each family present in text"""
+        normalized = normalize_text(text)
+        return {family: len(set(regex.findall(normalized))) for family, regex in self._family_regexes}
+
+    def best(self, text: str) -> Optional[str]:
+        """Family with strictly more keyword hits than any other, or None (tie / no hits)"""
+        normalized = normalize_text(text)
+        best, best_score, tied = None, 0, False
+        for family, regex in self._family_regexes:
+            score = len(set(regex.findall(normalized)))
+            if score > best_score:
+                best, best_score, tied = family, score, False
+            elif score == best_score and score > 0:
+                tied = True
+        return None if tied else best
+
+    def first(self, text: str) -> Optional[str]:
+        """Highest-priority family (declaration order) with at least one hit, or None"""
+        found = {self._keyword_family[keyword] for keyword in self.keywords(text)}
+        for family in self.families:
+            if family in found:
+                return family
+        return None
+
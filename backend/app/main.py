@@ -9,33 +9,70 @@ from fastapi.responses import RedirectResponse, FileResponse
 from pydantic import BaseModel
 from pathlib import Path
 from typing import Dict, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import uuid
 import logging
 import tempfile
 import os
-import httpx
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Imports
-from app.validators import validate_upload_file, sanitize_filename_part, FileValidationError
+from app.validators import validate_file_extension, sanitize_filename_part, FileValidationError
+from app.temp_storage import save_upload_stream, TempFileIndex
 from app.questions_ursall import (
-    get_first_question_ursall,
-    get_next_question_ursall,
-    is_last_question_ursall,
+    QUESTIONS_URSALL,
+    candidate_questions_ursall,
+    get_next_unanswered_question_ursall,
+    prefill_answers_ursall,
+    reachable_questions_ursall,
+    resolve_answers_ursall,
     validate_ursall_answers
 )
-from app.nlp_extractor_legal import extract_information_legal, extract_partes
+from app.nlp_extractor_legal import extract_partes, extract_with_confidence_legal
+from app.answer_cascade import extract_answer_cascade, cascade_stats, ANSWER_CASCADE_MIN_CONFIDENCE
 from app.path_mapper_ursall import suggest_path_ursall
 from app import auth
-from app.dropbox_uploader import upload_file_to_dropbox, create_folder_if_not_exists
+from app.dropbox_uploader import upload_file_to_dropbox
+from app.dropbox_folders import ensure_folders
 from app.gemini_rest_extractor import check_gemini_status
+from app.document_fields import extract_document_fields, suggested_answers, DOCUMENT_FIELDS_MIN_CONFIDENCE
 from app.document_preview import generate_document_preview, check_preview_availability
+from app.http_clients import get_client, startup_clients, shutdown_clients
+from app.circuit_breaker import breakers_status
+from app.rate_limiter import limiter_status
+from app.session_store import create_session_store, sweep_sessions_periodically
+from app.temp_janitor import TempJanitor
+from app.document_workers import document_pool, render_thumbnail
+from app.dolphin_worker import shutdown_dolphin_workers
+
+# Question sessions (memory, SQLite or Redis depending on SESSION_STORE)
+session_store = create_session_store()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown: shared outbound HTTP connection pools and background cleanup"""
+    await startup_clients()
+    # Files stored before the index existed: one directory scan, never per lookup
+    await asyncio.to_thread(temp_index.index_existing)
+    background_tasks = [
+        asyncio.create_task(sweep_sessions_periodically(session_store)),
+        asyncio.create_task(temp_janitor.run_periodically()),
+    ]
+    yield
+    for task in background_tasks:
+        task.cancel()
+    document_pool.shutdown()
+    shutdown_dolphin_workers()
+    await shutdown_clients()
+
 
 # Create FastAPI app
-app = FastAPI(title="Dropbox AI Organizer - URSALL Legal System")
+app = FastAPI(title="Dropbox AI Organizer - URSALL Legal System", lifespan=lifespan)
 
 # CORS middleware for frontend
 # Support development, production URLs, and network access by IP
@@ -65,8 +102,11 @@ else:
 TEMP_STORAGE_PATH = Path(tempfile.gettempdir()) / "dropbox_chatbot"
 os.makedirs(TEMP_STORAGE_PATH, exist_ok=True)
 
-# In-memory storage for question sessions (in production, use database)
-ursall_sessions: Dict[str, Dict] = {}
+# file_id -> stored file metadata (avoids globbing TEMP_STORAGE_PATH per request)
+temp_index = TempFileIndex(TEMP_STORAGE_PATH)
+
+# Removes abandoned uploads (TTL + quota) together with their sessions
+temp_janitor = TempJanitor(temp_index, session_store)
 
 
 # ============================================================================
@@ -83,6 +123,12 @@ class QuestionAnswer(BaseModel):
     answer: str
 
 
+class QuestionBulkAnswer(BaseModel):
+    file_id: str
+    answers: Optional[Dict[str, str]] = None
+    description: Optional[str] = None
+
+
 class GeneratePath(BaseModel):
     file_id: str
     answers: Dict[str, str]
@@ -140,7 +186,12 @@ async def health_check():
     return {
         "status": "ok",
         "system": "URSALL",
-        "ai": gemini_status
+        "ai": gemini_status,
+        "answer_cascade": cascade_stats.snapshot(),
+        "circuit_breakers": breakers_status(),
+        "rate_limits": limiter_status(),
+        "temp_storage": temp_janitor.metrics,
+        "document_pool": document_pool.status()
     }
 
 
@@ -220,33 +271,36 @@ async def upload_temp(file: UploadFile = File(...)) -> Dict:
     """
     Upload a file to temporary storage
 
-    - Validates file size and extension
-    - Saves to temp with UUID prefix
-    - Returns file metadata
+    - Validates file extension before reading the body
+    - Streams to temp in fixed-size chunks with UUID prefix,
+      aborting with 413 as soon as the size limit is crossed
+    - Returns file metadata including SHA-256 content hash
     """
-    # Read file content
-    file_content = await file.read()
-    file_size = len(file_content)
-
-    # Validate file
+    # Validate extension first (cheap, no body read needed)
     try:
-        file_extension, _ = validate_upload_file(file.filename, file_size)
+        file_extension = validate_file_extension(file.filename)
     except FileValidationError as e:
         raise HTTPException(status_code=e.status_code, detail=e.message)
 
     # Generate unique file ID
     file_id = str(uuid.uuid4())
 
-    # Save to temporary storage
+    # Stream to temporary storage, enforcing size limit incrementally
     temp_file_path = TEMP_STORAGE_PATH / f"{file_id}_{file.filename}"
-    temp_file_path.write_bytes(file_content)
+    try:
+        file_size, content_hash = await save_upload_stream(file, temp_file_path)
+    except FileValidationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    temp_index.register(file_id, temp_file_path, file_size, file_extension, content_hash, file.filename)
 
     # Return metadata
     return {
         "file_id": file_id,
         "original_name": file.filename,
         "size": file_size,
-        "extension": file_extension
+        "extension": file_extension,
+        "sha256": content_hash
     }
 
 
@@ -266,12 +320,9 @@ async def get_file_preview(file_id: str):
     before Dolphin processing
     """
     # Find temporary file
-    temp_file = None
-    for file in TEMP_STORAGE_PATH.glob(f"{file_id}_*"):
-        temp_file = file
-        break
+    temp_file = temp_index.get_path(file_id)
 
-    if not temp_file or not temp_file.exists():
+    if not temp_file:
         raise HTTPException(
             status_code=404,
             detail="Archivo no encontrado"
@@ -282,27 +333,15 @@ async def get_file_preview(file_id: str):
     # For PDFs, generate thumbnail of first page
     if file_ext == '.pdf':
         try:
-            import fitz  # PyMuPDF
-
             # Check if thumbnail already exists
             thumbnail_path = TEMP_STORAGE_PATH / f"{file_id}_thumbnail.png"
 
             if not thumbnail_path.exists():
-                # Generate thumbnail
+                # Generate thumbnail of the first page in the document worker pool
+                # (zoom factor 2 gives good quality)
                 logger.info(f"Generating thumbnail for PDF: {temp_file}")
-                doc = fitz.open(str(temp_file))
-
-                # Get first page
-                page = doc[0]
-
-                # Render page to image (matrix for scaling)
-                # Zoom factor 2 gives good quality
-                mat = fitz.Matrix(2, 2)
-                pix = page.get_pixmap(matrix=mat)
-
-                # Save as PNG
-                pix.save(str(thumbnail_path))
-                doc.close()
+                await document_pool.run(render_thumbnail, str(temp_file), str(thumbnail_path), 2.0)
+                temp_index.add_derived(file_id, thumbnail_path)
                 logger.info(f"Thumbnail generated: {thumbnail_path}")
 
             return FileResponse(
@@ -371,17 +410,15 @@ async def preview_document(payload: DocumentPreview) -> Dict:
     file_id = payload.file_id
     target_use = payload.target_use or "legal"
 
-    # Find temporary file
-    temp_file = None
-    for file in TEMP_STORAGE_PATH.glob(f"{file_id}_*"):
-        temp_file = file
-        break
+    # Find temporary file (held so the janitor does not remove it meanwhile)
+    temp_entry = temp_index.acquire(file_id)
 
-    if not temp_file or not temp_file.exists():
+    if not temp_entry:
         raise HTTPException(
             status_code=404,
             detail="Archivo temporal no encontrado. Por favor, vuelve a subir el archivo."
         )
+    temp_file = Path(temp_entry["path"])
 
     try:
         # Generate preview
@@ -389,7 +426,8 @@ async def preview_document(payload: DocumentPreview) -> Dict:
         preview_result = await generate_document_preview(
             file_path=str(temp_file),
             file_id=file_id,
-            target_use=target_use
+            target_use=target_use,
+            content_hash=temp_entry["sha256"] or None
         )
 
         if preview_result["status"] == "error":
@@ -399,6 +437,20 @@ async def preview_document(payload: DocumentPreview) -> Dict:
                 detail=preview_result["error"]
             )
 
+        # Keep the suggestions: once the document is confirmed, start_questions
+        # prefills the confident ones instead of asking them again. Merged, so
+        # answers already given in this session are kept
+        preview = preview_result["preview"]
+        suggestions = {
+            "preview_suggestions": {
+                "answers": preview.get("suggested_answers", {}),
+                "confidence": preview.get("suggested_answers_confidence", {})
+            },
+            "preview_confirmed": False
+        }
+        if await session_store.aupdate(file_id, suggestions) is None:
+            await session_store.aput(file_id, suggestions)
+
         logger.info(f"Preview generated successfully for {file_id}")
         return preview_result
 
@@ -410,6 +462,8 @@ async def preview_document(payload: DocumentPreview) -> Dict:
             status_code=500,
             detail=f"Error generando previsualización: {str(e)}"
         )
+    finally:
+        temp_index.release(file_id)
 
 
 @app.post("/api/document/confirm")
@@ -434,20 +488,17 @@ async def confirm_document(payload: DocumentConfirm) -> Dict:
         # User rejected - clean up temp file
         logger.info(f"Document {file_id} rejected by user, cleaning up")
 
-        for file in TEMP_STORAGE_PATH.glob(f"{file_id}_*"):
-            try:
-                file.unlink()
-                logger.info(f"Deleted temp file: {file}")
-            except Exception as e:
-                logger.error(f"Error deleting temp file: {e}")
+        temp_index.remove(file_id)
+        await session_store.adelete(file_id)
 
         return {
             "success": True,
             "message": "Documento cancelado y eliminado correctamente"
         }
 
-    # User confirmed - document is ready for question flow
+    # User confirmed - document is ready for question flow, with its preview suggestions
     logger.info(f"Document {file_id} confirmed by user")
+    await session_store.aupdate(file_id, {"preview_confirmed": True})
     return {
         "success": True,
         "message": "Documento confirmado. Puedes proceder con las preguntas."
@@ -460,9 +511,9 @@ async def preview_status() -> Dict:
     Check availability of document preview service
 
     Returns:
-        Status of Dolphin parser and Gemini summarizer
+        Status of the parser backends (policy, selected backend, health) and Gemini summarizer
     """
-    status = check_preview_availability()
+    status = await check_preview_availability()
     return status
 
 
@@ -474,18 +525,40 @@ async def preview_status() -> Dict:
 async def start_questions(payload: QuestionStart) -> Dict:
     """
     Start URSALL question flow
-    Returns the first question (tipo_trabajo)
+    Returns the first question still unanswered: confident suggestions from a
+    confirmed document preview are validated once and stored as answers, and
+    their questions are skipped (listed in "prefilled_answers"). The session is
+    merged, not replaced, so a repeated start keeps the preview suggestions and
+    the answers already given
     """
     file_id = payload.file_id
 
+    session = await session_store.aget(file_id) or {}
+    answers = {}
+    if session.get("preview_confirmed"):
+        suggestions = session.get("preview_suggestions", {})
+        answers = prefill_answers_ursall(suggestions.get("answers", {}), suggestions.get("confidence", {}))
+        logger.info(f"Respuestas prellenadas desde la previsualización: {sorted(answers)}")
+    # Answers already given win over the preview's suggestions
+    answers.update(session.get("answers", {}))
+    extracted_answers = {**answers, **session.get("extracted_answers", {})}
+
+    first_question = get_next_unanswered_question_ursall(None, answers)
+
     # Initialize session
-    ursall_sessions[file_id] = {
-        "current_question": "tipo_trabajo",
-        "answers": {},
-        "extracted_answers": {}
+    changes = {
+        "current_question": first_question["question_id"] if first_question else None,
+        "answers": answers,
+        "extracted_answers": extracted_answers
     }
+    if await session_store.aupdate(file_id, changes) is None:
+        await session_store.aput(file_id, changes)
 
-    return get_first_question_ursall()
+    # Text answers only ("partes" is also stored split into parte_a/parte_b)
+    prefilled = {question_id: value for question_id, value in answers.items() if isinstance(value, str)}
+    if first_question is None:
+        return {"completed": True, "prefilled_answers": prefilled}
+    return {**first_question, "prefilled_answers": prefilled}
 
 
 @app.post("/api/questions/answer")
@@ -499,49 +572,21 @@ async def answer_question(payload: QuestionAnswer) -> Dict:
     answer = payload.answer
 
     # Verify session
-    if file_id not in ursall_sessions:
+    if not await session_store.acontains(file_id):
         raise HTTPException(status_code=404, detail="Sesión no encontrada")
 
-    session = ursall_sessions[file_id]
-
-    # STEP 1: Extract information using AI (Gemini preferred) or NLP fallback
+    # STEP 1: Extract information: legal NLP first, Gemini only when the NLP result is not confident
     logger.info(f"=== Procesando respuesta ===")
     logger.info(f"Pregunta ID: {question_id}")
     logger.info(f"Respuesta original: {answer}")
 
-    # Try Gemini AI extraction first for better accuracy
-    from app.gemini_rest_extractor import extract_with_gemini_rest, GEMINI_AVAILABLE
-
-    extracted_answer = answer.strip()
-
-    if GEMINI_AVAILABLE and question_id in ["tipo_trabajo", "doc_type_proc", "doc_type_proyecto", "client"]:
-        try:
-            logger.info(f"Intentando extracción con Gemini AI para: {question_id}")
-            gemini_result = await extract_with_gemini_rest(question_id, answer)
-            if gemini_result and gemini_result.upper() != "AMBIGUO":
-                extracted_answer = gemini_result
-                logger.info(f"✓ Gemini extrajo: {extracted_answer}")
-            else:
-                logger.info("Gemini retornó AMBIGUO, usando NLP legal...")
-                extracted_answer = extract_information_legal(question_id, answer)
-                logger.info(f"✓ NLP legal extrajo: {extracted_answer}")
-        except Exception as e:
-            logger.warning(f"Gemini falló, usando NLP legal: {e}")
-            try:
-                extracted_answer = extract_information_legal(question_id, answer)
-                logger.info(f"✓ NLP legal extrajo: {extracted_answer}")
-            except:
-                extracted_answer = answer.strip()
-                logger.warning(f"Extracción falló, usando respuesta original: {extracted_answer}")
-    else:
-        # Use legal NLP extractor
-        try:
-            extracted_answer = extract_information_legal(question_id, answer)
-            logger.info(f"✓ NLP legal extrajo: {extracted_answer}")
-        except Exception as e:
-            logger.error(f"Error en extracción NLP: {e}")
-            extracted_answer = answer.strip()
-            logger.warning(f"Usando respuesta original: {extracted_answer}")
+    try:
+        extracted_answer, tier = await extract_answer_cascade(question_id, answer)
+        logger.info(f"✓ Extraído ({tier}): {extracted_answer}")
+    except Exception as e:
+        logger.error(f"Error en extracción: {e}")
+        extracted_answer = answer.strip()
+        logger.warning(f"Usando respuesta original: {extracted_answer}")
 
     # STEP 2: Basic validations with clear error messages
     if not extracted_answer:
@@ -645,13 +690,17 @@ async def answer_question(payload: QuestionAnswer) -> Dict:
                 detail="Mes inválido. Debe ser MM (ej: 01, 06, 12)"
             )
 
-    # STEP 4: Store answer
-    session["answers"][question_id] = extracted_answer
-    session["extracted_answers"][question_id] = extracted_answer
+    # STEP 4: Store answer (single atomic update, safe across workers)
+    session = await session_store.aupdate(file_id, {
+        "answers": {question_id: extracted_answer},
+        "extracted_answers": {question_id: extracted_answer}
+    })
+    if session is None:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
 
-    # STEP 5: Get next question
-    next_q = get_next_question_ursall(question_id, session["answers"])
-    completed = is_last_question_ursall(question_id)
+    # STEP 5: Get next question (skipping questions prefilled from the preview)
+    next_q = get_next_unanswered_question_ursall(question_id, session["answers"])
+    completed = next_q is None and question_id in QUESTIONS_URSALL
 
     # STEP 6: If "partes", extract parte_a and parte_b
     if question_id == "partes":
@@ -690,10 +739,8 @@ async def answer_question(payload: QuestionAnswer) -> Dict:
                 logger.warning(f"Extracción manual - parte_a: {parte_a}, parte_b: {parte_b}")
 
         # Save in both dictionaries
-        session["answers"]["parte_a"] = parte_a
-        session["answers"]["parte_b"] = parte_b
-        session["extracted_answers"]["parte_a"] = parte_a
-        session["extracted_answers"]["parte_b"] = parte_b
+        partes_fields = {"parte_a": parte_a, "parte_b": parte_b}
+        await session_store.aupdate(file_id, {"answers": partes_fields, "extracted_answers": partes_fields})
         logger.info(f"Partes guardadas en sesión - parte_a: {parte_a}, parte_b: {parte_b}")
 
     return {
@@ -703,6 +750,116 @@ async def answer_question(payload: QuestionAnswer) -> Dict:
     }
 
 
+@app.post("/api/questions/answer-bulk")
+async def answer_questions_bulk(payload: QuestionBulkAnswer) -> Dict:
+    """
+    Answer several URSALL questions at once
+    Accepts question_id -> answer pairs or a free-text description of the whole
+    filing, resolved with a single Gemini call (JSON response) instead of one
+    call per question; every value then goes through the legal NLP extractor
+    and the question validation (in parallel) before being stored
+
+    Explicit answers win: Gemini only interprets the answers the local
+    extractor is not confident about, never overrides a clear one. A
+    description is sent once with every question its branches could reach;
+    only the values reachable from the accepted categoria/tipo_trabajo are kept
+    """
+    file_id = payload.file_id
+
+    session = await session_store.aget(file_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+
+    answers = {
+        question_id: answer.strip()
+        for question_id, answer in (payload.answers or {}).items()
+        if question_id in QUESTIONS_URSALL and answer.strip()
+    }
+    description = (payload.description or "").strip()
+    if not answers and not description:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "respuesta_vacia",
+                "message": "Indica las respuestas o una descripción del documento."
+            }
+        )
+
+    from app.gemini_rest_extractor import extract_bulk_with_gemini_rest, GEMINI_AVAILABLE
+
+    if answers:
+        question_ids = [
+            question_id for question_id, answer in answers.items()
+            if extract_with_confidence_legal(question_id, answer)[1] < ANSWER_CASCADE_MIN_CONFIDENCE
+        ]
+        user_input = "\n".join(f"{question_id}: {answers[question_id]}" for question_id in question_ids)
+
+        # STEP 1: One Gemini call for the unsure answers
+        gemini_values = None
+        if GEMINI_AVAILABLE and question_ids:
+            gemini_values = await extract_bulk_with_gemini_rest(question_ids, user_input)
+            logger.info(f"Gemini (bloque) extrajo: {gemini_values}")
+
+        # Only unsure answers were sent, and unresolved ones keep the user's text
+        values = {**answers, **{
+            question_id: value for question_id, value in (gemini_values or {}).items() if question_id in question_ids
+        }}
+
+        # STEP 2: Legal NLP extraction + validation of every field in parallel
+        accepted, rejected = await resolve_answers_ursall(values)
+        for question_id in answers:
+            if question_id not in accepted and question_id not in rejected:
+                rejected[question_id] = answers[question_id]
+    else:
+        # STEP 1: One Gemini call for every question any branch could still
+        # reach (categoria, tipo_trabajo not answered yet)
+        known = dict(session.get("answers", {}))
+        question_ids = [
+            question_id for question_id in candidate_questions_ursall(known)
+            if not known.get(question_id)
+        ]
+
+        values = None
+        if GEMINI_AVAILABLE and question_ids:
+            values = await extract_bulk_with_gemini_rest(question_ids, description)
+            logger.info(f"Gemini (bloque) extrajo: {values}")
+        if values is None:
+            values, _ = suggested_answers(extract_document_fields(description), DOCUMENT_FIELDS_MIN_CONFIDENCE)
+        pending = {question_id: value for question_id, value in values.items() if question_id in question_ids}
+
+        # STEP 2: Validate branch by branch, so only fields reachable from the
+        # accepted categoria/tipo_trabajo are kept: a procedimiento never gets
+        # proyecto/seguros fields
+        accepted, rejected = {}, {}
+        while True:
+            round_values = {
+                question_id: pending.pop(question_id)
+                for question_id in reachable_questions_ursall(known)
+                if question_id in pending
+            }
+            if not round_values:
+                break
+            round_accepted, round_rejected = await resolve_answers_ursall(round_values)
+            accepted.update(round_accepted)
+            rejected.update(round_rejected)
+            known.update(round_accepted)
+
+    # STEP 3: Store valid answers (single atomic update)
+    session = await session_store.aupdate(file_id, {"answers": accepted, "extracted_answers": accepted})
+    if session is None:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+
+    next_q = get_next_unanswered_question_ursall(None, session["answers"])
+    logger.info(f"Respuestas en bloque - aceptadas: {sorted(accepted)}, rechazadas: {sorted(rejected)}")
+
+    return {
+        "accepted": accepted,
+        "rejected": rejected,
+        "next_question": next_q,
+        "completed": next_q is None
+    }
+
+
 @app.post("/api/questions/generate-path")
 async def generate_path(payload: GeneratePath) -> Dict:
     """
@@ -717,7 +874,7 @@ async def generate_path(payload: GeneratePath) -> Dict:
     logger.info(f"Answers recibidas en payload: {answers}")
 
     # Get session
-    session = ursall_sessions.get(file_id, {})
+    session = await session_store.aget(file_id) or {}
     logger.info(f"Sesión encontrada: {session is not None}")
 
     extracted_answers = session.get("extracted_answers", answers)
@@ -939,72 +1096,72 @@ async def get_user_info() -> Dict:
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            # Get account info
-            logger.info("Fetching Dropbox account info...")
-            account_response = await client.post(
-                "https://api.dropboxapi.com/2/users/get_current_account",
-                headers=headers,
-                content=b"null"
-            )
+        client = get_client("dropbox_api")
+        # Get account info
+        logger.info("Fetching Dropbox account info...")
+        account_response = await client.post(
+            "https://api.dropboxapi.com/2/users/get_current_account",
+            headers=headers,
+            content=b"null"
+        )
 
-            if account_response.status_code != 200:
-                error_detail = account_response.text
-                logger.error(f"Dropbox API error (account): {account_response.status_code} - {error_detail}")
-                try:
-                    error_json = account_response.json()
-                    error_msg = error_json.get("error_summary", error_detail)
-                except:
-                    error_msg = error_detail
-                raise HTTPException(
-                    status_code=account_response.status_code,
-                    detail=f"Error fetching Dropbox account info: {error_msg}"
-                )
+        if account_response.status_code != 200:
+            error_detail = account_response.text
+            logger.error(f"Dropbox API error (account): {account_response.status_code} - {error_detail}")
+            try:
+                error_json = account_response.json()
+                error_msg = error_json.get("error_summary", error_detail)
+            except:
+                error_msg = error_detail
+            raise HTTPException(
+                status_code=account_response.status_code,
+                detail=f"Error fetching Dropbox account info: {error_msg}"
+            )
 
-            account_data = account_response.json()
-            logger.info(f"Account data retrieved for: {account_data.get('email', 'unknown')}")
+        account_data = account_response.json()
+        logger.info(f"Account data retrieved for: {account_data.get('email', 'unknown')}")
 
-            # Get space usage
-            logger.info("Fetching Dropbox space usage...")
-            space_response = await client.post(
-                "https://api.dropboxapi.com/2/users/get_space_usage",
-                headers=headers,
-                content=b"null"
-            )
+        # Get space usage
+        logger.info("Fetching Dropbox space usage...")
+        space_response = await client.post(
+            "https://api.dropboxapi.com/2/users/get_space_usage",
+            headers=headers,
+            content=b"null"
+        )
 
-            if space_response.status_code != 200:
-                error_detail = space_response.text
-                logger.error(f"Dropbox API error (space): {space_response.status_code} - {error_detail}")
-                # Continue without space info if it fails
-                space_data = {"used": 0, "allocation": {"allocated": 0}}
-            else:
-                space_data = space_response.json()
-
-            # Extract relevant information
-            name = account_data.get("name", {}).get("display_name", "Usuario")
-            email = account_data.get("email", "")
-            account_type = account_data.get("account_type", {}).get(".tag", "basic")
-            profile_photo_url = account_data.get("profile_photo_url", None)
-
-            # Space usage
-            used_space = space_data.get("used", 0)
-            allocated_space = space_data.get("allocation", {}).get("allocated", 0)
-
-            logger.info(f"User info successfully retrieved for {email}")
-
-            result = {
-                "name": name,
-                "email": email,
-                "used_space": used_space,
-                "allocated_space": allocated_space,
-                "account_type": account_type.capitalize()
-            }
+        if space_response.status_code != 200:
+            error_detail = space_response.text
+            logger.error(f"Dropbox API error (space): {space_response.status_code} - {error_detail}")
+            # Continue without space info if it fails
+            space_data = {"used": 0, "allocation": {"allocated": 0}}
+        else:
+            space_data = space_response.json()
+
+        # Extract relevant information
+        name = account_data.get("name", {}).get("display_name", "Usuario")
+        email = account_data.get("email", "")
+        account_type = account_data.get("account_type", {}).get(".tag", "basic")
+        profile_photo_url = account_data.get("profile_photo_url", None)
+
+        # Space usage
+        used_space = space_data.get("used", 0)
+        allocated_space = space_data.get("allocation", {}).get("allocated", 0)
+
+        logger.info(f"User info successfully retrieved for {email}")
+
+        result = {
+            "name": name,
+            "email": email,
+            "used_space": used_space,
+            "allocated_space": allocated_space,
+            "account_type": account_type.capitalize()
+        }
 
-            # Add profile photo URL if available
-            if profile_photo_url:
-                result["profile_photo_url"] = profile_photo_url
+        # Add profile photo URL if available
+        if profile_photo_url:
+            result["profile_photo_url"] = profile_photo_url
 
-            return result
+        return result
     except HTTPException:
         raise
     except Exception as e:
@@ -1033,26 +1190,23 @@ async def upload_final(payload: UploadFinal) -> Dict:
     # Verify authentication
     access_token = auth.get_access_token()
 
-    # Get temporary file
-    temp_file = None
-    for file in TEMP_STORAGE_PATH.glob(f"{file_id}_*"):
-        temp_file = file
-        break
+    # Get temporary file (held so the janitor does not remove it meanwhile)
+    temp_entry = temp_index.acquire(file_id)
 
-    if not temp_file or not temp_file.exists():
+    if not temp_entry:
         raise HTTPException(
             status_code=404,
             detail=f"Archivo temporal no encontrado: {file_id}"
         )
+    temp_file = Path(temp_entry["path"])
 
     try:
-        # Create folder structure
+        # Create folder structure (including destination) in batch
         logger.info(f"=== Creando estructura de carpetas URSALL ===")
         logger.info(f"Total de carpetas a crear: {len(folder_structure)}")
 
-        for folder_path in folder_structure:
-            await create_folder_if_not_exists(access_token, folder_path)
-            logger.info(f"Carpeta creada/verificada: {folder_path}")
+        folders = await ensure_folders(access_token, list(folder_structure) + [dropbox_path])
+        logger.info(f"Carpetas creadas/verificadas: {len(folders['leaves'])} ramas, {folders['api_calls']} llamadas API")
 
         # Upload file directly to dropbox_path (already includes correct subfolder)
         logger.info(f"=== Subiendo archivo ===")
@@ -1063,15 +1217,15 @@ async def upload_final(payload: UploadFinal) -> Dict:
             access_token=access_token,
             file_path=str(temp_file),
             dropbox_path=dropbox_path,  # Already full path of subfolder
-            new_filename=filename
+            new_filename=filename,
+            ensure_folder=not folders["success"]
         )
 
-        # Clean up temporary file
-        temp_file.unlink()
+        # Clean up temporary file (and its thumbnail, if any)
+        temp_index.remove(file_id)
 
         # Clean up session
-        if file_id in ursall_sessions:
-            del ursall_sessions[file_id]
+        await session_store.adelete(file_id)
 
         # Prepare response message
         message = "Archivo subido exitosamente a Dropbox (estructura URSALL)"
@@ -1085,6 +1239,7 @@ async def upload_final(payload: UploadFinal) -> Dict:
             "dropbox_name": result["name"],
             "size": result["size"],
             "folders_created": len(folder_structure),
+            "folder_api_calls": folders["api_calls"],
             "was_renamed": result.get("was_renamed", False),
             "original_filename": filename if result.get("was_renamed") else None
         }
@@ -1097,3 +1252,5 @@ async def upload_final(payload: UploadFinal) -> Dict:
             status_code=500,
             detail=f"Error subiendo a Dropbox: {str(e)}"
         )
+    finally:
+        temp_index.release(file_id)
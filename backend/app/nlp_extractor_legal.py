@@ -3,9 +3,12 @@ NLP Extractor Legal - Extracción de información para documentos legales URSALL
 Extrae información específica de procedimientos judiciales y proyectos jurídicos
 """
 import re
-from typing import Optional, Dict
+import unicodedata
+from typing import Any, Optional, Dict, Tuple
 from datetime import datetime
 
+from app.keyword_matcher import KeywordMatcher, normalize_text, split_words
+
 
 # Patrones para jurisdicciones
 JURISDICCION_PATTERNS = [
@@ -53,6 +56,157 @@ MATERIA_PATTERNS = [
 ]
 
 
+# ============================================================================
+# TABLAS COMPILADAS (palabras clave y patrones precompilados)
+# ============================================================================
+# Las palabras clave se comparan sin mayúsculas ni tildes y por palabra
+# completa (o plural); "xxx*" indica raíz ("asesor*" → asesoría, asesoramiento)
+
+CATEGORIA_MATCHER = KeywordMatcher({
+    "legal": [
+        "legal", "juridico", "judicial", "procedimiento",
+        "juzgado", "tribunal", "jurisdiccion",
+        "contencioso", "social", "civil", "penal", "instruccion",
+        "sentencia", "auto", "providencia", "demanda*", "recurso",
+        "proyecto", "informe legal", "dictamen", "asesor*", "consultoria",
+    ],
+    "seguros": [
+        "seguro", "poliza", "aseguradora",
+        "siniestro", "prima", "cobertura", "indemnizacion",
+        "asegurado", "tomador", "beneficiario", "riesgo", "franquicia",
+    ],
+})
+
+TIPO_TRABAJO_MATCHER = KeywordMatcher({
+    "procedimiento": [
+        "procedimiento", "judicial", "juicio", "demanda*", "recurso",
+        "juzgado", "tribunal", "jurisdiccion",
+        "contencioso", "social", "civil", "penal", "instruccion",
+        "sentencia", "auto", "providencia", "notificacion",
+        "pleito", "litigio", "causa",
+    ],
+    "proyecto": [
+        "proyecto", "asesor*", "consultoria",
+        "opinion", "informe", "dictamen", "estudio",
+        "analisis", "consulta",
+    ],
+})
+
+# Extractores con una sola palabra clave (o casi) por valor: una regex
+# precompilada por valor, en orden de prioridad, sobre el texto en
+# minúsculas (más rápido que KeywordMatcher para tan pocas palabras)
+_PLURAL = r'(?:e?s)?\b'
+
+JURISDICCION_RES = [
+    ("contencioso", re.compile(r'\bcontencioso' + _PLURAL)),
+    ("social", re.compile(r'\b(?:social|laboral)' + _PLURAL)),
+    ("civil", re.compile(r'\b(?:civil|primera[\s\-/]+instancia)' + _PLURAL)),
+    ("penal", re.compile(r'\bpenal' + _PLURAL)),
+    ("instrucción", re.compile(r'\binstrucci[oó]n' + _PLURAL)),
+]
+
+MATERIA_RES = [
+    ("Despidos", re.compile(r'\bdespido' + _PLURAL)),
+    ("Fijeza", re.compile(r'\bfijeza' + _PLURAL)),
+    ("Urbanismo", re.compile(r'\burbanismo' + _PLURAL)),
+    ("ReclamacionCantidad", re.compile(r'\breclamaci[oó]n')),
+    ("Indemnizacion", re.compile(r'\bindemnizaci[oó]n')),
+]
+
+PROYECTO_NOMBRE_RES = [
+    ("Informe", re.compile(r'\binforme' + _PLURAL)),
+    ("Dictamen", re.compile(r'\bdictamen' + _PLURAL)),
+    ("Estudio", re.compile(r'\bestudio' + _PLURAL)),
+    ("Analisis", re.compile(r'\ban[aá]lisis' + _PLURAL)),
+    ("Consulta", re.compile(r'\bconsulta' + _PLURAL)),
+]
+
+MES_MATCHER = KeywordMatcher({
+    "01": ["enero", "ene"],
+    "02": ["febrero", "feb"],
+    "03": ["marzo", "mar"],
+    "04": ["abril", "abr"],
+    "05": ["mayo", "may"],
+    "06": ["junio", "jun"],
+    "07": ["julio", "jul"],
+    "08": ["agosto", "ago"],
+    "09": ["septiembre", "setiembre", "sep", "sept"],
+    "10": ["octubre", "oct"],
+    "11": ["noviembre", "nov"],
+    "12": ["diciembre", "dic"],
+})
+
+# Tipos de documento (valor canónico → palabras clave)
+DOC_TYPE_PROC_MATCHER = KeywordMatcher({
+    "Demanda": ["demanda"],
+    "Contestación": ["contestacion"],
+    "Escrito de conclusiones": ["conclusiones"],
+    "Recurso de apelación": ["apelacion"],
+    "Recurso de casación": ["casacion"],
+    "Sentencia": ["sentencia"],
+    "Auto": ["auto"],
+    "Providencia": ["providencia"],
+    "Diligencia": ["diligencia"],
+    "Prueba documental": ["prueba documental"],
+    "Prueba pericial": ["pericial"],
+    "Prueba testifical": ["testifical"],
+})
+
+DOC_TYPE_PROYECTO_MATCHER = KeywordMatcher({
+    "Informe jurídico": ["informe"],
+    "Dictamen": ["dictamen"],
+    "Opinión legal": ["opinion legal"],
+    "Memoria": ["memoria"],
+    "Contrato": ["contrato"],
+    "Convenio": ["convenio"],
+    "Acuerdo": ["acuerdo"],
+    "Estatutos": ["estatuto"],
+    "Reglamento": ["reglamento"],
+    "Política": ["politica"],
+    "Documento de trabajo": ["documento de trabajo"],
+    "Borrador": ["borrador"],
+})
+
+# Patrones probados uno a uno en orden de prioridad (precompilados)
+JUZGADO_NUM_RES = [re.compile(pattern, re.IGNORECASE) for pattern in JUZGADO_NUM_PATTERNS]
+DEMARCACION_RES = [re.compile(pattern, re.IGNORECASE) for pattern in DEMARCACION_PATTERNS]
+NUM_PROCEDIMIENTO_RES = [re.compile(pattern) for pattern in NUM_PROCEDIMIENTO_PATTERNS]
+
+YEAR_SUFFIX_RE = re.compile(r'/(\d{4})')
+PARTES_VS_RE = re.compile(r'([A-ZÁÉÍÓÚ][a-záéíóúñ\s\.&,]+)\s+(?:vs\.?|contra|c\/|\/)\s+([A-ZÁÉÍÓÚ][a-záéíóúñ\s\.&,]+)', re.IGNORECASE)
+PARTES_ACTOR_RE = re.compile(r'(?:actor|demandante|parte\s+a)[:\s]+([A-ZÁÉÍÓÚ][a-záéíóúñ\s\.&,]+?)(?:\s*,|\s*y|\s*$|\s*\/)', re.IGNORECASE)
+PARTES_DEMANDADO_RE = re.compile(r'(?:demandado|demandada|parte\s+b)[:\s]+([A-ZÁÉÍÓÚ][a-záéíóúñ\s\.&,]+?)(?:\s*,|\s*y|\s*$)', re.IGNORECASE)
+ARTICULO_CP_RE = re.compile(r'art(?:ículo|iculo)?\.?\s*(\d+)\s*(?:CP|C\.?P\.?)', re.IGNORECASE)
+MATERIA_RE = re.compile(r'(?:materia|asunto)(?:\s+de)?\s*:?\s*([A-ZÁÉÍÓÚ][a-záéíóúñ]+)', re.IGNORECASE)
+YEAR_RE = re.compile(r'\b(20\d{2})\b')
+MES_NUM_RE = re.compile(r'\b(0?[1-9]|1[0-2])\b')
+PROYECTO_PREFIX_RE = re.compile(r'^(sobre|relativo\s+a|en\s+materia\s+de)\s+', re.IGNORECASE)
+CLIENT_INTRO_RE = re.compile(r'^\s*(?:el\s+|la\s+|su\s+)?(?:cliente|nombre|se\s+llama|es\s)', re.IGNORECASE)
+
+
+def _first_match(table: list, user_input: str) -> Optional[str]:
+    """Primer valor (por prioridad) cuya regex aparece en la respuesta"""
+    text = user_input.lower()
+    for value, regex in table:
+        if regex.search(text):
+            return value
+    return None
+
+
+def _first_pattern(patterns: list, user_input: str) -> Optional[re.Match]:
+    """Coincidencia del primer patrón (por prioridad) que aparece en la respuesta"""
+    for regex in patterns:
+        match = regex.search(user_input)
+        if match:
+            return match
+    return None
+
+
+def _strip_accents(text: str) -> str:
+    """Quita tildes y caracteres no ASCII ("Diseño" → "Diseno")"""
+    return unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode('utf-8')
+
+
 def extract_categoria(user_input: str) -> Optional[str]:
     """
     Extrae la categoría principal (legal o seguros)
@@ -63,36 +217,8 @@ def extract_categoria(user_input: str) -> Optional[str]:
     - "es una póliza de seguros" → "seguros"
     - "siniestro" → "seguros"
     """
-    user_input_lower = user_input.lower().strip()
-
-    # Palabras clave para Legal
-    legal_keywords = [
-        "legal", "juridico", "jurídico", "judicial", "procedimiento",
-        "juzgado", "tribunal", "jurisdicción", "jurisdiccion",
-        "contencioso", "social", "civil", "penal", "instrucción", "instruccion",
-        "sentencia", "auto", "providencia", "demanda", "recurso",
-        "proyecto", "informe legal", "dictamen", "asesor", "consultoria"
-    ]
-
-    # Palabras clave para Seguros
-    seguros_keywords = [
-        "seguro", "seguros", "poliza", "póliza", "aseguradora",
-        "siniestro", "prima", "cobertura", "indemnizacion", "indemnización",
-        "asegurado", "tomador", "beneficiario", "riesgo", "franquicia"
-    ]
-
-    # Contar coincidencias
-    legal_matches = sum(1 for kw in legal_keywords if kw in user_input_lower)
-    seguros_matches = sum(1 for kw in seguros_keywords if kw in user_input_lower)
-
-    # Decidir basado en coincidencias
-    if legal_matches > seguros_matches:
-        return "legal"
-    elif seguros_matches > legal_matches:
-        return "seguros"
-
-    # Si hay empate o ninguna coincidencia, devolver None
-    return None
+    # La familia con más palabras clave distintas gana; empate o ninguna → None
+    return CATEGORIA_MATCHER.best(user_input)
 
 
 def extract_tipo_trabajo(user_input: str) -> Optional[str]:
@@ -106,36 +232,8 @@ def extract_tipo_trabajo(user_input: str) -> Optional[str]:
     - "informe legal" → "proyecto"
     - "judicial" → "procedimiento"
     """
-    user_input_lower = user_input.lower().strip()
-
-    # Palabras clave para procedimiento judicial
-    procedimiento_keywords = [
-        "procedimiento", "judicial", "juicio", "demanda", "recurso",
-        "juzgado", "tribunal", "jurisdicción", "jurisdiccion",
-        "contencioso", "social", "civil", "penal", "instrucción", "instruccion",
-        "sentencia", "auto", "providencia", "notificación", "notificacion",
-        "autos", "pleito", "litigio", "causa"
-    ]
-
-    # Palabras clave para proyecto jurídico
-    proyecto_keywords = [
-        "proyecto", "asesor", "consultoria", "consultoría",
-        "opinion", "opinión", "informe", "dictamen", "estudio",
-        "analisis", "análisis", "consulta", "asesoramiento"
-    ]
-
-    # Contar coincidencias de cada tipo
-    proc_matches = sum(1 for kw in procedimiento_keywords if kw in user_input_lower)
-    proy_matches = sum(1 for kw in proyecto_keywords if kw in user_input_lower)
-
-    # Decidir basado en coincidencias
-    if proc_matches > proy_matches:
-        return "procedimiento"
-    elif proy_matches > proc_matches:
-        return "proyecto"
-
     # Si hay empate o ninguna coincidencia, devolver None para que main.py maneje el error
-    return None
+    return TIPO_TRABAJO_MATCHER.best(user_input)
 
 
 def extract_jurisdiccion(user_input: str) -> Optional[str]:
@@ -147,28 +245,8 @@ def extract_jurisdiccion(user_input: str) -> Optional[str]:
     - "Social" → "social"
     - "Juzgado de Primera Instancia" → "civil"
     """
-    user_input_lower = user_input.lower()
-
-    # Buscar patrones específicos
-    if re.search(r'contencioso[-\s]?administrativo|contencioso', user_input_lower):
-        return "contencioso"
-    elif re.search(r'social|laboral', user_input_lower):
-        return "social"
-    elif re.search(r'civil|primera\s+instancia', user_input_lower):
-        return "civil"
-    elif re.search(r'penal(?!\s*(mercantil|administrativo))', user_input_lower):
-        return "penal"
-    elif re.search(r'instrucción|instruccion', user_input_lower):
-        return "instrucción"
-
-    # Buscar palabra clave sola
-    for pattern in JURISDICCION_PATTERNS:
-        match = re.search(pattern, user_input_lower)
-        if match:
-            if match.groups():
-                return match.group(1).strip()
-
-    return None
+    # Primera jurisdicción (por prioridad) mencionada
+    return _first_match(JURISDICCION_RES, user_input)
 
 
 def extract_juzgado_numero(user_input: str) -> Optional[str]:
@@ -180,14 +258,10 @@ def extract_juzgado_numero(user_input: str) -> Optional[str]:
     - "CA1" → "1"
     - "Juzgado Social 3" → "3"
     """
-    for pattern in JUZGADO_NUM_PATTERNS:
-        match = re.search(pattern, user_input, re.IGNORECASE)
-        if match:
-            if len(match.groups()) == 2:
-                # Patrón tipo "CA1"
-                return match.group(2)
-            else:
-                return match.group(1)
+    match = _first_pattern(JUZGADO_NUM_RES, user_input)
+    if match:
+        # Patrón tipo "CA1" tiene dos grupos: el número es el último
+        return match.groups()[-1]
 
     return None
 
@@ -201,12 +275,11 @@ def extract_demarcacion(user_input: str) -> Optional[str]:
     - "de Tenerife" → "Tenerife"
     - "La Gomera" → "LaGomera"
     """
-    for pattern in DEMARCACION_PATTERNS:
-        match = re.search(pattern, user_input, re.IGNORECASE)
-        if match:
-            demarcacion = match.group(1).strip()
-            # Eliminar espacios para el nombre de carpeta
-            return demarcacion.replace(" ", "")
+    match = _first_pattern(DEMARCACION_RES, user_input)
+    if match:
+        demarcacion = match.group(1).strip()
+        # Eliminar espacios para el nombre de carpeta
+        return demarcacion.replace(" ", "")
 
     return None
 
@@ -220,19 +293,18 @@ def extract_num_procedimiento(user_input: str) -> Optional[str]:
     - "Autos 123/2025" → "123/2025"
     - "455/2025" → "455/2025"
     """
-    for pattern in NUM_PROCEDIMIENTO_PATTERNS:
-        match = re.search(pattern, user_input)
-        if match:
-            num_proc = match.group(1)
-            # Separar número y año si están juntos
-            if '/' in num_proc:
-                return num_proc
-            else:
-                # Buscar año cercano
-                year_match = re.search(r'/(\d{4})', user_input)
-                if year_match:
-                    return f"{num_proc}/{year_match.group(1)}"
-                return num_proc
+    match = _first_pattern(NUM_PROCEDIMIENTO_RES, user_input)
+    if match:
+        num_proc = match.group(1)
+        # Separar número y año si están juntos
+        if '/' in num_proc:
+            return num_proc
+        else:
+            # Buscar año cercano
+            year_match = YEAR_SUFFIX_RE.search(user_input)
+            if year_match:
+                return f"{num_proc}/{year_match.group(1)}"
+            return num_proc
 
     return None
 
@@ -253,19 +325,19 @@ def extract_partes(user_input: str) -> Dict[str, Optional[str]]:
         return result
 
     # Patrón "A vs B" o "A / B"
-    match = re.search(r'([A-ZÁÉÍÓÚ][a-záéíóúñ\s\.&,]+)\s+(?:vs\.?|contra|c\/|\/)\s+([A-ZÁÉÍÓÚ][a-záéíóúñ\s\.&,]+)', user_input, re.IGNORECASE)
+    match = PARTES_VS_RE.search(user_input)
     if match:
         result["parte_a"] = match.group(1).strip()
         result["parte_b"] = match.group(2).strip()
         return result
 
     # Buscar actor/demandante/parte_a
-    actor_match = re.search(r'(?:actor|demandante|parte\s+a)[:\s]+([A-ZÁÉÍÓÚ][a-záéíóúñ\s\.&,]+?)(?:\s*,|\s*y|\s*$|\s*\/)', user_input, re.IGNORECASE)
+    actor_match = PARTES_ACTOR_RE.search(user_input)
     if actor_match:
         result["parte_a"] = actor_match.group(1).strip()
 
     # Buscar demandado/parte_b
-    demandado_match = re.search(r'(?:demandado|demandada|parte\s+b)[:\s]+([A-ZÁÉÍÓÚ][a-záéíóúñ\s\.&,]+?)(?:\s*,|\s*y|\s*$)', user_input, re.IGNORECASE)
+    demandado_match = PARTES_DEMANDADO_RE.search(user_input)
     if demandado_match:
         result["parte_b"] = demandado_match.group(1).strip()
 
@@ -289,35 +361,21 @@ def extract_materia(user_input: str) -> Optional[str]:
     - "sobre fijeza" → "Fijeza"
     - "Art 316 CP" → "Art316CP"
     """
-    user_input_lower = user_input.lower()
-
     # Buscar materias comunes
-    materias_comunes = {
-        'despido': 'Despidos',
-        'fijeza': 'Fijeza',
-        'urbanismo': 'Urbanismo',
-        'reclamación': 'ReclamacionCantidad',
-        'reclamacion': 'ReclamacionCantidad',
-        'indemnización': 'Indemnizacion',
-        'indemnizacion': 'Indemnizacion',
-    }
-
-    for key, value in materias_comunes.items():
-        if key in user_input_lower:
-            return value
+    materia = _first_match(MATERIA_RES, user_input)
+    if materia:
+        return materia
 
     # Buscar artículo del código penal
-    art_match = re.search(r'art(?:ículo|iculo)?\.?\s*(\d+)\s*(?:CP|C\.?P\.?)', user_input, re.IGNORECASE)
+    art_match = ARTICULO_CP_RE.search(user_input)
     if art_match:
         return f"Art{art_match.group(1)}CP"
 
     # Buscar patrón "materia: X" o "materia de X"
-    materia_match = re.search(r'(?:materia|asunto)(?:\s+de)?\s*:?\s*([A-ZÁÉÍÓÚ][a-záéíóúñ]+)', user_input, re.IGNORECASE)
+    materia_match = MATERIA_RE.search(user_input)
     if materia_match:
-        materia = materia_match.group(1).strip()
         # Normalizar: sin tildes, sin artículos
-        import unicodedata
-        materia = unicodedata.normalize('NFD', materia).encode('ascii', 'ignore').decode('utf-8')
+        materia = _strip_accents(materia_match.group(1).strip())
         return materia.capitalize()
 
     # Si no hay patrón específico, devolver el input limpio
@@ -334,7 +392,7 @@ def extract_year(user_input: str) -> Optional[str]:
     - "en el año 2024" → "2024"
     """
     # Buscar año de 4 dígitos
-    year_match = re.search(r'\b(20\d{2})\b', user_input)
+    year_match = YEAR_RE.search(user_input)
     if year_match:
         return year_match.group(1)
 
@@ -351,31 +409,13 @@ def extract_month(user_input: str) -> Optional[str]:
     - "08" → "08"
     - "mes 8" → "08"
     """
-    # Mapeo de meses en español
-    meses = {
-        'enero': '01', 'ene': '01',
-        'febrero': '02', 'feb': '02',
-        'marzo': '03', 'mar': '03',
-        'abril': '04', 'abr': '04',
-        'mayo': '05', 'may': '05',
-        'junio': '06', 'jun': '06',
-        'julio': '07', 'jul': '07',
-        'agosto': '08', 'ago': '08',
-        'septiembre': '09', 'sep': '09', 'sept': '09',
-        'octubre': '10', 'oct': '10',
-        'noviembre': '11', 'nov': '11',
-        'diciembre': '12', 'dic': '12',
-    }
-
-    user_input_lower = user_input.lower()
-
-    # Buscar nombre de mes
-    for mes_name, mes_num in meses.items():
-        if mes_name in user_input_lower:
-            return mes_num
+    # Buscar nombre de mes (completo o abreviado)
+    mes = MES_MATCHER.first(user_input)
+    if mes:
+        return mes
 
     # Buscar número de mes
-    mes_num_match = re.search(r'\b(0?[1-9]|1[0-2])\b', user_input)
+    mes_num_match = MES_NUM_RE.search(user_input)
     if mes_num_match:
         mes = mes_num_match.group(1)
         # Normalizar a dos dígitos
@@ -398,10 +438,9 @@ def extract_proyecto_info(user_input: str, tipo: str) -> Optional[str]:
     """
     if tipo == "nombre":
         # Buscar tipo de proyecto
-        proyectos = ['informe', 'dictamen', 'estudio', 'analisis', 'análisis', 'consulta']
-        for proyecto in proyectos:
-            if proyecto in user_input.lower():
-                return proyecto.capitalize()
+        proyecto = _first_match(PROYECTO_NOMBRE_RES, user_input)
+        if proyecto:
+            return proyecto
 
         # Si no se encuentra, extraer primera palabra significativa
         words = user_input.split()
@@ -411,12 +450,11 @@ def extract_proyecto_info(user_input: str, tipo: str) -> Optional[str]:
 
     elif tipo == "materia":
         # Eliminar palabras comunes y normalizar
-        cleaned = re.sub(r'^(sobre|relativo\s+a|en\s+materia\s+de)\s+', '', user_input, flags=re.IGNORECASE)
+        cleaned = PROYECTO_PREFIX_RE.sub('', user_input)
         cleaned = cleaned.strip()
 
         # Normalizar: sin tildes, sin espacios, CamelCase
-        import unicodedata
-        normalized = unicodedata.normalize('NFD', cleaned).encode('ascii', 'ignore').decode('utf-8')
+        normalized = _strip_accents(cleaned)
 
         # Convertir a CamelCase
         words = normalized.split()
@@ -427,6 +465,98 @@ def extract_proyecto_info(user_input: str, tipo: str) -> Optional[str]:
     return None
 
 
+# ============================================================================
+# EXTRACCIÓN CON CONFIANZA (cascada NLP → Gemini)
+# ============================================================================
+# Confianza 0.0-1.0 de la extracción local: por encima del umbral de la
+# cascada no se consulta a Gemini
+
+# Palabras que invierten o ponen en duda la respuesta ("no es un juicio")
+NEGATION_WORDS = {"no", "ni", "tampoco", "quizas", "creo"}
+
+# Respuestas más largas que esto no se consideran un nombre o tipo "limpio"
+MAX_CONFIDENT_WORDS = 6
+
+
+def _answer_words(user_input: str) -> list:
+    """Palabras normalizadas de la respuesta"""
+    return [word for word in split_words(normalize_text(user_input)) if word]
+
+
+def _keyword_confidence(matcher: KeywordMatcher, user_input: str) -> Tuple[Optional[str], float]:
+    """
+    Familia ganadora y confianza según el margen sobre la segunda
+
+    Sin competencia → 0.9; con competencia baja con el margen; empate o
+    ninguna coincidencia → (None, 0.0). Una negación limita a 0.5.
+    """
+    scores = sorted(matcher.scores(user_input).items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), runner_up = scores[0], scores[1][1] if len(scores) > 1 else 0
+    if best_score == 0 or best_score == runner_up:
+        return None, 0.0
+
+    confidence = 0.9 if runner_up == 0 else 0.5 + 0.3 * (best_score - runner_up) / best_score
+    if NEGATION_WORDS.intersection(_answer_words(user_input)):
+        confidence = min(confidence, 0.5)
+    return best, confidence
+
+
+def _doc_type_confidence(matcher: KeywordMatcher, user_input: str) -> Tuple[str, float]:
+    """
+    Tipo de documento canónico si la respuesta nombra exactamente uno
+
+    Respuestas largas o con varios tipos se devuelven tal cual con confianza baja
+    """
+    found = [family for family, score in matcher.scores(user_input).items() if score]
+    if len(found) == 1 and len(_answer_words(user_input)) <= MAX_CONFIDENT_WORDS:
+        return found[0], 0.9
+    return user_input.strip(), 0.3
+
+
+def _client_confidence(user_input: str) -> Tuple[str, float]:
+    """
+    El nombre del cliente tal cual, con confianza alta solo si parece un nombre
+
+    "Acme Corp" → 0.9; "el cliente es Acme Corp", "no lo sé" → 0.3
+    """
+    client = user_input.strip()
+    words = _answer_words(client)
+    if (len(client) < 2 or len(words) > MAX_CONFIDENT_WORDS or CLIENT_INTRO_RE.match(client)
+            or NEGATION_WORDS.intersection(words) or "?" in client):
+        return client, 0.3
+    return client, 0.9
+
+
+CONFIDENCE_EXTRACTORS = {
+    "categoria": lambda x: _keyword_confidence(CATEGORIA_MATCHER, x),
+    "tipo_trabajo": lambda x: _keyword_confidence(TIPO_TRABAJO_MATCHER, x),
+    "doc_type_proc": lambda x: _doc_type_confidence(DOC_TYPE_PROC_MATCHER, x),
+    "doc_type_proyecto": lambda x: _doc_type_confidence(DOC_TYPE_PROYECTO_MATCHER, x),
+    "client": _client_confidence,
+}
+
+
+def extract_with_confidence_legal(question_id: str, user_input: str) -> Tuple[Any, float]:
+    """
+    Extracción local con confianza
+
+    Args:
+        question_id: Identificador de la pregunta
+        user_input: Respuesta del usuario
+
+    Returns:
+        (información extraída, confianza 0.0-1.0); las preguntas sin
+        puntuación propia usan extract_information_legal con confianza 1.0
+        si extrajo algo
+    """
+    extractor = CONFIDENCE_EXTRACTORS.get(question_id)
+    if extractor:
+        return extractor(user_input)
+
+    extracted = extract_information_legal(question_id, user_input)
+    return extracted, 1.0 if extracted else 0.0
+
+
 def extract_information_legal(question_id: str, user_input: str) -> any:
     """
     Función principal de extracción para datos legales
@@ -438,25 +568,26 @@ def extract_information_legal(question_id: str, user_input: str) -> any:
     Returns:
         Información extraída según el tipo de pregunta
     """
-    extractors = {
-        "categoria": extract_categoria,  # ← NUEVO: Extractor para categoría
-        "tipo_trabajo": extract_tipo_trabajo,  # Extractor para tipo de trabajo
-        "jurisdiccion": extract_jurisdiccion,
-        "juzgado_num": extract_juzgado_numero,
-        "juzgado_numero": extract_juzgado_numero,  # Alias
-        "demarcacion": extract_demarcacion,
-        "num_procedimiento": extract_num_procedimiento,
-        "partes": extract_partes,
-        "materia": extract_materia,
-        "materia_proc": extract_materia,
-        "proyecto_year": extract_year,
-        "proyecto_month": extract_month,
-        "proyecto_nombre": lambda x: extract_proyecto_info(x, "nombre"),
-        "proyecto_materia": lambda x: extract_proyecto_info(x, "materia"),
-    }
-
-    extractor = extractors.get(question_id)
+    extractor = EXTRACTORS.get(question_id)
     if extractor:
         return extractor(user_input)
 
     return user_input.strip()
+
+
+EXTRACTORS = {
+    "categoria": extract_categoria,  # ← NUEVO: Extractor para categoría
+    "tipo_trabajo": extract_tipo_trabajo,  # Extractor para tipo de trabajo
+    "jurisdiccion": extract_jurisdiccion,
+    "juzgado_num": extract_juzgado_numero,
+    "juzgado_numero": extract_juzgado_numero,  # Alias
+    "demarcacion": extract_demarcacion,
+    "num_procedimiento": extract_num_procedimiento,
+    "partes": extract_partes,
+    "materia": extract_materia,
+    "materia_proc": extract_materia,
+    "proyecto_year": extract_year,
+    "proyecto_month": extract_month,
+    "proyecto_nombre": lambda x: extract_proyecto_info(x, "nombre"),
+    "proyecto_materia": lambda x: extract_proyecto_info(x, "materia"),
+}
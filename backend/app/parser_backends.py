@@ -0,0 +1,396 @@
+"""
+Document parser backends
+Async interface over the ways a document's text can be extracted (the
+remote Dolphin REST service, local Dolphin worker processes, PyMuPDF) and
+the policy that picks the backend for each preview
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.document_workers import (
+    TEXT_LAYER_MAX_IMAGE_COVERAGE,
+    TEXT_LAYER_MIN_CHARS,
+    classify_pages,
+    count_pages,
+    document_pool,
+    extract_pages,
+    extract_text,
+)
+from app.circuit_breaker import get_breaker
+from app.dolphin_parser import is_local_dolphin_configured, local_model_version
+from app.dolphin_rest_client import DolphinRestClient, DOLPHIN_API_TIMEOUT
+from app.dolphin_worker import get_dolphin_worker_pool
+
+logger = logging.getLogger(__name__)
+
+# Which backends to try, in order:
+#   auto    - Dolphin REST API, then local Dolphin, then PyMuPDF
+#   api     - Dolphin REST API, then PyMuPDF
+#   local   - local Dolphin, then PyMuPDF
+#   pymupdf - PyMuPDF only
+DOCUMENT_PARSER_POLICY = os.getenv("DOCUMENT_PARSER_POLICY", "auto")
+
+POLICIES = {
+    "auto": ["dolphin-api", "dolphin", "pymupdf"],
+    "api": ["dolphin-api", "pymupdf"],
+    "local": ["dolphin", "pymupdf"],
+    "pymupdf": ["pymupdf"],
+}
+
+# Seconds a health probe result is reused (healthy or not)
+PARSER_HEALTH_TTL = float(os.getenv("PARSER_HEALTH_TTL", "30"))
+
+# Extract born-digital PDF pages from their text layer and send only scanned
+# pages to Dolphin (see document_workers.classify_pages)
+TEXT_LAYER_FAST_PATH = os.getenv("TEXT_LAYER_FAST_PATH", "true").lower() == "true"
+
+# Confidence of text taken directly from a PDF text layer
+TEXT_LAYER_CONFIDENCE = 0.95
+
+
+class ParserBackend(ABC):
+    """
+    Base class for parser backends
+
+    Subclasses implement probe(), version() and parse(). Health is probed
+    lazily and cached for health_ttl seconds; a failed parse marks the
+    backend unhealthy until the next probe.
+    """
+
+    name = "base"
+
+    def __init__(self, health_ttl: float = PARSER_HEALTH_TTL, clock: Callable[[], float] = time.monotonic):
+        self.health_ttl = health_ttl
+        self.clock = clock
+        self._health: Optional[Dict] = None
+        self._checked_at: Optional[float] = None
+        self._probe_lock = asyncio.Lock()
+
+    @abstractmethod
+    async def probe(self) -> Dict:
+        """Check the backend; returns {"available": bool, "error": str or None, ...}"""
+
+    @abstractmethod
+    def version(self) -> str:
+        """Backend version (part of the extraction cache key)"""
+
+    @abstractmethod
+    async def parse(
+        self,
+        file_path: str,
+        max_chars: Optional[int] = None,
+        max_pages: Optional[int] = None
+    ) -> Tuple[Dict, float]:
+        """
+        Parse a document, or only its first pages if a budget is given
+
+        Args:
+            file_path: Path to document
+            max_chars: Stop once this many characters were extracted (best effort)
+            max_pages: Parse at most this many pages
+
+        Returns:
+            Tuple of (parsed_content, confidence) where parsed_content has
+            "text", "pages" (page count of the document), "pages_extracted",
+            "has_tables", "has_figures" and "elements"
+        """
+
+    async def is_available(self) -> bool:
+        """Cached health check"""
+        if self._checked_at is None or self.clock() - self._checked_at >= self.health_ttl:
+            async with self._probe_lock:
+                if self._checked_at is None or self.clock() - self._checked_at >= self.health_ttl:
+                    try:
+                        health = await self.probe()
+                    except Exception as e:
+                        health = {"available": False, "error": str(e)}
+                    self._health = health
+                    self._checked_at = self.clock()
+                    if not health["available"]:
+                        logger.info(f"Parser backend {self.name} unavailable: {health.get('error')}")
+        return self._health["available"]
+
+    def mark_unhealthy(self, error: Exception) -> None:
+        """Skip this backend until its health is probed again"""
+        self._health = {"available": False, "error": str(error)}
+        self._checked_at = self.clock()
+
+    def status(self) -> Dict:
+        """Last health probe result"""
+        health = self._health or {"available": None, "error": None}
+        return {
+            **health,
+            "checked_seconds_ago": round(self.clock() - self._checked_at, 1) if self._checked_at is not None else None,
+        }
+
+
+class RestDolphinBackend(ParserBackend):
+    """Remote Dolphin service (see app.dolphin_rest_client)"""
+
+    name = "dolphin-api"
+
+    def __init__(self, client: Optional[DolphinRestClient] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client or DolphinRestClient(timeout=DOLPHIN_API_TIMEOUT)
+
+    async def probe(self) -> Dict:
+        health = await self.client.check_health()
+        available = health.get("status", "healthy") == "healthy" and health.get("model_loaded", True)
+        return {
+            "available": bool(available),
+            "error": None if available else f"Service reports {health}",
+            "api_url": self.client.api_url,
+            "health": health,
+        }
+
+    async def is_available(self) -> bool:
+        # Skipped without probing while the Dolphin circuit is open
+        if not get_breaker("dolphin").available():
+            return False
+        return await super().is_available()
+
+    def version(self) -> str:
+        health = (self._health or {}).get("health") or {}
+        return os.getenv("DOLPHIN_API_MODEL_VERSION", str(health.get("model_version") or health.get("model") or "unknown"))
+
+    async def parse(self, file_path, max_chars=None, max_pages=None) -> Tuple[Dict, float]:
+        return await parse_first_pages(self.client.parse_document, file_path, max_pages)
+
+
+class LocalDolphinBackend(ParserBackend):
+    """Local Dolphin model in the inference worker processes (see app.dolphin_worker)"""
+
+    name = "dolphin"
+
+    async def probe(self) -> Dict:
+        if not is_local_dolphin_configured():
+            return {"available": False, "error": "Dolphin dependencies or config not installed"}
+        pool = get_dolphin_worker_pool().status()
+        if pool["startup_errors"] >= pool["workers"]:
+            return {"available": False, "error": "No Dolphin worker could start"}
+        return {"available": True, "error": None, "workers": pool}
+
+    def version(self) -> str:
+        return os.getenv("DOLPHIN_MODEL_VERSION", local_model_version())
+
+    async def parse(self, file_path, max_chars=None, max_pages=None) -> Tuple[Dict, float]:
+        return await parse_first_pages(get_dolphin_worker_pool().parse, file_path, max_pages)
+
+
+class PyMuPDFBackend(ParserBackend):
+    """Text layer extraction with PyMuPDF in the document worker pool"""
+
+    name = "pymupdf"
+
+    async def probe(self) -> Dict:
+        try:
+            import fitz  # noqa: F401 - PyMuPDF
+        except ImportError:
+            return {"available": False, "error": "PyMuPDF not installed"}
+        return {"available": True, "error": None}
+
+    def version(self) -> str:
+        try:
+            import fitz  # PyMuPDF
+            return fitz.VersionBind
+        except ImportError:
+            return "unavailable"
+
+    async def parse(self, file_path, max_chars=None, max_pages=None) -> Tuple[Dict, float]:
+        text, metadata = await document_pool.run(extract_text, file_path, max_chars, max_pages)
+        return {**metadata, "text": text, "elements": []}, 0.7  # Lower confidence than Dolphin
+
+
+class TextLayerFastPath(ParserBackend):
+    """
+    Wraps a Dolphin backend: PDF pages with a usable text layer are
+    extracted directly, only scanned pages go to the wrapped backend, and
+    both are merged back in page order
+    """
+
+    def __init__(self, inner: ParserBackend):
+        super().__init__(health_ttl=inner.health_ttl, clock=inner.clock)
+        self.inner = inner
+        self.name = inner.name
+        self.stats = {"documents": 0, "text_pages": 0, "scanned_pages": 0, "skipped_model": 0}
+
+    async def probe(self) -> Dict:
+        return await self.inner.probe()
+
+    async def is_available(self) -> bool:
+        return await self.inner.is_available()
+
+    def mark_unhealthy(self, error: Exception) -> None:
+        self.inner.mark_unhealthy(error)
+
+    def status(self) -> Dict:
+        return {**self.inner.status(), "text_layer_fast_path": dict(self.stats)}
+
+    def version(self) -> str:
+        # Results differ from the plain backend's, so they are cached apart
+        return f"{self.inner.version()}+textlayer1"
+
+    async def parse(self, file_path, max_chars=None, max_pages=None) -> Tuple[Dict, float]:
+        if not file_path.lower().endswith(".pdf"):
+            return await self.inner.parse(file_path)
+
+        classification = await document_pool.run(
+            classify_pages, file_path, TEXT_LAYER_MIN_CHARS, TEXT_LAYER_MAX_IMAGE_COVERAGE, max_chars, max_pages
+        )
+        pages, page_count = classification["pages"], classification["page_count"]
+        scanned = [page["page"] for page in pages if page["kind"] == "scanned"]
+        self.stats["documents"] += 1
+        self.stats["text_pages"] += len(pages) - len(scanned)
+        self.stats["scanned_pages"] += len(scanned)
+        logger.info(f"Text layer on {len(pages) - len(scanned)}/{len(pages)} examined pages "
+                    f"({page_count} total) of {os.path.basename(file_path)}")
+
+        if len(scanned) == page_count:
+            return await self.inner.parse(file_path)
+
+        scanned_content, scanned_confidence = {"elements": []}, 0.0
+        if scanned:
+            with tempfile.TemporaryDirectory(prefix="scanned-pages-") as tmp_dir:
+                subset = os.path.join(tmp_dir, "scanned.pdf")
+                await document_pool.run(extract_pages, file_path, subset, [number - 1 for number in scanned])
+                scanned_content, scanned_confidence = await self.inner.parse(subset)
+        else:
+            self.stats["skipped_model"] += 1
+
+        content, confidence = merge_page_results(pages, scanned, scanned_content, scanned_confidence)
+        content["pages"] = page_count
+        return content, confidence
+
+
+async def parse_first_pages(
+    parse: Callable,
+    file_path: str,
+    max_pages: Optional[int] = None
+) -> Tuple[Dict, float]:
+    """
+    Run a whole-document parse function on the first max_pages pages of a PDF
+
+    Args:
+        parse: Async function (path) -> (parsed_content, confidence)
+        file_path: Path to document (non-PDF documents are parsed whole)
+        max_pages: Page budget (None parses everything)
+
+    Returns:
+        Tuple of (parsed_content, confidence), with "pages" set to the
+        document's page count and "pages_extracted" to the pages parsed
+    """
+    if not max_pages or not file_path.lower().endswith(".pdf"):
+        return await parse(file_path)
+
+    page_count = await document_pool.run(count_pages, file_path)
+    if page_count <= max_pages:
+        return await parse(file_path)
+
+    with tempfile.TemporaryDirectory(prefix="first-pages-") as tmp_dir:
+        subset = os.path.join(tmp_dir, "first_pages.pdf")
+        await document_pool.run(extract_pages, file_path, subset, list(range(max_pages)))
+        content, confidence = await parse(subset)
+    return {**content, "pages": page_count, "pages_extracted": max_pages}, confidence
+
+
+def merge_page_results(
+    pages: List[Dict],
+    scanned: List[int],
+    scanned_content: Dict,
+    scanned_confidence: float
+) -> Tuple[Dict, float]:
+    """
+    Merge text-layer pages with the parse of the scanned pages
+
+    Args:
+        pages: Examined pages, as listed by classify_pages
+        scanned: 1-based numbers of the scanned pages, in the order they were parsed
+        scanned_content: Parsed content of the scanned-pages PDF
+        scanned_confidence: Confidence of that parse
+
+    Returns:
+        Tuple of (parsed_content, confidence) for the examined pages
+    """
+    elements = []
+    for page in pages:
+        if page["kind"] == "text":
+            elements.append({
+                "label": "para",
+                "text": page["text"].strip(),
+                "page": page["page"],
+                "reading_order": 0,
+                "source": "text-layer",
+            })
+    for element in scanned_content.get("elements", []):
+        # Page numbers in the subset PDF -> page numbers in the original
+        subset_page = element.get("page", 1)
+        elements.append({**element, "page": scanned[subset_page - 1]})
+
+    elements.sort(key=lambda e: (e["page"], e.get("reading_order", 0)))
+    text = "\n\n".join(e["text"] for e in elements if e.get("text") and e["text"] != "[Figure]")
+
+    text_pages = len(pages) - len(scanned)
+    confidence = (TEXT_LAYER_CONFIDENCE * text_pages + scanned_confidence * len(scanned)) / len(pages)
+
+    content = {
+        "text": text,
+        "elements": elements,
+        "pages": len(pages),
+        "pages_extracted": len(pages),
+        "has_tables": scanned_content.get("has_tables", False),
+        "has_figures": scanned_content.get("has_figures", False),
+    }
+    return content, confidence
+
+
+def default_backends() -> Dict[str, ParserBackend]:
+    """One instance of every backend, by name"""
+    dolphin_backends = [RestDolphinBackend(), LocalDolphinBackend()]
+    if TEXT_LAYER_FAST_PATH:
+        dolphin_backends = [TextLayerFastPath(backend) for backend in dolphin_backends]
+    backends = dolphin_backends + [PyMuPDFBackend()]
+    return {backend.name: backend for backend in backends}
+
+
+class ParserSelector:
+    """Picks backends for a parse according to a policy"""
+
+    def __init__(self, backends: Dict[str, ParserBackend], policy: str = DOCUMENT_PARSER_POLICY):
+        if policy not in POLICIES:
+            logger.warning(f"Unknown DOCUMENT_PARSER_POLICY '{policy}', using 'auto'")
+            policy = "auto"
+        self.backends = backends
+        self.policy = policy
+        self.last_selected: Optional[str] = None
+
+    async def candidates(self) -> List[ParserBackend]:
+        """Healthy backends in policy order (the first one is the selected backend)"""
+        available = []
+        for name in POLICIES[self.policy]:
+            backend = self.backends.get(name)
+            if backend is not None and await backend.is_available():
+                available.append(backend)
+        return available
+
+    async def select(self) -> Optional[ParserBackend]:
+        """The backend new documents will be parsed with, or None"""
+        candidates = await self.candidates()
+        return candidates[0] if candidates else None
+
+    async def status(self) -> Dict:
+        """Policy, selected backend and health of every backend in the policy"""
+        selected = await self.select()
+        return {
+            "policy": self.policy,
+            "selected": selected.name if selected else None,
+            "last_used": self.last_selected,
+            "backends": {
+                name: self.backends[name].status()
+                for name in POLICIES[self.policy] if name in self.backends
+            },
+        }
@@ -3,7 +3,27 @@ Question flow logic for document organization
 Sistema de organización de documentos para URSALL Legal
 Maneja múltiples categorías: Legal (Procedimientos y Proyectos) y Seguros
 """
-from typing import Dict, Optional, List, Any
+import asyncio
+import logging
+import os
+import re
+from typing import Dict, Optional, List, Any, Tuple
+
+from app.document_fields import DEMARCACIONES
+from app.nlp_extractor_legal import extract_information_legal
+
+logger = logging.getLogger(__name__)
+
+# Sugerencias de la previsualización con al menos esta confianza se dan por
+# respondidas al iniciar el flujo (si el usuario confirmó el documento)
+PREFILL_MIN_CONFIDENCE = float(os.getenv("PREFILL_MIN_CONFIDENCE", "0.8"))
+
+# Valores ya canónicos (salen del gazetteer del extractor de documentos): se
+# validan tal cual, el extractor legal los estropearía ("Santa Cruz de La
+# Palma" -> "LaPalma")
+CANONICAL_ANSWERS = {
+    "demarcacion": frozenset(DEMARCACIONES.values()),
+}
 
 
 # Definición de flujos de preguntas para URSALL
@@ -428,3 +448,198 @@ def validate_ursall_answers(answers: Dict[str, str]) -> Dict[str, any]:
         "missing": missing,
         "tipo_trabajo": tipo_trabajo
     }
+
+
+def get_next_unanswered_question_ursall(current_question_id: Optional[str], answers: Dict[str, Any]) -> Optional[Dict]:
+    """
+    Siguiente pregunta del flujo que aún no tiene respuesta
+
+    Las preguntas ya respondidas (p. ej. prellenadas desde la previsualización)
+    se saltan siguiendo la misma navegación que get_next_question_ursall.
+
+    Args:
+        current_question_id: Pregunta actual, o None para empezar por la primera
+        answers: Respuestas de la sesión
+
+    Returns:
+        Siguiente pregunta sin responder o None si se completó el flujo
+    """
+    question = get_first_question_ursall() if current_question_id is None \
+        else get_next_question_ursall(current_question_id, answers)
+    while question is not None and answers.get(question["question_id"]):
+        question = get_next_question_ursall(question["question_id"], answers)
+    return question
+
+
+def reachable_questions_ursall(answers: Dict[str, Any]) -> List[str]:
+    """
+    Preguntas del flujo alcanzables con las respuestas dadas
+
+    Recorre el flujo desde la primera pregunta con get_next_question_ursall y
+    se detiene en la bifurcación (categoría, tipo de trabajo) cuya respuesta
+    aún no se conoce; esa pregunta sí se incluye.
+
+    Args:
+        answers: Respuestas conocidas hasta ahora
+
+    Returns:
+        IDs de las preguntas alcanzables, en el orden del flujo
+    """
+    reachable = []
+    question = get_first_question_ursall()
+    while question is not None:
+        reachable.append(question["question_id"])
+        question = get_next_question_ursall(question["question_id"], answers)
+    return reachable
+
+
+def candidate_questions_ursall(answers: Dict[str, Any]) -> List[str]:
+    """
+    Preguntas que pueden llegar a ser alcanzables con las respuestas dadas
+
+    Como reachable_questions_ursall, pero en una bifurcación cuya respuesta
+    aún no se conoce sigue todas sus ramas en lugar de detenerse.
+
+    Args:
+        answers: Respuestas conocidas hasta ahora
+
+    Returns:
+        IDs de las preguntas candidatas, rama por rama en el orden del flujo
+    """
+    candidates = []
+    pending = [get_first_question_ursall()["question_id"]]
+    while pending:
+        question_id = pending.pop(0)
+        if question_id in candidates:
+            continue
+        candidates.append(question_id)
+
+        question = QUESTIONS_URSALL[question_id]
+        branches = []
+        for condition_key, condition_values in question.get("next_conditional", {}).items():
+            condition_answer = str(answers.get(condition_key, "")).lower().strip()
+            if condition_answer in condition_values:
+                branches = [condition_values[condition_answer]]
+                break
+            if not condition_answer:
+                branches.extend(condition_values.values())
+        else:
+            if question.get("next"):
+                branches.append(question["next"])
+        pending[:0] = branches
+    return candidates
+
+
+def validate_answer_ursall(question_id: str, value: Any) -> bool:
+    """Comprobar una respuesta ya extraída contra la validación declarada de la pregunta"""
+    question = QUESTIONS_URSALL.get(question_id)
+    if question is None or not value:
+        return False
+    if isinstance(value, dict):
+        # "partes": el extractor devuelve {"parte_a", "parte_b"}
+        return all(value.values())
+
+    value = str(value).strip()
+    validation = question.get("validation", {})
+    if validation.get("type") == "choice" and value.lower() not in validation["choices"]:
+        return False
+    if validation.get("type") == "number" and not value.isdigit():
+        return False
+    if "pattern" in validation and not re.match(validation["pattern"], value):
+        return False
+    if validation.get("format") == "date" and not re.match(r'^\d{4}-\d{2}-\d{2}$', value):
+        return False
+    return len(value) >= validation.get("min_length", 1)
+
+
+def prefill_answers_ursall(
+    suggestions: Dict[str, str],
+    confidences: Dict[str, float],
+    min_confidence: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Respuestas de la sesión a partir de las sugerencias de la previsualización
+
+    Cada sugerencia con confianza suficiente pasa una sola vez por el mismo
+    extractor y la misma validación que una respuesta escrita por el usuario;
+    las que no superan la validación se preguntan normalmente.
+
+    Args:
+        suggestions: {question_id: valor sugerido}
+        confidences: {question_id: confianza 0.0-1.0}
+        min_confidence: Umbral (por defecto PREFILL_MIN_CONFIDENCE)
+
+    Returns:
+        {question_id: respuesta extraída}, más parte_a/parte_b si se prellenó "partes"
+    """
+    if min_confidence is None:
+        min_confidence = PREFILL_MIN_CONFIDENCE
+
+    answers = {}
+    for question_id, value in suggestions.items():
+        if question_id not in QUESTIONS_URSALL or not value:
+            continue
+        if confidences.get(question_id, 0.0) < min_confidence:
+            continue
+        extracted = resolve_answer_ursall(question_id, value)
+        if extracted is None:
+            logger.info(f"Prellenado de {question_id} descartado: {value!r} no es válido")
+            continue
+        answers.update(_with_partes(question_id, extracted))
+
+    return answers
+
+
+def resolve_answer_ursall(question_id: str, value: Any) -> Any:
+    """
+    Pasar un valor por el extractor legal y la validación de su pregunta
+
+    Los valores canónicos (CANONICAL_ANSWERS) solo se validan.
+
+    Returns:
+        Respuesta extraída (dict para "partes"), o None si no es válida
+    """
+    if value in CANONICAL_ANSWERS.get(question_id, ()):
+        return value if validate_answer_ursall(question_id, value) else None
+    try:
+        extracted = extract_information_legal(question_id, str(value))
+    except Exception as e:
+        logger.warning(f"Extracción de {question_id} falló: {e}")
+        return None
+    if not validate_answer_ursall(question_id, extracted):
+        return None
+    return extracted
+
+
+async def resolve_answers_ursall(values: Dict[str, str]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Extraer y validar varias respuestas a la vez (respuesta en bloque)
+
+    Cada campo pasa por resolve_answer_ursall en paralelo, fuera del event loop.
+
+    Args:
+        values: {question_id: valor en bruto}
+
+    Returns:
+        (respuestas válidas más parte_a/parte_b, {question_id: valor rechazado})
+    """
+    values = {question_id: value for question_id, value in values.items() if question_id in QUESTIONS_URSALL}
+    results = await asyncio.gather(*(
+        asyncio.to_thread(resolve_answer_ursall, question_id, value)
+        for question_id, value in values.items()
+    ))
+
+    answers, rejected = {}, {}
+    for (question_id, value), extracted in zip(values.items(), results):
+        if extracted is None:
+            rejected[question_id] = value
+        else:
+            answers.update(_with_partes(question_id, extracted))
+    return answers, rejected
+
+
+def _with_partes(question_id: str, extracted: Any) -> Dict[str, Any]:
+    """{question_id: respuesta}, más parte_a/parte_b si la pregunta es partes"""
+    if question_id != "partes":
+        return {question_id: extracted}
+    return {"partes": extracted, "parte_a": extracted["parte_a"], "parte_b": extracted["parte_b"]}
@@ -0,0 +1,294 @@
+"""
+Client-side rate limiting for upstream APIs
+One token bucket per upstream and account (Dropbox access token, Gemini API
+key) spaces requests out and queues them in arrival order. A 429 response
+pauses the account's bucket for the Retry-After the upstream asks for and
+the request is retried; idempotent requests are also retried on timeouts
+and 5xx responses, with jittered exponential backoff.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import re
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _bucket_config(name: str, rate: float, burst: int) -> Dict:
+    """
+    Rate limit for an upstream, overridable with environment variables
+
+    For upstream "gemini" the variables are GEMINI_RATE_PER_SECOND and
+    GEMINI_RATE_BURST.
+    """
+    prefix = name.upper()
+    return {
+        "rate": float(os.getenv(f"{prefix}_RATE_PER_SECOND", str(rate))),
+        "burst": int(os.getenv(f"{prefix}_RATE_BURST", str(burst))),
+    }
+
+
+# Requests per second and burst size, per account
+RATE_LIMITS: Dict[str, Dict] = {
+    "dropbox_api": _bucket_config("dropbox_api", rate=10.0, burst=20),
+    "dropbox_content": _bucket_config("dropbox_content", rate=4.0, burst=8),
+    "gemini": _bucket_config("gemini", rate=0.25, burst=15),  # Free tier: 15 requests/minute
+}
+
+# Gemini callers have a fallback: they give up instead of queueing longer than this
+GEMINI_MAX_QUEUE_WAIT = float(os.getenv("GEMINI_MAX_QUEUE_WAIT", "5"))
+
+# Retries after a 429 (and, for idempotent requests, timeouts and 5xx)
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))
+RATE_LIMIT_BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", "0.5"))
+
+# Idle buckets are dropped once there are more than this many
+MAX_BUCKETS = 1000
+
+GEMINI_RETRY_DELAY_RE = re.compile(r'^(\d+(?:\.\d+)?)s$')
+
+
+class RateLimitExceeded(Exception):
+    """Raised instead of queueing when the expected wait exceeds the caller's max_wait"""
+
+
+class TokenBucket:
+    """
+    Token bucket with a FIFO queue
+
+    Waiters take turns on an asyncio.Lock (which wakes them in arrival
+    order), so a burst from one caller cannot starve requests queued
+    before it.
+
+    Args:
+        rate: Tokens added per second
+        burst: Bucket capacity
+        clock: Monotonic clock (injectable for tests)
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.waiting = 0
+        self._lock = asyncio.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0, "rejected": 0, "waited_seconds": 0.0}
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds a request arriving now is expected to wait in the queue"""
+        self._refill()
+        paused = max(0.0, self.paused_until - self.clock())
+        deficit = self.waiting + 1 - self.tokens
+        return paused + max(0.0, deficit / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request of this bucket for seconds (Retry-After)"""
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    async def acquire(self, max_wait: Optional[float] = None) -> None:
+        """
+        Wait for a token
+
+        Raises:
+            RateLimitExceeded: If the expected wait is longer than max_wait
+        """
+        if max_wait is not None and self.wait_time() > max_wait:
+            self.stats["rejected"] += 1
+            raise RateLimitExceeded(f"Expected queue wait {self.wait_time():.1f}s exceeds {max_wait:.1f}s")
+
+        start = self.clock()
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    self._refill()
+                    delay = self.paused_until - self.clock()
+                    if delay <= 0:
+                        if self.tokens >= 1:
+                            self.tokens -= 1
+                            break
+                        delay = (1 - self.tokens) / self.rate
+                    await asyncio.sleep(delay)
+        finally:
+            self.waiting -= 1
+        self.stats["requests"] += 1
+        self.stats["waited_seconds"] += self.clock() - start
+
+    def status(self) -> Dict:
+        """Queue length, expected wait and counters"""
+        return {
+            "waiting": self.waiting,
+            "queue_wait_seconds": round(self.wait_time(), 2),
+            **self.stats,
+            "waited_seconds": round(self.stats["waited_seconds"], 2),
+        }
+
+
+_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+
+def account_key(secret: str) -> str:
+    """Account identifier derived from an access token or API key (never the secret itself)"""
+    return hashlib.sha256((secret or "").encode()).hexdigest()[:12]
+
+
+def get_bucket(upstream: str, account: str) -> TokenBucket:
+    """
+    Get the bucket of an upstream account (created on first use)
+
+    Args:
+        upstream: Upstream name ("dropbox_api", "dropbox_content", "gemini")
+        account: Access token or API key of the account
+
+    Raises:
+        KeyError: If the upstream has no rate limit configured
+    """
+    key = (upstream, account_key(account))
+    bucket = _buckets.get(key)
+    if bucket is None:
+        if len(_buckets) >= MAX_BUCKETS:
+            _drop_idle_buckets()
+        config = RATE_LIMITS[upstream]
+        bucket = TokenBucket(config["rate"], config["burst"])
+        _buckets[key] = bucket
+    return bucket
+
+
+def _drop_idle_buckets() -> None:
+    """Forget buckets with no queued request and a full bucket"""
+    for key, bucket in list(_buckets.items()):
+        if bucket.waiting == 0 and bucket.wait_time() == 0 and bucket.tokens >= bucket.burst:
+            del _buckets[key]
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Seconds the upstream asks to wait before retrying, if it says
+
+    Reads the Retry-After header, Dropbox's error.retry_after and Gemini's
+    RetryInfo retryDelay ("30s").
+    """
+    header = response.headers.get("Retry-After")
+    if header is not None:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            pass
+
+    try:
+        error = response.json().get("error", {})
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(error, dict):
+        return None
+    if isinstance(error.get("retry_after"), (int, float)):
+        return float(error["retry_after"])
+    for detail in error.get("details", []):
+        match = GEMINI_RETRY_DELAY_RE.match(str(detail.get("retryDelay", "")))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def backoff_delay(base: float, attempt: int) -> float:
+    """Exponential backoff with jitter (between half and all of base * 2^attempt)"""
+    return base * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+async def limited_request(
+    upstream: str,
+    account: str,
+    send: Callable[[], Awaitable[httpx.Response]],
+    idempotent: bool = True,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+    max_wait: Optional[float] = None
+) -> httpx.Response:
+    """
+    Send a request through the account's rate limiter
+
+    A 429 pauses the account's bucket for Retry-After (or the backoff) and
+    is always retried, since the upstream did not process the request.
+    Timeouts, connection errors and 5xx are retried only if idempotent.
+
+    Args:
+        upstream: Upstream name (see RATE_LIMITS)
+        account: Access token or API key the request is made with
+        send: Coroutine factory sending the request once
+        idempotent: Whether the request may be repeated after an unknown outcome
+        retries: Retries (defaults to RATE_LIMIT_RETRIES)
+        backoff: Base backoff in seconds (defaults to RATE_LIMIT_BACKOFF)
+        max_wait: Fail with RateLimitExceeded instead of queueing longer than
+            this, and stop retrying once this many seconds have passed since
+            the first attempt (for callers that have a fallback)
+
+    Returns:
+        The last response (a 429 or 5xx once retries are exhausted)
+
+    Raises:
+        RateLimitExceeded: If the wait would exceed max_wait
+        httpx.TimeoutException, httpx.TransportError: Once retries are exhausted
+    """
+    if retries is None:
+        retries = RATE_LIMIT_RETRIES
+    if backoff is None:
+        backoff = RATE_LIMIT_BACKOFF
+    bucket = get_bucket(upstream, account)
+    started = bucket.clock()
+
+    def out_of_time(delay: float) -> bool:
+        return max_wait is not None and bucket.clock() - started + delay > max_wait
+
+    for attempt in range(retries + 1):
+        await bucket.acquire(None if max_wait is None else max(0.0, max_wait - (bucket.clock() - started)))
+        throttled = False
+        try:
+            response = await send()
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            failure, delay = str(e) or e.__class__.__name__, backoff_delay(backoff, attempt)
+            if not idempotent or attempt == retries or out_of_time(delay):
+                raise
+        else:
+            if response.status_code == 429:
+                throttled = True
+                bucket.stats["throttled"] += 1
+                delay = retry_after(response)
+                if delay is None:
+                    delay = backoff_delay(backoff, attempt)
+                # Every request of this account waits, not just the retry
+                bucket.pause(delay)
+            elif response.status_code >= 500 and idempotent:
+                delay = backoff_delay(backoff, attempt)
+            else:
+                return response
+            if attempt == retries or out_of_time(delay):
+                return response
+            failure = f"HTTP {response.status_code}"
+
+        bucket.stats["retries"] += 1
+        logger.warning(f"{upstream} request failed ({failure}), retry {attempt + 1}/{retries} in {delay:.1f}s")
+        # After a 429 the bucket pause already holds the retry back
+        if not throttled:
+            await asyncio.sleep(delay)
+
+
+def limiter_status() -> Dict:
+    """Queue state of every bucket, by upstream and account"""
+    status: Dict[str, Dict] = {}
+    for (upstream, account), bucket in _buckets.items():
+        status.setdefault(upstream, {})[account] = bucket.status()
+    return status
@@ -0,0 +1,351 @@
+"""
+Question-flow session store
+Pluggable storage for URSALL question sessions (answers per file_id) so
+sessions survive restarts and can be shared by several uvicorn workers
+
+Async handlers use the a*-methods (aget, aput, ...), which run the SQLite
+and Redis backends' blocking I/O in a worker thread.
+
+Backends (selected with SESSION_STORE):
+- "memory": in-process LRU with TTL (single worker, default)
+- "sqlite": SQLite database in WAL mode (several workers on one host)
+- "redis": Redis server (several hosts, needs the optional "redis" package)
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(24 * 3600)))  # seconds since last write
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))  # memory backend only
+SESSION_DB_PATH = Path(os.getenv(
+    "SESSION_DB_PATH",
+    str(Path(os.path.expanduser("~")) / ".dropbox_chatbot_sessions.db")
+))
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "300"))
+
+
+def _apply_changes(session: Dict, changes: Dict) -> Dict:
+    """
+    Merge changes into a session
+
+    Dict values are merged into an existing dict field (e.g. one new entry
+    in "answers"); any other value replaces the field.
+    """
+    for field, value in changes.items():
+        if isinstance(value, dict) and isinstance(session.get(field), dict):
+            session[field].update(value)
+        else:
+            session[field] = value
+    return session
+
+
+class SessionStore(ABC):
+    """Interface shared by all session store backends"""
+
+    @abstractmethod
+    def get(self, file_id: str) -> Optional[Dict]:
+        """Return a copy of the session, or None if missing or expired"""
+
+    @abstractmethod
+    def put(self, file_id: str, session: Dict) -> None:
+        """Create or replace a session"""
+
+    @abstractmethod
+    def update(self, file_id: str, changes: Dict) -> Optional[Dict]:
+        """
+        Atomically merge changes into a session
+
+        Args:
+            file_id: Session key
+            changes: Fields to change, e.g.
+                {"answers": {"client": "X"}, "extracted_answers": {"client": "X"}}
+
+        Returns:
+            The updated session, or None if it does not exist
+        """
+
+    @abstractmethod
+    def delete(self, file_id: str) -> bool:
+        """Remove a session (no error if missing) and return whether it existed"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Remove expired sessions and return how many were removed"""
+
+    def __contains__(self, file_id: str) -> bool:
+        return self.get(file_id) is not None
+
+    async def _run(self, method: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking store call off the event loop"""
+        return await asyncio.to_thread(method, *args)
+
+    async def aget(self, file_id: str) -> Optional[Dict]:
+        return await self._run(self.get, file_id)
+
+    async def aput(self, file_id: str, session: Dict) -> None:
+        await self._run(self.put, file_id, session)
+
+    async def aupdate(self, file_id: str, changes: Dict) -> Optional[Dict]:
+        return await self._run(self.update, file_id, changes)
+
+    async def adelete(self, file_id: str) -> bool:
+        return await self._run(self.delete, file_id)
+
+    async def acontains(self, file_id: str) -> bool:
+        return await self._run(self.__contains__, file_id)
+
+    async def asweep(self) -> int:
+        return await self._run(self.sweep)
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store with TTL and least-recently-used eviction"""
+
+    def __init__(
+        self,
+        ttl: float = SESSION_TTL,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        clock: Callable[[], float] = time.time
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def _run(self, method: Callable[..., Any], *args: Any) -> Any:
+        # In-process dict operations: not worth a thread hop
+        return method(*args)
+
+    def _live(self, file_id: str) -> Optional[Dict]:
+        entry = self._sessions.get(file_id)
+        if entry is None:
+            return None
+        session, expires_at = entry
+        if expires_at <= self.clock():
+            del self._sessions[file_id]
+            return None
+        self._sessions.move_to_end(file_id)
+        return session
+
+    def _store(self, file_id: str, session: Dict) -> None:
+        self._sessions[file_id] = (session, self.clock() + self.ttl)
+        self._sessions.move_to_end(file_id)
+        while len(self._sessions) > self.max_entries:
+            evicted, _ = self._sessions.popitem(last=False)
+            logger.info(f"Session evicted (LRU): {evicted}")
+
+    def get(self, file_id: str) -> Optional[Dict]:
+        with self._lock:
+            session = self._live(file_id)
+            return json.loads(json.dumps(session)) if session is not None else None
+
+    def put(self, file_id: str, session: Dict) -> None:
+        with self._lock:
+            self._store(file_id, json.loads(json.dumps(session)))
+
+    def update(self, file_id: str, changes: Dict) -> Optional[Dict]:
+        with self._lock:
+            session = self._live(file_id)
+            if session is None:
+                return None
+            _apply_changes(session, json.loads(json.dumps(changes)))
+            self._store(file_id, session)
+            return json.loads(json.dumps(session))
+
+    def delete(self, file_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(file_id, None) is not None
+
+    def sweep(self) -> int:
+        with self._lock:
+            now = self.clock()
+            expired = [k for k, (_, expires_at) in self._sessions.items() if expires_at <= now]
+            for file_id in expired:
+                del self._sessions[file_id]
+            return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite-backed store shared by all workers on the same host
+
+    The database runs in WAL mode so readers do not block the writer;
+    updates are read-modify-write inside BEGIN IMMEDIATE transactions,
+    which makes them atomic across processes.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = SESSION_DB_PATH,
+        ttl: float = SESSION_TTL,
+        clock: Callable[[], float] = time.time
+    ):
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " file_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+        logger.info(f"SQLite session store at {self.db_path}")
+
+    def get(self, file_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE file_id = ? AND expires_at > ?",
+                (file_id, self.clock())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, file_id: str, session: Dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (file_id, data, expires_at) VALUES (?, ?, ?)",
+                (file_id, json.dumps(session), self.clock() + self.ttl)
+            )
+
+    def update(self, file_id: str, changes: Dict) -> Optional[Dict]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = self.clock()
+                row = self._conn.execute(
+                    "SELECT data FROM sessions WHERE file_id = ? AND expires_at > ?",
+                    (file_id, now)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                session = _apply_changes(json.loads(row[0]), changes)
+                self._conn.execute(
+                    "UPDATE sessions SET data = ?, expires_at = ? WHERE file_id = ?",
+                    (json.dumps(session), now + self.ttl, file_id)
+                )
+                self._conn.execute("COMMIT")
+                return session
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, file_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE file_id = ?", (file_id,))
+            return cursor.rowcount > 0
+
+    def sweep(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (self.clock(),))
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Redis-backed store shared by workers on any host
+
+    Expiry uses Redis key TTLs (so sweep() has nothing to do); updates use
+    WATCH/MULTI optimistic transactions.
+    """
+
+    def __init__(self, url: str = SESSION_REDIS_URL, ttl: float = SESSION_TTL, prefix: str = "ursall_session:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SESSION_STORE=redis requires the 'redis' package (pip install redis)")
+
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        logger.info(f"Redis session store at {url}")
+
+    def _key(self, file_id: str) -> str:
+        return f"{self.prefix}{file_id}"
+
+    def get(self, file_id: str) -> Optional[Dict]:
+        data = self._redis.get(self._key(file_id))
+        return json.loads(data) if data else None
+
+    def put(self, file_id: str, session: Dict) -> None:
+        self._redis.set(self._key(file_id), json.dumps(session), ex=self.ttl)
+
+    def update(self, file_id: str, changes: Dict) -> Optional[Dict]:
+        key = self._key(file_id)
+        result = {}
+
+        def apply(pipe):
+            data = pipe.get(key)
+            if not data:
+                result["session"] = None
+                return
+            session = _apply_changes(json.loads(data), changes)
+            pipe.multi()
+            pipe.set(key, json.dumps(session), ex=self.ttl)
+            result["session"] = session
+
+        self._redis.transaction(apply, key)
+        return result.get("session")
+
+    def delete(self, file_id: str) -> bool:
+        return self._redis.delete(self._key(file_id)) > 0
+
+    def sweep(self) -> int:
+        return 0
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    """
+    Create a session store for the configured backend
+
+    Args:
+        backend: "memory", "sqlite" or "redis" (default: SESSION_STORE env var)
+
+    Returns:
+        SessionStore instance
+    """
+    backend = (backend or SESSION_STORE_BACKEND).lower()
+
+    if backend == "sqlite":
+        return SQLiteSessionStore(SESSION_DB_PATH)
+    if backend == "redis":
+        return RedisSessionStore(SESSION_REDIS_URL)
+    if backend != "memory":
+        logger.warning(f"Unknown SESSION_STORE '{backend}', using memory")
+    return MemorySessionStore()
+
+
+async def sweep_sessions_periodically(store: SessionStore, interval: float = SESSION_SWEEP_INTERVAL) -> None:
+    """Background task: remove expired sessions every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await store.asweep()
+            if removed:
+                logger.info(f"Session sweeper removed {removed} expired sessions")
+        except Exception as e:
+            logger.warning(f"Session sweep failed: {e}")
@@ -0,0 +1,167 @@
+"""
+Temp storage janitor
+Periodically removes abandoned uploads (and their thumbnails and question
+sessions) from TEMP_STORAGE_PATH: files older than a TTL, and the oldest
+files whenever the directory exceeds its byte quota
+"""
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from app.session_store import SessionStore
+from app.temp_storage import TempFileIndex
+
+logger = logging.getLogger(__name__)
+
+# Uploads not finished within this many seconds are removed (default 24h)
+TEMP_FILE_TTL = float(os.getenv("TEMP_FILE_TTL", str(24 * 3600)))
+
+# Max total bytes kept in temp storage; oldest uploads are evicted beyond it (default 2GB)
+TEMP_STORAGE_MAX_BYTES = int(os.getenv("TEMP_STORAGE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Seconds between janitor runs
+TEMP_JANITOR_INTERVAL = float(os.getenv("TEMP_JANITOR_INTERVAL", "600"))
+
+
+def _file_size(path: str) -> int:
+    try:
+        return Path(path).stat().st_size
+    except OSError:
+        return 0
+
+
+class TempJanitor:
+    """
+    Cleans temp storage according to TTL and quota
+
+    Metrics (cumulative since startup) are available in `metrics`:
+    {
+        "runs": int,
+        "files_evicted": int,  # Uploads removed (expired + quota)
+        "expired": int,
+        "quota_evictions": int,
+        "orphans_removed": int,  # Unindexed or partial files removed
+        "bytes_reclaimed": int,
+        "sessions_removed": int,
+        "temp_files": int,  # Uploads kept after the last run
+        "temp_bytes": int,  # Bytes kept after the last run
+        "last_run_at": Optional[float]
+    }
+    """
+
+    def __init__(
+        self,
+        index: TempFileIndex,
+        sessions: Optional[SessionStore] = None,
+        ttl: float = TEMP_FILE_TTL,
+        max_bytes: int = TEMP_STORAGE_MAX_BYTES,
+        clock: Callable[[], float] = time.time
+    ):
+        self.index = index
+        self.sessions = sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.metrics: Dict = {
+            "runs": 0,
+            "files_evicted": 0,
+            "expired": 0,
+            "quota_evictions": 0,
+            "orphans_removed": 0,
+            "bytes_reclaimed": 0,
+            "sessions_removed": 0,
+            "temp_files": 0,
+            "temp_bytes": 0,
+            "last_run_at": None,
+        }
+
+    def _evict(self, file_id: str) -> bool:
+        """Remove an upload and its session, unless a request is using it"""
+        freed = self.index.evict(file_id)
+        if freed is None:
+            logger.info(f"Janitor kept {file_id}: in use by a request")
+            return False
+        self.metrics["bytes_reclaimed"] += freed
+        self.metrics["files_evicted"] += 1
+        if self.sessions is not None and self.sessions.delete(file_id):
+            self.metrics["sessions_removed"] += 1
+        return True
+
+    def _remove_orphans(self, indexed: set, cutoff: float) -> None:
+        """Remove expired files the index does not know about (crashed uploads, old layouts)"""
+        for path in self.index.root.iterdir():
+            if not path.is_file():
+                continue
+            file_id = path.name.lstrip(".").split("_", 1)[0]
+            if file_id in indexed:
+                continue
+            try:
+                stat = path.stat()
+                if stat.st_mtime >= cutoff:
+                    continue
+                path.unlink()
+            except OSError:
+                continue
+            self.metrics["orphans_removed"] += 1
+            self.metrics["bytes_reclaimed"] += stat.st_size
+            logger.info(f"Janitor removed orphan temp file: {path.name}")
+
+    def run_once(self) -> Dict:
+        """
+        Run one cleanup pass
+
+        Returns:
+            Dict with this run's counts: {"expired", "quota_evictions", "orphans_removed", "bytes_reclaimed"}
+        """
+        before = dict(self.metrics)
+        now = self.clock()
+        cutoff = now - self.ttl
+
+        entries = sorted(self.index.entries(), key=lambda e: e["created_at"])
+
+        kept = []
+        for entry in entries:
+            if entry["created_at"] < cutoff and self._evict(entry["file_id"]):
+                self.metrics["expired"] += 1
+            else:
+                kept.append(entry)
+
+        self._remove_orphans({entry["file_id"] for entry in entries}, cutoff)
+
+        sizes = {
+            entry["file_id"]: sum(_file_size(p) for p in [entry["path"]] + entry.get("derived", []))
+            for entry in kept
+        }
+        total = sum(sizes.values())
+        for oldest in list(kept):
+            if total <= self.max_bytes:
+                break
+            if self._evict(oldest["file_id"]):
+                kept.remove(oldest)
+                total -= sizes[oldest["file_id"]]
+                self.metrics["quota_evictions"] += 1
+
+        self.metrics["runs"] += 1
+        self.metrics["temp_files"] = len(kept)
+        self.metrics["temp_bytes"] = total
+        self.metrics["last_run_at"] = now
+
+        run = {key: self.metrics[key] - before[key] for key in ("expired", "quota_evictions", "orphans_removed", "bytes_reclaimed")}
+        if any(run.values()):
+            logger.info(
+                f"Janitor: {run['expired']} expired, {run['quota_evictions']} evicted for quota, "
+                f"{run['orphans_removed']} orphans, {run['bytes_reclaimed']} bytes reclaimed"
+            )
+        return run
+
+    async def run_periodically(self, interval: float = TEMP_JANITOR_INTERVAL) -> None:
+        """Background task: run a cleanup pass every `interval` seconds (first one at startup)"""
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.warning(f"Temp janitor run failed: {e}")
+            await asyncio.sleep(interval)
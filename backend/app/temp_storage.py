@@ -0,0 +1,330 @@
+"""
+Temporary storage helpers
+Streams uploaded files to TEMP_STORAGE_PATH in fixed-size chunks so memory
+usage per upload is bounded by the chunk size instead of the file size, and
+indexes them by file_id so lookups never scan the directory
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from fastapi import UploadFile
+
+from app.validators import MAX_FILE_SIZE, FileValidationError
+
+logger = logging.getLogger(__name__)
+
+# Size of each read/write when streaming an upload to disk (default 1MB)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+async def save_upload_stream(
+    upload: UploadFile,
+    destination: Path,
+    max_size: int = MAX_FILE_SIZE,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Tuple[int, str]:
+    """
+    Stream an uploaded file to disk chunk by chunk
+
+    The file is written to a hidden ".part" sibling and only renamed to
+    `destination` once it has been fully received, so lookups by file_id
+    never see a partial upload.
+
+    Args:
+        upload: FastAPI UploadFile to read from
+        destination: Final path of the stored file
+        max_size: Maximum allowed size in bytes
+        chunk_size: Bytes read and written per iteration
+
+    Returns:
+        Tuple of (size_in_bytes, sha256_hexdigest)
+
+    Raises:
+        FileValidationError: If the upload exceeds max_size (status 413).
+            Reading stops at the first chunk that crosses the limit.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    partial_path = destination.with_name(f".{destination.name}.part")
+
+    try:
+        # Disk writes and hashing run in a thread so concurrent uploads do
+        # not stall the event loop; unbuffered, so close() has nothing to flush
+        out = await asyncio.to_thread(open, partial_path, "wb", 0)
+        try:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_size:
+                    logger.warning(f"Upload aborted after {size} bytes: exceeds {max_size} bytes")
+                    raise FileValidationError(
+                        f"File size exceeds {max_size // (1024 * 1024)}MB limit",
+                        status_code=413
+                    )
+
+                await asyncio.to_thread(_write_chunk, out, hasher, chunk)
+        finally:
+            out.close()
+
+        await asyncio.to_thread(partial_path.replace, destination)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+    return size, hasher.hexdigest()
+
+
+def _write_chunk(out, hasher, chunk: bytes) -> None:
+    """Hash and write one chunk (blocking)"""
+    hasher.update(chunk)
+    out.write(chunk)
+
+
+# file_ids are UUIDs; anything else must not be turned into a path
+_SAFE_FILE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def _copy(entry: Dict) -> Dict:
+    """Copy of an index entry that callers can keep without sharing its derived list"""
+    return {**entry, "derived": list(entry["derived"])}
+
+
+class TempFileIndex:
+    """
+    file_id -> metadata index of files in temporary storage
+
+    Entries are kept in memory and persisted as one small JSON sidecar per
+    file_id under `<root>/.index/`, so every worker (and a restarted
+    process) resolves a file_id with a single file read instead of a glob
+    over the whole temp directory. A lock serializes every change, since the
+    janitor removes entries from a worker thread while requests look them up
+    on the event loop; lookups return copies. Requests that work on a file
+    across awaits hold it with acquire()/release() so the janitor's evict()
+    skips it.
+
+    Entry structure:
+    {
+        "file_id": str,
+        "path": str,
+        "original_name": str,
+        "size": int,
+        "extension": str,
+        "sha256": str,
+        "created_at": float,  # Unix timestamp
+        "derived": List[str]  # Files generated from it (thumbnails, ...)
+    }
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.sidecar_dir = self.root / ".index"
+        self.sidecar_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: Dict[str, Dict] = {}
+        # Reentrant: index_existing and add_derived go through register/get
+        self._lock = threading.RLock()
+        # file_id -> number of requests currently working on the file
+        self._held: Dict[str, int] = {}
+
+    def _sidecar(self, file_id: str) -> Path:
+        return self.sidecar_dir / f"{file_id}.json"
+
+    def _write_sidecar(self, entry: Dict) -> None:
+        sidecar = self._sidecar(entry["file_id"])
+        partial = sidecar.with_name(f".{sidecar.name}.part")
+        partial.write_text(json.dumps(entry), encoding="utf-8")
+        partial.replace(sidecar)
+
+    def _read_sidecar(self, file_id: str) -> Optional[Dict]:
+        try:
+            return json.loads(self._sidecar(file_id).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable temp index entry for {file_id}: {e}")
+            return None
+
+    def register(
+        self,
+        file_id: str,
+        path: Path,
+        size: int,
+        extension: str,
+        sha256: str,
+        original_name: Optional[str] = None
+    ) -> Dict:
+        """
+        Add a stored file to the index
+
+        Returns:
+            The index entry
+        """
+        entry = {
+            "file_id": file_id,
+            "path": str(path),
+            "original_name": original_name or Path(path).name[len(file_id) + 1:],
+            "size": size,
+            "extension": extension,
+            "sha256": sha256,
+            "created_at": time.time(),
+            "derived": []
+        }
+        with self._lock:
+            self._write_sidecar(entry)
+            self._entries[file_id] = entry
+        return _copy(entry)
+
+    def index_existing(self) -> int:
+        """
+        Index files stored without a sidecar (e.g. before the index existed)
+
+        Scans the directory once, at startup, so that lookups never have to;
+        a "<file_id>_thumbnail.png" next to an upload is recorded as derived.
+
+        Returns:
+            Number of files indexed
+        """
+        uploads, thumbnails = {}, {}
+        for path in self.root.iterdir():
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            file_id, separator, name = path.name.partition("_")
+            if not separator or not _SAFE_FILE_ID.match(file_id) or self._sidecar(file_id).exists():
+                continue
+            if name == "thumbnail.png":
+                thumbnails[file_id] = path
+            else:
+                uploads.setdefault(file_id, path)
+
+        for file_id, path in uploads.items():
+            stat = path.stat()
+            logger.info(f"Indexing unindexed temp file: {path.name}")
+            with self._lock:
+                self.register(file_id, path, stat.st_size, path.suffix.lower(), "")
+                entry = self._entries[file_id]
+                entry["created_at"] = stat.st_mtime
+                if file_id in thumbnails:
+                    entry["derived"].append(str(thumbnails[file_id]))
+                self._write_sidecar(entry)
+        return len(uploads)
+
+    def get(self, file_id: str) -> Optional[Dict]:
+        """
+        Look up a file by id
+
+        Returns:
+            The index entry, or None if unknown or the file no longer exists
+        """
+        if not _SAFE_FILE_ID.match(file_id):
+            return None
+
+        with self._lock:
+            entry = self._entries.get(file_id) or self._read_sidecar(file_id)
+            if entry is None:
+                return None
+
+            if not Path(entry["path"]).exists():
+                # Removed by another worker (or by hand): drop the stale entry
+                self._entries.pop(file_id, None)
+                self._sidecar(file_id).unlink(missing_ok=True)
+                return None
+
+            self._entries[file_id] = entry
+            return _copy(entry)
+
+    def get_path(self, file_id: str) -> Optional[Path]:
+        """Path of the stored file, or None if not found"""
+        entry = self.get(file_id)
+        return Path(entry["path"]) if entry else None
+
+    def acquire(self, file_id: str) -> Optional[Dict]:
+        """
+        Look up a file and keep evict() from removing it until release()
+
+        Returns:
+            The index entry, or None (nothing held) if not found
+        """
+        with self._lock:
+            entry = self.get(file_id)
+            if entry is not None:
+                self._held[file_id] = self._held.get(file_id, 0) + 1
+            return entry
+
+    def release(self, file_id: str) -> None:
+        """Drop a hold taken with acquire()"""
+        with self._lock:
+            if file_id in self._held:
+                self._held[file_id] -= 1
+                if not self._held[file_id]:
+                    del self._held[file_id]
+
+    def add_derived(self, file_id: str, path: Path) -> None:
+        """Record a file generated from an upload so it is removed along with it"""
+        with self._lock:
+            if self.get(file_id) is None:
+                return
+            entry = self._entries[file_id]
+            if str(path) in entry["derived"]:
+                return
+            entry["derived"].append(str(path))
+            self._write_sidecar(entry)
+
+    def remove(self, file_id: str) -> int:
+        """
+        Delete a file, its derived files and its index entry
+
+        Returns:
+            Number of bytes freed
+        """
+        if not _SAFE_FILE_ID.match(file_id):
+            return 0
+
+        with self._lock:
+            # The sidecar is authoritative: other workers may have added derived files
+            entry = self._read_sidecar(file_id) or self._entries.get(file_id)
+            self._entries.pop(file_id, None)
+            freed = 0
+            if entry is not None:
+                for path in [entry["path"]] + entry.get("derived", []):
+                    try:
+                        freed += Path(path).stat().st_size
+                        Path(path).unlink()
+                        logger.info(f"Deleted temp file: {path}")
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        logger.error(f"Error deleting temp file {path}: {e}")
+            self._sidecar(file_id).unlink(missing_ok=True)
+        return freed
+
+    def evict(self, file_id: str) -> Optional[int]:
+        """
+        remove() a file unless a request holds it
+
+        Returns:
+            Number of bytes freed, or None if the file is held and was kept
+        """
+        with self._lock:
+            if self._held.get(file_id):
+                return None
+            return self.remove(file_id)
+
+    def entries(self) -> Iterator[Dict]:
+        """Iterate over all indexed entries (reads every sidecar)"""
+        for sidecar in self.sidecar_dir.glob("*.json"):
+            entry = self._read_sidecar(sidecar.stem)
+            if entry is not None:
+                yield entry
+
+    def __contains__(self, file_id: str) -> bool:
+        return self.get(file_id) is not None
@@ -0,0 +1,136 @@
+"""
+Micro-benchmark for nlp_extractor_legal
+Times every extractor over a corpus of real URSALL answers
+
+Usage:
+    python bench_nlp_extractor_legal.py
+    python bench_nlp_extractor_legal.py --baseline old_nlp_extractor_legal.py
+
+--baseline loads another implementation of the module (for example
+`git show <rev>:backend/app/nlp_extractor_legal.py > old_nlp_extractor_legal.py`)
+and reports the speedup and any answers extracted differently.
+"""
+import argparse
+import importlib.util
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from app import nlp_extractor_legal
+
+# Answers collected from the question flow (test scripts and real sessions)
+CORPUS = {
+    "categoria": [
+        "es un documento legal", "judicial", "es una póliza de seguros", "siniestro", "legal",
+        "seguros", "Juzgado de Primera Instancia", "un recurso", "informe legal",
+        "reclamación a la aseguradora por el siniestro", "no lo sé", "es un asunto jurídico",
+        "prima del seguro del coche", "asesoría jurídica",
+    ],
+    "tipo_trabajo": [
+        "es un documento judicial", "judicial", "este documento es judicial", "procedimiento",
+        "es un procedimiento judicial", "demanda laboral", "sentencia del juzgado", "auto judicial",
+        "recurso de apelación", "proyecto", "es un proyecto jurídico", "informe legal", "dictamen",
+        "consultoría legal", "asesoramiento", "opinión jurídica", "estudio legal", "documento",
+        "Es un proyecto de asesoría", "es un juicio", "una demanda", "no sé", "la causa penal",
+    ],
+    "jurisdiccion": [
+        "Juzgado de lo Contencioso-Administrativo", "Social", "Juzgado de Primera Instancia",
+        "Juzgado de lo Social", "penal", "Juzgado de Instrucción nº 2", "laboral", "civil",
+        "jurisdicción contencioso administrativa", "es de lo penal", "Sala de lo Social del TSJ",
+    ],
+    "juzgado_num": [
+        "2", "3", " 5 ", "15", "Juzgado número 2", "juzgado nº 3", "Número 5", "es el juzgado numero 7",
+        "Juzgado Social 4", "CA1", "SC2", "Jdo. 8", "sin número", "el juzgado 12 de Madrid",
+        "Juzgado de lo Social número 3 de Santa Cruz",
+    ],
+    "demarcacion": [
+        "de Tenerife", "Juzgado de Santa Cruz", "La Gomera", "en Las Palmas", "de la Laguna",
+        "Santa Cruz de Tenerife",
+    ],
+    "num_procedimiento": [
+        "Procedimiento 455/2025", "Autos 123/2025", "455/2025", "el numero es 455/2025",
+        "procedimiento 12/2024", "número 88", "proc. 1/2022", "autos 5/2021", "no lo tengo",
+    ],
+    "partes": [
+        "Pedro Perez vs Cabildo Gomera", "Actor: Juan López, Demandado: Motor 7 Islas",
+        "Parte A: Empresa XYZ / Parte B: Ayuntamiento", "Pedro Perez contra Cabildo Gomera",
+        "demandante: Ana García y demandado: Banco Ejemplo",
+    ],
+    "materia_proc": [
+        "Materia: Despido", "materia de Despidos", "sobre fijeza", "Art 316 CP", "reclamación de cantidad",
+        "indemnización por despido", "urbanismo", "asunto: Tráfico",
+    ],
+    "proyecto_year": ["año 2025", "2025", "en el año 2024"],
+    "proyecto_month": ["mes de agosto", "agosto", "08", "mes 8", "mes de mayo", "en marzo", "diciembre"],
+    "proyecto_nombre": ["Informe sobre accidente laboral", "dictamen pericial", "consulta fiscal", "Revisión Contratos"],
+    "proyecto_materia": ["sobre Derecho Laboral", "relativo a Seguro de Salud", "en materia de Diseño Industrial"],
+}
+
+
+def load_module(path: str):
+    """Import a module from a file path"""
+    spec = importlib.util.spec_from_file_location("baseline_nlp_extractor_legal", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_question(module, question_id: str, answers, repeat: int) -> float:
+    """Best time per call, in microseconds"""
+    extract = module.extract_information_legal
+
+    def run():
+        for answer in answers:
+            extract(question_id, answer)
+
+    best = min(timeit.repeat(run, number=repeat, repeat=5))
+    return best / (repeat * len(answers)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", help="Path to another nlp_extractor_legal.py to compare against")
+    parser.add_argument("--repeat", type=int, default=2000, help="Passes over the corpus per measurement")
+    args = parser.parse_args()
+
+    baseline = load_module(args.baseline) if args.baseline else None
+
+    print("=" * 70)
+    print(f"{'question':20} {'answers':>8} {'us/call':>10}" + (f" {'baseline':>10} {'speedup':>8}" if baseline else ""))
+    print("=" * 70)
+
+    total_new = total_old = 0.0
+    for question_id, answers in CORPUS.items():
+        new = time_question(nlp_extractor_legal, question_id, answers, args.repeat)
+        total_new += new * len(answers)
+        line = f"{question_id:20} {len(answers):>8} {new:>10.2f}"
+        if baseline:
+            old = time_question(baseline, question_id, answers, args.repeat)
+            total_old += old * len(answers)
+            line += f" {old:>10.2f} {old / new:>7.1f}x"
+        print(line)
+
+    answers_count = sum(len(answers) for answers in CORPUS.values())
+    print("-" * 70)
+    summary = f"{'all':20} {answers_count:>8} {total_new / answers_count:>10.2f}"
+    if baseline:
+        summary += f" {total_old / answers_count:>10.2f} {total_old / total_new:>7.1f}x"
+    print(summary)
+
+    if baseline:
+        print("\nAnswers extracted differently:")
+        differences = 0
+        for question_id, answers in CORPUS.items():
+            for answer in answers:
+                new = nlp_extractor_legal.extract_information_legal(question_id, answer)
+                old = baseline.extract_information_legal(question_id, answer)
+                if new != old:
+                    differences += 1
+                    print(f"  {question_id}: {answer!r}: {old!r} -> {new!r}")
+        if not differences:
+            print("  none")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,32 @@ from pathlib import Path
 import shutil
 
 
+@pytest.fixture(autouse=True)
+def isolated_gemini_cache(monkeypatch):
+    """Each test gets an empty in-memory Gemini cache (never the on-disk one)"""
+    from app import gemini_cache
+
+    cache = gemini_cache.GeminiCache(db_path=":memory:")
+    monkeypatch.setattr(gemini_cache, "_gemini_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_circuit_breakers(monkeypatch):
+    """Each test starts with closed circuits and no latency history"""
+    from app import circuit_breaker
+
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+
+
+@pytest.fixture(autouse=True)
+def isolated_rate_limits(monkeypatch):
+    """Each test starts with full token buckets"""
+    from app import rate_limiter
+
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+
+
 @pytest.fixture
 async def test_client():
     """
@@ -36,3 +62,25 @@ def tmp_path(tmp_path_factory):
     yield temp_dir
     # Cleanup after test
     shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@pytest.fixture
+async def fake_dropbox(monkeypatch):
+    """
+    Routes Dropbox requests made through the shared HTTP clients to a local
+    in-memory fake server (see tests/fake_dropbox.py) with retry backoff disabled
+    """
+    from fake_dropbox import FakeDropbox
+    from app import dropbox_folders, dropbox_uploader, http_clients
+
+    fake = FakeDropbox()
+    client = AsyncClient(transport=ASGITransport(app=fake.app))
+
+    monkeypatch.setitem(http_clients._clients, "dropbox_api", client)
+    monkeypatch.setitem(http_clients._clients, "dropbox_content", client)
+    monkeypatch.setattr(dropbox_uploader, "DROPBOX_RETRY_BACKOFF", 0)
+    monkeypatch.setattr(dropbox_folders, "DROPBOX_BATCH_POLL_INTERVAL", 0)
+    dropbox_folders.known_folders.clear()
+    yield fake
+    dropbox_folders.known_folders.clear()
+    await client.aclose()
@@ -0,0 +1,72 @@
+"""
+Fake Dolphin parser for worker process tests
+Importable by spawned worker processes; behaviour depends on the document name
+"""
+import os
+import time
+
+# Number of times a parser was created in this process
+LOADS = 0
+
+
+class FakeDolphinParser:
+    """Stands in for DolphinParser without loading a model"""
+
+    def parse_document(self, document_path: str, max_batch_size: int = 4):
+        name = os.path.basename(document_path)
+        if name.startswith("slow"):
+            time.sleep(2)
+        if name.startswith("broken"):
+            raise ValueError("cannot parse")
+        if name.startswith("crash"):
+            os._exit(1)  # Like a segfault or an OOM kill
+        content = {
+            "text": f"Texto de {name}",
+            "elements": [{"label": "para", "text": f"Texto de {name}", "reading_order": 0, "page": 1}],
+            "pages": 1,
+            "has_tables": False,
+            "has_figures": False,
+            "worker_pid": os.getpid(),
+            "parser_loads": LOADS,
+        }
+        return content, 0.85
+
+
+class FakeModel:
+    """Batched chat() that echoes each prompt; slow enough for batches to fill"""
+
+    def chat(self, prompts, images, max_batch_size=None):
+        time.sleep(0.2)
+        return [f"texto {prompt}" for prompt in prompts]
+
+
+class FakeBatchedParser:
+    """Parser whose documents are four crops recognised through the model"""
+
+    def __init__(self):
+        self.model = FakeModel()
+        self.batcher = None
+
+    def parse_document(self, document_path: str, max_batch_size: int = 4):
+        name = os.path.basename(document_path)
+        prompts = [f"{name}:{i}" for i in range(4)]
+        images = [None] * len(prompts)
+        if self.batcher is not None:
+            outputs = self.batcher.map(prompts, images)
+        else:
+            outputs = self.model.chat(prompts, images, max_batch_size=max_batch_size)
+        return {"text": "\n\n".join(outputs), "pages": 1}, 0.85
+
+
+def create_fake_parser():
+    global LOADS
+    LOADS += 1
+    return FakeDolphinParser()
+
+
+def failing_factory():
+    raise RuntimeError("model weights not found")
+
+
+def create_batched_parser():
+    return FakeBatchedParser()
@@ -0,0 +1,248 @@
+"""
+Local fake Dropbox server for tests
+Implements the subset of the Dropbox HTTP API used by the app, records
+every request and supports fault injection per endpoint
+"""
+import json
+import uuid
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+class FakeDropbox:
+    """In-memory Dropbox used through httpx.ASGITransport"""
+
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+        # Lower-cased paths of existing folders
+        self.folders = set()
+        # When True, create_folder_batch answers with an async job that
+        # completes after batch_checks_pending calls to create_folder_batch/check
+        self.batch_async = False
+        self.batch_checks_pending = 1
+        self._jobs: Dict[str, Dict] = {}
+        self.sessions: Dict[str, bytearray] = {}
+        # (endpoint, api_arg, body_length) for every content request
+        self.requests: List[tuple] = []
+        # endpoint -> list of faults applied to the next calls, in order:
+        #   "error"       -> 500 without processing the request
+        #   "lost"        -> process the request, then answer 500
+        #   "rate_limit"  -> 429 without processing the request
+        #   "not_found"   -> 409 path/not_found (content endpoints only)
+        #   "session_not_found" -> 409 lookup_failed/not_found (content endpoints only)
+        #   "offset:N"    -> 409 incorrect_offset with correct_offset N (append_v2 only)
+        self.faults: Dict[str, List[str]] = {}
+        self.app = self._build_app()
+
+    def fail(self, endpoint: str, *faults: str) -> None:
+        """Queue faults for the next calls to endpoint (e.g. "upload_session/append_v2")"""
+        self.faults.setdefault(endpoint, []).extend(faults)
+
+    def calls(self, endpoint: str) -> List[tuple]:
+        """Requests received for an endpoint"""
+        return [r for r in self.requests if r[0] == endpoint]
+
+    def _take_fault(self, endpoint: str):
+        pending = self.faults.get(endpoint)
+        return pending.pop(0) if pending else None
+
+    def api_calls(self) -> int:
+        """Number of requests made to api.dropboxapi.com endpoints"""
+        return sum(1 for r in self.requests if r[0].startswith("api:"))
+
+    def _make_folder(self, path: str) -> Dict:
+        """Create a folder and its missing parents (like Dropbox does)"""
+        key = path.lower()
+        if key in self.folders:
+            return {".tag": "failure", "failure": {".tag": "path", "path": {".tag": "conflict", "conflict": {".tag": "folder"}}}}
+        parts = key.strip("/").split("/")
+        for i in range(1, len(parts) + 1):
+            self.folders.add("/" + "/".join(parts[:i]))
+        return {".tag": "success", "metadata": {"name": path.rsplit("/", 1)[-1], "path_display": path}}
+
+    def _store_file(self, path: str, content: bytes, autorename: bool) -> Dict:
+        final_path = path
+        if path in self.files and autorename:
+            stem, dot, ext = path.rpartition(".")
+            counter = 1
+            while final_path in self.files:
+                final_path = f"{stem} ({counter}).{ext}" if dot else f"{path} ({counter})"
+                counter += 1
+        self.files[final_path] = content
+        return {
+            "name": final_path.rsplit("/", 1)[-1],
+            "path_display": final_path,
+            "path_lower": final_path.lower(),
+            "id": f"id:{uuid.uuid4().hex[:12]}",
+            "size": len(content),
+        }
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+        fake = self
+
+        def path_not_found(endpoint: str) -> Dict:
+            # files/upload flattens UploadWriteFailed into the error, finish nests the WriteError
+            if endpoint == "upload":
+                return {".tag": "path", "reason": {".tag": "not_found"}, "upload_session_id": uuid.uuid4().hex}
+            return {".tag": "path", "path": {".tag": "not_found"}}
+
+        async def content_request(request: Request, endpoint: str):
+            api_arg = json.loads(request.headers.get("Dropbox-API-Arg", "{}"))
+            body = await request.body()
+            fake.requests.append((endpoint, api_arg, len(body)))
+
+            fault = fake._take_fault(endpoint)
+            if fault == "error":
+                return JSONResponse({"error_summary": "internal_error/"}, status_code=500)
+            if fault == "rate_limit":
+                return JSONResponse(
+                    {"error_summary": "too_many_requests/", "error": {".tag": "too_many_requests"}},
+                    status_code=429,
+                    headers={"Retry-After": "0"}
+                )
+            if fault == "not_found":
+                return JSONResponse(
+                    {"error_summary": "path/not_found/", "error": path_not_found(endpoint)},
+                    status_code=409
+                )
+            if fault == "session_not_found":
+                return JSONResponse(
+                    {
+                        "error_summary": "lookup_failed/not_found/",
+                        "error": {".tag": "lookup_failed", "lookup_failed": {".tag": "not_found"}}
+                    },
+                    status_code=409
+                )
+            return api_arg, body, fault
+
+        def incorrect_offset(correct: int) -> JSONResponse:
+            return JSONResponse(
+                {
+                    "error_summary": "lookup_failed/incorrect_offset/",
+                    "error": {
+                        ".tag": "lookup_failed",
+                        "lookup_failed": {".tag": "incorrect_offset", "correct_offset": correct}
+                    }
+                },
+                status_code=409
+            )
+
+        def finish_response(fault, payload):
+            if fault == "lost":
+                return JSONResponse({"error_summary": "internal_error/"}, status_code=500)
+            if payload is None:
+                return Response(content=b"null", media_type="application/json")
+            return JSONResponse(payload)
+
+        async def api_request(request: Request, endpoint: str):
+            payload = await request.json()
+            fake.requests.append((f"api:{endpoint}", payload, 0))
+            fault = fake._take_fault(endpoint)
+            if fault == "error":
+                return JSONResponse({"error_summary": "internal_error/"}, status_code=500)
+            if fault == "rate_limit":
+                return JSONResponse(
+                    {"error_summary": "too_many_requests/", "error": {".tag": "too_many_requests"}},
+                    status_code=429,
+                    headers={"Retry-After": "0"}
+                )
+            return payload
+
+        @app.post("/2/files/get_metadata")
+        async def get_metadata(request: Request):
+            payload = await api_request(request, "get_metadata")
+            if isinstance(payload, Response):
+                return payload
+            if payload["path"].lower() in fake.folders:
+                return JSONResponse({".tag": "folder", "path_display": payload["path"]})
+            return JSONResponse(
+                {"error_summary": "path/not_found/", "error": {".tag": "path", "path": {".tag": "not_found"}}},
+                status_code=409
+            )
+
+        @app.post("/2/files/create_folder_v2")
+        async def create_folder(request: Request):
+            payload = await api_request(request, "create_folder_v2")
+            if isinstance(payload, Response):
+                return payload
+            entry = fake._make_folder(payload["path"])
+            if entry[".tag"] == "failure":
+                return JSONResponse({"error_summary": "path/conflict/folder/", "error": entry["failure"]}, status_code=409)
+            return JSONResponse({"metadata": entry["metadata"]})
+
+        @app.post("/2/files/create_folder_batch")
+        async def create_folder_batch(request: Request):
+            payload = await api_request(request, "create_folder_batch")
+            if isinstance(payload, Response):
+                return payload
+            entries = [fake._make_folder(path) for path in payload["paths"]]
+            if not fake.batch_async:
+                return JSONResponse({".tag": "complete", "entries": entries})
+            job_id = uuid.uuid4().hex
+            fake._jobs[job_id] = {"entries": entries, "pending": fake.batch_checks_pending}
+            return JSONResponse({".tag": "async_job_id", "async_job_id": job_id})
+
+        @app.post("/2/files/create_folder_batch/check")
+        async def create_folder_batch_check(request: Request):
+            payload = await api_request(request, "create_folder_batch/check")
+            if isinstance(payload, Response):
+                return payload
+            job = fake._jobs[payload["async_job_id"]]
+            if job["pending"] > 0:
+                job["pending"] -= 1
+                return JSONResponse({".tag": "in_progress"})
+            return JSONResponse({".tag": "complete", "entries": job["entries"]})
+
+        @app.post("/2/files/upload")
+        async def upload(request: Request):
+            parsed = await content_request(request, "upload")
+            if isinstance(parsed, Response):
+                return parsed
+            api_arg, body, fault = parsed
+            metadata = fake._store_file(api_arg["path"], body, api_arg.get("autorename", False))
+            return finish_response(fault, metadata)
+
+        @app.post("/2/files/upload_session/start")
+        async def session_start(request: Request):
+            parsed = await content_request(request, "upload_session/start")
+            if isinstance(parsed, Response):
+                return parsed
+            _, body, fault = parsed
+            session_id = uuid.uuid4().hex
+            fake.sessions[session_id] = bytearray(body)
+            return finish_response(fault, {"session_id": session_id})
+
+        @app.post("/2/files/upload_session/append_v2")
+        async def session_append(request: Request):
+            parsed = await content_request(request, "upload_session/append_v2")
+            if isinstance(parsed, Response):
+                return parsed
+            api_arg, body, fault = parsed
+            if fault and fault.startswith("offset:"):
+                return incorrect_offset(int(fault.split(":", 1)[1]))
+            cursor = api_arg["cursor"]
+            data = fake.sessions[cursor["session_id"]]
+            if cursor["offset"] != len(data):
+                return incorrect_offset(len(data))
+            data.extend(body)
+            return finish_response(fault, None)
+
+        @app.post("/2/files/upload_session/finish")
+        async def session_finish(request: Request):
+            parsed = await content_request(request, "upload_session/finish")
+            if isinstance(parsed, Response):
+                return parsed
+            api_arg, body, fault = parsed
+            cursor = api_arg["cursor"]
+            data = fake.sessions[cursor["session_id"]]
+            if cursor["offset"] != len(data):
+                return incorrect_offset(len(data))
+            data.extend(body)
+            commit = api_arg["commit"]
+            metadata = fake._store_file(commit["path"], bytes(data), commit.get("autorename", False))
+            return finish_response(fault, metadata)
+
+        return app
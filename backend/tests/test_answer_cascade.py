@@ -0,0 +1,116 @@
+"""
+Tests for the NLP-first answer extraction cascade
+"""
+import asyncio
+import logging
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app import answer_cascade
+from app.answer_cascade import CascadeStats, extract_answer_cascade
+
+
+@pytest.fixture
+def stats():
+    with patch.object(answer_cascade, "cascade_stats", CascadeStats()) as stats:
+        yield stats
+
+
+def gemini(result):
+    """Patch Gemini as available, answering result"""
+    return patch.multiple(
+        "app.gemini_rest_extractor",
+        GEMINI_AVAILABLE=True,
+        extract_with_gemini_rest=AsyncMock(return_value=result)
+    )
+
+
+class TestExtractAnswerCascade:
+    """Tests for extract_answer_cascade"""
+
+    @pytest.mark.asyncio
+    async def test_confident_nlp_result_skips_gemini(self, stats):
+        with gemini("proyecto"):
+            from app.gemini_rest_extractor import extract_with_gemini_rest
+            result = await extract_answer_cascade("tipo_trabajo", "procedimiento")
+
+            extract_with_gemini_rest.assert_not_awaited()
+        assert result == ("procedimiento", "nlp")
+        assert stats.hits["nlp"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unsure_nlp_result_asks_gemini(self, stats):
+        with gemini("Juan Pérez"):
+            result = await extract_answer_cascade("client", "El cliente es Juan Pérez")
+
+        assert result == ("Juan Pérez", "gemini")
+        assert stats.snapshot()["gemini"]["hit_rate"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_ambiguous_gemini_falls_back_to_nlp(self, stats):
+        with gemini("AMBIGUO"):
+            result = await extract_answer_cascade("tipo_trabajo", "informe sobre el juicio y la demanda")
+
+        assert result == ("procedimiento", "nlp_fallback")
+
+    @pytest.mark.asyncio
+    async def test_threshold_is_configurable(self, stats):
+        with gemini("Contrato"):
+            result = await extract_answer_cascade("client", "El cliente es Juan Pérez", min_confidence=0.2)
+
+        assert result == ("El cliente es Juan Pérez", "nlp")
+
+    @pytest.mark.asyncio
+    async def test_without_gemini(self, stats):
+        with patch("app.gemini_rest_extractor.GEMINI_AVAILABLE", False):
+            assert await extract_answer_cascade("doc_type_proc", "Es una demanda") == ("Demanda", "nlp")
+            assert await extract_answer_cascade("num_procedimiento", "Autos 455/2025") == ("455/2025", "nlp")
+
+
+def slow_gemini(result, delay):
+    """Patch Gemini as available, answering result after delay seconds"""
+    async def extract(question_id, user_input):
+        await asyncio.sleep(delay)
+        return result
+
+    return patch.multiple("app.gemini_rest_extractor", GEMINI_AVAILABLE=True, extract_with_gemini_rest=extract)
+
+
+class TestHedgedMode:
+    """Tests for extract_answer_cascade(mode="hedged")"""
+
+    @pytest.mark.asyncio
+    async def test_gemini_within_deadline_wins(self, stats):
+        with slow_gemini("Juan Pérez", 0.01):
+            result = await extract_answer_cascade("client", "El cliente es Juan Pérez", mode="hedged", deadline_ms=500)
+
+        assert result == ("Juan Pérez", "gemini")
+
+    @pytest.mark.asyncio
+    async def test_confident_nlp_result_never_starts_gemini(self, stats):
+        with gemini("proyecto"):
+            from app.gemini_rest_extractor import extract_with_gemini_rest
+            result = await extract_answer_cascade("tipo_trabajo", "procedimiento", mode="hedged", deadline_ms=500)
+
+            extract_with_gemini_rest.assert_not_called()
+        assert result == ("procedimiento", "nlp")
+        assert stats.hits["nlp"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_gemini_answers_with_nlp_and_logs_late_result(self, stats, caplog):
+        with slow_gemini("proyecto", 0.05):
+            start = time.perf_counter()
+            result = await extract_answer_cascade(
+                "tipo_trabajo", "informe sobre el juicio y la demanda", mode="hedged", deadline_ms=10
+            )
+            elapsed = time.perf_counter() - start
+
+            assert result == ("procedimiento", "nlp_deadline")
+            assert elapsed < 0.05
+            with caplog.at_level(logging.INFO, logger="app.answer_cascade"):
+                await asyncio.sleep(0.1)
+
+        assert "Gemini tardío" in caplog.text and "difiere" in caplog.text
+        assert stats.hits["nlp_deadline"] == 1
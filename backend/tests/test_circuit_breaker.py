@@ -0,0 +1,158 @@
+"""
+Tests for upstream circuit breakers and adaptive timeouts
+"""
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app import circuit_breaker
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def respond(status_code=200):
+    """send() factory answering with a status code and recording the timeout used"""
+    timeouts = []
+
+    async def send(timeout):
+        timeouts.append(timeout)
+        return httpx.Response(status_code)
+
+    return send, timeouts
+
+
+async def fail(timeout):
+    raise httpx.ConnectTimeout("timed out")
+
+
+class TestCircuitStates:
+    """Tests for closed / open / half-open transitions"""
+
+    @pytest.mark.asyncio
+    async def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("gemini", failure_threshold=2, clock=FakeClock())
+
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectTimeout):
+                await breaker.request(fail, 10.0)
+
+        send, timeouts = respond()
+        with pytest.raises(CircuitOpenError):
+            await breaker.request(send, 10.0)
+        assert timeouts == []
+        assert breaker.state == "open"
+        assert breaker.status()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_server_errors_count_as_failures(self):
+        breaker = CircuitBreaker("gemini", failure_threshold=1, clock=FakeClock())
+        send, _ = respond(503)
+
+        response = await breaker.request(send, 10.0)
+
+        assert response.status_code == 503
+        assert breaker.state == "open"
+
+    @pytest.mark.asyncio
+    async def test_throttling_is_not_a_failure(self):
+        breaker = CircuitBreaker("gemini", failure_threshold=1, clock=FakeClock())
+        send, _ = respond(429)
+
+        response = await breaker.request(send, 10.0)
+
+        assert response.status_code == 429
+        assert breaker.state == "closed"
+        assert breaker.status()["failures"] == 0
+
+    @pytest.mark.asyncio
+    async def test_half_open_trial_closes_or_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("dolphin", failure_threshold=1, reset_seconds=30, clock=clock)
+        with pytest.raises(httpx.ConnectTimeout):
+            await breaker.request(fail, 60.0)
+
+        clock.now += 31
+        assert breaker.available()
+        with pytest.raises(httpx.ConnectTimeout):
+            await breaker.request(fail, 60.0)
+        assert breaker.state == "open"
+
+        clock.now += 31
+        send, _ = respond()
+        await breaker.request(send, 60.0)
+        assert breaker.state == "closed"
+        assert breaker.status()["transitions"] == {"closed->open": 1, "open->half_open": 2, "half_open->open": 1,
+                                                   "half_open->closed": 1}
+
+    def test_only_one_trial_while_half_open(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("dolphin", failure_threshold=1, reset_seconds=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 31
+
+        assert breaker.allow()
+        assert not breaker.allow()
+        assert not breaker.available()
+
+
+class TestAdaptiveTimeout:
+    """Tests for CircuitBreaker.timeout"""
+
+    def test_default_until_enough_samples(self):
+        breaker = CircuitBreaker("gemini")
+        breaker.record_success(0.5, "extract")
+
+        assert breaker.timeout(10.0, "extract") == 10.0
+
+    def test_follows_p99_per_operation(self):
+        breaker = CircuitBreaker("gemini")
+        for _ in range(circuit_breaker.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+            breaker.record_success(1.5, "extract")
+            breaker.record_success(20.0, "summary")
+
+        assert breaker.timeout(10.0, "extract") == 3.0
+        assert breaker.timeout(30.0, "summary") == 30.0  # Never above the caller's timeout
+        assert breaker.status()["latency"]["extract"]["p99_ms"] == 1500.0
+
+
+class TestCallers:
+    """Callers fall back immediately while a circuit is open"""
+
+    @pytest.mark.asyncio
+    async def test_gemini_extraction_skips_request(self):
+        from app import gemini_rest_extractor
+
+        breaker = get_breaker("gemini")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        post = AsyncMock()
+
+        with patch.object(gemini_rest_extractor, "GEMINI_AVAILABLE", True), \
+             patch.object(gemini_rest_extractor, "get_client", return_value=AsyncMock(post=post)):
+            result = await gemini_rest_extractor.extract_with_gemini_rest("tipo_trabajo", "un juicio")
+
+        assert result is None
+        post.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_dolphin_backend_is_skipped(self):
+        from app.parser_backends import RestDolphinBackend
+
+        client = AsyncMock()
+        backend = RestDolphinBackend(client=client)
+        breaker = get_breaker("dolphin")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        assert not await backend.is_available()
+        client.check_health.assert_not_awaited()
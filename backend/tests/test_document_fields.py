@@ -0,0 +1,174 @@
+"""
+Tests for the local document field extractor
+"""
+import time
+from unittest.mock import AsyncMock, patch
+
+import fitz
+import pytest
+
+from app.document_fields import (
+    DEMARCACIONES,
+    extract_aseguradora,
+    extract_document_fields,
+    extract_fecha,
+    extract_juzgado,
+    extract_num_procedimiento,
+    merge_suggested_answers,
+    suggested_answers,
+)
+from app.document_preview import DocumentPreviewService
+from app.extraction_cache import ExtractionCache
+
+SENTENCIA = """JUZGADO DE LO SOCIAL Nº 3 DE SANTA CRUZ DE TENERIFE
+Procedimiento: Despidos 455/2025
+DEMANDANTE: D. Pedro Pérez García
+DEMANDADO: Cabildo Insular de La Gomera
+
+SENTENCIA
+
+En Santa Cruz de Tenerife, a 15 de marzo de 2025.
+
+Vista la demanda interpuesta por Pedro Pérez García contra Cabildo Insular de La Gomera, en materia de despido,
+presentada con fecha 02/01/2025, el Juzgado de lo Social número 3 acordó citar a las partes (autos 455/2025).
+"""
+
+FILLER = ("El trabajador prestó servicios desde el 1 de enero de 2019, con categoría de oficial, "
+          "salario de 1.500 euros y fecha de baja 12/12/2020, según consta en autos. ") * 20
+
+
+class TestExtractDocumentFields:
+    """Tests for extract_document_fields"""
+
+    def test_extracts_procedure_fields(self):
+        fields = extract_document_fields(SENTENCIA)
+        values = {field: result["value"] for field, result in fields.items()}
+
+        assert values == {
+            "jurisdiccion": "social",
+            "juzgado_num": "3",
+            "demarcacion": "Santa Cruz",
+            "num_procedimiento": "455/2025",
+            "fecha_procedimiento": "2025-03-15",
+            "partes": "Pedro Pérez García vs Cabildo Insular de La Gomera",
+        }
+        assert fields["num_procedimiento"]["matches"] == 2
+        assert all(0.5 <= result["confidence"] <= 0.99 for result in fields.values())
+
+    def test_empty_text(self):
+        assert extract_document_fields("") == {}
+
+    def test_runs_in_milliseconds_on_a_long_document(self):
+        text = SENTENCIA + "\n".join(FILLER for _ in range(100))  # ~100 pages
+        start = time.perf_counter()
+        fields = extract_document_fields(text)
+        elapsed = time.perf_counter() - start
+
+        assert fields["num_procedimiento"]["value"] == "455/2025"
+        assert elapsed < 0.25
+
+
+class TestFieldExtractors:
+    """Tests for the individual field extractors"""
+
+    def test_longest_demarcacion_wins(self):
+        for name, value in DEMARCACIONES.items():
+            fields = extract_juzgado(f"Juzgado de lo Social nº 1 de {name.title()}, sala 2")
+            assert fields["demarcacion"]["value"] == value, name
+
+        fields = extract_juzgado("JUZGADO DE PRIMERA INSTANCIA Nº 2 DE SANTA CRUZ DE  LA PALMA")
+        assert fields["demarcacion"]["value"] == "Santa Cruz de La Palma"
+        assert "demarcacion" not in extract_juzgado("Juzgado de lo Penal nº 1 de Teldex")
+
+    def test_dates_are_not_procedure_numbers(self):
+        assert extract_num_procedimiento("fecha 12/12/2020 y 1/2/2021") is None
+
+    def test_disagreeing_numbers_lower_confidence(self):
+        agreed = extract_num_procedimiento("Procedimiento 455/2025")
+        disputed = extract_num_procedimiento("Procedimiento 455/2025. Autos 12/2024")
+
+        assert agreed["value"] == "455/2025"
+        assert disputed["confidence"] < agreed["confidence"]
+
+    def test_bare_number_has_low_confidence(self):
+        assert extract_num_procedimiento("ver 455/2025")["confidence"] == 0.5
+
+    def test_signature_date_beats_earlier_dates(self):
+        text = "Escrito de 02/01/2025.\nFECHA: 3 de Mayo del 2024"
+        assert extract_fecha(text) == {"value": "2024-05-03", "confidence": 0.75, "matches": 1}
+
+    def test_first_date_as_fallback(self):
+        assert extract_fecha("Escrito de 02/01/2025 y 2025-02-03")["value"] == "2025-01-02"
+        assert extract_fecha("31/02/2025") is None
+
+    def test_insurer_gazetteer(self):
+        result = extract_aseguradora("Póliza de MAPFRE. Siniestro comunicado a Mapfre Seguros")
+        assert result["value"] == "MAPFRE"
+        assert extract_aseguradora("el taxista") is None
+
+
+class TestSuggestedAnswers:
+    """Tests for suggested_answers / merge_suggested_answers"""
+
+    def test_filters_by_confidence(self):
+        fields = {
+            "num_procedimiento": {"value": "455/2025", "confidence": 0.9, "matches": 1},
+            "compania_seguro": {"value": "AXA", "confidence": 0.3, "matches": 1},
+        }
+        assert suggested_answers(fields, 0.5) == ({"num_procedimiento": "455/2025"}, {"num_procedimiento": 0.9})
+
+    def test_merge_keeps_the_more_confident_answer(self):
+        answers, confidences = merge_suggested_answers(
+            {"jurisdiccion": "Social", "num_procedimiento": "455/2024", "materia": None},
+            0.8,
+            {"num_procedimiento": "455/2025", "juzgado_num": "3"},
+            {"num_procedimiento": 0.9, "juzgado_num": 0.9},
+        )
+
+        assert answers == {"jurisdiccion": "Social", "num_procedimiento": "455/2025", "juzgado_num": "3"}
+        assert confidences == {"jurisdiccion": 0.8, "num_procedimiento": 0.9, "juzgado_num": 0.9}
+
+
+@pytest.fixture
+def sentencia_pdf(tmp_path):
+    path = tmp_path / "sentencia.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), SENTENCIA, fontsize=8)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+class TestPreviewSuggestedAnswers:
+    """DocumentPreviewService fills suggested_answers from the local extractor"""
+
+    @pytest.mark.asyncio
+    async def test_without_gemini(self, tmp_path, sentencia_pdf):
+        with patch("app.document_preview.is_gemini_available", return_value=False), \
+             patch("app.document_preview.get_extraction_cache", return_value=ExtractionCache(tmp_path / "cache")):
+            result = await DocumentPreviewService(policy="pymupdf").generate_preview(str(sentencia_pdf), "file-1")
+
+        preview = result["preview"]
+        assert preview["suggested_answers"]["num_procedimiento"] == "455/2025"
+        assert preview["suggested_answers"]["jurisdiccion"] == "social"
+        assert preview["suggested_answers_confidence"]["num_procedimiento"] >= 0.9
+
+    @pytest.mark.asyncio
+    async def test_merged_with_gemini(self, tmp_path, sentencia_pdf):
+        summary = {
+            "summary": "Sentencia por despido",
+            "document_type": "sentencia",
+            "is_legal_document": True,
+            "confidence": 0.8,
+            "key_information": {},
+            "suggested_answers": {"client": "Pedro Pérez García", "jurisdiccion": None},
+        }
+        with patch("app.document_preview.is_gemini_available", return_value=True), \
+             patch("app.document_preview.get_extraction_cache", return_value=ExtractionCache(tmp_path / "cache")), \
+             patch("app.document_preview.summarize_document", new=AsyncMock(return_value=summary)):
+            result = await DocumentPreviewService(policy="pymupdf").generate_preview(str(sentencia_pdf), "file-1")
+
+        answers = result["preview"]["suggested_answers"]
+        assert answers["client"] == "Pedro Pérez García"
+        assert answers["jurisdiccion"] == "social"
+        assert result["preview"]["suggested_answers_confidence"]["client"] == 0.8
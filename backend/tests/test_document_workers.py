@@ -0,0 +1,192 @@
+"""
+Tests for the document worker pool (process pool with async facade)
+"""
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+import pytest
+
+from app.document_workers import (
+    DocumentPoolBusy,
+    DocumentWorkerPool,
+    classify_pages,
+    count_pages,
+    extract_pages,
+    extract_text,
+    render_thumbnail,
+    take_within_budget,
+)
+
+
+@pytest.fixture
+def pool():
+    pool = DocumentWorkerPool(max_workers=2, max_queue=2, default_timeout=30)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def pdf_file(tmp_path):
+    path = tmp_path / "escrito.pdf"
+    doc = fitz.open()
+    for number in range(3):
+        doc.new_page().insert_text((72, 72), f"Pagina {number + 1} del escrito")
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+class TestWorkerFunctions:
+    """CPU-bound functions executed in the pool"""
+
+    @pytest.mark.asyncio
+    async def test_extract_text(self, pool, pdf_file):
+        text, metadata = await pool.run(extract_text, str(pdf_file))
+
+        assert "Pagina 1" in text and "Pagina 3" in text
+        assert metadata == {"pages": 3, "pages_extracted": 3, "has_tables": False, "has_figures": False}
+
+    @pytest.mark.asyncio
+    async def test_extract_text_within_page_budget(self, pool, pdf_file):
+        text, metadata = await pool.run(extract_text, str(pdf_file), None, 2)
+
+        assert "Pagina 2" in text and "Pagina 3" not in text
+        assert (metadata["pages"], metadata["pages_extracted"]) == (3, 2)
+
+    @pytest.mark.asyncio
+    async def test_render_thumbnail(self, pool, pdf_file, tmp_path):
+        output = tmp_path / "thumb.png"
+
+        await pool.run(render_thumbnail, str(pdf_file), str(output), 1.0)
+
+        assert output.read_bytes().startswith(b"\x89PNG")
+
+
+class TestTakeWithinBudget:
+    """take_within_budget consumes page texts lazily"""
+
+    def test_stops_reading_once_budget_is_reached(self):
+        read = []
+
+        def pages():
+            for number in range(300):
+                read.append(number)
+                yield "x" * 1000
+
+        assert len(take_within_budget(pages(), max_chars=2500)) == 3
+        assert len(read) == 3
+
+    def test_page_budget_and_no_budget(self):
+        assert take_within_budget(["a", "b", "c"], max_pages=2) == ["a", "b"]
+        assert take_within_budget(["a", "b", "c"]) == ["a", "b", "c"]
+
+
+def write_mixed_pdf(path):
+    """PDF whose page 2 is a scanned image with no text layer"""
+    lines = "\n".join(f"Fundamento de derecho {n}: texto de la sentencia." for n in range(12))
+    scan = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 280), 0)
+    scan.clear_with(200)
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Sentencia 1\n" + lines)
+    doc.new_page().insert_image(fitz.Rect(0, 0, 595, 842), pixmap=scan)
+    doc.new_page().insert_text((72, 72), "Sentencia 3\n" + lines)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+class TestPageClassification:
+    """classify_pages / extract_pages"""
+
+    def test_classifies_text_layer_and_scanned_pages(self, tmp_path):
+        result = classify_pages(str(write_mixed_pdf(tmp_path / "mixed.pdf")))
+        pages = result["pages"]
+
+        assert result["page_count"] == 3
+        assert [page["kind"] for page in pages] == ["text", "scanned", "text"]
+        assert "Sentencia 3" in pages[2]["text"]
+        assert pages[1]["image_coverage"] > 0.9
+        assert pages[1]["text"] == ""
+
+    def test_sparse_pages_are_not_trusted(self, pdf_file):
+        pages = classify_pages(str(pdf_file))["pages"]
+
+        assert {page["kind"] for page in pages} == {"scanned"}
+        assert classify_pages(str(pdf_file), min_chars=10)["pages"][0]["kind"] == "text"
+
+    def test_stops_examining_pages_at_budget(self, tmp_path):
+        result = classify_pages(str(write_mixed_pdf(tmp_path / "mixed.pdf")), max_pages=2)
+
+        assert result["page_count"] == 3
+        assert [page["page"] for page in result["pages"]] == [1, 2]
+
+    def test_extract_pages(self, tmp_path, pdf_file):
+        output = extract_pages(str(pdf_file), str(tmp_path / "subset.pdf"), [2, 0])
+
+        doc = fitz.open(output)
+        assert [page.get_text().strip() for page in doc] == ["Pagina 3 del escrito", "Pagina 1 del escrito"]
+        doc.close()
+
+
+class TestDocumentWorkerPool:
+    """Tests for the async facade"""
+
+    @pytest.mark.asyncio
+    async def test_event_loop_keeps_running_during_work(self, pool):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        await pool.run(time.sleep, 0.3)
+        ticker_task.cancel()
+
+        assert ticks >= 10
+
+    @pytest.mark.asyncio
+    async def test_timeout(self, pool):
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(time.sleep, 2, timeout=0.2)
+
+        assert pool.metrics["timeouts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_worker_exceptions_propagate(self, pool, tmp_path):
+        with pytest.raises(Exception):
+            await pool.run(extract_text, str(tmp_path / "missing.pdf"))
+
+        assert pool.metrics["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_dead_worker_fails_its_task_and_pool_recovers(self, pool, pdf_file):
+        await pool.run(count_pages, str(pdf_file))
+
+        with pytest.raises(BrokenProcessPool):
+            await pool.run(os._exit, 1)  # Like a segfault or an OOM kill
+
+        assert await pool.run(count_pages, str(pdf_file)) == 3
+        status = pool.status()
+        assert status["respawned"] == 1
+        assert status["running"] == 0
+        assert status["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_is_full_and_reports_depth(self, pool):
+        tasks = [asyncio.create_task(pool.run(time.sleep, 0.3)) for _ in range(4)]
+        await asyncio.sleep(0)
+
+        assert pool.status()["queue_depth"] == 2
+        with pytest.raises(DocumentPoolBusy):
+            await pool.run(time.sleep, 0)
+
+        await asyncio.gather(*tasks)
+        assert pool.metrics["rejected"] == 1
+        assert pool.metrics["completed"] == 4
+        assert pool.status()["queue_depth"] == 0
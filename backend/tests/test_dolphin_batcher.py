@@ -0,0 +1,107 @@
+"""
+Tests for the Dolphin dynamic batcher
+"""
+import threading
+import time
+
+import pytest
+
+from app.dolphin_batcher import DynamicBatcher, Histogram
+
+
+class RecordingModel:
+    """Batched chat() stand-in recording the size of every batch"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+
+    def chat(self, prompts, images, max_batch_size=None):
+        self.batches.append(list(prompts))
+        time.sleep(self.delay)
+        return [f"out:{prompt}" for prompt in prompts]
+
+
+class TestHistogram:
+    """Tests for Histogram"""
+
+    def test_counts_values_into_buckets(self):
+        histogram = Histogram([1, 4])
+        for value in (1, 2, 4, 9):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        assert snapshot["buckets"] == {"<=1": 1, "<=4": 2, "+Inf": 1}
+        assert snapshot["count"] == 4
+        assert snapshot["mean"] == 4
+
+
+class TestDynamicBatcher:
+    """Tests for DynamicBatcher"""
+
+    def test_results_are_routed_back_in_order(self):
+        model = RecordingModel()
+        batcher = DynamicBatcher(model.chat, max_batch_size=8, max_wait=0.01)
+        try:
+            outputs = batcher.map([f"p{i}" for i in range(5)], [None] * 5)
+        finally:
+            batcher.close()
+
+        assert outputs == [f"out:p{i}" for i in range(5)]
+        assert model.batches == [[f"p{i}" for i in range(5)]]
+
+    def test_batches_never_exceed_max_size(self):
+        model = RecordingModel()
+        batcher = DynamicBatcher(model.chat, max_batch_size=4, max_wait=0.05)
+        try:
+            batcher.map([f"p{i}" for i in range(10)], [None] * 10)
+        finally:
+            batcher.close()
+
+        assert [len(batch) for batch in model.batches] == [4, 4, 2]
+        fill = batcher.snapshot()["batch_fill"]["buckets"]
+        assert (fill["<=0.5"], fill["<=1.0"]) == (1, 2)
+
+    def test_requests_from_different_threads_share_a_batch(self):
+        model = RecordingModel(delay=0.1)
+        batcher = DynamicBatcher(model.chat, max_batch_size=16, max_wait=0.05)
+        outputs = {}
+
+        def document(name):
+            outputs[name] = batcher.map([f"{name}:{i}" for i in range(3)], [None] * 3)
+
+        threads = [threading.Thread(target=document, args=(f"doc{i}",)) for i in range(3)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            batcher.close()
+
+        assert outputs["doc1"] == ["out:doc1:0", "out:doc1:1", "out:doc1:2"]
+        assert len(model.batches) < 3
+        assert batcher.snapshot()["latency_seconds"]["count"] == 9
+
+    def test_a_partial_batch_is_sent_after_max_wait(self):
+        model = RecordingModel()
+        batcher = DynamicBatcher(model.chat, max_batch_size=16, max_wait=0.02)
+        try:
+            started = time.monotonic()
+            assert batcher.submit("solo", None).result(timeout=2) == "out:solo"
+            assert time.monotonic() - started < 1
+        finally:
+            batcher.close()
+
+    def test_model_errors_fail_every_request_in_the_batch(self):
+        def broken(prompts, images, max_batch_size=None):
+            raise RuntimeError("CUDA out of memory")
+
+        batcher = DynamicBatcher(broken, max_batch_size=4, max_wait=0.01)
+        try:
+            futures = [batcher.submit(f"p{i}", None) for i in range(2)]
+            for future in futures:
+                with pytest.raises(RuntimeError, match="out of memory"):
+                    future.result(timeout=2)
+        finally:
+            batcher.close()
@@ -0,0 +1,123 @@
+"""
+Tests for the out-of-process Dolphin inference workers
+"""
+import asyncio
+import os
+
+import pytest
+
+from fake_dolphin import create_batched_parser, create_fake_parser, failing_factory
+from app.dolphin_worker import DolphinQueueFull, DolphinWorkerError, DolphinWorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = DolphinWorkerPool(parser_factory=create_fake_parser, workers=1, queue_max=3, deadline=30)
+    yield pool
+    pool.shutdown()
+
+
+class TestDolphinWorkerPool:
+    """Tests for DolphinWorkerPool"""
+
+    @pytest.mark.asyncio
+    async def test_parses_in_a_separate_process_and_loads_model_once(self, pool):
+        first, confidence = await pool.parse("/docs/demanda.pdf")
+        second, _ = await pool.parse("/docs/sentencia.pdf")
+
+        assert first["text"] == "Texto de demanda.pdf"
+        assert second["text"] == "Texto de sentencia.pdf"
+        assert confidence == 0.85
+        assert first["worker_pid"] != os.getpid()
+        assert first["worker_pid"] == second["worker_pid"]
+        assert second["parser_loads"] == 1
+        assert pool.status()["completed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_event_loop_is_free_while_job_runs(self, pool):
+        await pool.parse("/docs/warmup.pdf")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        await pool.parse("/docs/slow.pdf")
+        ticker_task.cancel()
+
+        assert ticks >= 50
+
+    @pytest.mark.asyncio
+    async def test_job_errors_are_raised_to_the_caller(self, pool):
+        with pytest.raises(DolphinWorkerError, match="cannot parse"):
+            await pool.parse("/docs/broken.pdf")
+
+        # The worker keeps serving jobs
+        content, _ = await pool.parse("/docs/ok.pdf")
+        assert content["text"] == "Texto de ok.pdf"
+
+    @pytest.mark.asyncio
+    async def test_dead_worker_fails_its_job_and_is_replaced(self, pool):
+        first, _ = await pool.parse("/docs/warmup.pdf")
+
+        with pytest.raises(DolphinWorkerError, match="died"):
+            await asyncio.wait_for(pool.parse("/docs/crash.pdf"), 10)
+
+        content, _ = await pool.parse("/docs/ok.pdf")
+        assert content["worker_pid"] != first["worker_pid"]
+        assert pool.status()["respawned"] == 1
+        assert pool.status()["pending_jobs"] == 0
+
+    @pytest.mark.asyncio
+    async def test_deadline(self, pool):
+        await pool.parse("/docs/warmup.pdf")
+
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.parse("/docs/slow.pdf", deadline=0.3)
+
+        assert pool.status()["pending_jobs"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rejects_jobs_beyond_queue_limit(self, pool):
+        await pool.parse("/docs/warmup.pdf")
+        jobs = [asyncio.create_task(pool.parse(f"/docs/slow-{i}.pdf", deadline=0.5)) for i in range(3)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(DolphinQueueFull):
+            await pool.parse("/docs/extra.pdf")
+
+        await asyncio.gather(*jobs, return_exceptions=True)
+        assert pool.status()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_worker_startup_failure_fails_jobs(self):
+        pool = DolphinWorkerPool(parser_factory=failing_factory, workers=1, queue_max=3, deadline=30)
+        try:
+            with pytest.raises(DolphinWorkerError, match="model weights not found"):
+                await pool.parse("/docs/demanda.pdf")
+        finally:
+            pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_documents_share_model_batches():
+    """Crops of concurrent jobs are recognised in shared batches and routed back in order"""
+    pool = DolphinWorkerPool(parser_factory=create_batched_parser, workers=1, queue_max=8, deadline=30,
+                             concurrency=4, batching=True)
+    try:
+        await pool.parse("/docs/warmup.pdf")
+        results = await asyncio.gather(*(pool.parse(f"/docs/doc{i}.pdf") for i in range(3)))
+        await asyncio.sleep(0.2)  # Let the last metrics message arrive
+
+        for i, (content, _) in enumerate(results):
+            assert content["text"] == "\n\n".join(f"texto doc{i}.pdf:{n}" for n in range(4))
+
+        (batcher,) = pool.status()["batchers"].values()
+        assert batcher["batch_size"]["sum"] == 16
+        assert batcher["batches"] < 4
+        assert batcher["latency_seconds"]["count"] == 16
+    finally:
+        pool.shutdown()
@@ -0,0 +1,304 @@
+"""
+Tests for batch folder provisioning (create_folder_batch)
+Uses the local fake Dropbox server from tests/fake_dropbox.py
+"""
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+
+from app import dropbox_folders, dropbox_uploader
+from app.dropbox_folders import (
+    KnownFolderCache,
+    ensure_folders,
+    known_folders,
+    leaf_folders,
+    normalize_folder_path,
+)
+from app.dropbox_uploader import upload_file_to_dropbox
+from app.path_mapper_ursall import suggest_path_ursall
+
+
+def procedimiento_structure():
+    return suggest_path_ursall(
+        client_name="Cabildo Gomera",
+        tipo_trabajo="procedimiento",
+        doc_type="demanda",
+        year="2025", month="01",
+        jurisdiccion="social", juzgado_num="2", demarcacion="SantaCruz",
+        num_procedimiento="455", year_proc="2025",
+        parte_a="Pedro Perez", parte_b="Cabildo Gomera",
+        materia_proc="Despidos"
+    )
+
+
+class TestLeafFolders:
+    """Deduplication and prefix elimination"""
+
+    def test_normalize(self):
+        assert normalize_folder_path("Docs//A/ ") == "/Docs/A"
+        assert normalize_folder_path("/") == ""
+
+    def test_prefixes_and_duplicates_are_dropped(self):
+        paths = ["/A", "/A/B", "/a/b", "/A/B/C", "/A/D", "/E/"]
+
+        assert leaf_folders(paths) == ["/A/B/C", "/A/D", "/E"]
+
+    def test_sibling_with_common_name_prefix_is_kept(self):
+        assert leaf_folders(["/A/B", "/A/BC"]) == ["/A/B", "/A/BC"]
+
+    def test_procedimiento_structure_reduces_to_subfolders(self):
+        structure = procedimiento_structure()["folder_structure"]
+
+        leaves = leaf_folders(structure)
+
+        assert len(leaves) < len(structure)
+        assert all(not any(o.startswith(l + "/") for o in leaves) for l in leaves)
+
+
+class TestEnsureFolders:
+    """Folder creation through create_folder_batch"""
+
+    @pytest.mark.asyncio
+    async def test_creates_structure_with_single_batch_call(self, fake_dropbox):
+        structure = procedimiento_structure()["folder_structure"]
+
+        result = await ensure_folders("token", structure)
+
+        assert result["success"] is True
+        assert result["api_calls"] == 1
+        assert fake_dropbox.api_calls() == 1
+        for path in structure:
+            assert path.lower() in fake_dropbox.folders
+
+    @pytest.mark.asyncio
+    async def test_existing_folders_count_as_success(self, fake_dropbox):
+        fake_dropbox.folders.update({"/docs", "/docs/a"})
+
+        result = await ensure_folders("token", ["/Docs/A", "/Docs/B"])
+
+        assert result["success"] is True
+        assert result["existing"] == ["/Docs/A"]
+        assert result["created"] == ["/Docs/B"]
+
+    @pytest.mark.asyncio
+    async def test_polls_async_batch_job(self, fake_dropbox):
+        fake_dropbox.batch_async = True
+        fake_dropbox.batch_checks_pending = 2
+
+        result = await ensure_folders("token", ["/Docs/A"])
+
+        assert result["success"] is True
+        assert len(fake_dropbox.calls("api:create_folder_batch/check")) == 3
+        assert result["api_calls"] == 4
+
+    @pytest.mark.asyncio
+    async def test_large_structures_are_split_into_concurrent_batches(self, fake_dropbox, monkeypatch):
+        monkeypatch.setattr(dropbox_folders, "DROPBOX_FOLDER_BATCH_SIZE", 2)
+
+        result = await ensure_folders("token", ["/A", "/B", "/C", "/D", "/E"])
+
+        assert result["success"] is True
+        assert result["api_calls"] == 3
+
+    @pytest.mark.asyncio
+    async def test_api_error_is_reported_not_raised(self, fake_dropbox):
+        fake_dropbox.fail("create_folder_batch", "error")
+
+        result = await ensure_folders("token", ["/Docs/A"])
+
+        assert result["success"] is False
+        assert result["failed"] == ["/Docs/A"]
+
+    @pytest.mark.asyncio
+    async def test_empty_input_makes_no_calls(self, fake_dropbox):
+        result = await ensure_folders("token", ["/", ""])
+
+        assert result["api_calls"] == 0
+        assert fake_dropbox.api_calls() == 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestKnownFolderCache:
+    """TTL, LRU eviction, invalidation and per-account isolation"""
+
+    def test_add_records_ancestors(self):
+        cache = KnownFolderCache()
+        cache.add("token", "/Cliente/Proc/01. Escritos")
+
+        assert cache.contains("token", "/cliente")
+        assert cache.contains("token", "/Cliente/Proc")
+        assert not cache.contains("token", "/Cliente/Otro")
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = KnownFolderCache(ttl=60, clock=clock)
+        cache.add("token", "/A")
+
+        clock.now += 59
+        assert cache.contains("token", "/A")
+        clock.now += 2
+        assert not cache.contains("token", "/A")
+        assert len(cache) == 0
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = KnownFolderCache(max_entries=2)
+        cache.add("token", "/A")
+        cache.add("token", "/B")
+        cache.contains("token", "/A")
+        cache.add("token", "/C")
+
+        assert cache.contains("token", "/A")
+        assert not cache.contains("token", "/B")
+        assert cache.contains("token", "/C")
+
+    def test_invalidate_removes_descendants_only(self):
+        cache = KnownFolderCache()
+        cache.add("token", "/A/B/C")
+        cache.add("token", "/A/BC")
+
+        cache.invalidate("token", "/A/B")
+
+        assert cache.contains("token", "/A")
+        assert cache.contains("token", "/A/BC")
+        assert not cache.contains("token", "/A/B")
+        assert not cache.contains("token", "/A/B/C")
+
+    def test_accounts_are_isolated(self):
+        cache = KnownFolderCache()
+        cache.add("token-a", "/A")
+
+        assert not cache.contains("token-b", "/A")
+
+
+class TestEnsureFoldersWithCache:
+    """Repeat provisioning is served from the known-folder cache"""
+
+    @pytest.mark.asyncio
+    async def test_repeat_structure_needs_no_api_calls(self, fake_dropbox):
+        structure = procedimiento_structure()["folder_structure"]
+        await ensure_folders("token", structure)
+
+        result = await ensure_folders("token", structure)
+
+        assert result["success"] is True
+        assert result["api_calls"] == 0
+        assert fake_dropbox.api_calls() == 1
+
+    @pytest.mark.asyncio
+    async def test_only_unknown_leaves_are_sent(self, fake_dropbox):
+        await ensure_folders("token", ["/Docs/A"])
+
+        await ensure_folders("token", ["/Docs/A", "/Docs/B"])
+
+        batch = fake_dropbox.calls("api:create_folder_batch")[-1]
+        assert batch[1]["paths"] == ["/Docs/B"]
+
+    @pytest.mark.asyncio
+    async def test_upload_not_found_invalidates_destination(self, fake_dropbox, tmp_path):
+        local = tmp_path / "doc.pdf"
+        local.write_bytes(b"data")
+        await ensure_folders("token", ["/Docs/A"])
+        fake_dropbox.fail("upload", "not_found", "not_found")
+
+        with pytest.raises(HTTPException):
+            await upload_file_to_dropbox("token", str(local), "/Docs/A", "doc.pdf", ensure_folder=False)
+
+        assert not known_folders.contains("token", "/Docs/A")
+        assert known_folders.contains("token", "/Docs")
+
+    @pytest.mark.asyncio
+    async def test_upload_not_found_recreates_destination_and_retries_once(self, fake_dropbox, tmp_path):
+        local = tmp_path / "doc.pdf"
+        local.write_bytes(b"data")
+        await ensure_folders("token", ["/Docs/A"])
+        fake_dropbox.fail("upload", "not_found")
+
+        result = await upload_file_to_dropbox("token", str(local), "/Docs/A", "doc.pdf", ensure_folder=False)
+
+        assert result["success"] is True
+        assert result["path"] == "/Docs/A/doc.pdf"
+        assert len(fake_dropbox.calls("upload")) == 2
+        assert len(fake_dropbox.calls("api:create_folder_batch")) == 2
+        assert known_folders.contains("token", "/Docs/A")
+
+    @pytest.mark.asyncio
+    async def test_finish_not_found_recreates_destination(self, fake_dropbox, tmp_path, monkeypatch):
+        monkeypatch.setattr(dropbox_uploader, "DROPBOX_SESSION_THRESHOLD", 2)
+        monkeypatch.setattr(dropbox_uploader, "DROPBOX_UPLOAD_CHUNK_SIZE", 2)
+        local = tmp_path / "doc.pdf"
+        local.write_bytes(b"data")
+        await ensure_folders("token", ["/Docs/A"])
+        fake_dropbox.fail("upload_session/finish", "not_found")
+
+        result = await upload_file_to_dropbox("token", str(local), "/Docs/A", "doc.pdf", ensure_folder=False)
+
+        assert result["path"] == "/Docs/A/doc.pdf"
+        assert len(fake_dropbox.calls("upload_session/finish")) == 2
+        assert len(fake_dropbox.calls("api:create_folder_batch")) == 2
+
+    @pytest.mark.asyncio
+    async def test_upload_session_not_found_keeps_destination(self, fake_dropbox, tmp_path, monkeypatch):
+        monkeypatch.setattr(dropbox_uploader, "DROPBOX_SESSION_THRESHOLD", 2)
+        monkeypatch.setattr(dropbox_uploader, "DROPBOX_UPLOAD_CHUNK_SIZE", 2)
+        local = tmp_path / "doc.pdf"
+        local.write_bytes(b"data")
+        await ensure_folders("token", ["/Docs/A"])
+        fake_dropbox.fail("upload_session/finish", "session_not_found")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_file_to_dropbox("token", str(local), "/Docs/A", "doc.pdf", ensure_folder=False)
+
+        assert exc_info.value.status_code == 409
+        assert known_folders.contains("token", "/Docs/A")
+        assert len(fake_dropbox.calls("upload_session/start")) == 1
+        assert len(fake_dropbox.calls("api:create_folder_batch")) == 1
+        assert fake_dropbox.files == {}
+
+
+async def post_upload_final(test_client, file_id, path_info):
+    from app.main import TEMP_STORAGE_PATH, temp_index
+
+    temp_file = TEMP_STORAGE_PATH / f"{file_id}_demanda.pdf"
+    temp_file.write_bytes(b"%PDF-1.4 test")
+    temp_index.register(file_id, temp_file, temp_file.stat().st_size, ".pdf", "")
+
+    with patch("app.auth.get_access_token", return_value="token"):
+        response = await test_client.post("/api/upload-final", json={
+            "file_id": file_id,
+            "filename": "2025-01-15_Demanda.pdf",
+            "dropbox_path": path_info["full_path"],
+            "folder_structure": path_info["folder_structure"],
+        })
+    return response, temp_file
+
+
+@pytest.mark.asyncio
+async def test_upload_final_provisions_folders_in_one_call(test_client, fake_dropbox):
+    """A full procedimiento upload needs one folder call plus the upload"""
+    response, temp_file = await post_upload_final(test_client, "batch-folders-test", procedimiento_structure())
+
+    assert response.status_code == 200
+    assert response.json()["folder_api_calls"] == 1
+    assert fake_dropbox.api_calls() == 1
+    assert len(fake_dropbox.calls("upload")) == 1
+    assert not temp_file.exists()
+
+
+@pytest.mark.asyncio
+async def test_repeat_upload_final_into_same_case_needs_no_folder_calls(test_client, fake_dropbox):
+    path_info = procedimiento_structure()
+    await post_upload_final(test_client, "first-upload", path_info)
+
+    response, _ = await post_upload_final(test_client, "second-upload", path_info)
+
+    assert response.status_code == 200
+    assert response.json()["folder_api_calls"] == 0
+    assert fake_dropbox.api_calls() == 1
+    assert len(fake_dropbox.calls("upload")) == 2
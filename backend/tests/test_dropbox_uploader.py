@@ -0,0 +1,183 @@
+"""
+Tests for Dropbox uploads (single-shot and chunked upload sessions)
+Uses the local fake Dropbox server from tests/fake_dropbox.py
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException
+
+from app import dropbox_uploader
+from app.dropbox_uploader import upload_file_to_dropbox
+
+
+CHUNK = 1024
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """Use tiny chunks and skip folder creation so tests stay local"""
+    monkeypatch.setattr(dropbox_uploader, "DROPBOX_SESSION_THRESHOLD", 2 * CHUNK)
+    monkeypatch.setattr(dropbox_uploader, "DROPBOX_UPLOAD_CHUNK_SIZE", CHUNK)
+    with patch("app.dropbox_uploader.create_folder_if_not_exists", new_callable=AsyncMock):
+        yield
+
+
+def make_file(tmp_path, size: int):
+    content = bytes(i % 251 for i in range(size))
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(content)
+    return path, content
+
+
+class TestModeSelection:
+    """Single-shot vs session mode is picked by file size"""
+
+    @pytest.mark.asyncio
+    async def test_small_file_uses_single_upload(self, fake_dropbox, tmp_path):
+        path, content = make_file(tmp_path, 2 * CHUNK)
+
+        result = await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        assert result["path"] == "/Docs/scan.pdf"
+        assert len(fake_dropbox.calls("upload")) == 1
+        assert fake_dropbox.calls("upload_session/start") == []
+        assert fake_dropbox.files["/Docs/scan.pdf"] == content
+
+    @pytest.mark.asyncio
+    async def test_large_file_uses_upload_session(self, fake_dropbox, tmp_path):
+        path, content = make_file(tmp_path, 3 * CHUNK + 100)
+
+        result = await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        assert result["size"] == len(content)
+        assert fake_dropbox.calls("upload") == []
+        assert fake_dropbox.files["/Docs/scan.pdf"] == content
+
+
+class TestChunkBoundaries:
+    """Chunks are contiguous and bounded by the configured chunk size"""
+
+    @pytest.mark.asyncio
+    async def test_chunk_offsets_and_sizes(self, fake_dropbox, tmp_path):
+        path, _ = make_file(tmp_path, 3 * CHUNK + 100)
+
+        await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        start = fake_dropbox.calls("upload_session/start")
+        appends = fake_dropbox.calls("upload_session/append_v2")
+        finish = fake_dropbox.calls("upload_session/finish")
+
+        assert start[0][2] == CHUNK
+        assert [(a[1]["cursor"]["offset"], a[2]) for a in appends] == [(CHUNK, CHUNK), (2 * CHUNK, CHUNK)]
+        assert finish[0][1]["cursor"]["offset"] == 3 * CHUNK
+        assert finish[0][2] == 100
+        assert finish[0][1]["commit"]["mode"] == "add"
+
+    @pytest.mark.asyncio
+    async def test_exact_multiple_of_chunk_size(self, fake_dropbox, tmp_path):
+        path, content = make_file(tmp_path, 4 * CHUNK)
+
+        await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        finish = fake_dropbox.calls("upload_session/finish")
+        assert finish[0][2] == CHUNK
+        assert fake_dropbox.files["/Docs/scan.pdf"] == content
+
+
+class TestRetryAndResume:
+    """Individual chunks are retried and uploads resume at Dropbox's offset"""
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_is_retried(self, fake_dropbox, tmp_path):
+        path, content = make_file(tmp_path, 3 * CHUNK + 100)
+        fake_dropbox.fail("upload_session/append_v2", "error", "rate_limit")
+
+        await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        offsets = [a[1]["cursor"]["offset"] for a in fake_dropbox.calls("upload_session/append_v2")]
+        assert offsets == [CHUNK, CHUNK, CHUNK, 2 * CHUNK]
+        assert fake_dropbox.files["/Docs/scan.pdf"] == content
+
+    @pytest.mark.asyncio
+    async def test_lost_response_resumes_from_correct_offset(self, fake_dropbox, tmp_path):
+        path, content = make_file(tmp_path, 3 * CHUNK + 100)
+        # Dropbox stores the chunk but the response never arrives
+        fake_dropbox.fail("upload_session/append_v2", "lost")
+
+        await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        offsets = [a[1]["cursor"]["offset"] for a in fake_dropbox.calls("upload_session/append_v2")]
+        # Retry at CHUNK gets incorrect_offset -> resume at 2*CHUNK
+        assert offsets == [CHUNK, CHUNK, 2 * CHUNK]
+        assert fake_dropbox.files["/Docs/scan.pdf"] == content
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self, fake_dropbox, tmp_path, monkeypatch):
+        monkeypatch.setattr(dropbox_uploader, "DROPBOX_CHUNK_RETRIES", 2)
+        path, _ = make_file(tmp_path, 3 * CHUNK + 100)
+        fake_dropbox.fail("upload_session/append_v2", "error", "error", "error")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        assert exc_info.value.status_code == 500
+        assert len(fake_dropbox.calls("upload_session/append_v2")) == 3
+        assert "/Docs/scan.pdf" not in fake_dropbox.files
+
+    @pytest.mark.asyncio
+    async def test_failed_start_is_retried(self, fake_dropbox, tmp_path):
+        path, content = make_file(tmp_path, 3 * CHUNK + 100)
+        fake_dropbox.fail("upload_session/start", "lost")
+
+        await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        assert len(fake_dropbox.calls("upload_session/start")) == 2
+        assert fake_dropbox.files == {"/Docs/scan.pdf": content}
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("correct_offset", [0, CHUNK, 10 * CHUNK])
+    async def test_offset_that_does_not_move_forward_fails(self, fake_dropbox, tmp_path, correct_offset):
+        path, _ = make_file(tmp_path, 3 * CHUNK + 100)
+        # First append is sent at CHUNK: only (CHUNK, file size] moves forward
+        fake_dropbox.fail("upload_session/append_v2", f"offset:{correct_offset}")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        assert exc_info.value.status_code == 502
+        assert len(fake_dropbox.calls("upload_session/append_v2")) == 1
+        assert fake_dropbox.files == {}
+
+    @pytest.mark.asyncio
+    async def test_resumes_are_capped(self, fake_dropbox, tmp_path, monkeypatch):
+        monkeypatch.setattr(dropbox_uploader, "DROPBOX_MAX_RESUMES", 1)
+        path, _ = make_file(tmp_path, 4 * CHUNK + 100)
+        fake_dropbox.fail("upload_session/append_v2", f"offset:{2 * CHUNK}", f"offset:{3 * CHUNK}")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        assert exc_info.value.status_code == 502
+        assert len(fake_dropbox.calls("upload_session/append_v2")) == 2
+        assert fake_dropbox.files == {}
+
+    @pytest.mark.asyncio
+    async def test_finish_is_not_repeated_after_lost_response(self, fake_dropbox, tmp_path):
+        path, content = make_file(tmp_path, 3 * CHUNK + 100)
+        # Dropbox commits the file but the response never arrives
+        fake_dropbox.fail("upload_session/finish", "lost")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf")
+
+        assert exc_info.value.status_code == 500
+        assert len(fake_dropbox.calls("upload_session/finish")) == 1
+        assert fake_dropbox.files == {"/Docs/scan.pdf": content}
+
+
+@pytest.mark.asyncio
+async def test_missing_local_file_returns_404(fake_dropbox, tmp_path):
+    with pytest.raises(HTTPException) as exc_info:
+        await upload_file_to_dropbox("token", str(tmp_path / "missing.pdf"), "/Docs", "x.pdf")
+
+    assert exc_info.value.status_code == 404
@@ -0,0 +1,143 @@
+"""
+Tests for the content-addressed extraction cache
+"""
+import asyncio
+import os
+from unittest.mock import AsyncMock, patch
+
+import fitz
+import pytest
+
+from app.document_preview import DocumentPreviewService
+from app.extraction_cache import ExtractionCache, file_sha256
+
+METADATA = {"pages": 1, "has_tables": False, "has_figures": False}
+
+
+class TestExtractionCache:
+    """Tests for ExtractionCache"""
+
+    def test_round_trip(self, tmp_path):
+        cache = ExtractionCache(tmp_path)
+        elements = [{"label": "para", "text": "Hola", "reading_order": 0}]
+
+        cache.put("abc", "dolphin", "v1", "Hola", METADATA, 0.85, elements)
+        entry = cache.get("abc", "dolphin", "v1")
+
+        assert entry == {"text": "Hola", "elements": elements, "metadata": METADATA, "confidence": 0.85}
+        assert cache.stats() == {"hits": 1, "misses": 0, "evictions": 0}
+
+    def test_key_includes_backend_and_version(self, tmp_path):
+        cache = ExtractionCache(tmp_path)
+        cache.put("abc", "pymupdf", "1.23", "text", METADATA, 0.7)
+
+        assert cache.get("abc", "pymupdf", "1.24") is None
+        assert cache.get("abc", "dolphin", "1.23") is None
+        assert cache.get("other", "pymupdf", "1.23") is None
+        assert cache.get("abc", "pymupdf", "1.23") is not None
+
+    def test_entries_are_compressed(self, tmp_path):
+        cache = ExtractionCache(tmp_path)
+        text = "Juzgado de Primera Instancia nº 3 de Madrid. " * 2000
+
+        cache.put("abc", "pymupdf", "1", text, METADATA, 0.7)
+
+        [entry_file] = list(tmp_path.glob("*.json.gz"))
+        assert entry_file.stat().st_size < len(text) / 10
+
+    def test_evicts_least_recently_used_over_size_limit(self, tmp_path):
+        cache = ExtractionCache(tmp_path, max_bytes=10_000)
+        for name in ["a", "b", "c"]:
+            cache.put(name, "pymupdf", "1", os.urandom(2500).hex(), METADATA, 0.7)
+            for path in tmp_path.glob("*.json.gz"):
+                os.utime(path, (path.stat().st_mtime - 10, path.stat().st_mtime - 10))
+        # Touch "a" so "b" is the least recently used
+        assert cache.get("a", "pymupdf", "1") is not None
+
+        cache.put("d", "pymupdf", "1", os.urandom(2500).hex(), METADATA, 0.7)
+
+        assert cache.get("b", "pymupdf", "1") is None
+        assert cache.get("a", "pymupdf", "1") is not None
+        assert cache.get("d", "pymupdf", "1") is not None
+        assert cache.evictions >= 1
+
+    def test_size_is_tracked_without_rescanning(self, tmp_path):
+        cache = ExtractionCache(tmp_path, max_bytes=1_000_000)
+
+        with patch.object(cache, "_scan", wraps=cache._scan) as scan:
+            for name in ["a", "b", "c"]:
+                cache.put(name, "pymupdf", "1", os.urandom(500).hex(), METADATA, 0.7)
+            cache.put("a", "pymupdf", "1", "short", METADATA, 0.7)
+
+        assert scan.call_count == 1
+        assert cache._total_bytes == sum(path.stat().st_size for path in tmp_path.glob("*.json.gz"))
+
+    @pytest.mark.asyncio
+    async def test_async_access_runs_in_a_thread(self, tmp_path):
+        cache = ExtractionCache(tmp_path)
+
+        with patch("app.extraction_cache.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            await cache.aput("abc", "pymupdf", "1", "text", METADATA, 0.7)
+            entry = await cache.aget("abc", "pymupdf", "1")
+
+        assert entry["text"] == "text"
+        assert to_thread.call_count == 2
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path):
+        cache = ExtractionCache(tmp_path)
+        cache.put("abc", "pymupdf", "1", "text", METADATA, 0.7)
+        [entry_file] = list(tmp_path.glob("*.json.gz"))
+        entry_file.write_bytes(b"not gzip")
+
+        assert cache.get("abc", "pymupdf", "1") is None
+        assert not entry_file.exists()
+
+
+@pytest.fixture
+def pdf_file(tmp_path):
+    path = tmp_path / "demanda.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Demanda de juicio ordinario contra Banco Ejemplo")
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def preview_service(tmp_path):
+    """PyMuPDF-only preview service using an isolated cache"""
+    cache = ExtractionCache(tmp_path / "cache")
+    with patch("app.document_preview.is_gemini_available", return_value=False), \
+         patch("app.document_preview.get_extraction_cache", return_value=cache):
+        yield DocumentPreviewService(policy="pymupdf"), cache
+
+
+class TestPreviewUsesExtractionCache:
+    """DocumentPreviewService parses each distinct document only once"""
+
+    @pytest.mark.asyncio
+    async def test_second_preview_skips_parsing(self, preview_service, pdf_file):
+        service, cache = preview_service
+
+        pymupdf = service.parsers.backends["pymupdf"]
+        with patch.object(pymupdf, "parse", wraps=pymupdf.parse) as extract:
+            first = await service.generate_preview(str(pdf_file), "file-1")
+            second = await service.generate_preview(str(pdf_file), "file-2", content_hash=file_sha256(str(pdf_file)))
+
+        assert extract.call_count == 1
+        assert first["status"] == second["status"] == "success"
+        assert second["raw_text"] == first["raw_text"]
+        assert "Banco Ejemplo" in second["raw_text"]
+        assert cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_extraction_is_not_cached(self, preview_service, pdf_file):
+        service, cache = preview_service
+        empty = ({**METADATA, "text": ""}, 0.7)
+
+        with patch.object(service.parsers.backends["pymupdf"], "parse", new=AsyncMock(return_value=empty)) as extract:
+            await service.generate_preview(str(pdf_file), "file-1")
+            await service.generate_preview(str(pdf_file), "file-1")
+
+        assert extract.call_count == 2
+        assert list(cache.root.glob("*.json.gz")) == []
@@ -0,0 +1,221 @@
+"""
+Tests for the Gemini response cache (TTL, negative caching, single-flight, persistence)
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.gemini_cache import GeminiCache, cache_key
+
+CONFIG = {"temperature": 0.1, "maxOutputTokens": 50}
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def counting_call(result):
+    """Coroutine factory returning result and counting invocations"""
+    calls = {"count": 0}
+
+    async def call():
+        calls["count"] += 1
+        await asyncio.sleep(0)
+        return result
+
+    return call, calls
+
+
+class TestCacheKey:
+    """Tests for cache_key"""
+
+    def test_depends_on_model_config_and_prompt(self):
+        base = cache_key("m", CONFIG, "prompt")
+
+        assert cache_key("m", dict(reversed(list(CONFIG.items()))), "prompt") == base
+        assert cache_key("other", CONFIG, "prompt") != base
+        assert cache_key("m", {**CONFIG, "temperature": 0.2}, "prompt") != base
+        assert cache_key("m", CONFIG, "prompt 2") != base
+
+
+class TestGeminiCache:
+    """Tests for GeminiCache.get_or_call"""
+
+    @pytest.mark.asyncio
+    async def test_identical_prompt_is_sent_once(self):
+        cache = GeminiCache(":memory:")
+        call, calls = counting_call("procedimiento")
+
+        first = await cache.get_or_call("m", CONFIG, "prompt", call)
+        second = await cache.get_or_call("m", CONFIG, "prompt", call)
+
+        assert first == second == "procedimiento"
+        assert calls["count"] == 1
+        assert cache.stats["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = GeminiCache(":memory:", ttl=60, clock=clock)
+        call, calls = counting_call("proyecto")
+
+        await cache.get_or_call("m", CONFIG, "prompt", call)
+        clock.now += 61
+        await cache.get_or_call("m", CONFIG, "prompt", call)
+
+        assert calls["count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_negative_results_use_shorter_ttl(self):
+        clock = FakeClock()
+        cache = GeminiCache(":memory:", ttl=3600, negative_ttl=60, clock=clock)
+        call, calls = counting_call("AMBIGUO")
+        negative = lambda result: result == "AMBIGUO"
+
+        await cache.get_or_call("m", CONFIG, "prompt", call, negative)
+        await cache.get_or_call("m", CONFIG, "prompt", call, negative)
+        assert calls["count"] == 1
+        assert cache.stats["negative_hits"] == 1
+
+        clock.now += 61
+        await cache.get_or_call("m", CONFIG, "prompt", call, negative)
+        assert calls["count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self):
+        cache = GeminiCache(":memory:")
+        call, calls = counting_call(None)
+
+        await cache.get_or_call("m", CONFIG, "prompt", call)
+        await cache.get_or_call("m", CONFIG, "prompt", call)
+
+        assert calls["count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_share_one_call(self):
+        cache = GeminiCache(":memory:")
+        release = asyncio.Event()
+        calls = {"count": 0}
+
+        async def slow_call():
+            calls["count"] += 1
+            await release.wait()
+            return {"summary": "ok"}
+
+        tasks = [asyncio.create_task(cache.get_or_call("m", CONFIG, "prompt", slow_call)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert calls["count"] == 1
+        assert results == [{"summary": "ok"}] * 5
+        assert cache.stats["coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_concurrent_waiters_see_the_same_exception(self):
+        cache = GeminiCache(":memory:")
+        release = asyncio.Event()
+
+        async def failing_call():
+            await release.wait()
+            raise RuntimeError("boom")
+
+        tasks = [asyncio.create_task(cache.get_or_call("m", CONFIG, "prompt", failing_call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_coalesced_callers(self):
+        cache = GeminiCache(":memory:")
+        release = asyncio.Event()
+        call, calls = counting_call({"summary": "ok"})
+
+        async def slow_call():
+            await release.wait()
+            return await call()
+
+        leader = asyncio.create_task(cache.get_or_call("m", CONFIG, "prompt", slow_call))
+        follower = asyncio.create_task(cache.get_or_call("m", CONFIG, "prompt", slow_call))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await follower == {"summary": "ok"}
+        assert leader.cancelled()
+        assert calls["count"] == 1
+        assert await cache.get_or_call("m", CONFIG, "prompt", slow_call) == {"summary": "ok"}
+        assert calls["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_call_is_cancelled_once_every_caller_gave_up(self):
+        cache = GeminiCache(":memory:")
+        cancelled = asyncio.Event()
+
+        async def hanging_call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.create_task(cache.get_or_call("m", CONFIG, "prompt", hanging_call))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert cache._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_survives_restart(self, tmp_path):
+        db_path = str(tmp_path / "gemini.db")
+        call, calls = counting_call({"summary": "Demanda", "confidence": 0.9})
+        await GeminiCache(db_path).get_or_call("m", CONFIG, "prompt", call)
+
+        restarted = GeminiCache(db_path)
+        result = await restarted.get_or_call("m", CONFIG, "prompt", call)
+
+        assert result == {"summary": "Demanda", "confidence": 0.9}
+        assert calls["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_extract_with_gemini_rest_caches_identical_answers(isolated_gemini_cache):
+    """Repeated common answers reach Gemini only once"""
+    from app import gemini_rest_extractor
+
+    with patch.object(gemini_rest_extractor, "GEMINI_AVAILABLE", True), \
+         patch.object(gemini_rest_extractor, "_call_gemini", new=AsyncMock(return_value="procedimiento")) as call:
+        first = await gemini_rest_extractor.extract_with_gemini_rest("tipo_trabajo", "procedimiento judicial")
+        second = await gemini_rest_extractor.extract_with_gemini_rest("tipo_trabajo", "procedimiento judicial")
+        other = await gemini_rest_extractor.extract_with_gemini_rest("tipo_trabajo", "un juicio")
+
+    assert first == second == other == "procedimiento"
+    assert call.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_summarize_document_caches_by_document_text(isolated_gemini_cache):
+    from app import gemini_summarizer
+
+    summary = {"summary": "Demanda", "document_type": "demanda", "confidence": 0.9}
+    metadata = {"pages": 1, "has_tables": False, "has_figures": False}
+
+    with patch.object(gemini_summarizer, "GEMINI_AVAILABLE", True), \
+         patch.object(gemini_summarizer, "_request_summary", new=AsyncMock(return_value=summary)) as request:
+        await gemini_summarizer.summarize_document("Texto de la demanda", metadata)
+        result = await gemini_summarizer.summarize_document("Texto de la demanda", metadata)
+
+    assert result == summary
+    assert request.await_count == 1
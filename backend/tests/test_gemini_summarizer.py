@@ -0,0 +1,115 @@
+"""
+Tests for the long-document (map-reduce) summarization mode
+"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app import gemini_summarizer
+from app.gemini_summarizer import merge_summaries, score_chunk, select_salient_chunks, split_chunks
+
+METADATA = {"pages": 120, "has_tables": False, "has_figures": False}
+
+FILLER = "El presente escrito se presenta en tiempo y forma conforme a derecho. " * 40
+
+
+def summary(confidence=0.8, **key_information):
+    return {
+        "summary": "Resumen",
+        "document_type": "demanda",
+        "is_legal_document": True,
+        "confidence": confidence,
+        "key_information": key_information,
+        "suggested_answers": {},
+    }
+
+
+class TestChunking:
+    """split_chunks / score_chunk / select_salient_chunks"""
+
+    def test_chunks_respect_size_and_keep_all_text(self):
+        text = "\n\n".join(f"Párrafo {n}. " + "texto " * 100 for n in range(20))
+
+        chunks = split_chunks(text, chunk_chars=1500)
+
+        assert all(len(chunk) <= 1500 for chunk in chunks)
+        assert "".join(chunks).replace("\n\n", "") == text.replace("\n\n", "")
+
+    def test_legal_identifiers_score_higher(self):
+        assert score_chunk("Juzgado de lo Social nº 3, procedimiento 1234/2023, demandante: Ana") > score_chunk(FILLER)
+        assert score_chunk(FILLER) == 0
+
+    def test_selects_first_and_salient_chunks_within_budget(self):
+        chunks = [FILLER, FILLER, "Autos 56/2024 del Juzgado de Primera Instancia", FILLER, "Juzgado nº 2, recurrente Luis"]
+
+        assert select_salient_chunks(chunks, token_budget=100000) == [0, 2, 4]
+        assert select_salient_chunks(chunks, token_budget=1400, chunk_overhead=300) == [0, 2]
+
+
+class TestMergeSummaries:
+    """merge_summaries"""
+
+    def test_first_non_null_value_wins_and_lists_are_combined(self):
+        merged = merge_summaries([
+            summary(juzgado=None, numero_procedimiento=None, partes=["Ana"]),
+            summary(juzgado="Juzgado Social 3", numero_procedimiento="1234/2023", partes=["Ana", "Banco"]),
+            summary(juzgado="Otro juzgado", numero_procedimiento=None, partes=None),
+        ])
+
+        assert merged["key_information"] == {
+            "juzgado": "Juzgado Social 3",
+            "numero_procedimiento": "1234/2023",
+            "partes": ["Ana", "Banco"],
+        }
+
+    def test_unparseable_chunks_are_ignored(self):
+        merged = merge_summaries([summary(confidence=0.0, juzgado="basura"), summary(juzgado="Juzgado 1")])
+
+        assert merged["key_information"]["juzgado"] == "Juzgado 1"
+
+
+class TestLongDocumentMode:
+    """summarize_document on long texts"""
+
+    @pytest.mark.asyncio
+    async def test_summarizes_salient_chunks_concurrently_and_merges(self, isolated_gemini_cache):
+        text = "\n\n".join([FILLER] * 10 + ["Juzgado de lo Social nº 3 de Madrid. Procedimiento 1234/2023."] + [FILLER] * 10)
+        prompts = []
+        running = {"now": 0, "max": 0}
+
+        async def fake_request(prompt, generation_config):
+            prompts.append(prompt)
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            if "1234/2023" in prompt:
+                return summary(juzgado="Juzgado de lo Social nº 3", numero_procedimiento="1234/2023")
+            return summary(juzgado=None, numero_procedimiento=None)
+
+        with patch.object(gemini_summarizer, "GEMINI_AVAILABLE", True), \
+             patch.object(gemini_summarizer, "SUMMARY_CONCURRENCY", 2), \
+             patch.object(gemini_summarizer, "_request_summary", new=fake_request):
+            result = await gemini_summarizer.summarize_document(text, METADATA)
+
+        assert result["key_information"]["numero_procedimiento"] == "1234/2023"
+        assert 2 <= len(prompts) < len(split_chunks(text))
+        assert running["max"] <= 2
+
+    @pytest.mark.asyncio
+    async def test_token_budget_caps_requests(self, isolated_gemini_cache):
+        text = "\n\n".join(f"Juzgado nº {n}, autos {n}/2024." + FILLER for n in range(30))
+        prompts = []
+
+        async def fake_request(prompt, generation_config):
+            prompts.append(prompt)
+            return summary()
+
+        with patch.object(gemini_summarizer, "GEMINI_AVAILABLE", True), \
+             patch.object(gemini_summarizer, "SUMMARY_TOKEN_BUDGET", 6000), \
+             patch.object(gemini_summarizer, "_request_summary", new=fake_request):
+            await gemini_summarizer.summarize_document(text, METADATA)
+
+        spent = sum(gemini_summarizer.estimate_tokens(p) + 500 for p in prompts)
+        assert 1 <= len(prompts) and spent <= 6000 + 200
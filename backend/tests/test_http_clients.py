@@ -0,0 +1,93 @@
+"""
+Tests for the shared per-upstream HTTP client registry
+"""
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from app import http_clients
+from app.http_clients import get_client, startup_clients, shutdown_clients
+
+
+@pytest.fixture(autouse=True)
+async def clean_registry():
+    """Each test starts and ends with no clients registered"""
+    await shutdown_clients()
+    yield
+    await shutdown_clients()
+
+
+class TestClientRegistry:
+    """Tests for get_client / startup / shutdown"""
+
+    def test_same_client_is_reused_for_an_upstream(self):
+        assert get_client("gemini") is get_client("gemini")
+
+    def test_each_upstream_has_its_own_pool(self):
+        clients = {name: get_client(name) for name in http_clients.UPSTREAMS}
+
+        assert len({id(c) for c in clients.values()}) == len(http_clients.UPSTREAMS)
+
+    def test_unknown_upstream_raises(self):
+        with pytest.raises(KeyError):
+            get_client("unknown")
+
+    @pytest.mark.asyncio
+    async def test_startup_creates_all_and_shutdown_closes_them(self):
+        await startup_clients()
+        clients = list(http_clients._clients.values())
+        assert len(clients) == len(http_clients.UPSTREAMS)
+
+        await shutdown_clients()
+
+        assert all(c.is_closed for c in clients)
+        assert http_clients._clients == {}
+
+    @pytest.mark.asyncio
+    async def test_closed_client_is_recreated(self):
+        client = get_client("dolphin")
+        await client.aclose()
+
+        assert get_client("dolphin") is not client
+
+    def test_http2_falls_back_without_h2(self, monkeypatch):
+        monkeypatch.setattr(http_clients, "HTTP2_AVAILABLE", False)
+        monkeypatch.setitem(http_clients.UPSTREAMS["gemini"], "http2", True)
+
+        # Would raise ImportError if http2=True were passed without h2
+        assert isinstance(get_client("gemini"), httpx.AsyncClient)
+
+
+class TestUpstreamConfig:
+    """Pool settings can be overridden per upstream from the environment"""
+
+    def test_env_overrides(self, monkeypatch):
+        monkeypatch.setenv("DROPBOX_API_HTTP_MAX_CONNECTIONS", "3")
+        monkeypatch.setenv("DROPBOX_API_HTTP_KEEPALIVE_EXPIRY", "15")
+        monkeypatch.setenv("DROPBOX_API_HTTP2", "false")
+
+        config = http_clients._upstream_config("dropbox_api", timeout=5.0, max_connections=20, max_keepalive=10)
+
+        assert config["max_connections"] == 3
+        assert config["keepalive_expiry"] == 15.0
+        assert config["http2"] is False
+        assert config["timeout"] == 5.0
+
+
+@pytest.mark.asyncio
+async def test_requests_reuse_one_connection_pool():
+    """Consecutive calls through the registry share the same transport"""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.host)
+        return httpx.Response(200, json={})
+
+    http_clients._clients["dropbox_api"] = AsyncClient(transport=httpx.MockTransport(handler))
+
+    from app.dropbox_helper import folder_exists, list_folders_in_path
+    await folder_exists("token", "/A")
+    await list_folders_in_path("token", "/A")
+
+    assert calls == ["api.dropboxapi.com", "api.dropboxapi.com"]
+    assert not http_clients._clients["dropbox_api"].is_closed
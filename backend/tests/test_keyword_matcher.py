@@ -0,0 +1,58 @@
+"""
+Tests for the compiled keyword matcher
+"""
+from app.keyword_matcher import KeywordMatcher, normalize_text, split_words
+
+
+class TestNormalization:
+    """Tests for normalize_text and split_words"""
+
+    def test_lowercases_and_strips_accents(self):
+        assert normalize_text("Jurisdicción Contencioso") == "jurisdiccion contencioso"
+        assert normalize_text("Diseño") == "diseño"
+
+    def test_splits_words_without_punctuation(self):
+        assert split_words("contencioso-administrativo, (civil).") == ["contencioso", "administrativo", "civil"]
+
+
+class TestKeywordMatcher:
+    """Tests for KeywordMatcher"""
+
+    matcher = KeywordMatcher({
+        "legal": ["juzgado", "auto", "asesor*", "informe legal"],
+        "seguros": ["prima", "seguro", "poliza"],
+    })
+
+    def test_matches_whole_words_only(self):
+        assert self.matcher.scores("Juzgado de Primera Instancia") == {"legal": 1, "seguros": 0}
+        assert self.matcher.best("automóvil") is None
+
+    def test_matches_plurals_and_accents(self):
+        assert self.matcher.scores("dos pólizas y varios juzgados") == {"legal": 1, "seguros": 1}
+
+    def test_matches_stems(self):
+        assert self.matcher.best("asesoría") == "legal"
+        assert self.matcher.best("asesoramiento") == "legal"
+
+    def test_matches_multi_word_keywords(self):
+        assert self.matcher.keywords("un  Informe legales") == {"informe legal"}
+        assert self.matcher.keywords("informe") == set()
+
+    def test_counts_distinct_keywords(self):
+        assert self.matcher.scores("seguro, seguro y seguros") == {"legal": 0, "seguros": 1}
+
+    def test_counts_keywords_inside_multi_word_keywords(self):
+        matcher = KeywordMatcher({"legal": ["legal", "informe legal"], "seguros": ["seguro"]})
+        assert matcher.scores("un informe legal") == {"legal": 2, "seguros": 0}
+        assert matcher.scores("informe-legales") == {"legal": 2, "seguros": 0}
+
+    def test_best_returns_none_on_tie(self):
+        assert self.matcher.best("auto de la póliza") is None
+        assert self.matcher.best("auto del juzgado sobre la póliza") == "legal"
+
+    def test_first_follows_declaration_order(self):
+        matcher = KeywordMatcher({"contencioso": ["contencioso"], "social": ["social", "laboral"]})
+        assert matcher.first("social y contencioso") == "contencioso"
+        assert matcher.first("laboral") == "social"
+        assert matcher.first("asociación") is None
+
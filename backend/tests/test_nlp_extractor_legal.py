@@ -0,0 +1,98 @@
+"""
+Tests for the legal NLP extractor
+"""
+from app.nlp_extractor_legal import extract_information_legal, extract_with_confidence_legal
+
+
+class TestCategoria:
+    """Tests for categoria extraction"""
+
+    def test_legal_and_seguros(self):
+        assert extract_information_legal("categoria", "es un documento legal") == "legal"
+        assert extract_information_legal("categoria", "es una póliza de seguros") == "seguros"
+        assert extract_information_legal("categoria", "siniestro") == "seguros"
+
+    def test_words_inside_other_words_do_not_count(self):
+        # "primera" no es "prima" (seguros)
+        assert extract_information_legal("categoria", "Juzgado de Primera Instancia") == "legal"
+
+    def test_unknown_answer(self):
+        assert extract_information_legal("categoria", "no lo sé") is None
+
+
+class TestTipoTrabajo:
+    """Tests for tipo_trabajo extraction"""
+
+    def test_procedimiento_and_proyecto(self):
+        assert extract_information_legal("tipo_trabajo", "es un procedimiento judicial") == "procedimiento"
+        assert extract_information_legal("tipo_trabajo", "Es un proyecto de asesoría") == "proyecto"
+        assert extract_information_legal("tipo_trabajo", "dictamen") == "proyecto"
+
+    def test_tie_returns_none(self):
+        assert extract_information_legal("tipo_trabajo", "informe legal") == "proyecto"
+        assert extract_information_legal("tipo_trabajo", "sentencia sobre el informe") is None
+
+
+class TestJurisdiccion:
+    """Tests for jurisdiccion extraction"""
+
+    def test_priority(self):
+        assert extract_information_legal("jurisdiccion", "Juzgado de lo Contencioso-Administrativo") == "contencioso"
+        assert extract_information_legal("jurisdiccion", "Sala de lo Social del TSJ") == "social"
+        assert extract_information_legal("jurisdiccion", "Juzgado de Primera Instancia") == "civil"
+        assert extract_information_legal("jurisdiccion", "Juzgado de Instrucción nº 2") == "instrucción"
+
+    def test_social_inside_word(self):
+        assert extract_information_legal("jurisdiccion", "asociación vecinal") is None
+
+
+class TestNumbers:
+    """Tests for juzgado and procedimiento numbers"""
+
+    def test_juzgado_num(self):
+        assert extract_information_legal("juzgado_num", "Juzgado número 2") == "2"
+        assert extract_information_legal("juzgado_num", "Juzgado Social 4") == "4"
+        assert extract_information_legal("juzgado_num", "CA1") == "1"
+        assert extract_information_legal("juzgado_num", " 5 ") == "5"
+
+    def test_num_procedimiento(self):
+        assert extract_information_legal("num_procedimiento", "Autos 123/2025") == "123/2025"
+        assert extract_information_legal("num_procedimiento", "el numero es 455/2025") == "455/2025"
+        assert extract_information_legal("num_procedimiento", "no lo tengo") is None
+
+
+class TestProyecto:
+    """Tests for proyecto fields"""
+
+    def test_month(self):
+        assert extract_information_legal("proyecto_month", "mes de agosto") == "08"
+        assert extract_information_legal("proyecto_month", "mes 8") == "08"
+        # "mayor" no es "may"
+        assert extract_information_legal("proyecto_month", "el mayor") is None
+
+    def test_materia(self):
+        assert extract_information_legal("materia_proc", "indemnización por despido") == "Despidos"
+        assert extract_information_legal("materia_proc", "Art 316 CP") == "Art316CP"
+        assert extract_information_legal("proyecto_materia", "en materia de Diseño Industrial") == "DisenoIndustrial"
+
+
+class TestConfidence:
+    """Tests for extract_with_confidence_legal"""
+
+    def test_unambiguous_keywords_are_confident(self):
+        assert extract_with_confidence_legal("tipo_trabajo", "procedimiento") == ("procedimiento", 0.9)
+        assert extract_with_confidence_legal("tipo_trabajo", "sentencia sobre el informe") == (None, 0.0)
+
+    def test_competing_or_negated_keywords_lower_confidence(self):
+        value, confidence = extract_with_confidence_legal("tipo_trabajo", "informe sobre el juicio y la demanda")
+        assert value == "procedimiento" and confidence < 0.8
+        assert extract_with_confidence_legal("tipo_trabajo", "no es un juicio")[1] <= 0.5
+
+    def test_doc_type_is_canonical(self):
+        assert extract_with_confidence_legal("doc_type_proc", "Un recurso de apelación") == ("Recurso de apelación", 0.9)
+        assert extract_with_confidence_legal("doc_type_proyecto", "Borrador de convenio") == ("Borrador de convenio", 0.3)
+
+    def test_client(self):
+        assert extract_with_confidence_legal("client", "El Corte Inglés") == ("El Corte Inglés", 0.9)
+        assert extract_with_confidence_legal("client", "El cliente es Juan Pérez")[1] == 0.3
+        assert extract_with_confidence_legal("client", "no lo sé")[1] == 0.3
@@ -0,0 +1,282 @@
+"""
+Tests for the parser backend abstraction and selection policy
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fitz
+import pytest
+
+from test_document_workers import write_mixed_pdf
+from app.document_preview import DocumentPreviewService
+from app.extraction_cache import ExtractionCache, file_sha256
+from app.parser_backends import (
+    ParserBackend,
+    ParserSelector,
+    PyMuPDFBackend,
+    RestDolphinBackend,
+    TextLayerFastPath,
+)
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeBackend(ParserBackend):
+    """Backend with scripted health and output"""
+
+    def __init__(self, name, available=True, text="texto", error=None, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.available = available
+        self.text = text
+        self.error = error
+        self.probes = 0
+        self.parses = 0
+
+    async def probe(self):
+        self.probes += 1
+        return {"available": self.available, "error": None if self.available else "down"}
+
+    def version(self):
+        return "1"
+
+    async def parse(self, file_path, max_chars=None, max_pages=None):
+        self.parses += 1
+        if self.error:
+            raise self.error
+        return {"text": self.text, "pages": 1, "has_tables": False, "has_figures": False}, 0.9
+
+
+def rest_client(health=None, parse_result=None, parse_error=None):
+    client = MagicMock()
+    client.api_url = "http://dolphin.test"
+    if isinstance(health, Exception):
+        client.check_health = AsyncMock(side_effect=health)
+    else:
+        client.check_health = AsyncMock(return_value=health or {"status": "healthy", "model_loaded": True})
+    client.parse_document = AsyncMock(return_value=parse_result, side_effect=parse_error)
+    return client
+
+
+class TestParserSelector:
+    """Tests for ParserSelector"""
+
+    @pytest.mark.asyncio
+    async def test_selects_first_healthy_backend_in_policy_order(self):
+        backends = {
+            "dolphin-api": FakeBackend("dolphin-api", available=False),
+            "dolphin": FakeBackend("dolphin"),
+            "pymupdf": FakeBackend("pymupdf"),
+        }
+
+        assert (await ParserSelector(backends, "auto").select()).name == "dolphin"
+        assert (await ParserSelector(backends, "api").select()).name == "pymupdf"
+        assert (await ParserSelector(backends, "pymupdf").select()).name == "pymupdf"
+
+    @pytest.mark.asyncio
+    async def test_health_probes_are_cached(self):
+        clock = FakeClock()
+        backend = FakeBackend("dolphin-api", health_ttl=30, clock=clock)
+
+        await backend.is_available()
+        await backend.is_available()
+        assert backend.probes == 1
+
+        clock.now += 31
+        await backend.is_available()
+        assert backend.probes == 2
+
+    @pytest.mark.asyncio
+    async def test_unhealthy_backend_is_skipped_until_next_probe(self):
+        clock = FakeClock()
+        backend = FakeBackend("dolphin-api", health_ttl=30, clock=clock)
+        selector = ParserSelector({"dolphin-api": backend, "pymupdf": FakeBackend("pymupdf")}, "api")
+
+        backend.mark_unhealthy(RuntimeError("timeout"))
+        assert (await selector.select()).name == "pymupdf"
+
+        clock.now += 31
+        assert (await selector.select()).name == "dolphin-api"
+
+    @pytest.mark.asyncio
+    async def test_rest_backend_probes_service_health(self):
+        down = RestDolphinBackend(client=rest_client(health=Exception("Dolphin API is not reachable")))
+        up = RestDolphinBackend(client=rest_client(health={"status": "healthy", "model_loaded": True, "model_version": "1.5"}))
+
+        assert await down.is_available() is False
+        assert down.status()["error"] == "Dolphin API is not reachable"
+        assert await up.is_available() is True
+        assert up.version() == "1.5"
+
+
+@pytest.fixture
+def pdf_file(tmp_path):
+    path = tmp_path / "demanda.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Texto de la capa PDF")
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def service(tmp_path):
+    with patch("app.document_preview.is_gemini_available", return_value=False), \
+         patch("app.document_preview.get_extraction_cache", return_value=ExtractionCache(tmp_path / "cache")):
+        yield DocumentPreviewService(policy="api")
+
+
+class TestPreviewWithRestBackend:
+    """generate_preview awaits the remote Dolphin service when it is healthy"""
+
+    @pytest.mark.asyncio
+    async def test_uses_dolphin_rest_api(self, service, pdf_file):
+        parsed = {"text": "Texto extraído por Dolphin", "pages": 2, "has_tables": True, "has_figures": False, "elements": []}
+        client = rest_client(parse_result=(parsed, 0.85))
+        service.parsers.backends["dolphin-api"] = RestDolphinBackend(client=client)
+
+        result = await service.generate_preview(str(pdf_file), "file-1")
+
+        client.parse_document.assert_awaited_once_with(str(pdf_file))  # One page: within budget
+        assert result["raw_text"] == "Texto extraído por Dolphin"
+        assert result["preview"]["pages"] == 2
+        assert service.parsers.last_selected == "dolphin-api"
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_pymupdf_when_rest_parse_fails(self, service, pdf_file):
+        client = rest_client(parse_error=Exception("Document parsing timed out after 60 seconds"))
+        rest = RestDolphinBackend(client=client)
+        service.parsers.backends["dolphin-api"] = rest
+
+        result = await service.generate_preview(str(pdf_file), "file-1")
+
+        assert "Texto de la capa PDF" in result["raw_text"]
+        assert service.parsers.last_selected == "pymupdf"
+        assert await rest.is_available() is False
+
+    @pytest.mark.asyncio
+    async def test_status_reports_selected_backend(self, service):
+        service.parsers.backends["dolphin-api"] = RestDolphinBackend(client=rest_client())
+        service.parsers.backends["pymupdf"] = PyMuPDFBackend()
+
+        status = await service.get_status()
+
+        assert status["dolphin_available"] is True
+        assert status["parser"]["policy"] == "api"
+        assert status["parser"]["selected"] == "dolphin-api"
+        assert status["parser"]["backends"]["dolphin-api"]["api_url"] == "http://dolphin.test"
+
+
+class TestTextLayerFastPath:
+    """Born-digital pages skip Dolphin; scanned pages are merged back in order"""
+
+    @pytest.mark.asyncio
+    async def test_only_scanned_pages_are_sent_to_dolphin(self, tmp_path):
+        seen = {}
+
+        async def parse_scanned(path):
+            doc = fitz.open(path)
+            seen["pages"] = len(doc)
+            doc.close()
+            elements = [
+                {"label": "para", "text": "Texto escaneado", "page": 1, "reading_order": 1},
+                {"label": "title", "text": "Diligencia", "page": 1, "reading_order": 0},
+            ]
+            return {"text": "", "elements": elements, "pages": 1, "has_tables": True, "has_figures": False}, 0.85
+
+        inner = FakeBackend("dolphin-api")
+        inner.parse = parse_scanned
+        backend = TextLayerFastPath(inner)
+
+        content, confidence = await backend.parse(str(write_mixed_pdf(tmp_path / "mixed.pdf")))
+
+        assert seen["pages"] == 1
+        assert [e["page"] for e in content["elements"]] == [1, 2, 2, 3]
+        text = content["text"]
+        assert text.index("Sentencia 1") < text.index("Diligencia") < text.index("Texto escaneado") < text.index("Sentencia 3")
+        assert content["pages"] == 3 and content["has_tables"] is True
+        assert confidence == pytest.approx((0.95 * 2 + 0.85) / 3)
+        assert backend.status()["text_layer_fast_path"]["scanned_pages"] == 1
+
+    @pytest.mark.asyncio
+    async def test_born_digital_pdf_never_reaches_dolphin(self, pdf_file):
+        inner = FakeBackend("dolphin")
+        backend = TextLayerFastPath(inner)
+
+        with patch("app.parser_backends.classify_pages", side_effect=lambda path, *budget: {
+            "page_count": 1, "pages": [{"page": 1, "kind": "text", "text": "Texto de la capa PDF"}]
+        }), patch("app.parser_backends.document_pool.run", new=AsyncMock(side_effect=lambda fn, *args: fn(*args))):
+            content, confidence = await backend.parse(str(pdf_file))
+
+        assert inner.parses == 0
+        assert content["text"] == "Texto de la capa PDF"
+        assert confidence == 0.95
+        assert backend.version() == "1+textlayer1"
+
+
+@pytest.fixture
+def long_pdf(tmp_path):
+    path = tmp_path / "expediente.pdf"
+    doc = fitz.open()
+    for number in range(30):
+        doc.new_page().insert_text((72, 72), f"Folio {number + 1} del expediente")
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+class TestPreviewBudget:
+    """Previews extract only the first pages of long documents"""
+
+    @pytest.fixture
+    def pymupdf_service(self, tmp_path):
+        cache = ExtractionCache(tmp_path / "cache")
+        with patch("app.document_preview.is_gemini_available", return_value=False), \
+             patch("app.document_preview.get_extraction_cache", return_value=cache), \
+             patch("app.document_preview.PREVIEW_MAX_PAGES", 3):
+            yield DocumentPreviewService(policy="pymupdf"), cache
+
+    @pytest.mark.asyncio
+    async def test_stops_at_page_budget(self, pymupdf_service, long_pdf):
+        service, _ = pymupdf_service
+
+        result = await service.generate_preview(str(long_pdf), "file-1")
+
+        assert "Folio 3 " in result["raw_text"] and "Folio 4 " not in result["raw_text"]
+        assert result["preview"]["pages"] == 30
+        assert result["preview"]["pages_extracted"] == 3
+
+    @pytest.mark.asyncio
+    async def test_summarizer_gets_a_larger_page_budget(self, tmp_path, long_pdf):
+        summarize = AsyncMock(return_value={"summary": "Expediente", "document_type": "expediente"})
+        with patch("app.document_preview.is_gemini_available", return_value=True), \
+             patch("app.document_preview.get_extraction_cache", return_value=ExtractionCache(tmp_path / "cache")), \
+             patch("app.document_preview.summarize_document", new=summarize), \
+             patch("app.document_preview.PREVIEW_MAX_PAGES", 3), \
+             patch("app.document_preview.SUMMARY_MAX_PAGES", 20):
+            result = await DocumentPreviewService(policy="pymupdf").generate_preview(str(long_pdf), "file-1")
+
+        summarized_text = summarize.await_args.args[0]
+        assert "Folio 20 " in summarized_text and "Folio 21 " not in summarized_text
+        assert result["preview"]["pages_extracted"] == 20
+
+    @pytest.mark.asyncio
+    async def test_background_job_completes_extraction(self, pymupdf_service, long_pdf):
+        service, cache = pymupdf_service
+
+        with patch("app.document_preview.PREVIEW_FULL_EXTRACTION", True):
+            await service.generate_preview(str(long_pdf), "file-1")
+            await asyncio.gather(*service._full_extractions.values())
+
+        text, metadata, _ = await service._extract_text(str(long_pdf), file_sha256(str(long_pdf)), None, None)
+        assert "Folio 30 " in text
+        assert metadata["pages_extracted"] == 30
+        assert cache.stats()["hits"] == 1
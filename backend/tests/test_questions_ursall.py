@@ -0,0 +1,336 @@
+"""
+Tests for the URSALL question flow: prefill from preview suggestions,
+skipping answered questions and bulk answers
+"""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.questions_ursall import (
+    candidate_questions_ursall,
+    get_next_unanswered_question_ursall,
+    prefill_answers_ursall,
+    reachable_questions_ursall,
+    resolve_answers_ursall,
+    validate_answer_ursall,
+)
+
+SUGGESTIONS = {
+    "jurisdiccion": "social",
+    "juzgado_num": "3",
+    "demarcacion": "Santa Cruz",
+    "num_procedimiento": "455/2025",
+    "fecha_procedimiento": "2025-03-15",
+    "partes": "Pedro Pérez vs Cabildo Gomera",
+    "materia": "despido",  # Not a question id
+}
+CONFIDENCES = {question_id: 0.9 for question_id in SUGGESTIONS}
+
+
+class TestCandidateQuestions:
+    """Tests for candidate_questions_ursall"""
+
+    def test_unanswered_branches_are_all_followed(self):
+        candidates = candidate_questions_ursall({})
+
+        assert candidates[:2] == ["categoria", "tipo_trabajo"]
+        assert {"jurisdiccion", "proyecto_nombre", "compania_seguro"} <= set(candidates)
+
+    def test_answered_branches_match_reachable_questions(self):
+        answers = {"categoria": "legal", "tipo_trabajo": "procedimiento"}
+
+        assert candidate_questions_ursall(answers) == reachable_questions_ursall(answers)
+
+
+class TestValidateAnswer:
+    """Tests for validate_answer_ursall"""
+
+    def test_uses_declared_validation(self):
+        assert validate_answer_ursall("jurisdiccion", "social")
+        assert not validate_answer_ursall("jurisdiccion", "mercantil")
+        assert validate_answer_ursall("juzgado_num", "3")
+        assert not validate_answer_ursall("juzgado_num", "tres")
+        assert validate_answer_ursall("num_procedimiento", "455/2025")
+        assert not validate_answer_ursall("num_procedimiento", "455")
+        assert not validate_answer_ursall("fecha_procedimiento", "15/03/2025")
+        assert not validate_answer_ursall("client", "A")
+
+    def test_unknown_question_or_empty_value(self):
+        assert not validate_answer_ursall("materia", "despido")
+        assert not validate_answer_ursall("client", None)
+
+
+class TestPrefillAnswers:
+    """Tests for prefill_answers_ursall"""
+
+    def test_prefills_confident_valid_suggestions(self):
+        answers = prefill_answers_ursall(SUGGESTIONS, CONFIDENCES, 0.8)
+
+        assert answers == {
+            "jurisdiccion": "social",
+            "juzgado_num": "3",
+            "demarcacion": "Santa Cruz",
+            "num_procedimiento": "455/2025",
+            "fecha_procedimiento": "2025-03-15",
+            "partes": {"parte_a": "Pedro Pérez", "parte_b": "Cabildo Gomera"},
+            "parte_a": "Pedro Pérez",
+            "parte_b": "Cabildo Gomera",
+        }
+
+    def test_skips_low_confidence_and_invalid_suggestions(self):
+        answers = prefill_answers_ursall(
+            {"jurisdiccion": "Mercantil", "juzgado_num": "3", "num_procedimiento": "455/2025"},
+            {"jurisdiccion": 0.95, "juzgado_num": 0.95, "num_procedimiento": 0.6},
+            0.8
+        )
+        assert answers == {"juzgado_num": "3"}
+
+    @pytest.mark.parametrize("demarcacion", ["Santa Cruz de La Palma", "Icod de los Vinos", "Arona"])
+    def test_document_demarcaciones_are_kept_verbatim(self, demarcacion):
+        answers = prefill_answers_ursall({"demarcacion": demarcacion}, {"demarcacion": 0.9}, 0.8)
+
+        assert answers == {"demarcacion": demarcacion}
+
+
+class TestNextUnansweredQuestion:
+    """Tests for get_next_unanswered_question_ursall"""
+
+    def test_starts_with_first_question(self):
+        assert get_next_unanswered_question_ursall(None, {})["question_id"] == "categoria"
+
+    def test_skips_answered_questions(self):
+        answers = {"categoria": "legal", "tipo_trabajo": "procedimiento", "client": "Acme",
+                   **prefill_answers_ursall(SUGGESTIONS, CONFIDENCES, 0.8)}
+
+        question = get_next_unanswered_question_ursall("client", answers)
+
+        assert question["question_id"] == "materia_proc"
+        assert "next" not in question
+
+    def test_end_of_flow(self):
+        assert get_next_unanswered_question_ursall("doc_type_proc", {}) is None
+
+
+class TestPrefilledQuestionFlow:
+    """/api/questions/start and /answer with a confirmed preview"""
+
+    @pytest.mark.asyncio
+    async def test_confirmed_preview_skips_prefilled_questions(self, client):
+        from app.main import session_store
+
+        file_id = "prefill-file"
+        session_store.put(file_id, {
+            "preview_suggestions": {"answers": SUGGESTIONS, "confidence": CONFIDENCES},
+            "preview_confirmed": False
+        })
+        await client.post("/api/document/confirm", json={"file_id": file_id, "confirmed": True})
+
+        start = (await client.post("/api/questions/start", json={"file_id": file_id})).json()
+        assert start["question_id"] == "categoria"
+        assert start["prefilled_answers"]["num_procedimiento"] == "455/2025"
+        assert "partes" not in start["prefilled_answers"]
+
+        with patch("app.gemini_rest_extractor.GEMINI_AVAILABLE", False):
+            for question_id, answer in [("categoria", "legal"), ("tipo_trabajo", "procedimiento")]:
+                await client.post("/api/questions/answer",
+                                  json={"file_id": file_id, "question_id": question_id, "answer": answer})
+            result = (await client.post("/api/questions/answer",
+                                        json={"file_id": file_id, "question_id": "client", "answer": "Acme Corp"})).json()
+
+        assert result["next_question"]["question_id"] == "materia_proc"
+        assert result["completed"] is False
+        assert session_store.get(file_id)["extracted_answers"]["parte_b"] == "Cabildo Gomera"
+
+    @pytest.mark.asyncio
+    async def test_unconfirmed_preview_is_not_prefilled(self, client):
+        from app.main import session_store
+
+        file_id = "unconfirmed-file"
+        session_store.put(file_id, {
+            "preview_suggestions": {"answers": SUGGESTIONS, "confidence": CONFIDENCES},
+            "preview_confirmed": False
+        })
+
+        start = (await client.post("/api/questions/start", json={"file_id": file_id})).json()
+
+        assert start["prefilled_answers"] == {}
+        assert session_store.get(file_id)["answers"] == {}
+
+    @pytest.mark.asyncio
+    async def test_preview_keeps_existing_session_answers(self, client):
+        from app.main import session_store
+
+        files = {"file": ("demanda.pdf", b"%PDF-1.4 demanda", "application/pdf")}
+        file_id = (await client.post("/api/upload-temp", files=files)).json()["file_id"]
+        session_store.put(file_id, {"answers": {"categoria": "legal"}, "current_question": "tipo_trabajo"})
+        preview = {"suggested_answers": SUGGESTIONS, "suggested_answers_confidence": CONFIDENCES}
+
+        with patch("app.main.generate_document_preview",
+                   AsyncMock(return_value={"status": "success", "preview": preview})):
+            response = await client.post("/api/document/preview", json={"file_id": file_id})
+
+        assert response.status_code == 200
+        session = session_store.get(file_id)
+        assert session["answers"] == {"categoria": "legal"}
+        assert session["current_question"] == "tipo_trabajo"
+        assert session["preview_suggestions"]["answers"] == SUGGESTIONS
+        assert session["preview_confirmed"] is False
+
+    @pytest.mark.asyncio
+    async def test_restart_keeps_preview_and_answers(self, client):
+        from app.main import session_store
+
+        file_id = "restart-file"
+        session_store.put(file_id, {
+            "preview_suggestions": {"answers": SUGGESTIONS, "confidence": CONFIDENCES},
+            "preview_confirmed": True
+        })
+        await client.post("/api/questions/start", json={"file_id": file_id})
+        with patch("app.gemini_rest_extractor.GEMINI_AVAILABLE", False):
+            await client.post("/api/questions/answer",
+                              json={"file_id": file_id, "question_id": "categoria", "answer": "legal"})
+
+        start = (await client.post("/api/questions/start", json={"file_id": file_id})).json()
+
+        assert start["question_id"] == "tipo_trabajo"
+        assert start["prefilled_answers"]["num_procedimiento"] == "455/2025"
+        session = session_store.get(file_id)
+        assert session["preview_confirmed"] is True
+        assert session["preview_suggestions"]["answers"] == SUGGESTIONS
+        assert session["answers"]["categoria"] == "legal"
+
+
+class TestResolveAnswers:
+    """Tests for resolve_answers_ursall"""
+
+    @pytest.mark.asyncio
+    async def test_splits_valid_and_rejected_values(self):
+        accepted, rejected = await resolve_answers_ursall({
+            "jurisdiccion": "Juzgado de lo Social",
+            "num_procedimiento": "sin número",
+            "partes": "Pedro Pérez vs Cabildo Gomera",
+            "materia": "despido",  # Not a question id
+        })
+
+        assert accepted == {
+            "jurisdiccion": "social",
+            "partes": {"parte_a": "Pedro Pérez", "parte_b": "Cabildo Gomera"},
+            "parte_a": "Pedro Pérez",
+            "parte_b": "Cabildo Gomera",
+        }
+        assert rejected == {"num_procedimiento": "sin número"}
+
+
+class TestBulkAnswerFlow:
+    """/api/questions/answer-bulk"""
+
+    @pytest.mark.asyncio
+    async def test_answers_resolved_with_one_gemini_call(self, client):
+        from app import gemini_rest_extractor
+        from app.main import session_store
+
+        file_id = "bulk-file"
+        await client.post("/api/questions/start", json={"file_id": file_id})
+        gemini = AsyncMock(return_value={
+            "categoria": "legal",
+            "tipo_trabajo": "procedimiento",
+            "client": "Acme Corp",
+            "num_procedimiento": None,
+        })
+
+        with patch.object(gemini_rest_extractor, "GEMINI_AVAILABLE", True), \
+             patch.object(gemini_rest_extractor, "_call_gemini_json", new=gemini):
+            result = (await client.post("/api/questions/answer-bulk", json={"file_id": file_id, "answers": {
+                "categoria": "es legal",
+                "tipo_trabajo": "un juicio",
+                "client": "el cliente es Acme Corp",
+                "num_procedimiento": "no lo sé",
+            }})).json()
+
+        assert gemini.await_count == 1
+        # Answers the local extractor is sure about are not sent
+        schema = gemini.await_args.args[0]["generationConfig"]["responseSchema"]
+        assert set(schema["properties"]) == {"client", "num_procedimiento"}
+        assert result["accepted"] == {"categoria": "legal", "tipo_trabajo": "procedimiento", "client": "Acme Corp"}
+        assert result["rejected"] == {"num_procedimiento": "no lo sé"}
+        assert result["next_question"]["question_id"] == "jurisdiccion"
+        assert session_store.get(file_id)["answers"]["client"] == "Acme Corp"
+
+    @pytest.mark.asyncio
+    async def test_gemini_does_not_override_explicit_answers(self, client):
+        from app import gemini_rest_extractor
+
+        file_id = "bulk-conflict"
+        await client.post("/api/questions/start", json={"file_id": file_id})
+        gemini = AsyncMock(return_value={"categoria": "legal", "tipo_trabajo": "proyecto", "client": "Acme Corp"})
+
+        with patch.object(gemini_rest_extractor, "GEMINI_AVAILABLE", True), \
+             patch.object(gemini_rest_extractor, "_call_gemini_json", new=gemini):
+            result = (await client.post("/api/questions/answer-bulk", json={"file_id": file_id, "answers": {
+                "categoria": "seguros",
+                "tipo_trabajo": "procedimiento",
+                "client": "el cliente es Acme Corp",
+            }})).json()
+
+        assert result["accepted"] == {"categoria": "seguros", "tipo_trabajo": "procedimiento", "client": "Acme Corp"}
+
+    @pytest.mark.asyncio
+    async def test_description_without_gemini_uses_local_extractor(self, client):
+        from app.main import session_store
+
+        file_id = "bulk-description"
+        session_store.put(file_id, {"answers": {"categoria": "legal", "tipo_trabajo": "procedimiento"}})
+
+        with patch("app.gemini_rest_extractor.GEMINI_AVAILABLE", False):
+            result = (await client.post("/api/questions/answer-bulk", json={
+                "file_id": file_id,
+                "description": "Juzgado de lo Social nº 3 de Santa Cruz, procedimiento 455/2025",
+            })).json()
+
+        assert result["accepted"]["num_procedimiento"] == "455/2025"
+        assert result["accepted"]["jurisdiccion"] == "social"
+        assert result["next_question"]["question_id"] == "client"
+        assert result["completed"] is False
+
+    @pytest.mark.asyncio
+    async def test_description_only_fills_reachable_questions(self, client):
+        from app.main import session_store
+
+        file_id = "bulk-branches"
+        await client.post("/api/questions/start", json={"file_id": file_id})
+        extracted = {
+            "categoria": "legal",
+            "tipo_trabajo": "procedimiento",
+            "client": "Acme Corp",
+            "jurisdiccion": "social",
+            "num_procedimiento": "455/2025",
+            "proyecto_nombre": "Auditoría laboral",
+            "compania_seguro": "MAPFRE",
+        }
+        gemini = AsyncMock(side_effect=lambda question_ids, _: {
+            question_id: extracted[question_id] for question_id in question_ids if question_id in extracted
+        })
+
+        with patch("app.gemini_rest_extractor.GEMINI_AVAILABLE", True), \
+             patch("app.gemini_rest_extractor.extract_bulk_with_gemini_rest", new=gemini):
+            result = (await client.post("/api/questions/answer-bulk", json={
+                "file_id": file_id,
+                "description": "Demanda de Acme Corp ante el Juzgado de lo Social, procedimiento 455/2025",
+            })).json()
+
+        # One call covering every branch; unreachable values are dropped
+        assert gemini.await_count == 1
+        asked = gemini.await_args.args[0]
+        assert {"categoria", "jurisdiccion", "proyecto_nombre", "compania_seguro"} <= set(asked)
+        answers = session_store.get(file_id)["answers"]
+        assert answers["num_procedimiento"] == "455/2025"
+        assert "proyecto_nombre" not in answers and "compania_seguro" not in answers
+        assert result["next_question"]["question_id"] == "juzgado_num"
+
+    @pytest.mark.asyncio
+    async def test_empty_request(self, client):
+        await client.post("/api/questions/start", json={"file_id": "bulk-empty"})
+
+        response = await client.post("/api/questions/answer-bulk", json={"file_id": "bulk-empty", "answers": {}})
+
+        assert response.status_code == 400
@@ -0,0 +1,205 @@
+"""
+Tests for the client-side rate limiter (token buckets, 429 / Retry-After)
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app import dropbox_uploader, rate_limiter
+from app.dropbox_folders import ensure_folders
+from app.rate_limiter import RateLimitExceeded, TokenBucket, get_bucket, limited_request, retry_after
+
+
+def responses(*status_codes, headers=None):
+    """send() factory answering the given status codes in order and counting calls"""
+    calls = {"count": 0}
+
+    async def send():
+        status_code = status_codes[min(calls["count"], len(status_codes) - 1)]
+        calls["count"] += 1
+        return httpx.Response(status_code, headers=headers or {})
+
+    return send, calls
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket"""
+
+    @pytest.mark.asyncio
+    async def test_waits_once_the_burst_is_used(self):
+        bucket = TokenBucket(rate=50, burst=2)
+
+        start = time.perf_counter()
+        for _ in range(3):
+            await bucket.acquire()
+
+        assert time.perf_counter() - start >= 0.015
+        assert bucket.stats["requests"] == 3
+
+    @pytest.mark.asyncio
+    async def test_queue_is_served_in_arrival_order(self):
+        bucket = TokenBucket(rate=200, burst=1)
+        served = []
+
+        async def request(index):
+            await bucket.acquire()
+            served.append(index)
+
+        await asyncio.gather(*(request(index) for index in range(5)))
+
+        assert served == [0, 1, 2, 3, 4]
+
+    def test_wait_time_includes_pause(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        assert bucket.wait_time() == 0
+
+        bucket.pause(30)
+
+        assert 29 < bucket.wait_time() <= 30
+        assert 29 < bucket.status()["queue_wait_seconds"] <= 30
+
+    @pytest.mark.asyncio
+    async def test_max_wait_fails_fast(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.pause(30)
+
+        with pytest.raises(RateLimitExceeded):
+            await bucket.acquire(max_wait=5)
+        assert bucket.stats["rejected"] == 1
+
+    def test_buckets_are_per_account(self):
+        assert get_bucket("gemini", "key-a") is get_bucket("gemini", "key-a")
+        assert get_bucket("dropbox_api", "token-a") is not get_bucket("dropbox_api", "token-b")
+        assert "token-a" not in str(rate_limiter.limiter_status())
+
+
+class TestRetryAfter:
+    """Tests for retry_after"""
+
+    def test_header(self):
+        assert retry_after(httpx.Response(429, headers={"Retry-After": "7"})) == 7.0
+
+    def test_dropbox_body(self):
+        response = httpx.Response(429, json={"error": {"reason": {".tag": "too_many_writes"}, "retry_after": 2}})
+        assert retry_after(response) == 2.0
+
+    def test_gemini_body(self):
+        response = httpx.Response(429, json={"error": {"code": 429, "details": [
+            {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "31s"}
+        ]}})
+        assert retry_after(response) == 31.0
+
+    def test_absent(self):
+        assert retry_after(httpx.Response(429, text="slow down")) is None
+
+
+class TestLimitedRequest:
+    """Tests for limited_request"""
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_request_is_retried(self):
+        send, calls = responses(429, 200, headers={"Retry-After": "0"})
+
+        response = await limited_request("gemini", "key", send, idempotent=False, backoff=0)
+
+        assert response.status_code == 200
+        assert calls["count"] == 2
+        assert get_bucket("gemini", "key").stats["throttled"] == 1
+
+    @pytest.mark.asyncio
+    async def test_server_errors_are_retried_only_if_idempotent(self):
+        send, calls = responses(500, 200)
+        assert (await limited_request("dropbox_api", "t", send, idempotent=False, backoff=0)).status_code == 500
+        assert calls["count"] == 1
+
+        send, calls = responses(500, 200)
+        assert (await limited_request("dropbox_api", "t", send, backoff=0)).status_code == 200
+        assert calls["count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_long_retry_after_is_not_waited_with_max_wait(self):
+        send, calls = responses(429, headers={"Retry-After": "60"})
+
+        response = await limited_request("gemini", "key", send, max_wait=5)
+
+        assert response.status_code == 429
+        assert calls["count"] == 1
+        with pytest.raises(RateLimitExceeded):
+            await limited_request("gemini", "key", send, max_wait=5)
+
+    @pytest.mark.asyncio
+    async def test_transport_errors(self):
+        async def fail():
+            raise httpx.ConnectError("refused")
+
+        with pytest.raises(httpx.ConnectError):
+            await limited_request("dropbox_api", "t", fail, idempotent=False)
+        assert get_bucket("dropbox_api", "t").stats["retries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_max_wait_bounds_transport_retries(self):
+        calls = {"count": 0}
+
+        async def slow_timeout():
+            calls["count"] += 1
+            await asyncio.sleep(0.05)
+            raise httpx.ReadTimeout("timed out")
+
+        with pytest.raises(httpx.ReadTimeout):
+            await limited_request("dropbox_api", "t", slow_timeout, backoff=0.01, max_wait=0.04)
+
+        assert calls["count"] == 1
+
+
+class TestDropboxRateLimits:
+    """Dropbox 429 responses are retried instead of failing the upload"""
+
+    @pytest.mark.asyncio
+    async def test_folder_batch_is_retried_after_429(self, fake_dropbox):
+        fake_dropbox.fail("create_folder_batch", "rate_limit")
+
+        result = await ensure_folders("token", ["/Docs/A"])
+
+        assert result["success"] is True
+        assert result["api_calls"] == 2
+
+    @pytest.mark.asyncio
+    async def test_persistent_429_surfaces_with_retry_after(self, fake_dropbox, tmp_path, monkeypatch):
+        monkeypatch.setattr(dropbox_uploader, "DROPBOX_CHUNK_RETRIES", 1)
+        path = tmp_path / "scan.pdf"
+        path.write_bytes(b"%PDF")
+        fake_dropbox.fail("upload", "rate_limit", "rate_limit")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await dropbox_uploader.upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf", ensure_folder=False)
+
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.headers == {"Retry-After": "1"}
+
+    @pytest.mark.asyncio
+    async def test_committed_upload_is_not_repeated_after_lost_response(self, fake_dropbox, tmp_path):
+        path = tmp_path / "scan.pdf"
+        path.write_bytes(b"%PDF")
+        # Dropbox stores the file but the response never arrives
+        fake_dropbox.fail("upload", "lost")
+
+        with pytest.raises(HTTPException):
+            await dropbox_uploader.upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf", ensure_folder=False)
+
+        assert len(fake_dropbox.calls("upload")) == 1
+        assert list(fake_dropbox.files) == ["/Docs/scan.pdf"]
+
+    @pytest.mark.asyncio
+    async def test_committing_calls_still_wait_out_429(self, fake_dropbox, tmp_path):
+        path = tmp_path / "scan.pdf"
+        path.write_bytes(b"%PDF")
+        fake_dropbox.fail("upload", "rate_limit")
+
+        result = await dropbox_uploader.upload_file_to_dropbox("token", str(path), "/Docs", "scan.pdf", ensure_folder=False)
+
+        assert result["was_renamed"] is False
+        assert len(fake_dropbox.calls("upload")) == 2
+        assert list(fake_dropbox.files) == ["/Docs/scan.pdf"]
@@ -0,0 +1,221 @@
+"""
+Tests for question-flow session stores (memory and SQLite backends)
+"""
+import threading
+
+import pytest
+from httpx import AsyncClient
+
+from app.session_store import MemorySessionStore, SQLiteSessionStore, create_session_store
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def new_session():
+    return {"current_question": "tipo_trabajo", "answers": {}, "extracted_answers": {}}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store_factory(request, tmp_path):
+    """Builds stores of each backend sharing one clock (and one database file)"""
+    clock = FakeClock()
+
+    def make(ttl: float = 60):
+        if request.param == "memory":
+            return MemorySessionStore(ttl=ttl, clock=clock)
+        return SQLiteSessionStore(db_path=tmp_path / "sessions.db", ttl=ttl, clock=clock)
+
+    make.clock = clock
+    return make
+
+
+class TestSessionStore:
+    """Behaviour shared by all backends"""
+
+    def test_put_and_get(self, store_factory):
+        store = store_factory()
+        store.put("f1", new_session())
+
+        assert store.get("f1") == new_session()
+        assert "f1" in store
+        assert store.get("missing") is None
+        assert "missing" not in store
+
+    def test_get_returns_a_copy(self, store_factory):
+        store = store_factory()
+        store.put("f1", new_session())
+
+        store.get("f1")["answers"]["client"] = "X"
+
+        assert store.get("f1")["answers"] == {}
+
+    def test_update_merges_dict_fields(self, store_factory):
+        store = store_factory()
+        store.put("f1", new_session())
+
+        store.update("f1", {"answers": {"client": "ACME"}, "extracted_answers": {"client": "ACME"}})
+        session = store.update("f1", {"answers": {"tipo_trabajo": "proyecto"}, "current_question": "client"})
+
+        assert session["answers"] == {"client": "ACME", "tipo_trabajo": "proyecto"}
+        assert session["extracted_answers"] == {"client": "ACME"}
+        assert store.get("f1") == session
+
+    def test_update_missing_session_returns_none(self, store_factory):
+        store = store_factory()
+
+        assert store.update("missing", {"answers": {"client": "X"}}) is None
+        assert store.get("missing") is None
+
+    def test_delete(self, store_factory):
+        store = store_factory()
+        store.put("f1", new_session())
+
+        assert store.delete("f1") is True
+        assert store.delete("f1") is False
+
+        assert store.get("f1") is None
+
+    def test_sessions_expire_after_ttl_since_last_write(self, store_factory):
+        store = store_factory(ttl=60)
+        store.put("f1", new_session())
+
+        store_factory.clock.now += 50
+        store.update("f1", {"answers": {"client": "X"}})
+        store_factory.clock.now += 50
+
+        assert store.get("f1") is not None
+        store_factory.clock.now += 11
+        assert store.get("f1") is None
+
+    def test_sweep_removes_only_expired(self, store_factory):
+        store = store_factory(ttl=60)
+        store.put("old", new_session())
+        store_factory.clock.now += 30
+        store.put("new", new_session())
+        store_factory.clock.now += 31
+
+        assert store.sweep() == 1
+        assert store.get("old") is None
+        assert store.get("new") is not None
+
+
+class TestMemorySessionStore:
+    """Memory backend specifics"""
+
+    def test_evicts_least_recently_used(self):
+        store = MemorySessionStore(ttl=60, max_entries=2)
+        store.put("a", new_session())
+        store.put("b", new_session())
+        store.get("a")
+
+        store.put("c", new_session())
+
+        assert store.get("b") is None
+        assert store.get("a") is not None
+        assert len(store) == 2
+
+
+class TestSQLiteSessionStore:
+    """SQLite backend specifics"""
+
+    def test_uses_wal_mode(self, tmp_path):
+        store = SQLiteSessionStore(db_path=tmp_path / "sessions.db")
+
+        mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+        assert mode == "wal"
+
+    def test_survives_restart(self, tmp_path):
+        db_path = tmp_path / "sessions.db"
+        store = SQLiteSessionStore(db_path=db_path)
+        store.put("f1", new_session())
+        store.update("f1", {"answers": {"client": "ACME"}})
+        store.close()
+
+        reopened = SQLiteSessionStore(db_path=db_path)
+
+        assert reopened.get("f1")["answers"] == {"client": "ACME"}
+
+    def test_concurrent_updates_from_several_connections_are_not_lost(self, tmp_path):
+        """Simulates several workers answering questions for the same session"""
+        db_path = tmp_path / "sessions.db"
+        SQLiteSessionStore(db_path=db_path).put("f1", new_session())
+        workers = [SQLiteSessionStore(db_path=db_path) for _ in range(4)]
+
+        def answer(worker_index: int, store):
+            for i in range(25):
+                store.update("f1", {"answers": {f"q{worker_index}_{i}": i}})
+
+        threads = [threading.Thread(target=answer, args=(n, s)) for n, s in enumerate(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(workers[0].get("f1")["answers"]) == 100
+
+
+def test_create_session_store_selects_backend(monkeypatch, tmp_path):
+    monkeypatch.setattr("app.session_store.SESSION_DB_PATH", tmp_path / "sessions.db")
+
+    assert isinstance(create_session_store("memory"), MemorySessionStore)
+    assert isinstance(create_session_store("unknown"), MemorySessionStore)
+    assert isinstance(create_session_store("sqlite"), SQLiteSessionStore)
+
+
+@pytest.mark.asyncio
+async def test_question_flow_keeps_answers_in_store(test_client: AsyncClient):
+    """Answers given through the API are stored in the session store"""
+    from app.main import session_store
+
+    await test_client.post("/api/questions/start", json={"file_id": "store-flow-1"})
+    response = await test_client.post(
+        "/api/questions/answer",
+        json={"file_id": "store-flow-1", "question_id": "num_procedimiento", "answer": "455/2025"}
+    )
+
+    assert response.status_code == 200
+    session = session_store.get("store-flow-1")
+    assert session["answers"]["num_procedimiento"] == "455/2025"
+    assert session["extracted_answers"]["num_procedimiento"] == "455/2025"
+
+
+@pytest.mark.asyncio
+async def test_answer_without_session_returns_404(test_client: AsyncClient):
+    response = await test_client.post(
+        "/api/questions/answer",
+        json={"file_id": "no-such-session", "question_id": "client", "answer": "ACME"}
+    )
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_async_methods_run_blocking_backends_off_the_loop(tmp_path):
+    """SQLite calls from async handlers go through a worker thread"""
+    store = SQLiteSessionStore(db_path=tmp_path / "sessions.db")
+    loop_thread = threading.get_ident()
+    threads = []
+    original_get = store.get
+
+    def get(file_id):
+        threads.append(threading.get_ident())
+        return original_get(file_id)
+
+    store.get = get
+    await store.aput("f1", new_session())
+    await store.aupdate("f1", {"answers": {"client": "ACME"}})
+
+    assert (await store.aget("f1"))["answers"] == {"client": "ACME"}
+    assert await store.acontains("f1")
+    assert threads and loop_thread not in threads
+    await store.adelete("f1")
+    assert await store.aget("f1") is None
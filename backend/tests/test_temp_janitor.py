@@ -0,0 +1,158 @@
+"""
+Tests for the temp storage janitor (TTL, quota, orphans, sessions)
+"""
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.session_store import MemorySessionStore
+from app.temp_janitor import TempJanitor
+from app.temp_storage import TempFileIndex
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Index, session store and janitor over an empty temp dir"""
+    index = TempFileIndex(tmp_path)
+    sessions = MemorySessionStore()
+    clock = FakeClock(time.time())
+
+    def upload(file_id: str, size: int, age: float = 0):
+        path = tmp_path / f"{file_id}_doc.pdf"
+        path.write_bytes(b"x" * size)
+        with patch("app.temp_storage.time.time", return_value=clock.now - age):
+            index.register(file_id, path, size, ".pdf", "hash")
+        sessions.put(file_id, {"answers": {}})
+        return path
+
+    return index, sessions, clock, upload
+
+
+class TestTempJanitor:
+    """Tests for TempJanitor.run_once"""
+
+    def test_removes_expired_uploads_and_their_sessions(self, storage):
+        index, sessions, clock, upload = storage
+        old = upload("old", 100, age=7200)
+        new = upload("new", 100, age=60)
+        janitor = TempJanitor(index, sessions, ttl=3600, max_bytes=10_000, clock=clock)
+
+        run = janitor.run_once()
+
+        assert run["expired"] == 1
+        assert run["bytes_reclaimed"] == 100
+        assert not old.exists() and new.exists()
+        assert sessions.get("old") is None
+        assert sessions.get("new") is not None
+
+    def test_evicts_oldest_uploads_over_quota(self, storage):
+        index, sessions, clock, upload = storage
+        first = upload("first", 400, age=300)
+        second = upload("second", 400, age=200)
+        third = upload("third", 400, age=100)
+        janitor = TempJanitor(index, sessions, ttl=3600, max_bytes=1000, clock=clock)
+
+        run = janitor.run_once()
+
+        assert run["quota_evictions"] == 1
+        assert not first.exists()
+        assert second.exists() and third.exists()
+        assert janitor.metrics["temp_bytes"] == 800
+        assert janitor.metrics["temp_files"] == 2
+
+    def test_quota_counts_thumbnails(self, storage, tmp_path):
+        index, sessions, clock, upload = storage
+        upload("first", 400, age=300)
+        thumbnail = tmp_path / "first_thumbnail.png"
+        thumbnail.write_bytes(b"p" * 400)
+        index.add_derived("first", thumbnail)
+        upload("second", 400, age=100)
+        janitor = TempJanitor(index, sessions, ttl=3600, max_bytes=1000, clock=clock)
+
+        run = janitor.run_once()
+
+        assert run["bytes_reclaimed"] == 800
+        assert not thumbnail.exists()
+
+    def test_removes_expired_orphans_but_not_uploads_in_progress(self, storage, tmp_path):
+        index, sessions, clock, _ = storage
+        orphan = tmp_path / "gone_thumbnail.png"
+        orphan.write_bytes(b"p" * 50)
+        os.utime(orphan, (clock.now - 7200, clock.now - 7200))
+        in_progress = tmp_path / ".new_doc.pdf.part"
+        in_progress.write_bytes(b"x" * 50)
+        os.utime(in_progress, (clock.now, clock.now))
+        janitor = TempJanitor(index, sessions, ttl=3600, max_bytes=10_000, clock=clock)
+
+        run = janitor.run_once()
+
+        assert run["orphans_removed"] == 1
+        assert not orphan.exists()
+        assert in_progress.exists()
+
+    def test_only_existing_sessions_are_counted(self, storage):
+        index, sessions, clock, upload = storage
+        upload("with-session", 100, age=7200)
+        upload("without-session", 100, age=7200)
+        sessions.delete("without-session")
+        janitor = TempJanitor(index, sessions, ttl=3600, max_bytes=10_000, clock=clock)
+
+        run = janitor.run_once()
+
+        assert run["expired"] == 2
+        assert janitor.metrics["sessions_removed"] == 1
+
+    def test_keeps_uploads_held_by_a_request(self, storage):
+        index, sessions, clock, upload = storage
+        held = upload("held", 400, age=7200)
+        other = upload("other", 400, age=300)
+        janitor = TempJanitor(index, sessions, ttl=3600, max_bytes=500, clock=clock)
+
+        assert index.acquire("held") is not None
+        run = janitor.run_once()
+
+        assert run["expired"] == 0
+        assert run["quota_evictions"] == 1
+        assert held.exists() and not other.exists()
+        assert sessions.get("held") is not None
+
+        index.release("held")
+        assert janitor.run_once()["expired"] == 1
+        assert not held.exists()
+
+    def test_metrics_accumulate_across_runs(self, storage):
+        index, sessions, clock, upload = storage
+        upload("a", 100, age=7200)
+        janitor = TempJanitor(index, sessions, ttl=3600, max_bytes=10_000, clock=clock)
+        janitor.run_once()
+        upload("b", 200, age=0)
+        clock.now += 7200
+
+        janitor.run_once()
+
+        assert janitor.metrics["runs"] == 2
+        assert janitor.metrics["files_evicted"] == 2
+        assert janitor.metrics["bytes_reclaimed"] == 300
+        assert janitor.metrics["sessions_removed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_health_exposes_janitor_metrics(test_client: AsyncClient):
+    response = await test_client.get("/health")
+
+    metrics = response.json()["temp_storage"]
+    assert "bytes_reclaimed" in metrics
+    assert "files_evicted" in metrics
@@ -0,0 +1,207 @@
+"""
+Tests for streaming temp storage (chunked ingestion of uploads)
+"""
+import hashlib
+import io
+import threading
+
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.temp_storage import save_upload_stream, TempFileIndex
+from app.validators import FileValidationError
+
+
+class FakeUpload:
+    """Minimal UploadFile stand-in that records requested read sizes"""
+
+    def __init__(self, content: bytes):
+        self._buffer = io.BytesIO(content)
+        self.read_sizes = []
+
+    async def read(self, size: int = -1) -> bytes:
+        self.read_sizes.append(size)
+        return self._buffer.read(size)
+
+
+class TestSaveUploadStream:
+    """Tests for save_upload_stream"""
+
+    @pytest.mark.asyncio
+    async def test_writes_file_and_returns_size_and_hash(self, tmp_path):
+        content = b"abc123" * 1000
+        destination = tmp_path / "doc.pdf"
+
+        size, digest = await save_upload_stream(FakeUpload(content), destination, chunk_size=512)
+
+        assert size == len(content)
+        assert digest == hashlib.sha256(content).hexdigest()
+        assert destination.read_bytes() == content
+
+    @pytest.mark.asyncio
+    async def test_reads_in_fixed_size_chunks(self, tmp_path):
+        upload = FakeUpload(b"x" * 5000)
+
+        await save_upload_stream(upload, tmp_path / "doc.pdf", chunk_size=1024)
+
+        assert set(upload.read_sizes) == {1024}
+
+    @pytest.mark.asyncio
+    async def test_writes_off_the_event_loop(self, tmp_path):
+        from app import temp_storage
+        write_chunk = temp_storage._write_chunk
+        threads = []
+
+        def record_thread(*args):
+            threads.append(threading.get_ident())
+            write_chunk(*args)
+
+        with patch.object(temp_storage, "_write_chunk", side_effect=record_thread):
+            await save_upload_stream(FakeUpload(b"x" * 3000), tmp_path / "doc.pdf", chunk_size=1024)
+
+        assert len(threads) == 3
+        assert threading.get_ident() not in threads
+
+    @pytest.mark.asyncio
+    async def test_aborts_early_when_limit_exceeded(self, tmp_path):
+        upload = FakeUpload(b"x" * 10_000)
+        destination = tmp_path / "big.pdf"
+
+        with pytest.raises(FileValidationError) as exc_info:
+            await save_upload_stream(upload, destination, max_size=2048, chunk_size=1024)
+
+        assert exc_info.value.status_code == 413
+        # Stops reading at the first chunk over the limit
+        assert len(upload.read_sizes) == 3
+        # Neither the final file nor the partial file is left behind
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestTempFileIndex:
+    """Tests for the file_id -> metadata index"""
+
+    def store(self, root, file_id, name="doc.pdf", content=b"data"):
+        path = root / f"{file_id}_{name}"
+        path.write_bytes(content)
+        return path
+
+    def test_register_and_get(self, tmp_path):
+        index = TempFileIndex(tmp_path)
+        path = self.store(tmp_path, "abc")
+
+        index.register("abc", path, 4, ".pdf", "hash", "doc.pdf")
+        entry = index.get("abc")
+
+        assert entry["path"] == str(path)
+        assert entry["size"] == 4
+        assert entry["extension"] == ".pdf"
+        assert entry["sha256"] == "hash"
+        assert entry["original_name"] == "doc.pdf"
+        assert entry["created_at"] > 0
+        assert index.get_path("abc") == path
+
+    def test_other_instance_sees_entry_without_scanning(self, tmp_path):
+        """A second worker (or a restart) resolves the id from the sidecar"""
+        path = self.store(tmp_path, "abc")
+        TempFileIndex(tmp_path).register("abc", path, 4, ".pdf", "hash")
+        other = TempFileIndex(tmp_path)
+
+        with patch("pathlib.Path.glob", side_effect=AssertionError("directory scanned")):
+            assert other.get_path("abc") == path
+
+    def test_unindexed_files_are_indexed_at_startup(self, tmp_path):
+        path = self.store(tmp_path, "legacy")
+        thumbnail = self.store(tmp_path, "legacy", name="thumbnail.png")
+        index = TempFileIndex(tmp_path)
+
+        assert index.index_existing() == 1
+        assert index.index_existing() == 0
+        entry = TempFileIndex(tmp_path).get("legacy")
+        assert entry["path"] == str(path)
+        assert entry["derived"] == [str(thumbnail)]
+
+    def test_unknown_id_does_not_scan_directory(self, tmp_path):
+        self.store(tmp_path, "legacy")
+        index = TempFileIndex(tmp_path)
+
+        with patch("pathlib.Path.glob", side_effect=AssertionError("directory scanned")), \
+             patch("pathlib.Path.iterdir", side_effect=AssertionError("directory scanned")):
+            assert index.get("legacy") is None
+            assert index.get("missing") is None
+            assert index.remove("missing") == 0
+
+    def test_missing_file_drops_stale_entry(self, tmp_path):
+        path = self.store(tmp_path, "abc")
+        index = TempFileIndex(tmp_path)
+        index.register("abc", path, 4, ".pdf", "hash")
+
+        path.unlink()
+
+        assert index.get("abc") is None
+        assert not (tmp_path / ".index" / "abc.json").exists()
+
+    def test_remove_deletes_file_derived_files_and_entry(self, tmp_path):
+        path = self.store(tmp_path, "abc")
+        thumbnail = self.store(tmp_path, "abc", name="thumbnail.png", content=b"png")
+        index = TempFileIndex(tmp_path)
+        index.register("abc", path, 4, ".pdf", "hash")
+        index.add_derived("abc", thumbnail)
+
+        freed = index.remove("abc")
+
+        assert freed == 7
+        assert not path.exists()
+        assert not thumbnail.exists()
+        assert index.get("abc") is None
+
+    def test_rejects_unsafe_file_ids(self, tmp_path):
+        index = TempFileIndex(tmp_path)
+
+        assert index.get("../etc/passwd") is None
+        assert index.remove("../etc/passwd") == 0
+
+
+@pytest.mark.asyncio
+async def test_upload_temp_returns_content_hash(test_client: AsyncClient):
+    """POST /api/upload-temp includes SHA-256 of the stored file"""
+    content = b"Hashed content"
+    files = {"file": ("hashed.pdf", content, "application/pdf")}
+
+    response = await test_client.post("/api/upload-temp", files=files)
+
+    assert response.status_code == 200
+    assert response.json()["sha256"] == hashlib.sha256(content).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_upload_temp_oversized_returns_413_without_storing(test_client: AsyncClient):
+    """Oversized uploads are rejected with 413 and nothing is left in temp storage"""
+    from app.main import TEMP_STORAGE_PATH
+
+    before = set(TEMP_STORAGE_PATH.iterdir())
+
+    files = {"file": ("huge_file.pdf", b"x" * (51 * 1024 * 1024), "application/pdf")}
+    response = await test_client.post("/api/upload-temp", files=files)
+
+    assert response.status_code == 413
+    assert set(TEMP_STORAGE_PATH.iterdir()) == before
+
+
+@pytest.mark.asyncio
+async def test_uploaded_file_is_indexed_and_removed_on_reject(test_client: AsyncClient):
+    """upload-temp registers the file; rejecting the preview removes it"""
+    from app.main import temp_index
+
+    files = {"file": ("indexed.pdf", b"Indexed content", "application/pdf")}
+    file_id = (await test_client.post("/api/upload-temp", files=files)).json()["file_id"]
+
+    entry = temp_index.get(file_id)
+    assert entry["original_name"] == "indexed.pdf"
+    assert entry["size"] == len(b"Indexed content")
+
+    response = await test_client.post("/api/document/confirm", json={"file_id": file_id, "confirmed": False})
+
+    assert response.status_code == 200
+    assert temp_index.get(file_id) is None
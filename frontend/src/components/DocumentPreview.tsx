@@ -7,6 +7,7 @@ interface DocumentPreviewData {
   confidence: number;
   is_legal_document: boolean;
   pages: number;
+  pages_extracted?: number;
   has_tables: boolean;
   has_figures: boolean;
   suggested_workflow: string;
@@ -29,7 +30,9 @@ interface DocumentPreviewData {
     materia?: string;
     doc_type?: string;
     date?: string;
+    [questionId: string]: string | undefined;
   };
+  suggested_answers_confidence?: Record<string, number>;
 }
 
 interface DocumentPreviewProps {
@@ -189,7 +192,11 @@ const DocumentPreview: React.FC<DocumentPreviewProps> = ({
 
                 <div className="info-item">
                   <span className="info-label">Páginas</span>
-                  <span className="info-value">{preview.pages}</span>
+                  <span className="info-value">
+                    {preview.pages_extracted !== undefined && preview.pages_extracted < preview.pages
+                      ? `${preview.pages} (analizadas ${preview.pages_extracted})`
+                      : preview.pages}
+                  </span>
                 </div>
 
                 <div className="info-item">
@@ -226,7 +226,16 @@ export function QuestionFlow({ fileId, fileMetadata, onComplete, onCancel, onErr
         return
       }
 
-      const question: Question = await response.json()
+      const question: Question & { prefilled_answers?: Record<string, string>; completed?: boolean } = await response.json()
+      // Answers prefilled from the confirmed preview are not asked again
+      const allAnswers = { ...answers, ...question.prefilled_answers }
+      setAnswers(allAnswers)
+
+      if (question.completed) {
+        // The preview answered every question: go straight to the name and upload step
+        await generateFilename(allAnswers)
+        return
+      }
       setCurrentQuestion(question)
     } catch (error) {
       setApiError('Error de conexión. Verifica que el servidor esté activo.')